@@ -89,7 +89,7 @@ def get_vector_store_service(
     Dependency that provides an instance of VectorStoreService.
 
     Args:
-        strategy (str): The vector store strategy to use ("inmemory", "db", or "hybrid").
+        strategy (str): The vector store strategy to use ("inmemory", "binary", "mmap", "hnsw", "ivf", "pq", "int8", "sharded", "router", "db", or "hybrid").
         memory_strategy (Optional[str]): Required if strategy is "hybrid" to determine which store to use in memory.
         db (Session): A SQLAlchemy session provided by get_db.
 
@@ -106,7 +106,8 @@ def get_vector_store_service(
     else:
         vector_store = get_vector_store(strategy=strategy, db_session=db)
 
-    return VectorStoreService(vector_store=vector_store)
+    namespace = f"{strategy.lower()}:{memory_strategy}" if memory_strategy else strategy.lower()
+    return VectorStoreService(vector_store=vector_store, db_session=db, cache_namespace=namespace)
 
 
 def get_storage_service(backend: str = "sqlite") -> StorageService:
@@ -37,6 +37,15 @@ class ChatRequest(BaseModel):
     temperature: float = Field(
         0.7, description="Temperature for response generation", ge=0, le=2
     )
+    nprobe: Optional[int] = Field(
+        None, description="IVF posting lists to scan (higher = better recall, slower)", ge=1
+    )
+    mmr_lambda: Optional[float] = Field(
+        None, description="Context relevance/diversity trade-off (1 = plain top-k, 0 = most diverse)", ge=0, le=1
+    )
+    fetch_k: Optional[int] = Field(
+        None, description="Candidates retrieved to choose the context chunks from", ge=1
+    )
 
 
 
@@ -62,9 +71,16 @@ class SearchRequest(BaseModel):
     filters: Optional[Dict[str, Any]] = Field(
         None, description="Metadata filters to apply"
     )
+    knowledge_base_id: Optional[str] = Field(
+        None, description="ID of the knowledge base to search"
+    )
     min_score: Optional[float] = Field(
         0.0, description="Minimum similarity score threshold", ge=0, le=1
     )
+    nprobe: Optional[int] = Field(
+        None, description="IVF posting lists to scan (higher = better recall, slower)", ge=1
+    )
+    debug: bool = Field(False, description="Include the vector store's search plan in the response")
 
 class DocumentChunk(BaseModel):
     """Representation of a document chunk with its metadata."""
@@ -85,6 +101,89 @@ class SearchResponse(BaseModel):
     query: str = Field(..., description="Original search query")
     results: List[DocumentChunk] = Field(..., description="Search results")
     total_found: int = Field(..., description="Total number of matching documents")
+    debug: Optional[Dict[str, Any]] = Field(
+        None, description="Search diagnostics (e.g. the chosen query plan), when requested"
+    )
+
+
+class BatchSearchRequest(BaseModel):
+    """Request model for running several vector searches in one call."""
+
+    searches: List[SearchRequest] = Field(
+        ..., description="Searches to run; those sharing scope and parameters are scored together", min_length=1
+    )
+
+
+class BatchSearchResponse(BaseModel):
+    """Response model for a batch of vector searches."""
+
+    results: List[SearchResponse] = Field(..., description="One response per search, in request order")
+
+
+class IndexStatsResponse(BaseModel):
+    """Residency counters of the per-knowledge-base index partitions in this worker."""
+
+    hits: int = Field(..., description="Scoped queries served by a resident partition")
+    misses: int = Field(..., description="Scoped queries that had to load a partition")
+    evictions: int = Field(..., description="Partitions evicted to stay within the memory budget")
+    resident_partitions: int = Field(..., description="Partitions currently loaded")
+    resident_bytes: int = Field(..., description="Bytes held by loaded partitions")
+    memory_budget: int = Field(..., description="Configured byte budget (0 = unlimited)")
+
+
+class QueryCacheStatsResponse(BaseModel):
+    """Counters of the query-result cache in this worker."""
+
+    hits: int = Field(..., description="Queries served from the cache")
+    misses: int = Field(..., description="Queries that ran against the vector store")
+    hit_ratio: float = Field(..., description="hits / (hits + misses)")
+    evictions: int = Field(..., description="Entries evicted to stay within the size or byte budget")
+    expirations: int = Field(..., description="Entries dropped after their TTL")
+    invalidations: int = Field(..., description="Entries dropped because the corpus changed")
+    entries: int = Field(..., description="Entries currently cached")
+    bytes: int = Field(..., description="Bytes held by cached results")
+    generation: int = Field(..., description="Newest corpus generation the cache has seen")
+    max_entries: int = Field(..., description="Configured entry limit (0 = cache disabled)")
+    max_bytes: int = Field(..., description="Configured byte budget (0 = unlimited)")
+    ttl_seconds: float = Field(..., description="Configured entry lifetime (0 = no expiry)")
+
+
+class ShardSearchRequest(BaseModel):
+    """Request a shard router sends to each shard server: pre-computed query embeddings."""
+
+    query_embeddings: List[List[float]] = Field(
+        ..., description="Query embeddings, scored as one batch", min_length=1
+    )
+    top_k: int = Field(5, description="Maximum number of results per query", ge=1)
+    knowledge_base_id: Optional[str] = Field(
+        None, description="ID of the knowledge base to search"
+    )
+    filters: Optional[Dict[str, Any]] = Field(
+        None, description="Metadata filters to apply"
+    )
+    min_score: float = Field(0.0, description="Minimum similarity score threshold")
+    search_params: Dict[str, Any] = Field(
+        default_factory=dict, description="Index-specific tuning knobs (e.g. nprobe)"
+    )
+
+
+class ShardHit(BaseModel):
+    """One chunk matched by a shard server, with the fields of a vector store result."""
+
+    chunk_id: int = Field(..., description="Unique ID of the chunk")
+    document_id: Optional[int] = Field(None, description="ID of the chunk's document")
+    text: str = Field(..., description="Text content of the chunk")
+    chunk_metadata: Optional[Dict[str, Any]] = Field(
+        None, description="Metadata associated with the chunk"
+    )
+    similarity: float = Field(..., description="Similarity score of the chunk")
+
+
+class ShardSearchResponse(BaseModel):
+    """Per-query top-k of one shard server's slice of the corpus."""
+
+    shard: str = Field(..., description="Document slice served, as index/count")
+    results: List[List[ShardHit]] = Field(..., description="Hits of each query, best first, in request order")
 
 
 # TODO: Add more models as needed for the assignment
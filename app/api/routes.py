@@ -4,6 +4,10 @@ Routes for handling chat and semantic search functionality in the RAG API.
 These endpoints expose:
 - `/chat`: Chat completion using RAG pipeline.
 - `/search`: Semantic vector search based on query embeddings.
+- `/search/batch`: Runs many searches, scoring those that share parameters together.
+- `/index/stats`: Residency counters of the per-knowledge-base index partitions.
+- `/cache/stats`: Hit ratio, byte usage and evictions of the query-result cache.
+- `/shard/search`: Scores query embeddings against this server's document slice, for a shard router.
 
 Dependencies are injected using FastAPI's Depends mechanism for testability
 and modular design.
@@ -16,15 +20,26 @@ from app.api.models import (
     ChatMessage,
     SearchRequest,
     SearchResponse,
-    DocumentChunk
+    BatchSearchRequest,
+    BatchSearchResponse,
+    DocumentChunk,
+    IndexStatsResponse,
+    QueryCacheStatsResponse,
+    ShardSearchRequest,
+    ShardSearchResponse
 )
 from app.api.dependencies import (
+    get_db,
     get_embedding_service,
     get_vector_store_service,
     get_rag_service
 )
+from app.db.shard_slice import shard_label
+from app.db.vector.partitioned_index import get_partitioned_index
+from app.db.vector.query_cache import get_query_cache
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Tuple
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -54,6 +69,7 @@ def chat(
         raise HTTPException(status_code=400, detail="No user message found in request.")
 
     logger.info(f"Received chat request | Query: {request.query} | Conversation ID: {request.conversation_id} | Knowledge Base ID: {request.knowledge_base_id}")
+    search_params = {"nprobe": request.nprobe} if request.nprobe else {}
     try:
         rag_result = rag_service.chat(
             query=request.query,
@@ -61,6 +77,9 @@ def chat(
             knowledge_base_id=request.knowledge_base_id,
             top_k=5,
             min_score=0.0,
+            mmr_lambda=request.mmr_lambda,
+            fetch_k=request.fetch_k,
+            **search_params,
         )
 
         logger.info(f"Generated response for conversation_id={rag_result['conversation_id']} | Retrieved {len(rag_result.get('context_chunks', []))} context chunks")
@@ -108,6 +127,7 @@ def search(
     """
     logger.info(f"Received search request | Query: {request.query} | TopK: {request.limit} | MinScore: {request.min_score} | Filters: {request.filters}")
 
+    search_params = {"nprobe": request.nprobe} if request.nprobe else {}
     try:
         query_embedding = embedding_service.get_embedding(request.query)
         logger.debug(f"Query embedding generated with dimension: {len(query_embedding)}")
@@ -115,29 +135,187 @@ def search(
         results = vector_store_service.query(
             query_embedding=query_embedding,
             top_k=request.limit,
+            knowledge_base_id=request.knowledge_base_id,
             filters=request.filters,
-            min_score=request.min_score or 0.0
+            min_score=request.min_score or 0.0,
+            **search_params
         )
 
         logger.info(f"Search completed | Found {len(results)} matching chunks")
+        return _search_response(request, results, vector_store_service)
+    except Exception as e:
+        logger.exception("Unexpected error during semantic search.")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error. Please try again later."
+        )
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+def search_batch(
+    request: BatchSearchRequest,
+    embedding_service=Depends(get_embedding_service),
+    vector_store_service=Depends(get_vector_store_service),
+):
+    """
+    Perform many semantic vector searches in one request.
+
+    Searches with the same limit, knowledge base, filters, score threshold and search
+    parameters are sent to the vector store as one batch, so their scoring is shared.
+
+    Args:
+        request (BatchSearchRequest): The searches to run.
+        embedding_service (EmbeddingService): Injected service to generate query embeddings.
+        vector_store_service (VectorStoreService): Injected service to perform similarity search.
+
+    Returns:
+        BatchSearchResponse: One SearchResponse per search, in request order.
 
-        chunks: List[DocumentChunk] = [
-            DocumentChunk(
-                chunk_id=chunk["chunk_id"],
-                text=chunk["text"],
-                metadata=chunk.get("chunk_metadata"),
-                similarity_score=chunk.get("similarity")
+    Raises:
+        HTTPException: 500 if any error occurs during embedding or search.
+    """
+    logger.info(f"Received batch search request | Searches: {len(request.searches)}")
+
+    groups: Dict[Tuple, List[int]] = {}
+    for position, search_request in enumerate(request.searches):
+        key = (
+            search_request.limit,
+            search_request.knowledge_base_id,
+            json.dumps(search_request.filters, sort_keys=True, default=str),
+            search_request.min_score or 0.0,
+            search_request.nprobe,
+        )
+        groups.setdefault(key, []).append(position)
+
+    try:
+        query_embeddings = [embedding_service.get_embedding(search_request.query) for search_request in request.searches]
+
+        responses: List[SearchResponse] = [None] * len(request.searches)
+        for positions in groups.values():
+            first = request.searches[positions[0]]
+            search_params = {"nprobe": first.nprobe} if first.nprobe else {}
+            batch_results = vector_store_service.query_batch(
+                query_embeddings=[query_embeddings[position] for position in positions],
+                top_k=first.limit,
+                knowledge_base_id=first.knowledge_base_id,
+                filters=first.filters,
+                min_score=first.min_score or 0.0,
+                **search_params
             )
-            for chunk in results
-        ]
+            for position, results in zip(positions, batch_results):
+                responses[position] = _search_response(request.searches[position], results, vector_store_service)
 
-        return SearchResponse(
-            query=request.query,
-            results=chunks,
-            total_found=len(results)
+        logger.info(f"Batch search completed | Searches: {len(responses)} | Batches: {len(groups)}")
+        return BatchSearchResponse(results=responses)
+    except Exception as e:
+        logger.exception("Unexpected error during batch semantic search.")
+        raise HTTPException(
+            status_code=500,
+            detail="Internal Server Error. Please try again later."
         )
+
+
+def _search_response(request: SearchRequest, results: List[dict], vector_store_service) -> SearchResponse:
+    """
+    Build the SearchResponse for one search from the vector store results.
+
+    Args:
+        request (SearchRequest): The search that produced the results.
+        results (List[dict]): Matched chunks returned by the vector store.
+        vector_store_service (VectorStoreService): Service whose last plan is reported in debug mode.
+
+    Returns:
+        SearchResponse: The response model for the search.
+    """
+    chunks: List[DocumentChunk] = [
+        DocumentChunk(
+            chunk_id=chunk["chunk_id"],
+            text=chunk["text"],
+            metadata=chunk.get("chunk_metadata"),
+            similarity_score=chunk.get("similarity")
+        )
+        for chunk in results
+    ]
+
+    debug = None
+    if request.debug:
+        debug = {"plan": vector_store_service.last_plan}
+        logger.debug(f"Search plan: {debug['plan']}")
+
+    return SearchResponse(
+        query=request.query,
+        results=chunks,
+        total_found=len(results),
+        debug=debug
+    )
+
+
+@router.get("/index/stats", response_model=IndexStatsResponse)
+def index_stats(db=Depends(get_db)):
+    """
+    Report hit/miss/eviction counters and resident bytes of the knowledge base partitions.
+
+    Args:
+        db (Session): Injected database session identifying the shared partitions.
+
+    Returns:
+        IndexStatsResponse: Residency counters for this worker process.
+    """
+    stats = get_partitioned_index(db).stats()
+    logger.info(f"Index partition stats: {stats}")
+    return IndexStatsResponse(**stats)
+
+
+@router.get("/cache/stats", response_model=QueryCacheStatsResponse)
+def cache_stats(db=Depends(get_db)):
+    """
+    Report hit ratio, byte usage and eviction counters of the query-result cache.
+
+    Args:
+        db (Session): Injected database session identifying the shared cache.
+
+    Returns:
+        QueryCacheStatsResponse: Cache counters for this worker process.
+    """
+    stats = get_query_cache(db).stats()
+    logger.info(f"Query cache stats: {stats}")
+    return QueryCacheStatsResponse(**stats)
+
+
+@router.post("/shard/search", response_model=ShardSearchResponse)
+def shard_search(
+    request: ShardSearchRequest,
+    vector_store_service=Depends(get_vector_store_service),
+):
+    """
+    Score pre-computed query embeddings against the document slice this server holds.
+
+    Called by a shard router (see ShardRouterVectorStore), which embeds the query once,
+    fans it out to every shard server and merges their top-k.
+
+    Args:
+        request (ShardSearchRequest): Query embeddings, scope and search parameters.
+        vector_store_service (VectorStoreService): Injected service to perform similarity search.
+
+    Returns:
+        ShardSearchResponse: The slice served and the hits of each query.
+
+    Raises:
+        HTTPException: 500 if any error occurs during search.
+    """
+    logger.info(f"Received shard search request | Shard: {shard_label()} | Queries: {len(request.query_embeddings)} | TopK: {request.top_k}")
+    try:
+        results = vector_store_service.query_batch(
+            query_embeddings=request.query_embeddings,
+            top_k=request.top_k,
+            knowledge_base_id=request.knowledge_base_id,
+            filters=request.filters,
+            min_score=request.min_score,
+            **request.search_params
+        )
+        return ShardSearchResponse(shard=shard_label(), results=results)
     except Exception as e:
-        logger.exception("Unexpected error during semantic search.")
+        logger.exception("Unexpected error during shard search.")
         raise HTTPException(
             status_code=500,
             detail="Internal Server Error. Please try again later."
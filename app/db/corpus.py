@@ -0,0 +1,125 @@
+"""
+Corpus Generation and Deletions
+
+A monotonically increasing counter of committed corpus changes, stored in the
+single-row `corpus_state` table. Writers bump it in the same transaction that adds or
+removes chunks; readers (index snapshots, result caches) record the generation they
+were built from and compare it with the current one.
+
+Chunks are deleted together with a tombstone per chunk in `chunk_tombstones`, which
+in-memory indexes replay incrementally to mask (and later drop) the deleted rows.
+"""
+
+import logging
+from typing import List, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.models import Chunk, ChunkTombstone, CorpusState, Document
+
+logger = logging.getLogger(__name__)
+
+CORPUS_STATE_ID = 1
+
+
+def current_generation(db: Session) -> int:
+    """
+    Returns the committed corpus generation.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+
+    Returns:
+        int: The generation; 0 for a database that has never recorded a change.
+    """
+    row = db.query(CorpusState.generation).filter(CorpusState.id == CORPUS_STATE_ID).first()
+    return int(row[0]) if row else 0
+
+
+def ahead_of_database(db: Session, generation: int, last_chunk_id: int) -> bool:
+    """
+    Returns whether a saved index holds changes the database does not.
+
+    An index saved at a generation or watermark past the database's (e.g. the database
+    was recreated or restored from an older backup) must be rebuilt rather than loaded:
+    chunks written since at or below its watermark would never be indexed.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        generation (int): Corpus generation the index was built from.
+        last_chunk_id (int): Highest chunk id the index has loaded.
+
+    Returns:
+        bool: True if the index is ahead of the database.
+    """
+    if generation > current_generation(db):
+        return True
+    max_chunk_id = db.query(func.max(Chunk.id)).scalar() or 0
+    return last_chunk_id > max_chunk_id
+
+
+def bump_generation(db: Session) -> None:
+    """
+    Increments the corpus generation as part of the caller's transaction.
+
+    The increment is a single `UPDATE ... SET generation = generation + 1`, so concurrent
+    writers never lose a bump. The caller commits.
+
+    Args:
+        db (Session): Session holding the transaction that changes the corpus.
+    """
+    updated = (
+        db.query(CorpusState)
+        .filter(CorpusState.id == CORPUS_STATE_ID)
+        .update({CorpusState.generation: CorpusState.generation + 1}, synchronize_session=False)
+    )
+    if not updated:
+        db.add(CorpusState(id=CORPUS_STATE_ID, generation=1))
+    logger.debug("Bumped corpus generation")
+
+
+def delete_document_chunks(db: Session, document_id: Union[int, str], delete_document: bool = False) -> List[int]:
+    """
+    Deletes a document's chunks, tombstones them and bumps the generation.
+
+    Everything happens in the caller's transaction; the caller commits.
+
+    Args:
+        db (Session): Session holding the transaction.
+        document_id (Union[int, str]): ID of the document whose chunks are deleted.
+        delete_document (bool, optional): Also delete the document row. Defaults to False.
+
+    Returns:
+        List[int]: IDs of the deleted chunks.
+    """
+    chunk_ids = [row[0] for row in db.query(Chunk.id).filter(Chunk.document_id == document_id).order_by(Chunk.id)]
+    if chunk_ids:
+        db.query(Chunk).filter(Chunk.document_id == document_id).delete(synchronize_session=False)
+        db.add_all([ChunkTombstone(chunk_id=chunk_id) for chunk_id in chunk_ids])
+    if delete_document:
+        db.query(Document).filter(Document.id == document_id).delete(synchronize_session=False)
+    if chunk_ids or delete_document:
+        bump_generation(db)
+    logger.info(f"Deleted {len(chunk_ids)} chunks of document_id={document_id} (delete_document={delete_document})")
+    return chunk_ids
+
+
+def tombstones_since(db: Session, after_id: int) -> List[Tuple[int, int]]:
+    """
+    Returns tombstones recorded after a watermark.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        after_id (int): Exclusive lower bound on tombstone id.
+
+    Returns:
+        List[Tuple[int, int]]: (tombstone_id, chunk_id) pairs in tombstone id order.
+    """
+    rows = (
+        db.query(ChunkTombstone.id, ChunkTombstone.chunk_id)
+        .filter(ChunkTombstone.id > after_id)
+        .order_by(ChunkTombstone.id)
+        .all()
+    )
+    return [(int(row[0]), int(row[1])) for row in rows]
@@ -0,0 +1,190 @@
+"""
+SQLite FTS5 Keyword Index
+
+Mirrors `chunks.text` into an external-content FTS5 virtual table (`chunks_fts`, rowid =
+chunk id) kept in sync by insert/update/delete triggers on `chunks`, so chunks written
+by any process are indexed on commit. Keyword queries are answered by the FTS5 index
+with `MATCH` and ranked with its built-in `bm25()`, so nothing is held in worker memory.
+
+The table and triggers are created on first use (`ensure_fts_index`), rebuilding the
+index from any chunks already present. The same backfill can be run explicitly on an
+existing database:
+
+Usage:
+    python -m app.db.fts_index [--rebuild]
+"""
+
+import argparse
+import logging
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.db.vector.bm25_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "chunks_fts"
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(text, content='chunks', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON chunks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON chunks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text ON chunks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+_prepared: "weakref.WeakSet" = weakref.WeakSet()
+_prepared_lock = threading.Lock()
+
+
+def fts5_available(engine: Engine) -> bool:
+    """
+    Check whether the database is SQLite with the FTS5 extension compiled in.
+
+    Args:
+        engine (Engine): Engine bound to the database.
+
+    Returns:
+        bool: True if FTS5 virtual tables can be created.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.connect() as conn:
+        options = {row[0] for row in conn.execute(text("PRAGMA compile_options"))}
+    return "ENABLE_FTS5" in options
+
+
+def backfill_fts_index(engine: Engine) -> int:
+    """
+    Rebuild the FTS5 index from the current contents of `chunks`.
+
+    Args:
+        engine (Engine): Engine bound to the database.
+
+    Returns:
+        int: Number of chunks indexed.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        count = conn.execute(text("SELECT COUNT(*) FROM chunks")).scalar()
+    logger.info(f"Rebuilt {FTS_TABLE} from {count} chunks")
+    return count
+
+
+def ensure_fts_index(engine: Engine) -> None:
+    """
+    Create the FTS5 table and sync triggers if missing, backfilling a new table.
+
+    Checked once per engine per process.
+
+    Args:
+        engine (Engine): Engine bound to the database.
+
+    Raises:
+        RuntimeError: If the database does not support FTS5.
+    """
+    with _prepared_lock:
+        if engine in _prepared:
+            return
+        if not fts5_available(engine):
+            raise RuntimeError("FTS5 keyword search requires SQLite compiled with FTS5")
+
+        created = not inspect(engine).has_table(FTS_TABLE)
+        with engine.begin() as conn:
+            for statement in FTS_DDL:
+                conn.execute(text(statement))
+        if created:
+            logger.info(f"Created {FTS_TABLE} and its triggers")
+            backfill_fts_index(engine)
+        _prepared.add(engine)
+
+
+def match_expression(query_text: Optional[str]) -> Optional[str]:
+    """
+    Build an FTS5 `MATCH` expression from free text.
+
+    Each word is quoted (so FTS5 operators and punctuation in user input are inert) and
+    the words are OR-ed, matching any chunk that contains at least one of them.
+
+    Args:
+        query_text (Optional[str]): Free-text query.
+
+    Returns:
+        Optional[str]: The expression, or None if the text contains no words.
+    """
+    terms = sorted(set(tokenize(query_text)))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def fts_search(
+    db: Session,
+    query_text: str,
+    top_k: int,
+    document_ids: Optional[Sequence[int]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[int, float]]:
+    """
+    Rank chunks by FTS5 `bm25()` for a free-text query.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        query_text (str): Free-text query.
+        top_k (int): Maximum number of results.
+        document_ids (Optional[Sequence[int]]): Only match chunks of these documents.
+        filters (Optional[Dict[str, Any]]): Metadata key/value pairs, compared as strings.
+
+    Returns:
+        List[Tuple[int, float]]: (chunk_id, score) pairs, best first. FTS5 reports lower
+            `bm25()` values as better; scores are negated so higher is better.
+    """
+    expression = match_expression(query_text)
+    if expression is None or top_k <= 0 or (document_ids is not None and not len(document_ids)):
+        return []
+
+    conditions = [f"{FTS_TABLE} MATCH :expression"]
+    params: Dict[str, Any] = {"expression": expression, "top_k": top_k}
+    bind = []
+    if document_ids is not None:
+        conditions.append("chunks.document_id IN :document_ids")
+        params["document_ids"] = list(document_ids)
+        bind.append(bindparam("document_ids", expanding=True))
+    for i, (key, value) in enumerate((filters or {}).items()):
+        conditions.append(f"CAST(json_extract(chunks.chunk_metadata, :path_{i}) AS TEXT) = :value_{i}")
+        params[f"path_{i}"] = '$."' + key.replace('"', '\\"') + '"'
+        params[f"value_{i}"] = str(value)
+
+    statement = text(
+        f"SELECT {FTS_TABLE}.rowid, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+        f"JOIN chunks ON chunks.id = {FTS_TABLE}.rowid "
+        f"WHERE {' AND '.join(conditions)} ORDER BY rank, {FTS_TABLE}.rowid LIMIT :top_k"
+    ).bindparams(*bind)
+    rows = db.execute(statement, params).all()
+    return [(int(row[0]), -float(row[1])) for row in rows]
+
+
+if __name__ == "__main__":
+    from app.db.database import Base, engine
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Create and backfill the FTS5 keyword index over chunk text.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it already exists.")
+    args = parser.parse_args()
+
+    setup_logging()
+    Base.metadata.create_all(bind=engine)
+    ensure_fts_index(engine)
+    if args.rebuild:
+        backfill_fts_index(engine)
@@ -0,0 +1,77 @@
+"""
+Knowledge Base Resolution
+
+Maps a `knowledge_base_id` to the documents it covers. Documents are assigned to a
+knowledge base through `Document.knowledge_base_id`; for backward compatibility, a
+numeric ID that names a document without a knowledge base selects that document alone
+(the convention used before knowledge bases existed).
+
+Moving documents between knowledge bases changes what scoped queries return, so
+`assign_documents` bumps the corpus generation like any other corpus change.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Union
+
+from sqlalchemy.orm import Session
+
+from app.db.corpus import bump_generation
+from app.db.models import Document
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_document_ids(db: Session, knowledge_base_id: Union[int, str]) -> List[int]:
+    """
+    Returns the IDs of the documents in a knowledge base.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        knowledge_base_id (Union[int, str]): Knowledge base ID, or a legacy document ID.
+
+    Returns:
+        List[int]: Sorted document IDs; empty if the knowledge base has no documents.
+    """
+    document_ids = {
+        row[0] for row in db.query(Document.id).filter(Document.knowledge_base_id == str(knowledge_base_id)).all()
+    }
+
+    try:
+        legacy_id = int(knowledge_base_id)
+    except (TypeError, ValueError):
+        legacy_id = None
+    if legacy_id is not None:
+        owner = db.query(Document.knowledge_base_id).filter(Document.id == legacy_id).first()
+        # Chunks may reference a document id with no Document row; those stay addressable too
+        if owner is None or owner[0] is None:
+            document_ids.add(legacy_id)
+
+    logger.debug(f"knowledge_base_id={knowledge_base_id} resolves to {len(document_ids)} documents")
+    return sorted(document_ids)
+
+
+def assign_documents(db: Session, document_ids: Sequence[int], knowledge_base_id: Optional[str]) -> int:
+    """
+    Moves documents into a knowledge base (or out of any, with None) and bumps the generation.
+
+    Everything happens in the caller's transaction; the caller commits.
+
+    Args:
+        db (Session): Session holding the transaction.
+        document_ids (Sequence[int]): IDs of the documents to move.
+        knowledge_base_id (Optional[str]): Target knowledge base ID, or None.
+
+    Returns:
+        int: Number of documents whose knowledge base changed.
+    """
+    target = None if knowledge_base_id is None else str(knowledge_base_id)
+    query = db.query(Document).filter(Document.id.in_(list(document_ids)))
+    if target is None:
+        query = query.filter(Document.knowledge_base_id.isnot(None))
+    else:
+        query = query.filter(Document.knowledge_base_id.is_(None) | (Document.knowledge_base_id != target))
+    updated = query.update({Document.knowledge_base_id: target}, synchronize_session=False)
+    if updated:
+        bump_generation(db)
+    logger.info(f"Assigned {updated} documents to knowledge_base_id={knowledge_base_id}")
+    return updated
@@ -0,0 +1,250 @@
+"""
+Embedding Storage Migration
+
+Converts chunk embeddings from the legacy JSON `embedding` column to the binary
+`embedding_blob` column (little-endian float32 or float16 bytes with dtype and
+dimension recorded). Rows are converted in bounded batches, each committed on its
+own, so the migration can be interrupted and resumed safely.
+
+With `--normalize`, stored embeddings that predate ingest-time L2 normalization are
+rescaled to unit norm and flagged (`embedding_normalized`), so every store can score
+them with a dot product instead of recomputing norms per query.
+
+Usage:
+    python -m app.db.migrate_embeddings [--batch-size 1000] [--dtype float32] [--normalize] [--vacuum]
+"""
+
+import argparse
+import json
+import logging
+
+import numpy as np
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+
+from app.db.models import Chunk
+
+from app.utils.embedding_codec import EMBEDDING_DTYPES, decode_embedding, encode_embedding
+from app.utils.similarity import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+# Columns added to `chunks` after the initial schema, with their SQL types.
+CHUNK_COLUMNS = {
+    "embedding_blob": "BLOB",
+    "embedding_dtype": "VARCHAR(16)",
+    "embedding_dim": "INTEGER",
+    "embedding_normalized": "BOOLEAN",
+}
+
+# Columns added to `documents` after the initial schema.
+DOCUMENT_COLUMNS = {
+    "knowledge_base_id": "VARCHAR",
+}
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Add any missing columns to existing `chunks` and `documents` tables.
+
+    `Base.metadata.create_all` never alters existing tables, so databases created
+    before the binary embedding columns or knowledge bases existed need them added
+    explicitly, and a SQLite `chunks` table created before ids were AUTOINCREMENT is
+    rebuilt. Safe to call on every startup.
+
+    Args:
+        engine (Engine): Engine bound to the database to upgrade.
+    """
+    inspector = inspect(engine)
+    for table, columns in (("chunks", CHUNK_COLUMNS), ("documents", DOCUMENT_COLUMNS)):
+        if not inspector.has_table(table):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        with engine.begin() as conn:
+            for name, sql_type in columns.items():
+                if name not in existing:
+                    logger.info(f"Adding column {table}.{name}")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"))
+
+    if engine.dialect.name == "sqlite" and inspector.has_table("chunks"):
+        rebuild_chunks_with_autoincrement(engine)
+
+
+def rebuild_chunks_with_autoincrement(engine: Engine) -> bool:
+    """
+    Rebuild a SQLite `chunks` table created without AUTOINCREMENT.
+
+    Without AUTOINCREMENT, SQLite hands out the id of a deleted max row again, so a
+    replaced chunk could get the id of the chunk it replaced and be masked by that
+    chunk's tombstone. The table is recreated from the model (keeping ids, triggers and
+    indexes) and `sqlite_sequence` is seeded past every id ever used, including ids that
+    only survive as tombstones.
+
+    Args:
+        engine (Engine): Engine bound to the SQLite database to upgrade.
+
+    Returns:
+        bool: True if the table was rebuilt; False if it already uses AUTOINCREMENT.
+    """
+    with engine.begin() as conn:
+        table_sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'chunks'")
+        ).scalar()
+        if table_sql is None or "AUTOINCREMENT" in table_sql.upper():
+            return False
+
+        logger.info("Rebuilding chunks table with AUTOINCREMENT ids")
+        triggers = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'chunks'")
+        ).scalars().all()
+        existing = [row[1] for row in conn.execute(text("PRAGMA table_info(chunks)"))]
+        columns = ", ".join(name for name in existing if name in Chunk.__table__.columns)
+
+        create_sql = str(CreateTable(Chunk.__table__).compile(dialect=engine.dialect))
+        conn.execute(text(create_sql.replace("CREATE TABLE chunks", "CREATE TABLE chunks_rebuild", 1)))
+        conn.execute(text(f"INSERT INTO chunks_rebuild ({columns}) SELECT {columns} FROM chunks"))
+        conn.execute(text("DROP TABLE chunks"))
+        conn.execute(text("ALTER TABLE chunks_rebuild RENAME TO chunks"))
+        for index in Chunk.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        for trigger_sql in triggers:
+            conn.execute(text(trigger_sql))
+
+        max_id = conn.execute(text("SELECT MAX(id) FROM chunks")).scalar() or 0
+        if inspect(conn).has_table("chunk_tombstones"):
+            max_id = max(max_id, conn.execute(text("SELECT MAX(chunk_id) FROM chunk_tombstones")).scalar() or 0)
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'chunks'"))
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('chunks', :seq)"), {"seq": max_id})
+    return True
+
+
+def migrate_embeddings(engine: Engine, batch_size: int = 1000, dtype: str = "float32") -> int:
+    """
+    Convert JSON embeddings to binary blobs in bounded batches.
+
+    Args:
+        engine (Engine): Engine bound to the database to migrate.
+        batch_size (int): Maximum rows converted per transaction.
+        dtype (str): Storage dtype for the blobs ("float32" or "float16").
+
+    Returns:
+        int: Number of rows converted.
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+    upgrade_schema(engine)
+
+    select_sql = text(
+        "SELECT id, embedding FROM chunks "
+        "WHERE id > :last_id AND embedding_blob IS NULL AND embedding IS NOT NULL "
+        "ORDER BY id LIMIT :batch_size"
+    )
+    update_sql = text(
+        "UPDATE chunks SET embedding_blob = :blob, embedding_dtype = :dtype, "
+        "embedding_dim = :dim, embedding = NULL WHERE id = :id"
+    )
+
+    converted = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_sql, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+            if not rows:
+                break
+
+            params = []
+            for chunk_id, raw in rows:
+                values = json.loads(raw) if isinstance(raw, str) else raw
+                if values is None:
+                    continue
+                vector = np.asarray(values, dtype=np.float32)
+                params.append({
+                    "id": chunk_id,
+                    "blob": encode_embedding(vector, dtype),
+                    "dtype": dtype,
+                    "dim": int(vector.shape[0]),
+                })
+            if params:
+                conn.execute(update_sql, params)
+
+        converted += len(params)
+        last_id = rows[-1][0]
+        logger.info(f"Converted {converted} embeddings so far (last id={last_id})")
+
+    logger.info(f"Embedding migration complete: {converted} rows converted to {dtype}")
+    return converted
+
+
+def normalize_embeddings(engine: Engine, batch_size: int = 1000) -> int:
+    """
+    Rescale binary embeddings to unit L2 norm and flag them as normalized.
+
+    Only rows whose `embedding_normalized` flag is unset are touched, so the backfill
+    can be interrupted and resumed. Rows still holding JSON embeddings are skipped;
+    run `migrate_embeddings` first.
+
+    Args:
+        engine (Engine): Engine bound to the database to backfill.
+        batch_size (int): Maximum rows rewritten per transaction.
+
+    Returns:
+        int: Number of rows normalized.
+    """
+    upgrade_schema(engine)
+
+    select_sql = text(
+        "SELECT id, embedding_blob, embedding_dtype, embedding_dim FROM chunks "
+        "WHERE id > :last_id AND embedding_blob IS NOT NULL "
+        "AND (embedding_normalized IS NULL OR embedding_normalized = :false) "
+        "ORDER BY id LIMIT :batch_size"
+    )
+    update_sql = text("UPDATE chunks SET embedding_blob = :blob, embedding_normalized = :true WHERE id = :id")
+
+    normalized = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select_sql, {"last_id": last_id, "batch_size": batch_size, "false": False}
+            ).fetchall()
+            if not rows:
+                break
+
+            params = []
+            for chunk_id, blob, dtype, dim in rows:
+                dtype = dtype or "float32"
+                vector = l2_normalize(decode_embedding(blob, dtype, dim))
+                params.append({"id": chunk_id, "blob": encode_embedding(vector, dtype), "true": True})
+            conn.execute(update_sql, params)
+
+        normalized += len(params)
+        last_id = rows[-1][0]
+        logger.info(f"Normalized {normalized} embeddings so far (last id={last_id})")
+
+    logger.info(f"Embedding normalization complete: {normalized} rows normalized")
+    return normalized
+
+
+if __name__ == "__main__":
+    from app.db.database import engine
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Convert JSON chunk embeddings to binary blobs.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows converted per transaction.")
+    parser.add_argument("--dtype", choices=sorted(EMBEDDING_DTYPES), default="float32", help="Storage dtype.")
+    parser.add_argument("--normalize", action="store_true", help="Backfill unit-norm embeddings afterwards.")
+    parser.add_argument("--vacuum", action="store_true", help="Run VACUUM afterwards to reclaim disk space.")
+    args = parser.parse_args()
+
+    setup_logging()
+    migrate_embeddings(engine, batch_size=args.batch_size, dtype=args.dtype)
+    if args.normalize:
+        normalize_embeddings(engine, batch_size=args.batch_size)
+
+    if args.vacuum:
+        logger.info("Running VACUUM")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, Text, ForeignKey, DateTime, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy import Index
 from sqlalchemy.types import JSON
 import uuid
+import numpy as np
 from datetime import datetime
+from typing import List, Optional
 from .database import Base
+from app.utils.embedding_codec import DEFAULT_EMBEDDING_DTYPE, encode_embedding, decode_embedding
+from app.utils.similarity import l2_normalize
 
 
 def generate_uuid():
@@ -12,6 +16,28 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+class KnowledgeBase(Base):
+    """
+    SQLAlchemy model representing a knowledge base: a named collection of documents.
+
+    Searches scoped by `knowledge_base_id` only consider chunks of the knowledge base's
+    documents, and in-memory stores keep one index partition per knowledge base.
+
+    Attributes:
+        id (str): Primary key (UUID string by default).
+        name (str): Human-readable name.
+        created_at (datetime): Timestamp when the knowledge base was created.
+        documents (List[Document]): Documents belonging to this knowledge base.
+    """
+    __tablename__ = "knowledge_bases"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    documents = relationship("Document", back_populates="knowledge_base")
+
+
 class Document(Base):
     """
     SQLAlchemy model representing a document that has been ingested into the system.
@@ -25,7 +51,11 @@ class Document(Base):
         path (str): File system or storage path of the document.
         created_at (datetime): Timestamp when the document was ingested.
         document_metadata (dict): Optional metadata about the document (e.g., source, tags, format).
+        knowledge_base_id (str): Optional ID of the knowledge base the document belongs to.
+            Documents without one are addressed as a knowledge base of their own, keyed by
+            their document ID.
         chunks (List[Chunk]): Relationship to associated text chunks split from this document.
+        knowledge_base (KnowledgeBase): The knowledge base the document belongs to, if any.
     """
     __tablename__ = "documents"
 
@@ -34,8 +64,10 @@ class Document(Base):
     path = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     document_metadata = Column(JSON, nullable=True)
+    knowledge_base_id = Column(String, ForeignKey("knowledge_bases.id"), nullable=True, index=True)
 
     chunks = relationship("Chunk", back_populates="document")
+    knowledge_base = relationship("KnowledgeBase", back_populates="documents")
 
 
 class Chunk(Base):
@@ -50,7 +82,15 @@ class Chunk(Base):
         document_id (int): Foreign key referencing the parent document.
         chunk_index (int): Order/index of the chunk in the parent document.
         text (str): The raw text content of the chunk.
-        embedding (List[float]): The vector embedding of the chunk (stored as JSON).
+        embedding (List[float]): The vector embedding of the chunk. Reads decode `embedding_blob`
+            (falling back to the legacy JSON column); writes encode into `embedding_blob`.
+        embedding_json (List[float]): Legacy JSON-encoded embedding, NULL once migrated.
+        embedding_blob (bytes): Little-endian float32/float16 embedding bytes.
+        embedding_dtype (str): Storage dtype of `embedding_blob` ("float32" or "float16").
+        embedding_dim (int): Dimension of the embedding.
+        embedding_normalized (bool): True if the stored embedding has unit L2 norm, so cosine
+            similarity reduces to a dot product. NULL/False rows predate ingest-time
+            normalization and are fixed by `python -m app.db.migrate_embeddings --normalize`.
         created_at (datetime): Timestamp when the chunk was created.
         chunk_metadata (dict): Additional metadata about the chunk (e.g., source, position).
         document (Document): SQLAlchemy relationship back to the parent document.
@@ -61,7 +101,11 @@ class Chunk(Base):
     document_id = Column(Integer, ForeignKey("documents.id"), index=True)
     chunk_index = Column(Integer, index=True)
     text = Column(Text, nullable=False)
-    embedding = Column(JSON)
+    embedding_json = Column("embedding", JSON(none_as_null=True), nullable=True)
+    embedding_blob = Column(LargeBinary, nullable=True)
+    embedding_dtype = Column(String(16), nullable=True)
+    embedding_dim = Column(Integer, nullable=True)
+    embedding_normalized = Column(Boolean, nullable=True, default=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     chunk_metadata = Column(JSON, nullable=True)
 
@@ -69,8 +113,89 @@ class Chunk(Base):
 
     __table_args__ = (
         Index("idx_docid_chunkindex", "document_id", "chunk_index"),
+        # Never reuse the ids of deleted chunks: indexes sync by id watermark and tombstones match by id
+        {"sqlite_autoincrement": True},
     )
 
+    @property
+    def embedding_array(self) -> Optional[np.ndarray]:
+        """The embedding as a float32 NumPy array, or None if the chunk has none."""
+        if self.embedding_blob is not None:
+            return decode_embedding(self.embedding_blob, self.embedding_dtype or "float32", self.embedding_dim)
+        if self.embedding_json is not None:
+            return np.asarray(self.embedding_json, dtype=np.float32)
+        return None
+
+    @property
+    def embedding(self) -> Optional[List[float]]:
+        vector = self.embedding_array
+        return None if vector is None else vector.tolist()
+
+    @embedding.setter
+    def embedding(self, value) -> None:
+        self.set_embedding(value)
+
+    def set_embedding(self, value, dtype: str = DEFAULT_EMBEDDING_DTYPE, normalize: bool = True) -> None:
+        """
+        Encode and store an embedding in the binary column.
+
+        Args:
+            value (List[float] or np.ndarray or None): The embedding vector.
+            dtype (str): Storage dtype ("float32" or "float16").
+            normalize (bool): Scale the vector to unit L2 norm before storing it, so
+                readers can score it with a plain dot product.
+        """
+        self.embedding_json = None
+        if value is None:
+            self.embedding_blob = None
+            self.embedding_dtype = None
+            self.embedding_dim = None
+            self.embedding_normalized = None
+            return
+        if normalize:
+            value = l2_normalize(value)
+        self.embedding_blob = encode_embedding(value, dtype)
+        self.embedding_dtype = dtype
+        self.embedding_dim = len(value)
+        self.embedding_normalized = normalize
+
+
+class CorpusState(Base):
+    """
+    Single-row table holding the corpus generation counter.
+
+    Every transaction that adds or removes chunks bumps `generation`, so index
+    snapshots and cached results can tell which corpus state they were built from.
+
+    Attributes:
+        id (int): Always 1.
+        generation (int): Number of corpus changes committed so far.
+    """
+    __tablename__ = "corpus_state"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+
+class ChunkTombstone(Base):
+    """
+    Append-only log of deleted chunk ids.
+
+    Deleting chunks removes their rows from `chunks` and records one tombstone per chunk
+    in the same transaction. In-memory indexes replay tombstones with an id above their
+    watermark (like they replay new chunks), so rows deleted by any process are masked.
+
+    Attributes:
+        id (int): Monotonic tombstone id, used as the replay watermark.
+        chunk_id (int): ID of the deleted chunk.
+        created_at (datetime): Deletion timestamp.
+    """
+    __tablename__ = "chunk_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chunk_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 
 class Conversation(Base):
     """
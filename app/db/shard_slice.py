@@ -0,0 +1,61 @@
+"""
+Document Shard Slices
+
+A shard server runs this app against the shared database but serves only one slice of
+the corpus: the documents whose id modulo `SHARD_COUNT` equals `SHARD_INDEX`. Whole
+documents stay on one shard, so re-ingesting or deleting a document touches a single
+shard, and the slices of `SHARD_COUNT` servers are disjoint and cover every document.
+
+With the defaults (`SHARD_COUNT=1`, `SHARD_INDEX=0`) the slice is the whole corpus.
+"""
+
+import logging
+import os
+from typing import Tuple
+
+from sqlalchemy.orm import Query
+
+from app.db.models import Chunk
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+
+
+def shard_slice() -> Tuple[int, int]:
+    """
+    Returns the slice of the corpus this process serves.
+
+    Returns:
+        Tuple[int, int]: (shard index, shard count).
+
+    Raises:
+        ValueError: If the configured index is outside `[0, SHARD_COUNT)`.
+    """
+    if SHARD_COUNT < 1 or not 0 <= SHARD_INDEX < SHARD_COUNT:
+        raise ValueError(f"Invalid shard slice SHARD_INDEX={SHARD_INDEX} SHARD_COUNT={SHARD_COUNT}")
+    return SHARD_INDEX, SHARD_COUNT
+
+
+def shard_label() -> str:
+    """Returns the slice as `index/count`, e.g. for snapshot manifests and shard responses."""
+    index, count = shard_slice()
+    return f"{index}/{count}"
+
+
+def filter_shard_slice(query: Query, document_id_column=Chunk.document_id) -> Query:
+    """
+    Restricts a query to the documents of this process's slice.
+
+    Args:
+        query (Query): Query over a table with a document id column.
+        document_id_column: The document id column to slice on. Defaults to `Chunk.document_id`.
+
+    Returns:
+        Query: The query, filtered unless the slice is the whole corpus.
+    """
+    index, count = shard_slice()
+    if count == 1:
+        return query
+    return query.filter(document_id_column % count == index)
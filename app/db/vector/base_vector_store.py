@@ -7,8 +7,14 @@ class BaseVectorStore(ABC):
 
     This class defines the contract for storing and querying document chunks 
     with their associated vector embeddings.
+
+    Attributes:
+        last_plan (Optional[Dict[str, Any]]): Search plan chosen by the most recent `query`,
+            for stores that plan filtered searches; None otherwise.
     """
 
+    last_plan: Optional[Dict[str, Any]] = None
+
     @abstractmethod
     def store_chunks(
         self,
@@ -39,6 +45,7 @@ class BaseVectorStore(ABC):
         filters: Optional[Dict[str, Union[str, int]]] = None,
         min_score: float = 0.0,
         query_text: Optional[str] = None,
+        **search_params: Any,
     ) -> List[Dict[str, Any]]:
         """
         Queries the vector store for the most relevant chunks based on a query embedding.
@@ -50,8 +57,91 @@ class BaseVectorStore(ABC):
             filters (Optional[Dict[str, Union[str, int]]], optional): Optional metadata filters for more granular search.
             min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
             query_text (Optional[str], optional): Optional keyword-based query text for hybrid strategies.
+            **search_params: Index-specific tuning knobs for this query (e.g. `nprobe` for IVF,
+                `ef_search` for HNSW). Stores ignore the ones they do not use.
 
         Returns:
             List[Dict[str, Any]]: A list of matched chunks with associated metadata and similarity scores.
         """
         pass
+
+    def delete_chunks(self, document_id: int) -> int:
+        """
+        Deletes all chunks of a document so they no longer match queries.
+
+        Args:
+            document_id (int): The ID of the document whose chunks are deleted.
+
+        Returns:
+            int: The number of chunks deleted.
+
+        Raises:
+            NotImplementedError: If the store does not support deletion.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support deleting chunks")
+
+    def replace_chunks(
+        self,
+        document_id: int,
+        chunks: List[Union[str, Dict[str, Any]]],
+        embeddings: List[List[float]],
+    ) -> None:
+        """
+        Replaces all chunks of a document, e.g. after its source file changed.
+
+        The default implementation deletes and then stores; stores that can do both in
+        one transaction override it.
+
+        Args:
+            document_id (int): The ID of the document whose chunks are replaced.
+            chunks (List[Union[str, Dict[str, Any]]]): The new text chunks or dictionaries
+                with 'text' and optional 'metadata'.
+            embeddings (List[List[float]]): Vector embeddings corresponding to the chunks.
+
+        Returns:
+            None
+        """
+        self.delete_chunks(document_id)
+        self.store_chunks(document_id, chunks, embeddings)
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        knowledge_base_id: Optional[str] = None,
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        min_score: float = 0.0,
+        query_texts: Optional[List[Optional[str]]] = None,
+        **search_params: Any,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Queries the vector store with several embeddings that share the same scope and parameters.
+
+        The default implementation runs `query` once per embedding; stores that can score a
+        whole batch at once (e.g. with one matrix-matrix product) override it.
+
+        Args:
+            query_embeddings (List[List[float]]): The embedding vectors of the queries.
+            top_k (int, optional): The maximum number of results per query. Defaults to 5.
+            knowledge_base_id (Optional[str], optional): Optional filter to restrict search to a specific knowledge base.
+            filters (Optional[Dict[str, Union[str, int]]], optional): Optional metadata filters shared by every query.
+            min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
+            query_texts (Optional[List[Optional[str]]], optional): Optional keyword query text per embedding.
+            **search_params: Index-specific tuning knobs, as for `query`.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The matched chunks of each query, in input order.
+        """
+        query_texts = query_texts or [None] * len(query_embeddings)
+        return [
+            self.query(
+                query_embedding=query_embedding,
+                top_k=top_k,
+                knowledge_base_id=knowledge_base_id,
+                filters=filters,
+                min_score=min_score,
+                query_text=query_text,
+                **search_params,
+            )
+            for query_embedding, query_text in zip(query_embeddings, query_texts)
+        ]
@@ -0,0 +1,230 @@
+import logging
+import math
+import re
+import threading
+import weakref
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.models import Chunk
+from app.db.vector.matrix_index import GrowableArray, fit_mask
+from app.utils.similarity import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Splits text into lowercase word tokens.
+
+    Args:
+        text (Optional[str]): Text to tokenize.
+
+    Returns:
+        List[str]: Tokens in order of appearance (empty for empty or missing text).
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class BM25Index:
+    """
+    In-memory inverted index over chunk text, scored with Okapi BM25.
+
+    Each term keeps a posting list of (row, term frequency) pairs, appended in ascending
+    chunk id order, and each row keeps its chunk id, document id and token count. Like
+    the vector indexes it is loaded once and then synced incrementally from the `chunks`
+    table. A query touches only the posting lists of its terms: per-posting BM25 weights
+    are computed with vectorized NumPy operations and summed per row with `np.bincount`.
+
+    Attributes:
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+        last_chunk_id (int): Highest chunk id loaded so far, used for incremental sync.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initializes an empty index.
+
+        Args:
+            k1 (float, optional): Term frequency saturation. Defaults to 1.2.
+            b (float, optional): Document length normalization. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self.last_chunk_id = 0
+        self._postings: Dict[str, Tuple[GrowableArray, GrowableArray]] = {}
+        self._chunk_ids = GrowableArray((), np.int64)
+        self._document_ids = GrowableArray((), np.int64)
+        self._lengths = GrowableArray((), np.float32)
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Returns the number of indexed chunks."""
+        return len(self._chunk_ids)
+
+    @property
+    def vocabulary_size(self) -> int:
+        """Number of distinct terms."""
+        return len(self._postings)
+
+    def add(self, chunk_ids: Sequence[int], document_ids: Sequence[int], texts: Sequence[Optional[str]]) -> None:
+        """
+        Indexes the text of a batch of chunks.
+
+        Args:
+            chunk_ids (Sequence[int]): Chunk ids, ascending and greater than `last_chunk_id`.
+            document_ids (Sequence[int]): Parent document id of each chunk.
+            texts (Sequence[Optional[str]]): Text of each chunk.
+        """
+        if not len(chunk_ids):
+            return
+
+        with self._lock:
+            start = len(self._chunk_ids)
+            pending: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+            lengths = []
+            for offset, text in enumerate(texts):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                for term, frequency in Counter(tokens).items():
+                    rows, frequencies = pending[term]
+                    rows.append(start + offset)
+                    frequencies.append(frequency)
+
+            for term, (rows, frequencies) in pending.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    capacity = max(8, len(rows))
+                    posting = self._postings[term] = (
+                        GrowableArray((), np.int64, capacity=capacity),
+                        GrowableArray((), np.float32, capacity=capacity),
+                    )
+                posting[0].extend(np.asarray(rows, dtype=np.int64))
+                posting[1].extend(np.asarray(frequencies, dtype=np.float32))
+
+            self._lengths.extend(np.asarray(lengths, dtype=np.float32))
+            self._document_ids.extend(np.asarray(document_ids, dtype=np.int64))
+            self._chunk_ids.extend(np.asarray(chunk_ids, dtype=np.int64))
+            self._total_length += sum(lengths)
+            self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Indexes chunks with an id above `last_chunk_id`.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of chunks indexed.
+        """
+        added = 0
+        with self._lock:
+            while True:
+                rows = (
+                    db.query(Chunk.id, Chunk.document_id, Chunk.text)
+                    .filter(Chunk.id > self.last_chunk_id)
+                    .order_by(Chunk.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                self.add([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+                added += len(rows)
+                if len(rows) < batch_size:
+                    break
+        if added:
+            logger.info(f"BM25Index synced {added} chunks ({self.vocabulary_size} terms)")
+        return added
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the chunk ids and document ids of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk_ids, document_ids).
+        """
+        with self._lock:
+            return self._chunk_ids.view, self._document_ids.view
+
+    def search(
+        self,
+        query_text: str,
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Ranks chunks containing any query term by BM25 score.
+
+        Each distinct query term contributes
+        `idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))` with
+        `idf = ln(1 + (N - df + 0.5) / (df + 0.5))`.
+
+        Args:
+            query_text (str): Free-text query, tokenized like the indexed text.
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, BM25 score) pairs, best first; ties keep chunk id order.
+        """
+        terms = set(tokenize(query_text))
+        with self._lock:
+            size = len(self._chunk_ids)
+            if top_k <= 0 or size == 0 or not terms:
+                return []
+            postings = [
+                (rows.view, frequencies.view)
+                for rows, frequencies in (self._postings[term] for term in terms if term in self._postings)
+            ]
+            chunk_ids = self._chunk_ids.view
+            lengths = self._lengths.view
+            avg_length = self._total_length / size
+        if not postings:
+            return []
+
+        posting_rows, weights = [], []
+        for rows, frequencies in postings:
+            idf = math.log(1.0 + (size - len(rows) + 0.5) / (len(rows) + 0.5))
+            length_norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / avg_length)
+            posting_rows.append(rows)
+            weights.append(idf * frequencies * (self.k1 + 1.0) / (frequencies + length_norm))
+
+        candidates, positions = np.unique(np.concatenate(posting_rows), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(weights))
+        if mask is not None:
+            keep = fit_mask(mask, size)[candidates]
+            candidates, scores = candidates[keep], scores[keep]
+
+        return [(int(chunk_ids[candidates[i]]), float(scores[i])) for i in top_k_indices(scores, top_k)]
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_bm25_index(db_session: Session) -> BM25Index:
+    """
+    Returns the process-wide BM25Index for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        BM25Index: The shared index (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = BM25Index()
+            _indexes[engine] = index
+            logger.info("Created process-wide BM25Index")
+        return index
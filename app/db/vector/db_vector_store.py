@@ -1,8 +1,14 @@
 import logging
-from sqlalchemy import text
+import numpy as np
+from sqlalchemy import text, func, String, cast
 from sqlalchemy.orm import Session
+from app.db.corpus import bump_generation, delete_document_chunks
+from app.db.knowledge_bases import resolve_document_ids
 from app.db.models import Chunk
 from app.db.vector.base_vector_store import BaseVectorStore
+from app.db.vector.hydration import hydrate_chunks
+from app.utils.embedding_codec import decode_embedding_rows
+from app.utils.similarity import cosine_similarity_matrix, top_k_indices
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +17,9 @@ class DBVectorStore(BaseVectorStore):
     Vector store implementation that persists chunks and embeddings in a database.
 
     This implementation uses SQL queries for similarity search using PGVector or similar
-    extensions and stores chunk metadata and embeddings in a relational schema.
+    extensions and stores chunk metadata and embeddings in a relational schema. On SQLite,
+    which has no vector operators, candidates are filtered in SQL and their binary
+    embeddings are decoded with `np.frombuffer` and scored in one vectorized pass.
     """
 
     def __init__(self, db_session: Session):
@@ -50,9 +58,40 @@ class DBVectorStore(BaseVectorStore):
                 chunk_metadata=metadata,
             )
             self.db.add(chunk)
+        bump_generation(self.db)
         self.db.commit()
         logger.info(f"Successfully stored all chunks for document_id={document_id}")
 
+    def delete_chunks(self, document_id):
+        """
+        Deletes a document's chunks (queries read the table, so they stop matching at once).
+
+        Args:
+            document_id (int): ID of the document whose chunks are deleted.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        deleted = delete_document_chunks(self.db, document_id)
+        self.db.commit()
+        logger.info(f"Deleted {len(deleted)} chunks for document_id={document_id}")
+        return len(deleted)
+
+    def replace_chunks(self, document_id, chunks, embeddings):
+        """
+        Replaces a document's chunks in one transaction.
+
+        Args:
+            document_id (int): ID of the document whose chunks are replaced.
+            chunks (List[Union[str, Dict]]): New chunk texts or dicts containing 'text' and optional 'metadata'.
+            embeddings (List[List[float]]): List of corresponding embedding vectors.
+
+        Returns:
+            None
+        """
+        delete_document_chunks(self.db, document_id)
+        self.store_chunks(document_id, chunks, embeddings)
+
     def query(
         self,
         query_embedding,
@@ -61,6 +100,7 @@ class DBVectorStore(BaseVectorStore):
         filters=None,
         min_score=0.0,
         query_text=None,
+        **search_params,
     ):
         """
         Queries the database for top-k similar chunks based on vector similarity.
@@ -72,6 +112,7 @@ class DBVectorStore(BaseVectorStore):
             filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters to apply on the chunks.
             min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
             query_text (Optional[str], optional): Currently unused; included for interface compatibility.
+            **search_params: Ignored; exact search has no tuning knobs.
 
         Returns:
             List[Dict[str, Any]]: List of matched chunks with metadata and similarity scores.
@@ -79,6 +120,9 @@ class DBVectorStore(BaseVectorStore):
         logger.info("Starting vector similarity query")
         logger.debug(f"Query params: top_k={top_k}, min_score={min_score}, kb_id={knowledge_base_id}, filters={filters}")
 
+        if self.db.get_bind().dialect.name == "sqlite":
+            return self._query_sqlite(query_embedding, top_k, knowledge_base_id, filters, min_score)
+
         # Format the embedding for SQL (PGVector expects array like '{1.0, 0.5, ...}')
         embedding_str = "{" + ",".join(map(str, query_embedding)) + "}"
 
@@ -97,8 +141,8 @@ class DBVectorStore(BaseVectorStore):
         # Apply knowledge base filter
         if knowledge_base_id:
             logger.debug(f"Applying knowledge_base_id filter: {knowledge_base_id}")
-            base_sql += " AND document_id = :knowledge_base_id"
-            params["knowledge_base_id"] = knowledge_base_id
+            base_sql += " AND document_id = ANY(:document_ids)"
+            params["document_ids"] = resolve_document_ids(self.db, knowledge_base_id)
 
         # Apply metadata filters
         if filters:
@@ -126,3 +170,45 @@ class DBVectorStore(BaseVectorStore):
             }
             for row in result
         ]
+
+    def _query_sqlite(self, query_embedding, top_k, knowledge_base_id, filters, min_score):
+        """
+        Scores binary embeddings fetched from SQLite in a single vectorized pass.
+
+        Only `(id, embedding)` columns are read for scoring; text and metadata are fetched
+        for the top-k winners afterwards.
+        """
+        query = self.db.query(
+            Chunk.id,
+            Chunk.embedding_blob,
+            Chunk.embedding_dtype,
+            Chunk.embedding_dim,
+            Chunk.embedding_json,
+            Chunk.embedding_normalized,
+        )
+        if knowledge_base_id:
+            query = query.filter(Chunk.document_id.in_(resolve_document_ids(self.db, knowledge_base_id)))
+        if filters:
+            for key, value in filters.items():
+                query = query.filter(
+                    cast(func.json_extract(Chunk.chunk_metadata, f'$.{key}'), String) == str(value)
+                )
+
+        rows = [row for row in query.order_by(Chunk.id).all() if row[1] is not None or row[4] is not None]
+        if not rows or top_k <= 0:
+            logger.info("Vector query returned 0 results")
+            return []
+
+        decoded = decode_embedding_rows([row[1:5] for row in rows])
+        matrix = decoded if isinstance(decoded, np.ndarray) else np.vstack(decoded)
+        normalized = np.fromiter((bool(row[5]) for row in rows), dtype=bool, count=len(rows))
+        scores = cosine_similarity_matrix(query_embedding, matrix, normalized=normalized)
+
+        order = top_k_indices(scores, top_k)
+        hits = [(rows[i][0], float(scores[i])) for i in order if scores[i] >= min_score]
+        if not hits:
+            logger.info("Vector query returned 0 results")
+            return []
+
+        logger.info(f"Vector query returned {len(hits)} results")
+        return hydrate_chunks(self.db, hits)
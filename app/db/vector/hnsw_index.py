@@ -0,0 +1,489 @@
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.corpus import current_generation
+from app.db.vector.matrix_index import MatrixIndex, fit_mask, index_file_is_current, iter_chunk_embeddings
+from app.utils.similarity import l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "rag_index")
+HNSW_FORMAT_VERSION = 1
+
+
+class HNSWIndex:
+    """
+    Hierarchical Navigable Small World graph over pre-normalized embeddings, in pure NumPy.
+
+    Vectors live in a MatrixIndex (so row `i` of the matrix is graph node `i`); the graph
+    is a list of layers, each mapping a node to its neighbor list. Distances are
+    `1 - dot(q, v)` on unit vectors, and every neighbor expansion scores all unvisited
+    neighbors with a single matrix-vector product.
+
+    Inserts hold the lock; searches do not. After each insert the entry point, top layer
+    and node count are published together, and a search walks only the nodes published
+    when it started. The graph is written to `path` only by `save`/`persist`, at ingest
+    end and shutdown, never on the query path.
+
+    Attributes:
+        M (int): Maximum neighbors per node on upper layers (2 * M on layer 0).
+        ef_construction (int): Candidate list size while inserting.
+        ef_search (int): Default candidate list size while searching.
+        path (Optional[str]): File the graph is persisted to, if any.
+        generation (int): Corpus generation read before the last sync, saved in the file header.
+    """
+
+    def __init__(
+        self,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        path: Optional[str] = None,
+        seed: int = 42,
+    ):
+        """
+        Initializes an empty graph.
+
+        Args:
+            M (int, optional): Neighbors per node. Defaults to 16.
+            ef_construction (int, optional): Build-time beam width. Defaults to 200.
+            ef_search (int, optional): Default query-time beam width. Defaults to 64.
+            path (Optional[str], optional): `.npz` file to persist to and load from.
+            seed (int, optional): Seed for level assignment. Defaults to 42.
+        """
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.path = path
+        self.vectors = MatrixIndex()
+        self.generation = 0
+        # Whether the first sync has considered loading `path`
+        self._file_checked = False
+        self._level_mult = 1.0 / math.log(max(M, 2))
+        self._rng = np.random.default_rng(seed)
+        self._layers: List[Dict[int, List[int]]] = []
+        self._entry_point: Optional[int] = None
+        # (entry point, top layer, linked nodes) as of the last completed insert
+        self._published: Tuple[Optional[int], int, int] = (None, 0, 0)
+        self._published_lock = threading.Lock()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def last_chunk_id(self) -> int:
+        return self.vectors.last_chunk_id
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (chunk_ids, document_ids) for all nodes, in node order."""
+        return self.vectors.row_ids()
+
+    # ---------- Graph primitives ----------
+
+    def _max_neighbors(self, level: int) -> int:
+        return 2 * self.M if level == 0 else self.M
+
+    def _search_layer(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        level: int,
+    ) -> List[Tuple[float, int]]:
+        """Beam search on one layer; returns up to `ef` (distance, node) pairs, closest first."""
+        layer = self._layers[level]
+        size = matrix.shape[0]
+        visited = set(entry_points)
+        distances = 1.0 - matrix[entry_points] @ query
+
+        candidates = [(float(d), node) for d, node in zip(distances, entry_points)]
+        heapq.heapify(candidates)
+        results = [(-d, node) for d, node in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -results[0][0] and len(results) >= ef:
+                break
+
+            neighbors = [n for n in layer.get(node, ()) if n not in visited and n < size]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+
+            worst = -results[0][0]
+            for d, neighbor in zip((1.0 - matrix[neighbors] @ query).tolist(), neighbors):
+                if len(results) < ef or d < worst:
+                    heapq.heappush(candidates, (d, neighbor))
+                    heapq.heappush(results, (-d, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+                    worst = -results[0][0]
+
+        return sorted((-d, node) for d, node in results)
+
+    def _select_neighbors(self, matrix: np.ndarray, candidates: List[Tuple[float, int]], count: int) -> List[int]:
+        """
+        Neighbor selection heuristic: keep a candidate only if it is closer to the base
+        node than to every neighbor already kept, which preserves edges between clusters.
+        Falls back to the closest remaining candidates if the heuristic keeps too few.
+        """
+        if len(candidates) <= count:
+            return [node for _, node in candidates]
+
+        nodes = [node for _, node in candidates]
+        block = matrix[nodes]
+        pairwise = (1.0 - block @ block.T).tolist()
+
+        kept: List[int] = []
+        for i, (distance, _) in enumerate(candidates):
+            if len(kept) >= count:
+                break
+            row = pairwise[i]
+            if all(row[j] >= distance for j in kept):
+                kept.append(i)
+        selected = [nodes[i] for i in kept]
+
+        if len(selected) < count:
+            chosen = set(selected)
+            selected.extend(node for _, node in candidates if node not in chosen)
+            selected = selected[:count]
+        return selected
+
+    def _connect(self, matrix: np.ndarray, node: int, neighbor: int, level: int) -> None:
+        links = self._layers[level].setdefault(neighbor, [])
+        links.append(node)
+        limit = self._max_neighbors(level)
+        if len(links) > limit:
+            distances = 1.0 - matrix[links] @ matrix[neighbor]
+            ranked = sorted(zip(distances.tolist(), links))
+            self._layers[level][neighbor] = self._select_neighbors(matrix, ranked, limit)
+
+    def _insert(self, node: int) -> None:
+        matrix, _, _ = self.vectors.snapshot()
+        query = matrix[node]
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+        while len(self._layers) <= level:
+            self._layers.append({})
+        for lc in range(level + 1):
+            self._layers[lc].setdefault(node, [])
+
+        if self._entry_point is None:
+            self._entry_point = node
+            return
+
+        top_level = self._top_level()
+        entry_points = [self._entry_point]
+        for lc in range(top_level, level, -1):
+            entry_points = [self._search_layer(matrix, query, entry_points, 1, lc)[0][1]]
+
+        for lc in range(min(level, top_level), -1, -1):
+            found = self._search_layer(matrix, query, entry_points, self.ef_construction, lc)
+            neighbors = self._select_neighbors(matrix, found, self._max_neighbors(lc))
+            self._layers[lc][node] = list(neighbors)
+            for neighbor in neighbors:
+                self._connect(matrix, node, neighbor, lc)
+            entry_points = [n for _, n in found]
+
+        if level > top_level:
+            self._entry_point = node
+
+    def _top_level(self) -> int:
+        return max(lc for lc, layer in enumerate(self._layers) if self._entry_point in layer)
+
+    def _publish(self, size: int) -> None:
+        """Makes the first `size` nodes visible to searches. Caller holds the lock."""
+        top_level = self._top_level() if self._entry_point is not None else 0
+        with self._published_lock:
+            self._published = (self._entry_point, top_level, size)
+
+    # ---------- Public API ----------
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Inserts vectors into the graph incrementally.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors.
+
+        Returns:
+            int: Number of nodes inserted.
+        """
+        with self._lock:
+            start = len(self.vectors)
+            added = self.vectors.add(chunk_ids, document_ids, embeddings)
+            for node in range(start, start + added):
+                self._insert(node)
+                self._publish(node + 1)
+            if added:
+                self._dirty = True
+            return added
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Inserts chunks written since `last_chunk_id`.
+
+        The first sync of an empty index loads `path` unless the file is ahead of the
+        database (see `index_file_is_current`), in which case the graph is rebuilt from the
+        `chunks` table. The graph is not written here; call `persist` (or
+        `save_hnsw_indexes`) at ingest end or shutdown.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of nodes inserted.
+        """
+        added = 0
+        with self._lock:
+            if not self._file_checked:
+                self._file_checked = True
+                if self.path and os.path.exists(self.path) and len(self) == 0 and index_file_is_current(db, self.path):
+                    self.load(self.path)
+            # Read before syncing: the graph then holds at least everything up to this generation
+            generation = current_generation(db)
+            for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, self.last_chunk_id, batch_size):
+                added += self.add(chunk_ids, document_ids, embeddings)
+            self.generation = max(self.generation, generation)
+            if added:
+                logger.info(f"HNSW index inserted {added} nodes (total={len(self)})")
+        return added
+
+    def persist(self) -> bool:
+        """
+        Saves the graph to `path` if nodes were inserted since it was last saved or loaded.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        with self._lock:
+            if not (self.path and self._dirty):
+                return False
+            self.save(self.path)
+            self._dirty = False
+            return True
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        ef_search: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Approximate nearest-neighbour search.
+
+        With a mask, the beam is widened until enough unmasked nodes are found; masks
+        that leave fewer than `ef` rows are brute-forced over the subset instead.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over nodes.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            ef_search (Optional[int], optional): Beam width override for this query.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        with self._published_lock:
+            entry_point, top_level, size = self._published
+        # Nodes appended after the publish are not linked yet
+        matrix, ids, _ = self.vectors.snapshot()
+        matrix, ids = matrix[:size], ids[:size]
+        if top_k <= 0 or len(ids) == 0 or entry_point is None:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}")
+        query = l2_normalize(query)
+
+        ef = max(ef_search or self.ef_search, top_k)
+
+        if mask is not None:
+            mask = fit_mask(mask, len(ids))
+            allowed = np.flatnonzero(mask)
+            if len(allowed) <= ef:
+                scores = matrix[allowed] @ query
+                order = top_k_indices(scores, top_k)
+                return [
+                    (int(ids[allowed[i]]), float(scores[i]))
+                    for i in order
+                    if scores[i] >= min_score
+                ]
+
+        while True:
+            entry_points = [entry_point]
+            for lc in range(top_level, 0, -1):
+                entry_points = [self._search_layer(matrix, query, entry_points, 1, lc)[0][1]]
+            found = self._search_layer(matrix, query, entry_points, ef, 0)
+
+            if mask is not None:
+                found = [(d, node) for d, node in found if mask[node]]
+                if len(found) < top_k and ef < len(ids):
+                    ef = min(ef * 2, len(ids))
+                    continue
+            break
+
+        hits = []
+        for distance, node in found[:top_k]:
+            score = 1.0 - distance
+            if score >= min_score:
+                hits.append((int(ids[node]), float(score)))
+        return hits
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        rows: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """Scores only the given nodes exactly, bypassing the graph (see `MatrixIndex.search_rows`)."""
+        return self.vectors.search_rows(query_embedding, rows, top_k, min_score=min_score)
+
+    # ---------- Persistence ----------
+
+    def save(self, path: str) -> None:
+        """
+        Persists vectors, ids and graph to a `.npz` file (written atomically).
+
+        Each layer is stored in CSR form: node ids, offsets into a flat neighbor array.
+
+        Args:
+            path (str): Destination file path.
+        """
+        with self._lock:
+            matrix, ids, document_ids = self.vectors.snapshot()
+            arrays = {
+                "vectors": matrix,
+                "chunk_ids": ids,
+                "document_ids": document_ids,
+            }
+            for level, layer in enumerate(self._layers):
+                nodes = np.fromiter(layer.keys(), dtype=np.int64, count=len(layer))
+                lengths = np.fromiter((len(layer[n]) for n in nodes), dtype=np.int64, count=len(nodes))
+                offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+                flat = np.fromiter((n for node in nodes for n in layer[node]), dtype=np.int64, count=int(offsets[-1]))
+                arrays[f"layer{level}_nodes"] = nodes
+                arrays[f"layer{level}_offsets"] = offsets
+                arrays[f"layer{level}_neighbors"] = flat
+
+            header = {
+                "version": HNSW_FORMAT_VERSION,
+                "M": self.M,
+                "ef_construction": self.ef_construction,
+                "layers": len(self._layers),
+                "entry_point": self._entry_point,
+                "last_chunk_id": self.last_chunk_id,
+                "generation": self.generation,
+            }
+            arrays["header"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+        logger.info(f"Saved HNSW index with {len(ids)} nodes to {path}")
+
+    def load(self, path: str) -> None:
+        """
+        Restores an index written by `save`, replacing the current contents.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file format version is not supported.
+        """
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("version") != HNSW_FORMAT_VERSION:
+                raise ValueError(f"Unsupported HNSW index version: {header.get('version')}")
+
+            with self._lock:
+                self.M = header["M"]
+                self.ef_construction = header["ef_construction"]
+                self._level_mult = 1.0 / math.log(max(self.M, 2))
+                self.vectors = MatrixIndex(initial_capacity=max(1, len(data["chunk_ids"])))
+                self.vectors.add(data["chunk_ids"].tolist(), data["document_ids"].tolist(), data["vectors"])
+                self.vectors.last_chunk_id = header["last_chunk_id"]
+                self.generation = header.get("generation", 0)
+
+                self._layers = []
+                for level in range(header["layers"]):
+                    nodes = data[f"layer{level}_nodes"].tolist()
+                    offsets = data[f"layer{level}_offsets"].tolist()
+                    flat = data[f"layer{level}_neighbors"].tolist()
+                    self._layers.append({
+                        node: flat[offsets[i]:offsets[i + 1]] for i, node in enumerate(nodes)
+                    })
+                self._entry_point = header["entry_point"]
+                self._dirty = False
+                self._publish(len(self.vectors))
+        logger.info(f"Loaded HNSW index with {len(self)} nodes from {path}")
+
+
+_indexes: Dict[str, HNSWIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_hnsw_index(path: str, **params) -> HNSWIndex:
+    """
+    Returns the process-wide HNSWIndex persisted at `path`.
+
+    The file is loaded lazily by the first `sync`.
+
+    Args:
+        path (str): `.npz` file backing the index.
+        **params: M, ef_construction, ef_search used when the index is created.
+
+    Returns:
+        HNSWIndex: The shared index.
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = HNSWIndex(path=path, **params)
+            _indexes[key] = index
+        return index
+
+
+def save_hnsw_indexes() -> int:
+    """
+    Persists every process-wide HNSWIndex with unsaved inserts.
+
+    Called at the end of an ingest run and at shutdown, so inserts made on the query
+    path are written once instead of after every sync.
+
+    Returns:
+        int: Number of index files written.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return sum(index.persist() for index in indexes)
@@ -0,0 +1,53 @@
+import logging
+import os
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.hnsw_index import DEFAULT_INDEX_DIR, get_hnsw_index
+
+logger = logging.getLogger(__name__)
+
+class HNSWVectorStore(InMemoryVectorStore):
+    """
+    Vector store backed by an approximate HNSW graph index.
+
+    Persistence and filtering work exactly as in InMemoryVectorStore; only the search
+    index differs. New chunks are inserted into the graph incrementally by `store_chunks`
+    (or picked up on the next query if written elsewhere). The graph is saved to
+    `index_path` at ingest end and shutdown (`save_hnsw_indexes`), so a restart loads
+    it instead of rebuilding.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(
+        self,
+        db_session: Session,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        index_path: Optional[str] = None,
+    ):
+        """
+        Initializes the HNSW vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+            M (int, optional): Neighbors per graph node. Defaults to 16.
+            ef_construction (int, optional): Build-time beam width. Defaults to 200.
+            ef_search (int, optional): Query-time beam width; higher means better recall. Defaults to 64.
+            index_path (Optional[str], optional): Graph file. Defaults to `<VECTOR_INDEX_DIR>/hnsw.npz`.
+        """
+        super().__init__(db_session)
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, "hnsw.npz")
+        logger.info(f"HNSWVectorStore initialized | M={M} | ef_construction={ef_construction} | ef_search={ef_search}")
+
+    def _index(self):
+        return get_hnsw_index(self.index_path, M=self.M, ef_construction=self.ef_construction, ef_search=self.ef_search)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        ef_search = search_params.get("ef_search") or self.ef_search
+        return index.search(query_embedding, top_k, mask=mask, min_score=min_score, ef_search=ef_search)
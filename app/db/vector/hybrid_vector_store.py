@@ -1,35 +1,123 @@
 import logging
-from typing import List, Dict, Any, Optional, Union
+import os
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from sqlalchemy import func, String, cast
-from app.db.models import Chunk
+from app.db.fts_index import ensure_fts_index, fts_search
+from app.db.knowledge_bases import resolve_document_ids
 from app.db.vector.base_vector_store import BaseVectorStore
+from app.db.vector.bm25_index import get_bm25_index
+from app.db.vector.hydration import hydrate_chunks
+from app.db.vector.metadata_index import get_metadata_index
+from app.db.vector.tombstone_index import get_tombstone_index
+from app.utils.rank_fusion import RRF_K, reciprocal_rank_fusion
 
 logger = logging.getLogger(__name__)
 
+# Keyword search backend: "bm25" (in-memory inverted index) or "fts5" (SQLite FTS5 table)
+DEFAULT_KEYWORD_BACKEND = os.getenv("HYBRID_KEYWORD_BACKEND", "bm25")
+KEYWORD_BACKENDS = ("bm25", "fts5")
+# Seconds the keyword leg may take before the merge proceeds without it
+DEFAULT_LEG_TIMEOUT = float(os.getenv("HYBRID_LEG_TIMEOUT", "5.0"))
+LEG_WORKERS = int(os.getenv("HYBRID_LEG_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _leg_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide thread pool that runs hybrid search legs."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LEG_WORKERS, thread_name_prefix="hybrid-leg")
+        return _executor
+
+
+def supports_concurrent_legs(bind: Any) -> bool:
+    """
+    Checks whether the legs of a hybrid query can run on separate connections.
+
+    In-memory SQLite databases exist per connection, so a second session would not see
+    the data; those (and binds that are not engines) run the legs one after the other.
+
+    Args:
+        bind (Any): The bind of the store's session.
+
+    Returns:
+        bool: True if each leg can open its own connection to the same database.
+    """
+    if not isinstance(bind, Engine):
+        return False
+    return not (bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:"))
+
 class HybridVectorStore(BaseVectorStore):
     """
     A hybrid vector store that combines vector-based similarity search with keyword-based search.
 
     This class delegates vector operations to another vector store (e.g., DBVectorStore or InMemoryVectorStore)
-    and combines its results with full-text search using SQL queries for improved relevance.
+    and combines its results with BM25-ranked keyword search for improved relevance.
+
+    Keyword search runs either against a process-wide in-memory BM25 inverted index
+    (`keyword_backend="bm25"`) or against a SQLite FTS5 table kept in sync by triggers
+    (`keyword_backend="fts5"`), which keeps worker memory flat at the cost of a disk-backed
+    lookup per query.
+
+    Both legs of a query run concurrently: the keyword leg on the shared leg thread pool
+    with a session of its own, the vector leg on the request thread with the store's
+    session (which the inner store is bound to, and which must not be used from two
+    threads). The keyword leg has a timeout (`leg_timeout`); if it misses it, it is
+    logged and left out of the merge, so latency follows the slower leg rather than the
+    sum of both. The rankings are merged with weighted reciprocal-rank fusion, `alpha`
+    and `beta` weighting the vector and keyword legs.
 
-    The final similarity score is a weighted combination of both methods using alpha and beta parameters.
+    Attributes:
+        last_plan (Optional[Dict[str, Any]]): The vector leg's search plan for the most
+            recent query; when a leg timed out, also `partial=True` and the `timed_out` legs.
     """
 
-    def __init__(self, db_session: Session, vector_store: BaseVectorStore):
+    def __init__(
+        self,
+        db_session: Session,
+        vector_store: BaseVectorStore,
+        keyword_backend: str = DEFAULT_KEYWORD_BACKEND,
+        leg_timeout: float = DEFAULT_LEG_TIMEOUT,
+    ):
         """
         Initializes the HybridVectorStore with a database session and an underlying vector store.
 
         Args:
             db_session (Session): SQLAlchemy session for executing keyword-based queries.
             vector_store (BaseVectorStore): An instance of a vector store to handle embedding-based search.
+            keyword_backend (str, optional): "bm25" or "fts5". Defaults to `HYBRID_KEYWORD_BACKEND` ("bm25").
+                Falls back to "bm25" if the database does not support FTS5.
+            leg_timeout (float, optional): Seconds to wait for the keyword leg. Defaults to `HYBRID_LEG_TIMEOUT` (5s).
+
+        Raises:
+            ValueError: If the keyword backend is unknown.
         """
+        if keyword_backend not in KEYWORD_BACKENDS:
+            raise ValueError(f"Unsupported keyword backend: {keyword_backend}")
+        if keyword_backend == "fts5":
+            try:
+                ensure_fts_index(db_session.get_bind())
+            except RuntimeError as e:
+                logger.warning(f"{e}; falling back to the in-memory BM25 keyword index")
+                keyword_backend = "bm25"
+
         self.db = db_session
         self.vector_store = vector_store
-        self.alpha = 0.7  # weight for vector similarity
-        self.beta = 0.3   # weight for keyword similarity
-        logger.info(f"HybridVectorStore initialized with backend: {type(vector_store).__name__}")
+        self.keyword_backend = keyword_backend
+        self.leg_timeout = leg_timeout
+        self.alpha = 0.7  # RRF weight of the vector ranking
+        self.beta = 0.3   # RRF weight of the keyword ranking
+        self.rrf_k = RRF_K
+        self.last_plan = None
+        logger.info(f"HybridVectorStore initialized with backend: {type(vector_store).__name__} | keyword_backend={keyword_backend}")
 
     def store_chunks(self, document_id: int, chunks: List[Union[str, Dict[str, Any]]], embeddings: List[List[float]]) -> None:
         """
@@ -45,61 +133,123 @@ class HybridVectorStore(BaseVectorStore):
         """
         logger.info(f"Storing {len(chunks)} chunks for document_id={document_id}")
         self.vector_store.store_chunks(document_id, chunks, embeddings)
+        # The FTS5 table is maintained by triggers on `chunks`
+        if self.keyword_backend == "bm25":
+            get_bm25_index(self.db).sync(self.db)
         logger.info(f"Chunks successfully stored for document_id={document_id}")
 
+    def delete_chunks(self, document_id: int) -> int:
+        """
+        Deletes a document's chunks using the underlying vector store.
+
+        Keyword search excludes them too: the FTS5 triggers remove them from the FTS table,
+        and the BM25 leg masks tombstoned rows.
+
+        Args:
+            document_id (int): The ID of the document whose chunks are deleted.
+
+        Returns:
+            int: The number of chunks deleted.
+        """
+        return self.vector_store.delete_chunks(document_id)
+
+    def replace_chunks(self, document_id: int, chunks: List[Union[str, Dict[str, Any]]], embeddings: List[List[float]]) -> None:
+        """
+        Replaces a document's chunks using the underlying vector store.
+
+        Args:
+            document_id (int): The ID of the document whose chunks are replaced.
+            chunks (List[Union[str, Dict[str, Any]]]): New text chunks or dictionaries with optional metadata.
+            embeddings (List[List[float]]): Vector embeddings corresponding to the chunks.
+
+        Returns:
+            None
+        """
+        self.vector_store.replace_chunks(document_id, chunks, embeddings)
+        if self.keyword_backend == "bm25":
+            get_bm25_index(self.db).sync(self.db)
+
     def keyword_search(
         self,
         query_text: str,
         top_k: int = 5,
         knowledge_base_id: Optional[str] = None,
-        filters: Optional[Dict[str, Union[str, int]]] = None
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        db: Optional[Session] = None
     ) -> List[Dict[str, Any]]:
         """
-        Performs a keyword-based search over stored chunks using SQL `ILIKE` filtering.
+        Performs a keyword-based search over stored chunks, ranked by BM25.
+
+        With the "bm25" backend the query is scored against the process-wide BM25Index,
+        which is synced incrementally (so chunks written by other processes are picked up);
+        the knowledge base and metadata filters become a boolean mask over the index rows,
+        the metadata part resolved by the inverted MetadataIndex. With the "fts5" backend
+        the query is a `MATCH` against the FTS5 table, ranked by `bm25()`, with the filters
+        applied in the same SQL statement. Text and metadata of the (at most `top_k`)
+        matches are hydrated afterwards in a single batched fetch.
 
         Args:
             query_text (str): The textual query string to search for in chunks.
             top_k (int, optional): Maximum number of results to return. Defaults to 5.
             knowledge_base_id (Optional[str], optional): Filter to restrict results to a specific knowledge base.
             filters (Optional[Dict[str, Union[str, int]]], optional): Additional metadata filters.
+            db (Optional[Session], optional): Session to search with. Defaults to the store's session.
 
         Returns:
-            List[Dict[str, Any]]: Matching chunks with a default similarity score of 1.0.
+            List[Dict[str, Any]]: Matching chunks, best first. `similarity` is the BM25 score
+                relative to the best match (so it lies in (0, 1]); `keyword_score` is the raw score.
         """
-        logger.info(f"Starting keyword search | query_text='{query_text}' | top_k={top_k} | kb_id={knowledge_base_id} | filters={filters}")
-        query = self.db.query(Chunk)
+        logger.info(
+            f"Starting keyword search | backend={self.keyword_backend} | query_text='{query_text}' | top_k={top_k} "
+            f"| kb_id={knowledge_base_id} | filters={filters}"
+        )
+        db = db or self.db
+        if self.keyword_backend == "fts5":
+            document_ids = resolve_document_ids(db, knowledge_base_id) if knowledge_base_id else None
+            hits = fts_search(db, query_text, top_k, document_ids=document_ids, filters=filters)
+        else:
+            hits = self._bm25_search(db, query_text, top_k, knowledge_base_id, filters)
+        logger.info(f"Keyword search matched {len(hits)} chunks")
+        if not hits:
+            return []
 
+        best = hits[0][1]
+        results = hydrate_chunks(db, [(chunk_id, score / best) for chunk_id, score in hits])
+        raw_scores = dict(hits)
+        for result in results:
+            result["keyword_score"] = raw_scores[result["chunk_id"]]
+        return results
+
+    def _bm25_search(
+        self,
+        db: Session,
+        query_text: str,
+        top_k: int,
+        knowledge_base_id: Optional[str],
+        filters: Optional[Dict[str, Union[str, int]]],
+    ) -> List[Tuple[int, float]]:
+        """Scores the query against the in-memory BM25 index, masked by deletions, the knowledge base and filters."""
+        index = get_bm25_index(db)
+        index.sync(db)
+        chunk_ids, document_ids = index.row_ids()
+
+        tombstones = get_tombstone_index(db)
+        tombstones.sync(db)
+        mask = tombstones.live_mask(chunk_ids)
         if knowledge_base_id:
             logger.debug(f"Applying knowledge_base_id filter: {knowledge_base_id}")
-            query = query.filter(Chunk.document_id == knowledge_base_id)
+            kb_mask = np.isin(document_ids, resolve_document_ids(db, knowledge_base_id))
+            mask = kb_mask if mask is None else mask & kb_mask
 
-        dialect = self.db.get_bind().dialect.name
         if filters:
-            for key, value in filters.items():
-                logger.debug(f"Applying metadata filter: {key}={value}")
-                if dialect == "sqlite":
-                    query = query.filter(
-                        cast(func.json_extract(Chunk.chunk_metadata, f'$.{key}'), String) == str(value)
-                    )
-                else:
-                    query = query.filter(
-                        Chunk.chunk_metadata[key].astext == str(value)
-                    )
-
-        query = query.filter(Chunk.text.ilike(f"%{query_text}%"))
-        results = query.limit(top_k).all()
-
-        logger.info(f"Keyword search matched {len(results)} chunks")
-        return [
-            {
-                "chunk_id": chunk.id,
-                "text": chunk.text,
-                "similarity": 1.0,
-                "chunk_metadata": chunk.chunk_metadata,
-                "document_id": chunk.document_id
-            }
-            for chunk in results
-        ]
+            logger.debug(f"Applying metadata filters: {filters}")
+            # Synced after the BM25 index, so it covers every row the index holds
+            metadata_index = get_metadata_index(db)
+            metadata_index.sync(db)
+            filter_mask = metadata_index.mask(chunk_ids, filters)
+            mask = filter_mask if mask is None else mask & filter_mask
+
+        return index.search(query_text, top_k, mask=mask)
 
     def query(
         self,
@@ -108,13 +258,19 @@ class HybridVectorStore(BaseVectorStore):
         knowledge_base_id: Optional[str] = None,
         filters: Optional[Dict[str, Union[str, int]]] = None,
         min_score: float = 0.0,
-        query_text: Optional[str] = None
+        query_text: Optional[str] = None,
+        **search_params: Any
     ) -> List[Dict[str, Any]]:
         """
         Performs a hybrid search combining vector-based similarity and keyword relevance.
 
-        Vector and keyword results are merged using a weighted score:
-            final_similarity = alpha * vector_similarity + beta * keyword_similarity
+        The vector and keyword legs run concurrently (see `_run_legs`) and their rankings
+        are merged with weighted reciprocal-rank fusion:
+            rrf_score = alpha / (rrf_k + vector_rank) + beta / (rrf_k + keyword_rank)
+        Results are ordered by `rrf_score`. Each result is a new dict whose `similarity`
+        stays a leg score (the cosine similarity, or the relative keyword score for a
+        keyword-only match), with the leg scores as `vector_similarity` and
+        `keyword_similarity` (None for a leg that missed it).
 
         Args:
             query_embedding (List[float]): The embedding vector for semantic search.
@@ -123,6 +279,7 @@ class HybridVectorStore(BaseVectorStore):
             filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters.
             min_score (float, optional): Minimum similarity threshold for vector results. Defaults to 0.0.
             query_text (Optional[str], optional): Query text for keyword search.
+            **search_params: Index-specific parameters forwarded to the inner vector store.
 
         Returns:
             List[Dict[str, Any]]: Combined and ranked list of relevant chunks.
@@ -130,43 +287,112 @@ class HybridVectorStore(BaseVectorStore):
         logger.info("Starting hybrid query")
         logger.debug(f"Params | top_k={top_k} | kb_id={knowledge_base_id} | min_score={min_score} | query_text='{query_text}' | filters={filters}")
 
-        # Step 1: Vector search
-        vector_results = self.vector_store.query(
-            query_embedding=query_embedding,
-            top_k=top_k,
-            knowledge_base_id=knowledge_base_id,
-            filters=filters,
-            min_score=min_score,
-            query_text=query_text
-        )
-        logger.info(f"Vector search returned {len(vector_results)} results")
-
-        # Step 2: Keyword search
-        keyword_results = self.keyword_search(
-            query_text=query_text or "",
-            top_k=top_k,
-            knowledge_base_id=knowledge_base_id,
-            filters=filters
+        def vector_leg() -> List[Dict[str, Any]]:
+            return self.vector_store.query(
+                query_embedding=query_embedding,
+                top_k=top_k,
+                knowledge_base_id=knowledge_base_id,
+                filters=filters,
+                min_score=min_score,
+                query_text=query_text,
+                **search_params
+            )
+
+        def keyword_leg(db: Session) -> List[Dict[str, Any]]:
+            return self.keyword_search(
+                query_text=query_text or "",
+                top_k=top_k,
+                knowledge_base_id=knowledge_base_id,
+                filters=filters,
+                db=db
+            )
+
+        vector_results, keyword_results, timed_out = self._run_legs(vector_leg, keyword_leg)
+        plan = dict(self.vector_store.last_plan or {})
+        if timed_out:
+            # Results merged without a leg must not be cached or mistaken for complete ones
+            plan.update(partial=True, timed_out=timed_out)
+        self.last_plan = plan or None
+        logger.info(f"Vector search returned {len(vector_results)} results; keyword search returned {len(keyword_results)}")
+
+        results = self._fuse(vector_results, keyword_results)[:top_k]
+        logger.info(f"Returning top {len(results)} hybrid results")
+        return results
+
+    def _run_legs(
+        self,
+        vector_leg: Callable[[], List[Dict[str, Any]]],
+        keyword_leg: Callable[[Session], List[Dict[str, Any]]],
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+        """
+        Runs the vector and keyword legs, concurrently when the database allows it.
+
+        The keyword leg is submitted to the leg pool with a session of its own, and the
+        vector leg runs meanwhile on the calling thread, where the store's session (the
+        inner store is bound to it) stays; the two never share a connection. If the
+        keyword leg is still running `leg_timeout` seconds after it was submitted, it is
+        logged and contributes no results (it finishes in the background); exceptions
+        raised by a leg propagate.
+
+        Args:
+            vector_leg (Callable[[], List[Dict[str, Any]]]): Runs the vector search on the store's session.
+            keyword_leg (Callable[[Session], List[Dict[str, Any]]]): Runs the keyword search on the given session.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]: (vector results,
+                keyword results, names of the legs that timed out).
+        """
+        bind = self.db.get_bind()
+        if not supports_concurrent_legs(bind):
+            return vector_leg(), keyword_leg(self.db), []
+
+        def keyword_on_own_session() -> List[Dict[str, Any]]:
+            with Session(bind=bind) as session:
+                return keyword_leg(session)
+
+        started = time.perf_counter()
+        keyword_future = _leg_executor().submit(keyword_on_own_session)
+        vector_results = vector_leg()
+        remaining = max(0.0, self.leg_timeout - (time.perf_counter() - started))
+        done, _ = wait([keyword_future], timeout=remaining)
+
+        if keyword_future in done:
+            keyword_results, timed_out = keyword_future.result(), []
+        else:
+            logger.warning(f"Hybrid keyword leg exceeded {self.leg_timeout}s; merging without it")
+            keyword_results, timed_out = [], ["keyword"]
+        logger.debug(f"Hybrid legs finished in {time.perf_counter() - started:.4f}s")
+        return vector_results, keyword_results, timed_out
+
+    def _fuse(self, vector_results: List[Dict[str, Any]], keyword_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merges the legs with weighted reciprocal-rank fusion without mutating their results.
+
+        The fused score only orders the results and is reported as `rrf_score`;
+        `similarity` keeps the vector leg's cosine, or the keyword score when only the
+        keyword leg matched.
+
+        Args:
+            vector_results (List[Dict[str, Any]]): Vector leg results, best first.
+            keyword_results (List[Dict[str, Any]]): Keyword leg results, best first.
+
+        Returns:
+            List[Dict[str, Any]]: Fused results, best first.
+        """
+        vector_by_id = {item["chunk_id"]: item for item in vector_results}
+        keyword_by_id = {item["chunk_id"]: item for item in keyword_results}
+        fused = reciprocal_rank_fusion(
+            [list(vector_by_id), list(keyword_by_id)],
+            weights=[self.alpha, self.beta],
+            k=self.rrf_k,
         )
-        logger.info(f"Keyword search returned {len(keyword_results)} results")
-
-        # Step 3: Merge and re-rank
-        combined = {item["chunk_id"]: item for item in vector_results}
-        logger.debug("Merging results")
-
-        for item in keyword_results:
-            if item["chunk_id"] in combined:
-                combined_score = (
-                    self.alpha * combined[item["chunk_id"]]["similarity"]
-                    + self.beta * item["similarity"]
-                )
-                logger.debug(f"Re-weighted similarity for chunk_id={item['chunk_id']}: {combined_score}")
-                combined[item["chunk_id"]]["similarity"] = combined_score
-            else:
-                combined[item["chunk_id"]] = item
-
-        # Step 4: Sort by final similarity
-        sorted_results = sorted(combined.values(), key=lambda x: x["similarity"], reverse=True)[:top_k]
-        logger.info(f"Returning top {len(sorted_results)} hybrid results")
-
-        return sorted_results
+
+        results = []
+        for chunk_id, score in fused:
+            vector_item, keyword_item = vector_by_id.get(chunk_id), keyword_by_id.get(chunk_id)
+            result = dict(vector_item or keyword_item)
+            result["rrf_score"] = score
+            result["vector_similarity"] = vector_item["similarity"] if vector_item else None
+            result["keyword_similarity"] = keyword_item["similarity"] if keyword_item else None
+            results.append(result)
+        return results
@@ -0,0 +1,67 @@
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Chunk
+
+logger = logging.getLogger(__name__)
+
+
+def hydrate_chunks(db: Session, hits: Sequence[Tuple[int, float]]) -> List[Dict[str, Any]]:
+    """
+    Fetches text, metadata and document id for scored chunk ids in one `IN (...)` query.
+
+    Scoring only ever touches ids and embeddings; this is the single point where the
+    payload columns of the winners are read. Embedding columns are never selected.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        hits (Sequence[Tuple[int, float]]): (chunk_id, similarity) pairs, best first.
+
+    Returns:
+        List[Dict[str, Any]]: Result dicts (`chunk_id`, `text`, `similarity`, `chunk_metadata`,
+            `document_id`) in the order of `hits`. Ids no longer in the table are dropped.
+    """
+    return hydrate_chunk_batches(db, [hits])[0]
+
+
+def hydrate_chunk_batches(db: Session, hits_per_query: Sequence[Sequence[Tuple[int, float]]]) -> List[List[Dict[str, Any]]]:
+    """
+    Hydrates the hits of several queries with a single `IN (...)` query over their union.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        hits_per_query (Sequence[Sequence[Tuple[int, float]]]): (chunk_id, similarity) pairs
+            of each query, best first.
+
+    Returns:
+        List[List[Dict[str, Any]]]: Result dicts per query, as returned by `hydrate_chunks`.
+    """
+    wanted = {chunk_id for hits in hits_per_query for chunk_id, _ in hits}
+    if not wanted:
+        return [[] for _ in hits_per_query]
+
+    rows = (
+        db.query(Chunk.id, Chunk.text, Chunk.chunk_metadata, Chunk.document_id)
+        .filter(Chunk.id.in_(list(wanted)))
+        .all()
+    )
+    by_id = {row[0]: row for row in rows}
+    if len(by_id) < len(wanted):
+        logger.debug(f"{len(wanted) - len(by_id)} scored chunks were not found during hydration")
+
+    return [
+        [
+            {
+                "chunk_id": chunk_id,
+                "text": by_id[chunk_id][1],
+                "similarity": score,
+                "chunk_metadata": by_id[chunk_id][2],
+                "document_id": by_id[chunk_id][3],
+            }
+            for chunk_id, score in hits
+            if chunk_id in by_id
+        ]
+        for hits in hits_per_query
+    ]
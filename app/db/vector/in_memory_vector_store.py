@@ -1,33 +1,169 @@
 import logging
 import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import cast, String
-from typing import Dict, Optional, Union, List, Any
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union, List, Any, Tuple
+from app.db.corpus import bump_generation, delete_document_chunks
+from app.db.knowledge_bases import resolve_document_ids
 from app.db.models import Chunk
 from app.db.vector.base_vector_store import BaseVectorStore
-from app.utils.similarity import cosine_similarity
+from app.db.vector.hydration import hydrate_chunk_batches, hydrate_chunks
+from app.db.vector.lsm_index import get_lsm_index
+from app.db.vector.metadata_index import get_metadata_index
+from app.db.vector.partitioned_index import get_partitioned_index
+from app.db.vector.query_planner import PREFILTER_MAX_ROWS, QueryPlan, plan_query
+from app.db.vector.tombstone_index import get_tombstone_index
+from app.utils.embedding_codec import decode_embedding_rows
+from app.utils.similarity import cosine_similarity_matrix, top_k_indices
 
 logger = logging.getLogger(__name__)
 
+
+def _masked(chunk_ids: np.ndarray, mask: np.ndarray, hits: List[Tuple[int, float]]) -> np.ndarray:
+    """
+    Looks up the mask value of each hit by chunk id.
+
+    The index may have synced rows committed after `chunk_ids` and `mask` were taken;
+    such hits are not covered by the mask and are excluded.
+
+    Args:
+        chunk_ids (np.ndarray): Ascending chunk ids the mask was built over.
+        mask (np.ndarray): Boolean mask over `chunk_ids`.
+        hits (List[Tuple[int, float]]): (chunk_id, similarity) pairs.
+
+    Returns:
+        np.ndarray: Boolean array, True for hits whose row is in the mask and set.
+    """
+    wanted = np.asarray([chunk_id for chunk_id, _ in hits], dtype=np.int64)
+    rows = np.searchsorted(chunk_ids, wanted)
+    known = rows < len(chunk_ids)
+    known[known] = chunk_ids[rows[known]] == wanted[known]
+    known[known] = mask[rows[known]]
+    return known
+
+
 class InMemoryVectorStore(BaseVectorStore):
     """
     In-memory implementation of the BaseVectorStore using a SQLAlchemy database session.
 
-    This class simulates a vector store by storing text chunks and their embeddings
-    in a relational database and uses cosine similarity for querying.
+    Chunks and embeddings are persisted in the relational database, while search runs
+    against a process-wide LSMIndex: pre-normalized float32 matrices (a base segment plus
+    small delta segments written as chunks are stored, compacted in the background) that
+    are loaded once and then synced incrementally, so each query is one matrix-vector
+    product per segment.
+    Metadata filters are resolved by a process-wide inverted MetadataIndex into a boolean
+    mask over the same rows, so filtered searches cost about as much as unfiltered ones.
+
+    Filtered queries go through a small planner (`plan_query`): the match count taken from
+    the mask picks between brute-forcing only the matching rows, an over-fetched
+    unfiltered search, or a single masked search. The chosen plan is kept in `last_plan`.
+
+    `query_batch` scores a batch of queries sharing one scope with a single matrix-matrix
+    product when the index supports it (`search_batch`), and falls back to one planned
+    search per query otherwise.
+
+    Knowledge-base-scoped queries search a per-knowledge-base partition (`PartitionedIndex`)
+    loaded on first use, so they score only that knowledge base's vectors. Subclasses
+    backed by other index types set `partition_by_knowledge_base = False` and mask their
+    global index instead.
+
+    Deleting a document's chunks records tombstones (`chunk_tombstones`). The LSMIndex
+    replays them itself and drops the dead rows on its next compaction; for every other
+    index (partitions, HNSW, IVF, PQ, int8, mmap) `_scope` masks tombstoned rows out
+    until the index is rebuilt.
+
+    Attributes:
+        prefilter_max_rows (int): Largest filtered subset that is brute-forced directly.
+        partition_by_knowledge_base (bool): Whether scoped queries use per-knowledge-base partitions.
     """
 
-    def __init__(self, db_session: Session):
+    prefilter_max_rows = PREFILTER_MAX_ROWS
+    partition_by_knowledge_base = True
+
+    def __init__(self, db_session: Session, binary_shortlist: Optional[int] = None):
         """
         Initializes the in-memory vector store.
 
         Args:
             db_session (Session): SQLAlchemy database session used for persistence.
+            binary_shortlist (Optional[int], optional): Enables a sign-bit Hamming first stage that
+                keeps `top_k * binary_shortlist` candidates for full cosine reranking.
         """
         self.db = db_session
+        self.binary_shortlist = binary_shortlist
         logger.info("InMemoryVectorStore initialized with a database session.")
 
+    def _index(self):
+        """Returns the shared search index backing this store."""
+        return get_lsm_index(self.db)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        """Runs the index search; subclasses override to pass index-specific parameters."""
+        shortlist = search_params.get("shortlist") or self.binary_shortlist
+        if shortlist:
+            return index.search(query_embedding, top_k, mask=mask, min_score=min_score, shortlist=shortlist)
+        return index.search(query_embedding, top_k, mask=mask, min_score=min_score)
+
+    def _exact_search(self, index, query_embedding, top_k, rows, min_score):
+        """Scores only the given index rows; stores whose index has no float rows override this."""
+        return index.search_rows(query_embedding, rows, top_k, min_score=min_score)
+
+    def _rescore_rows(self, index, query_embedding, top_k, rows, min_score):
+        """Scores the given index rows exactly from the embeddings stored in the database."""
+        chunk_ids, _ = index.row_ids()
+        return self._rescore(query_embedding, [(int(chunk_id), 0.0) for chunk_id in chunk_ids[rows]], top_k, min_score)
+
+    def _rescore(
+        self,
+        query_embedding: List[float],
+        candidates: List[Tuple[int, float]],
+        top_k: int,
+        min_score: float,
+    ) -> List[Tuple[int, float]]:
+        """
+        Re-ranks candidates by exact cosine similarity using the embeddings stored in the database.
+
+        Used by stores whose index only holds compressed vectors.
+
+        Args:
+            query_embedding (List[float]): Query vector.
+            candidates (List[Tuple[int, float]]): (chunk_id, approximate score) pairs, best first.
+            top_k (int): Maximum number of results.
+            min_score (float): Minimum exact similarity.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, exact similarity) pairs, best first.
+        """
+        if not candidates:
+            return []
+
+        rows = (
+            self.db.query(
+                Chunk.id,
+                Chunk.embedding_blob,
+                Chunk.embedding_dtype,
+                Chunk.embedding_dim,
+                Chunk.embedding_json,
+                Chunk.embedding_normalized,
+            )
+            .filter(Chunk.id.in_([chunk_id for chunk_id, _ in candidates]))
+            .all()
+        )
+        vectors = dict(zip((row[0] for row in rows), decode_embedding_rows([row[1:5] for row in rows])))
+        normalized = {row[0]: bool(row[5]) for row in rows}
+        # Keep the approximate ranking order so exact ties resolve the same way each time
+        ids = [chunk_id for chunk_id, _ in candidates if vectors.get(chunk_id) is not None]
+        if not ids:
+            return []
+
+        matrix = np.asarray([vectors[chunk_id] for chunk_id in ids], dtype=np.float32)
+        scores = cosine_similarity_matrix(
+            query_embedding, matrix, normalized=np.asarray([normalized[chunk_id] for chunk_id in ids])
+        )
+
+        hits = [(ids[i], float(scores[i])) for i in top_k_indices(scores, top_k) if scores[i] >= min_score]
+        logger.debug(f"Rescored {len(ids)} candidates exactly; kept {len(hits)}")
+        return hits
+
     def store_chunks(
         self,
         document_id: Union[int, str],
@@ -62,9 +198,87 @@ class InMemoryVectorStore(BaseVectorStore):
             self.db.add(chunk)
             logger.debug(f"Added chunk index={idx} to session")
 
+        bump_generation(self.db)
         self.db.commit()
+        self._index().sync(self.db)
+        get_metadata_index(self.db).sync(self.db)
         logger.info(f"Successfully stored chunks for document_id={document_id}")
 
+    def delete_chunks(self, document_id: Union[int, str]) -> int:
+        """
+        Deletes a document's chunks; they stop matching queries immediately.
+
+        Args:
+            document_id (Union[int, str]): ID of the document whose chunks are deleted.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        deleted = delete_document_chunks(self.db, document_id)
+        self.db.commit()
+        self._index().sync(self.db)
+        logger.info(f"Deleted {len(deleted)} chunks of document_id={document_id}")
+        return len(deleted)
+
+    def replace_chunks(
+        self,
+        document_id: Union[int, str],
+        chunks: List[Union[str, Dict[str, Union[str, Dict[str, Union[str, int]]]]]],
+        embeddings: List[List[float]]
+    ) -> None:
+        """
+        Replaces a document's chunks in one transaction (e.g. when its file changed).
+
+        Args:
+            document_id (Union[int, str]): ID of the document whose chunks are replaced.
+            chunks (List[Union[str, Dict]]): New text chunks or dicts with 'text' and optional 'metadata'.
+            embeddings (List[List[float]]): Corresponding list of vector embeddings.
+
+        Returns:
+            None
+        """
+        deleted = delete_document_chunks(self.db, document_id)
+        logger.info(f"Replacing {len(deleted)} chunks of document_id={document_id}")
+        # store_chunks commits the deletion together with the new chunks and syncs the index
+        self.store_chunks(document_id, chunks, embeddings)
+
+    def _planned_search(self, index, query_embedding, top_k, chunk_ids, mask, min_score, **search_params):
+        """
+        Plans and runs a search, recording the plan in `last_plan`.
+
+        Args:
+            index: The synced search index.
+            query_embedding (List[float]): Query vector.
+            top_k (int): Maximum number of results.
+            chunk_ids (np.ndarray): Ascending chunk ids of the index rows.
+            mask (Optional[np.ndarray]): Boolean filter mask over the rows, or None.
+            min_score (float): Minimum similarity score.
+            **search_params: Index-specific parameters.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        matches = len(chunk_ids) if mask is None else int(np.count_nonzero(mask))
+        plan = plan_query(len(chunk_ids), matches, top_k, mask is not None, prefilter_max_rows=self.prefilter_max_rows)
+
+        if plan.strategy == "empty":
+            hits = []
+        elif plan.strategy == "prefilter":
+            hits = self._exact_search(index, query_embedding, top_k, np.flatnonzero(mask), min_score)
+        elif plan.strategy == "postfilter":
+            candidates = self._search(index, query_embedding, plan.fetch_k, None, min_score, **search_params)
+            hits = [hit for hit, keep in zip(candidates, _masked(chunk_ids, mask, candidates)) if keep][:top_k]
+            # Only a full candidate list can hide more matches; a short one was cut by min_score
+            if len(hits) < top_k and len(candidates) == plan.fetch_k:
+                plan.fallback = True
+                hits = self._search(index, query_embedding, top_k, mask, min_score, **search_params)
+        else:
+            hits = self._search(index, query_embedding, top_k, mask, min_score, **search_params)
+
+        self.last_plan = plan.as_dict()
+        logger.debug(f"Query plan: {self.last_plan}")
+        return hits
+
     def query(
         self,
         query_embedding: List[float],
@@ -72,7 +286,8 @@ class InMemoryVectorStore(BaseVectorStore):
         knowledge_base_id: Optional[Union[int, str]] = None,
         filters: Optional[Dict[str, Union[str, int]]] = None,
         min_score: float = 0.0,
-        query_text: Optional[str] = None
+        query_text: Optional[str] = None,
+        **search_params: Any
     ) -> List[Dict[str, Union[str, float, Dict[str, Any], int]]]:
         """
         Queries for the most similar chunks based on the input query embedding.
@@ -84,41 +299,126 @@ class InMemoryVectorStore(BaseVectorStore):
             filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters to apply.
             min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
             query_text (Optional[str], optional): Not used in this implementation.
+            **search_params: Index-specific parameters forwarded to the search index.
 
         Returns:
             List[Dict]: List of top matching chunks with metadata and similarity score.
         """
         logger.info(f"Querying chunks | top_k={top_k} | kb_id={knowledge_base_id} | filters={filters} | min_score={min_score}")
 
-        query = self.db.query(Chunk)
+        index, chunk_ids, mask = self._scope(knowledge_base_id, filters)
+        hits = self._planned_search(index, query_embedding, top_k, chunk_ids, mask, min_score, **search_params)
+        logger.info(f"Searched {len(chunk_ids)} indexed chunks; {len(hits)} passed the min_score filter")
 
-        if knowledge_base_id:
-            query = query.filter(Chunk.document_id == knowledge_base_id)
-            logger.debug(f"Filtered by knowledge_base_id={knowledge_base_id}")
+        results = hydrate_chunks(self.db, hits)
+        logger.info(f"Returning top {len(results)} results")
+        return results
+
+    def _scope(
+        self,
+        knowledge_base_id: Optional[Union[int, str]],
+        filters: Optional[Dict[str, Union[str, int]]],
+    ) -> Tuple[Any, np.ndarray, Optional[np.ndarray]]:
+        """
+        Syncs and returns the index to search, its row chunk ids and the filter mask over them.
+
+        Args:
+            knowledge_base_id (Optional[Union[int, str]]): Knowledge base to restrict the search to.
+            filters (Optional[Dict[str, Union[str, int]]]): Metadata filters to apply.
+
+        Returns:
+            Tuple[Any, np.ndarray, Optional[np.ndarray]]: (index, chunk_ids, mask); mask is None if unfiltered.
+        """
+        mask = None
+        if knowledge_base_id and self.partition_by_knowledge_base:
+            # The partition holds only this knowledge base's rows; no mask needed
+            index = get_partitioned_index(self.db).partition(self.db, knowledge_base_id)
+            chunk_ids, _ = index.row_ids()
+            logger.debug(f"Searching partition of knowledge_base_id={knowledge_base_id} ({len(chunk_ids)} rows)")
+        else:
+            index = self._index()
+            index.sync(self.db)
+            chunk_ids, document_ids = index.row_ids()
+            if knowledge_base_id:
+                mask = np.isin(document_ids, resolve_document_ids(self.db, knowledge_base_id))
+                logger.debug(f"Filtered by knowledge_base_id={knowledge_base_id}")
+
+        if not getattr(index, "applies_tombstones", False):
+            tombstones = get_tombstone_index(self.db)
+            tombstones.sync(self.db)
+            live_mask = tombstones.live_mask(chunk_ids)
+            if live_mask is not None:
+                mask = live_mask if mask is None else mask & live_mask
 
         if filters:
-            for key, value in filters.items():
-                query = query.filter(cast(Chunk.chunk_metadata[key], String) == value)
-                logger.debug(f"Applied metadata filter: {key}={value}")
-
-        chunks = query.all()
-        logger.info(f"Retrieved {len(chunks)} chunks from DB for similarity scoring")
-
-        def compute_score(chunk: Chunk) -> Optional[Dict[str, Any]]:
-            score = cosine_similarity(query_embedding, chunk.embedding)
-            if score >= min_score:
-                return {
-                    "chunk_id": chunk.id,
-                    "text": chunk.text,
-                    "similarity": score,
-                    "chunk_metadata": chunk.chunk_metadata,
-                    "document_id": chunk.document_id,
-                }
-            return None
-
-        with ThreadPoolExecutor() as executor:
-            results = list(filter(None, executor.map(compute_score, chunks)))
-
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        logger.info(f"{len(results)} results passed the min_score filter. Returning top {top_k}.")
-        return results[:top_k]
+            # Synced after the vector index, so it covers every row the index holds
+            metadata_index = get_metadata_index(self.db)
+            metadata_index.sync(self.db)
+            filter_mask = metadata_index.mask(chunk_ids, filters)
+            logger.debug(f"Metadata filters {filters} matched {int(filter_mask.sum())} indexed chunks")
+            mask = filter_mask if mask is None else mask & filter_mask
+
+        return index, chunk_ids, mask
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        knowledge_base_id: Optional[Union[int, str]] = None,
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        min_score: float = 0.0,
+        query_texts: Optional[List[Optional[str]]] = None,
+        **search_params: Any
+    ) -> List[List[Dict[str, Union[str, float, Dict[str, Any], int]]]]:
+        """
+        Queries for the most similar chunks of several query embeddings at once.
+
+        The scope (index, knowledge base partition, filter mask) is resolved once for the
+        batch. Indexes with `search_batch` score all queries with one matrix-matrix product;
+        since that scan is exact, a plan that would post-filter runs as a masked scan. The
+        winners of every query are hydrated with a single query.
+
+        Args:
+            query_embeddings (List[List[float]]): The vector embeddings of the search queries.
+            top_k (int, optional): Number of top results per query. Defaults to 5.
+            knowledge_base_id (Optional[Union[int, str]], optional): Restrict search to this knowledge base.
+            filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters to apply.
+            min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
+            query_texts (Optional[List[Optional[str]]], optional): Not used in this implementation.
+            **search_params: Index-specific parameters forwarded to the search index.
+
+        Returns:
+            List[List[Dict]]: Top matching chunks of each query, in input order.
+        """
+        logger.info(
+            f"Querying chunks in batch | queries={len(query_embeddings)} | top_k={top_k} | kb_id={knowledge_base_id} "
+            f"| filters={filters} | min_score={min_score}"
+        )
+        if not len(query_embeddings):
+            return []
+
+        index, chunk_ids, mask = self._scope(knowledge_base_id, filters)
+        search_batch = getattr(index, "search_batch", None)
+        if search_batch is None or search_params.get("shortlist") or self.binary_shortlist:
+            hits = [
+                self._planned_search(index, query_embedding, top_k, chunk_ids, mask, min_score, **search_params)
+                for query_embedding in query_embeddings
+            ]
+        else:
+            matches = len(chunk_ids) if mask is None else int(np.count_nonzero(mask))
+            plan = plan_query(len(chunk_ids), matches, top_k, mask is not None, prefilter_max_rows=self.prefilter_max_rows)
+            if plan.strategy == "postfilter":
+                plan = QueryPlan("masked_scan", plan.total_rows, plan.estimated_matches, top_k)
+
+            if plan.strategy == "empty":
+                hits = [[] for _ in query_embeddings]
+            elif plan.strategy == "prefilter":
+                hits = search_batch(query_embeddings, top_k, min_score=min_score, rows=np.flatnonzero(mask))
+            else:
+                hits = search_batch(query_embeddings, top_k, mask=mask, min_score=min_score)
+            self.last_plan = plan.as_dict()
+            logger.debug(f"Batch query plan: {self.last_plan}")
+
+        results = hydrate_chunk_batches(self.db, hits)
+        logger.info(f"Searched {len(chunk_ids)} indexed chunks for {len(results)} queries")
+        return results
@@ -0,0 +1,101 @@
+"""
+Int8 scalar-quantized vector index.
+
+Chunks are stored as one signed byte per dimension, calibrated per dimension from the
+stored embeddings. Calibration runs automatically, on a background thread, once enough
+vectors exist and can be redone offline as the corpus grows:
+
+    python -m app.db.vector.int8_index
+
+Serving processes reload the retrained file on their next sync, and the retrain bumps
+the corpus generation so cached query results from the old index are dropped.
+"""
+
+import argparse
+import logging
+import os
+import threading
+from typing import Dict
+
+from app.db.corpus import bump_generation, current_generation
+from app.db.vector.matrix_index import iter_chunk_embeddings
+from app.db.vector.quantized_index import QuantizedIndex
+from app.utils.scalar_quantization import ScalarQuantizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "rag_index")
+
+
+class Int8Index(QuantizedIndex):
+    """Index of int8 scalar-quantized, pre-normalized embeddings scanned with integer products."""
+
+    kind = "int8"
+
+    def _new_quantizer(self) -> ScalarQuantizer:
+        return ScalarQuantizer()
+
+    def _quantizer_from_arrays(self, arrays) -> ScalarQuantizer:
+        return ScalarQuantizer.from_arrays(arrays)
+
+
+_indexes: Dict[str, Int8Index] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_int8_index(path: str, **params) -> Int8Index:
+    """
+    Returns the process-wide Int8Index persisted at `path`.
+
+    The file is loaded lazily by the first `sync`.
+
+    Args:
+        path (str): `.npz` file backing the index.
+        **params: Int8Index constructor parameters used on first creation.
+
+    Returns:
+        Int8Index: The shared index.
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = Int8Index(path=path, **params)
+        return _indexes[key]
+
+
+def save_int8_indexes() -> int:
+    """
+    Persists every process-wide Int8Index with unsaved rows; see `QuantizedIndex.persist`.
+
+    Returns:
+        int: Number of index files written.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return sum(index.persist() for index in indexes)
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Calibrate (or recalibrate) the int8 index over all stored chunks.")
+    parser.add_argument("--path", default=os.path.join(DEFAULT_INDEX_DIR, "int8.npz"), help="Index file to write.")
+    args = parser.parse_args()
+
+    setup_logging()
+    index = Int8Index(min_train_size=2 ** 62)
+    db = SessionLocal()
+    try:
+        index.generation = current_generation(db)
+        for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, 0):
+            index.add(chunk_ids, document_ids, embeddings)
+    finally:
+        db.close()
+    index.train()
+    index.save(args.path)
+    # Serving processes reload the file on their next sync; results cached with the old
+    # calibration must not be served after that
+    with SessionLocal() as db:
+        bump_generation(db)
+        db.commit()
@@ -0,0 +1,56 @@
+import logging
+import os
+from typing import Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.int8_index import DEFAULT_INDEX_DIR, get_int8_index
+
+logger = logging.getLogger(__name__)
+
+class Int8VectorStore(InMemoryVectorStore):
+    """
+    Vector store backed by an int8 scalar-quantized index.
+
+    Embeddings are held at one byte per dimension (4x less than float32). Queries run a
+    coarse integer scan, then the best `top_k * oversample` candidates are rescored in
+    float32 from the embeddings stored in the database, so returned scores are exact.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(
+        self,
+        db_session: Session,
+        oversample: int = 4,
+        min_train_size: int = 1024,
+        index_path: Optional[str] = None,
+    ):
+        """
+        Initializes the int8 vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+            oversample (int, optional): Candidate multiplier for float32 rescoring; 0 disables it. Defaults to 4.
+            min_train_size (int, optional): Vectors needed before calibration. Defaults to 1024.
+            index_path (Optional[str], optional): Index file. Defaults to `<VECTOR_INDEX_DIR>/int8.npz`.
+        """
+        super().__init__(db_session)
+        self.oversample = oversample
+        self.min_train_size = min_train_size
+        self.index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, "int8.npz")
+        logger.info(f"Int8VectorStore initialized | oversample={oversample}")
+
+    def _index(self):
+        return get_int8_index(self.index_path, min_train_size=self.min_train_size)
+
+    def _exact_search(self, index, query_embedding, top_k, rows, min_score):
+        return self._rescore_rows(index, query_embedding, top_k, rows, min_score)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        oversample = search_params.get("oversample", self.oversample)
+        if not oversample or not index.trained:
+            return index.search(query_embedding, top_k, mask=mask, min_score=min_score)
+
+        candidates = index.search(query_embedding, top_k * oversample, mask=mask, min_score=-np.inf)
+        return self._rescore(query_embedding, candidates, top_k, min_score)
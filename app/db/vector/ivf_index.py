@@ -0,0 +1,551 @@
+"""
+IVF (inverted file) vector index.
+
+Embeddings are clustered with k-means; each centroid owns a posting list holding its
+vectors as one contiguous float32 block. A query scores the centroids, then scans only
+the `nprobe` closest posting lists.
+
+Centroids can be retrained offline as the corpus grows:
+
+    python -m app.db.vector.ivf_index --n-lists 1024
+
+Serving processes notice the new file on their next sync and reload it; the retrain
+bumps the corpus generation, so query results cached with the old centroids are
+dropped. The first
+automatic training runs on a background thread, and serving processes write the index
+file only at ingest end and shutdown (`save_ivf_indexes`), never on the query path.
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sqlalchemy.orm import Session
+
+from app.db.corpus import bump_generation, current_generation
+from app.db.vector.matrix_index import GrowableArray, fit_mask, index_file_is_current, iter_chunk_embeddings
+from app.utils.similarity import l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "rag_index")
+IVF_FORMAT_VERSION = 1
+
+
+class IVFIndex:
+    """
+    k-means inverted file index over pre-normalized embeddings.
+
+    Every vector has a global row number (its insertion order); `row_ids()` returns chunk
+    and document ids in that order, so masks built by the vector stores line up. Each
+    posting list stores its vectors contiguously together with their global row numbers.
+
+    Until enough vectors exist to train (`min_train_size`), the index keeps everything in
+    a single list and behaves like exact search. Crossing `min_train_size` starts k-means
+    on a background thread; searches stay exact until the centroids are swapped in.
+
+    Attributes:
+        n_lists (Optional[int]): Number of centroids; defaults to sqrt(N) at training time.
+        nprobe (int): Default number of posting lists scanned per query.
+        min_train_size (int): Vectors required before centroids are trained automatically.
+        path (Optional[str]): File the index is persisted to, if any.
+        generation (int): Corpus generation read before the last sync, saved in the file header.
+    """
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 1024,
+        max_train_samples: int = 100000,
+        path: Optional[str] = None,
+        seed: int = 42,
+    ):
+        """
+        Initializes an empty, untrained index.
+
+        Args:
+            n_lists (Optional[int], optional): Number of centroids. Defaults to sqrt(N) at training.
+            nprobe (int, optional): Default lists scanned per query. Defaults to 8.
+            min_train_size (int, optional): Auto-train threshold. Defaults to 1024.
+            max_train_samples (int, optional): Sample cap for k-means. Defaults to 100000.
+            path (Optional[str], optional): `.npz` file to persist to and load from.
+            seed (int, optional): Random seed for k-means and sampling. Defaults to 42.
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.max_train_samples = max_train_samples
+        self.path = path
+        self.seed = seed
+        self.dim: Optional[int] = None
+        self.last_chunk_id = 0
+        self.generation = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[Tuple[GrowableArray, GrowableArray]] = []
+        self._chunk_ids = GrowableArray((), np.int64)
+        self._document_ids = GrowableArray((), np.int64)
+        self._loaded_mtime: Optional[int] = None
+        self._training: Optional[threading.Thread] = None
+        # Bumped whenever the contents are replaced, so a background training can tell
+        self._epoch = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+        # Serializes writers (sync, add, load) so the database can be read without `_lock`
+        self._write_lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (chunk_ids, document_ids) for all rows, in global row order."""
+        with self._lock:
+            return self._chunk_ids.view, self._document_ids.view
+
+    # ---------- Building ----------
+
+    def _new_list(self) -> Tuple[GrowableArray, GrowableArray]:
+        return GrowableArray((self.dim,), np.float32), GrowableArray((), np.int64)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.trained:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def _append(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        if not self._lists:
+            self._lists = [self._new_list() for _ in range(len(self.centroids) if self.trained else 1)]
+        assignments = self._assign(vectors)
+        for list_no in np.unique(assignments):
+            members = assignments == list_no
+            list_vectors, list_rows = self._lists[list_no]
+            list_vectors.extend(vectors[members])
+            list_rows.extend(rows[members])
+
+    def all_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns every stored vector and its global row number, gathered from the posting lists.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (vectors, rows).
+        """
+        with self._lock:
+            if not self._lists:
+                return np.empty((0, self.dim or 0), dtype=np.float32), np.empty(0, dtype=np.int64)
+            vectors = np.concatenate([v.view for v, _ in self._lists])
+            rows = np.concatenate([r.view for _, r in self._lists])
+            return vectors, rows
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Normalizes and appends vectors to their nearest posting list.
+
+        Starts training centroids in the background the first time `min_train_size`
+        vectors are reached.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors.
+
+        Returns:
+            int: Number of vectors added.
+        """
+        if not len(chunk_ids):
+            return 0
+
+        with self._write_lock:
+            if self.dim is None:
+                first = next((emb for emb in embeddings if emb is not None), None)
+                if first is None:
+                    self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                    return 0
+                self.dim = len(first)
+
+            keep = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) == self.dim]
+            if len(keep) != len(embeddings):
+                logger.warning(f"Skipping {len(embeddings) - len(keep)} embeddings with dimension != {self.dim}")
+            if not keep:
+                self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                return 0
+
+            vectors = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+            vectors = l2_normalize(vectors)
+
+            with self._lock:
+                start = len(self)
+                self._chunk_ids.extend(np.asarray([chunk_ids[i] for i in keep], dtype=np.int64))
+                self._document_ids.extend(np.asarray([document_ids[i] for i in keep], dtype=np.int64))
+                self._append(vectors, np.arange(start, start + len(keep), dtype=np.int64))
+                self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+
+                if not self.trained and len(self) >= self.min_train_size and self._training is None:
+                    self._training = threading.Thread(target=self._train_in_background, name="ivf-train", daemon=True)
+                    self._training.start()
+                self._dirty = True
+            return len(keep)
+
+    def train(self, n_lists: Optional[int] = None) -> None:
+        """
+        (Re)trains k-means centroids on the stored vectors and rebuilds the posting lists.
+
+        Args:
+            n_lists (Optional[int], optional): Number of centroids. Defaults to `self.n_lists`
+                or sqrt(N).
+        """
+        with self._lock:
+            vectors, _ = self.all_vectors()
+            if len(vectors) == 0:
+                return
+            self._install(self._fit(vectors, n_lists))
+
+    def _fit(self, vectors: np.ndarray, n_lists: Optional[int] = None) -> np.ndarray:
+        """Runs k-means on a sample of `vectors` and returns normalized centroids; touches no index state."""
+        n_lists = n_lists or self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > self.max_train_samples:
+            sample = vectors[rng.choice(len(vectors), self.max_train_samples, replace=False)]
+
+        logger.info(f"Training IVF centroids | n_lists={n_lists} | samples={len(sample)}")
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, random_state=self.seed).fit(sample)
+        return l2_normalize(kmeans.cluster_centers_)
+
+    def _install(self, centroids: np.ndarray) -> None:
+        """Swaps in new centroids and rebuilds the posting lists from every stored row. Caller holds the lock."""
+        vectors, rows = self.all_vectors()
+        self.n_lists = len(centroids)
+        self.centroids = centroids
+        self._lists = []
+        order = np.argsort(rows, kind="stable")
+        self._append(vectors[order], rows[order])
+        self._epoch += 1
+        self._dirty = True
+        logger.info(f"IVF index trained with {self.n_lists} lists over {len(vectors)} vectors")
+
+    def _train_in_background(self) -> None:
+        """
+        Runs the first automatic training off the request path.
+
+        k-means runs on the rows stored when the thread started, without the lock; the
+        posting lists, including rows added meanwhile, are rebuilt under the lock. The
+        result is dropped if the index was trained or reloaded in between.
+        """
+        try:
+            with self._lock:
+                epoch = self._epoch
+                vectors, _ = self.all_vectors()
+            centroids = self._fit(vectors)
+            with self._lock:
+                if self._epoch != epoch or self.trained:
+                    logger.info("Discarding background IVF training; the index changed meanwhile")
+                    return
+                self._install(centroids)
+        except Exception as e:
+            logger.error(f"Background IVF training failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._training = None
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for a background training started by `add` to finish.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait; None waits indefinitely.
+
+        Returns:
+            bool: True if no training is running any more.
+        """
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+            return not training.is_alive()
+        return True
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Reloads the index file if it was retrained elsewhere, then appends new chunks.
+
+        The database and the file are read without holding the search lock, which is only
+        taken to append each batch, so searches proceed during a large sync. A file saved
+        ahead of the database (see `index_file_is_current`) is not loaded; the index is
+        rebuilt from the `chunks` table instead. The index is not written here; call
+        `persist` at ingest end or shutdown.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of vectors added.
+        """
+        added = 0
+        with self._write_lock:
+            if self.path and os.path.exists(self.path):
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._loaded_mtime:
+                    if index_file_is_current(db, self.path):
+                        self.load(self.path)
+                    else:
+                        self._loaded_mtime = mtime
+            # Read before syncing: the index then holds at least everything up to this generation
+            generation = current_generation(db)
+            for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, self.last_chunk_id, batch_size):
+                added += self.add(chunk_ids, document_ids, embeddings)
+            self.generation = max(self.generation, generation)
+        if added:
+            logger.info(f"IVF index added {added} vectors (total={len(self)})")
+        return added
+
+    # ---------- Search ----------
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores the `nprobe` closest posting lists and returns the best matches.
+
+        With a mask, more lists are probed (doubling) until `top_k` allowed rows are found
+        or every list has been scanned.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over global rows.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            nprobe (Optional[int], optional): Lists to scan for this query. Defaults to `self.nprobe`.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        with self._lock:
+            lists = [(v.view, r.view) for v, r in self._lists]
+            centroids = self.centroids
+            chunk_ids = self._chunk_ids.view
+        if top_k <= 0 or not lists:
+            return []
+        if mask is not None:
+            mask = fit_mask(mask, len(chunk_ids))
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self.dim}")
+        query = l2_normalize(query)
+
+        probe_order = np.arange(1) if centroids is None else top_k_indices(centroids @ query, len(centroids))
+        probes = max(1, min(nprobe or self.nprobe, len(probe_order)))
+
+        while True:
+            rows_found, scores_found = [], []
+            for list_no in probe_order[:probes]:
+                vectors, rows = lists[list_no]
+                if len(rows) == 0:
+                    continue
+                scores = vectors @ query
+                if mask is not None:
+                    allowed = mask[rows]
+                    rows, scores = rows[allowed], scores[allowed]
+                best = top_k_indices(scores, top_k)
+                rows_found.append(rows[best])
+                scores_found.append(scores[best])
+
+            found = sum(len(r) for r in rows_found)
+            if mask is not None and found < top_k and probes < len(probe_order):
+                probes = min(probes * 2, len(probe_order))
+                continue
+            break
+
+        if not rows_found:
+            return []
+        rows = np.concatenate(rows_found)
+        scores = np.concatenate(scores_found)
+        # Sort candidates by global row so ties break by insertion order
+        by_row = np.argsort(rows, kind="stable")
+        rows, scores = rows[by_row], scores[by_row]
+        return [
+            (int(chunk_ids[rows[i]]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] >= min_score
+        ]
+
+    # ---------- Persistence ----------
+
+    def save(self, path: str) -> None:
+        """
+        Persists centroids, posting lists and ids to a `.npz` file (written atomically).
+
+        Args:
+            path (str): Destination file path.
+        """
+        with self._lock:
+            vectors_by_list = [v.view for v, _ in self._lists]
+            rows_by_list = [r.view for _, r in self._lists]
+            offsets = np.concatenate([[0], np.cumsum([len(r) for r in rows_by_list])]).astype(np.int64)
+            header = {
+                "version": IVF_FORMAT_VERSION,
+                "dim": self.dim,
+                "n_lists": self.n_lists,
+                "last_chunk_id": self.last_chunk_id,
+                "generation": self.generation,
+                "trained": self.trained,
+            }
+            arrays = {
+                "header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                "centroids": self.centroids if self.trained else np.empty((0, self.dim or 0), dtype=np.float32),
+                "list_offsets": offsets,
+                "list_vectors": np.concatenate(vectors_by_list) if vectors_by_list else np.empty((0, self.dim or 0), dtype=np.float32),
+                "list_rows": np.concatenate(rows_by_list) if rows_by_list else np.empty(0, dtype=np.int64),
+                "chunk_ids": self._chunk_ids.view,
+                "document_ids": self._document_ids.view,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            if path == self.path:
+                self._loaded_mtime = os.stat(path).st_mtime_ns
+                self._dirty = False
+        logger.info(f"Saved IVF index ({len(self)} vectors, {len(self._lists)} lists) to {path}")
+
+    def persist(self) -> bool:
+        """
+        Saves the index to `path` if rows were added or it was trained since it was last saved or loaded.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        with self._lock:
+            if not (self.path and self._dirty):
+                return False
+            self.save(self.path)
+            return True
+
+    def load(self, path: str) -> None:
+        """
+        Restores an index written by `save`, replacing the current contents.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file format version is not supported.
+        """
+        with self._write_lock:
+            # Parse the file before taking the search lock, which is only held for the swap
+            with np.load(path) as data:
+                header = json.loads(data["header"].tobytes().decode("utf-8"))
+                if header.get("version") != IVF_FORMAT_VERSION:
+                    raise ValueError(f"Unsupported IVF index version: {header.get('version')}")
+
+                chunk_ids = GrowableArray((), np.int64, capacity=max(64, len(data["chunk_ids"])))
+                chunk_ids.extend(data["chunk_ids"])
+                document_ids = GrowableArray((), np.int64, capacity=max(64, len(data["document_ids"])))
+                document_ids.extend(data["document_ids"])
+                centroids = data["centroids"] if header["trained"] else None
+
+                offsets = data["list_offsets"]
+                list_vectors, list_rows = data["list_vectors"], data["list_rows"]
+                lists = []
+                for i in range(len(offsets) - 1):
+                    vectors = GrowableArray((header["dim"],), np.float32)
+                    rows = GrowableArray((), np.int64)
+                    vectors.extend(list_vectors[offsets[i]:offsets[i + 1]])
+                    rows.extend(list_rows[offsets[i]:offsets[i + 1]])
+                    lists.append((vectors, rows))
+            mtime = os.stat(path).st_mtime_ns
+
+            with self._lock:
+                self.dim = header["dim"]
+                self.n_lists = header["n_lists"]
+                self.last_chunk_id = header["last_chunk_id"]
+                self.generation = header.get("generation", 0)
+                self.centroids = centroids
+                self._chunk_ids, self._document_ids, self._lists = chunk_ids, document_ids, lists
+                self._loaded_mtime = mtime
+                self._epoch += 1
+                self._dirty = False
+        logger.info(f"Loaded IVF index ({len(self)} vectors, {len(self._lists)} lists) from {path}")
+
+
+_indexes: Dict[str, IVFIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_ivf_index(path: str, **params) -> IVFIndex:
+    """
+    Returns the process-wide IVFIndex persisted at `path`.
+
+    The file is loaded lazily by the first `sync`.
+
+    Args:
+        path (str): `.npz` file backing the index.
+        **params: IVFIndex constructor parameters used on first creation.
+
+    Returns:
+        IVFIndex: The shared index.
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = IVFIndex(path=path, **params)
+        return _indexes[key]
+
+
+def save_ivf_indexes() -> int:
+    """
+    Persists every process-wide IVFIndex with unsaved rows; see `IVFIndex.persist`.
+
+    Returns:
+        int: Number of index files written.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return sum(index.persist() for index in indexes)
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Train (or retrain) IVF centroids over all stored chunks.")
+    parser.add_argument("--n-lists", type=int, default=None, help="Number of centroids (default: sqrt(N)).")
+    parser.add_argument("--path", default=os.path.join(DEFAULT_INDEX_DIR, "ivf.npz"), help="Index file to write.")
+    args = parser.parse_args()
+
+    setup_logging()
+    index = IVFIndex(n_lists=args.n_lists, min_train_size=2 ** 62)
+    db = SessionLocal()
+    try:
+        index.generation = current_generation(db)
+        for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, 0):
+            index.add(chunk_ids, document_ids, embeddings)
+    finally:
+        db.close()
+    index.train(args.n_lists)
+    index.save(args.path)
+    # Serving processes reload the file on their next sync; results cached with the old
+    # centroids must not be served after that
+    with SessionLocal() as db:
+        bump_generation(db)
+        db.commit()
@@ -0,0 +1,57 @@
+import logging
+import os
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.ivf_index import DEFAULT_INDEX_DIR, get_ivf_index
+
+logger = logging.getLogger(__name__)
+
+class IVFVectorStore(InMemoryVectorStore):
+    """
+    Vector store backed by a k-means inverted file (IVF) index.
+
+    Persistence and filtering work exactly as in InMemoryVectorStore; only the search
+    index differs. A query scans the `nprobe` posting lists whose centroids are closest
+    to the query, so `nprobe` trades recall for latency and can be overridden per query.
+    Centroids are retrained offline with `python -m app.db.vector.ivf_index`.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(
+        self,
+        db_session: Session,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        min_train_size: int = 1024,
+        index_path: Optional[str] = None,
+    ):
+        """
+        Initializes the IVF vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+            n_lists (Optional[int], optional): Number of centroids. Defaults to sqrt(N) at training time.
+            nprobe (int, optional): Default posting lists scanned per query. Defaults to 8.
+            min_train_size (int, optional): Vectors needed before centroids are trained. Defaults to 1024.
+            index_path (Optional[str], optional): Index file. Defaults to `<VECTOR_INDEX_DIR>/ivf.npz`.
+        """
+        super().__init__(db_session)
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, "ivf.npz")
+        logger.info(f"IVFVectorStore initialized | n_lists={n_lists} | nprobe={nprobe}")
+
+    def _index(self):
+        return get_ivf_index(
+            self.index_path, n_lists=self.n_lists, nprobe=self.nprobe, min_train_size=self.min_train_size
+        )
+
+    def _exact_search(self, index, query_embedding, top_k, rows, min_score):
+        return self._rescore_rows(index, query_embedding, top_k, rows, min_score)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        nprobe = search_params.get("nprobe") or self.nprobe
+        return index.search(query_embedding, top_k, mask=mask, min_score=min_score, nprobe=nprobe)
@@ -0,0 +1,651 @@
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.corpus import tombstones_since
+from app.db.vector.matrix_index import BATCH_SCORE_ELEMENTS, GrowableArray, MatrixIndex, iter_chunk_embeddings
+from app.utils.binary_quantization import hamming_distances, pack_signs
+from app.utils.similarity import cosine_similarity_matrix, l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Rows per delta segment before it is sealed
+DEFAULT_DELTA_ROWS = int(os.getenv("VECTOR_DELTA_ROWS", "4096"))
+# Sealed delta segments that trigger a background compaction
+DEFAULT_MAX_DELTAS = int(os.getenv("VECTOR_MAX_DELTAS", "8"))
+
+
+class LSMIndex:
+    """
+    Log-structured vector index: an immutable base segment plus small delta segments.
+
+    New rows are appended to an active delta segment (a MatrixIndex preallocated to
+    `delta_rows`), which is sealed once full, so an ingest never copies or regrows the
+    base matrix. Once `max_deltas` sealed deltas accumulate, a background thread folds
+    them into a new base built off to the side and swapped in under the lock; readers
+    keep scoring the segments they started with, so searches never wait on compaction.
+
+    Segments are kept in ascending chunk id order and compaction preserves that order,
+    so a row's global position (base rows, then each delta's rows) never changes. Row
+    ids are therefore kept in one append-only array, masks built from `row_ids()` stay
+    valid across compactions, and a search scores each segment, keeps its top-k, and
+    merges them with a stable sort that reproduces a single-matrix scan.
+
+    Deleted chunks are tombstoned: `delete` (and `sync`, which replays the
+    `chunk_tombstones` table) clears their bit in a liveness array, and searches mask
+    them out immediately. Compaction drops dead rows from the new base, which then
+    records the global positions of the rows it kept, so positions still never change;
+    the ids of purged rows stay in `row_ids()` until the index is reloaded.
+
+    Attributes:
+        delta_rows (int): Rows per delta segment.
+        max_deltas (int): Sealed deltas that trigger a compaction.
+        background (bool): Whether compaction runs in a background thread (otherwise inline).
+        last_chunk_id (int): Highest chunk id loaded so far, used for incremental sync.
+        compactions (int): Compactions completed.
+        last_tombstone_id (int): Highest tombstone id replayed so far.
+    """
+
+    # Searches already exclude deleted chunks, so callers need not mask them
+    applies_tombstones = True
+
+    def __init__(
+        self,
+        delta_rows: int = DEFAULT_DELTA_ROWS,
+        max_deltas: int = DEFAULT_MAX_DELTAS,
+        background: bool = True,
+    ):
+        """
+        Initializes an empty index.
+
+        Args:
+            delta_rows (int, optional): Rows per delta segment. Defaults to `VECTOR_DELTA_ROWS`.
+            max_deltas (int, optional): Sealed deltas that trigger a compaction. Defaults to `VECTOR_MAX_DELTAS`.
+            background (bool, optional): Compact in a background thread. Defaults to True.
+        """
+        self.delta_rows = max(1, delta_rows)
+        self.max_deltas = max(1, max_deltas)
+        self.background = background
+        self.last_chunk_id = 0
+        self.compactions = 0
+        self.last_tombstone_id = 0
+        self._base = MatrixIndex()
+        # Global row positions of the base rows, or None while they are 0..len(base) - 1
+        self._base_positions: Optional[np.ndarray] = None
+        self._base_span = 0
+        self._deltas: List[MatrixIndex] = []
+        self._active = MatrixIndex(initial_capacity=self.delta_rows)
+        self._chunk_ids = GrowableArray((), np.int64)
+        self._document_ids = GrowableArray((), np.int64)
+        self._live = GrowableArray((), bool)
+        self._deleted = 0
+        self._purged = 0
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Embedding dimension, fixed by the first row added."""
+        with self._lock:
+            segments = [self._base, *self._deltas, self._active]
+        return next((segment.dim for segment in segments if segment.dim is not None), None)
+
+    def _segments(self, limit: Optional[int] = None) -> List[Tuple[MatrixIndex, np.ndarray, np.ndarray, Any]]:
+        """
+        Returns (segment, matrix, chunk_ids, positions) views of the non-empty segments, in row order.
+
+        `positions` is the global position of the segment's first row, or an ascending
+        array of the global position of every row for a base with purged rows.
+
+        Args:
+            limit (Optional[int]): Only return rows at global positions below `limit`
+                (e.g. the rows a mask covers).
+        """
+        with self._lock:
+            base_positions, offset = self._base_positions, self._base_span
+            views = [(self._base,) + self._base.snapshot()[:2] + (0 if base_positions is None else base_positions,)]
+            for segment in [*self._deltas, self._active]:
+                views.append((segment,) + segment.snapshot()[:2] + (offset,))
+                offset += len(segment)
+
+        result = []
+        for segment, matrix, ids, positions in views:
+            if limit is not None:
+                if isinstance(positions, np.ndarray):
+                    size = int(np.searchsorted(positions, limit))
+                    positions = positions[:size]
+                else:
+                    size = max(0, min(len(ids), limit - positions))
+                matrix, ids = matrix[:size], ids[:size]
+            if len(ids):
+                result.append((segment, matrix, ids, positions))
+        return result
+
+    @staticmethod
+    def _segment_mask(mask: np.ndarray, positions, size: int) -> np.ndarray:
+        """Returns the part of a mask over global rows that covers one segment."""
+        if isinstance(positions, np.ndarray):
+            return mask[positions[:size]]
+        return mask[positions:positions + size]
+
+    def _live_mask(self, mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """ANDs the liveness of rows into a mask while deleted rows remain in the segments."""
+        with self._lock:
+            if self._deleted == self._purged:
+                return mask
+            live = self._live.view
+        if mask is None:
+            return live
+        return mask & live[:len(mask)]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns segment counters.
+
+        Returns:
+            Dict[str, Any]: base rows, sealed delta count and rows, active delta rows,
+                deleted rows still held by segments, purged rows and compactions.
+        """
+        with self._lock:
+            return {
+                "base_rows": len(self._base),
+                "delta_segments": len(self._deltas),
+                "delta_rows": sum(len(delta) for delta in self._deltas),
+                "active_rows": len(self._active),
+                "dead_rows": self._deleted - self._purged,
+                "purged_rows": self._purged,
+                "compactions": self.compactions,
+            }
+
+    # ---------- Writes ----------
+
+    def _seal(self) -> None:
+        """Seals the active delta (if it holds rows) and starts a new one. Caller holds `_lock`."""
+        if len(self._active) == 0:
+            return
+        dim = self.dim
+        self._deltas.append(self._active)
+        self._active = MatrixIndex(initial_capacity=self.delta_rows)
+        self._active.dim = dim
+        logger.debug(f"Sealed delta segment {len(self._deltas)} ({len(self._deltas[-1])} rows)")
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Appends rows to the active delta segment, sealing it whenever it fills up.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending and greater than `last_chunk_id`.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors, or a 2-D array.
+
+        Returns:
+            int: Number of rows actually added.
+        """
+        if not len(chunk_ids):
+            return 0
+
+        added = 0
+        with self._write_lock:
+            start = 0
+            while start < len(chunk_ids):
+                with self._lock:
+                    end = start + max(1, self.delta_rows - len(self._active))
+                    active = self._active
+                    before = len(active)
+                    added += active.add(chunk_ids[start:end], document_ids[start:end], embeddings[start:end])
+                    ids, segment_document_ids = active.row_ids()
+                    self._chunk_ids.extend(ids[before:])
+                    self._document_ids.extend(segment_document_ids[before:])
+                    self._live.extend(np.ones(len(ids) - before, dtype=bool))
+                    self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[min(end, len(chunk_ids)) - 1]))
+                    if len(self._active) >= self.delta_rows:
+                        self._seal()
+                    pending = len(self._deltas)
+                start = end
+
+        if pending >= self.max_deltas:
+            self._schedule_compaction()
+        return added
+
+    def delete(self, chunk_ids: Sequence[int]) -> int:
+        """
+        Tombstones the rows of deleted chunks; they are excluded from searches at once
+        and dropped by the next compaction.
+
+        Args:
+            chunk_ids (Sequence[int]): Chunk ids to delete. Unknown or already deleted ids are ignored.
+
+        Returns:
+            int: Number of rows newly deleted.
+        """
+        targets = np.asarray(chunk_ids, dtype=np.int64)
+        if not len(targets):
+            return 0
+        with self._lock:
+            ids, live = self._chunk_ids.view, self._live.view
+            positions = np.searchsorted(ids, targets)
+            found = positions < len(ids)
+            positions, targets = positions[found], targets[found]
+            positions = np.unique(positions[ids[positions] == targets])
+            positions = positions[live[positions]]
+            live[positions] = False
+            self._deleted += len(positions)
+            reclaimable = self._deleted - self._purged
+        if len(positions):
+            logger.info(f"LSMIndex deleted {len(positions)} rows ({reclaimable} awaiting compaction)")
+        if reclaimable >= self.delta_rows:
+            self._schedule_compaction()
+        return len(positions)
+
+    def sync(self, db: Session, batch_size: int = 10000, document_ids: Optional[Sequence[int]] = None) -> int:
+        """
+        Loads chunks with an id above `last_chunk_id` into delta segments, then replays
+        tombstones recorded since `last_tombstone_id`.
+
+        The database is read without holding the segment lock, so searches proceed while
+        a large ingest is being loaded.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+            document_ids (Optional[Sequence[int]], optional): Only load chunks of these documents.
+
+        Returns:
+            int: Number of rows added to the index.
+        """
+        added = 0
+        with self._write_lock:
+            batches = iter_chunk_embeddings(db, self.last_chunk_id, batch_size, document_ids=document_ids)
+            for chunk_ids, chunk_document_ids, embeddings in batches:
+                added += self.add(chunk_ids, chunk_document_ids, embeddings)
+            if document_ids is None:
+                tombstones = tombstones_since(db, self.last_tombstone_id)
+                if tombstones:
+                    self.delete([chunk_id for _, chunk_id in tombstones])
+                    self.last_tombstone_id = tombstones[-1][0]
+        if added:
+            logger.info(f"LSMIndex synced {added} new rows (total={len(self)}, {self.stats()})")
+        return added
+
+    # ---------- Compaction ----------
+
+    def _schedule_compaction(self) -> None:
+        """Starts the background compactor unless one is already running."""
+        if not self.background:
+            self.compact(seal=False)
+            return
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact_pending, name="lsm-compactor", daemon=True)
+            self._compactor.start()
+
+    def _compact_pending(self) -> None:
+        """Compacts until fewer than `max_deltas` sealed deltas remain (deltas sealed meanwhile included)."""
+        try:
+            while True:
+                self.compact(seal=False)
+                with self._lock:
+                    if len(self._deltas) < self.max_deltas:
+                        return
+        except Exception as e:
+            logger.error(f"Background compaction failed: {e}", exc_info=True)
+
+    def compact(self, seal: bool = True) -> bool:
+        """
+        Folds the sealed delta segments into a new base segment, dropping deleted rows.
+
+        The new base is built without holding the segment lock and swapped in atomically;
+        deltas sealed and rows deleted while it was being built stay in place (and masked).
+
+        Args:
+            seal (bool, optional): Seal the active delta first so every row is folded. Defaults to True.
+
+        Returns:
+            bool: True if any delta was folded or deleted row dropped.
+        """
+        with self._compact_lock:
+            with self._lock:
+                if seal:
+                    self._seal()
+                base, deltas = self._base, list(self._deltas)
+                base_positions, base_span = self._base_positions, self._base_span
+                live = self._live.view
+
+            span = base_span + sum(len(delta) for delta in deltas)
+            positions = np.arange(base_span, span)
+            positions = np.concatenate([np.arange(base_span) if base_positions is None else base_positions, positions])
+            keep = live[positions]
+            dropped = int(len(keep) - np.count_nonzero(keep))
+            if not deltas and not dropped:
+                return False
+
+            merged = MatrixIndex.concatenate([base] + deltas, keep if dropped else None)
+            positions = positions[keep]
+            with self._lock:
+                self._base = merged
+                self._base_positions = None if len(positions) == span else positions
+                self._base_span = span
+                self._deltas = self._deltas[len(deltas):]
+                self._purged += dropped
+                self.compactions += 1
+        logger.info(f"Compacted {len(deltas)} delta segments into a base of {len(merged)} rows ({dropped} deleted rows dropped)")
+        return True
+
+    def wait_for_compaction(self, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until a running background compaction finishes.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait at most.
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+
+    # ---------- Persistence ----------
+
+    def memory_bytes(self) -> int:
+        """Returns the bytes allocated for all segments and the row id arrays."""
+        with self._lock:
+            segments = [self._base, *self._deltas, self._active]
+            positions = self._base_positions
+        return (
+            sum(segment.memory_bytes() for segment in segments)
+            + self._chunk_ids.nbytes
+            + self._document_ids.nbytes
+            + self._live.nbytes
+            + (0 if positions is None else positions.nbytes)
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Compacts every live row into the base segment and persists it in the MatrixIndex format.
+
+        Args:
+            path (str): Destination file path.
+        """
+        self.compact()
+        with self._lock:
+            base = self._base
+        base.save(path)
+
+    def load(self, path: str) -> None:
+        """
+        Restores an index written by `save` (or `MatrixIndex.save`) as the base segment.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file format version is not supported.
+        """
+        base = MatrixIndex()
+        base.load(path)
+        chunk_ids, document_ids = base.row_ids()
+        with self._write_lock, self._compact_lock, self._lock:
+            self._base = base
+            self._base_positions = None
+            self._base_span = len(base)
+            self._deltas = []
+            self._active = MatrixIndex(initial_capacity=self.delta_rows)
+            self._active.dim = base.dim
+            self._chunk_ids = GrowableArray((), np.int64, capacity=max(64, len(chunk_ids)))
+            self._chunk_ids.extend(chunk_ids)
+            self._document_ids = GrowableArray((), np.int64, capacity=max(64, len(document_ids)))
+            self._document_ids.extend(document_ids)
+            self._live = GrowableArray((), bool, capacity=max(64, len(chunk_ids)))
+            self._live.extend(np.ones(len(chunk_ids), dtype=bool))
+            self._deleted = self._purged = 0
+            self.last_chunk_id = base.last_chunk_id
+            # Tombstones are matched by chunk id, so replaying them all again is harmless
+            self.last_tombstone_id = 0
+
+    # ---------- Reads ----------
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the chunk ids and document ids of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk_ids, document_ids).
+        """
+        with self._lock:
+            return self._chunk_ids.view, self._document_ids.view
+
+    def _query_vector(self, query_embedding: List[float], segments) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        dim = segments[0][1].shape[1]
+        if query.shape[-1] != dim:
+            raise ValueError(f"Query dimension {query.shape[-1]} does not match index dimension {dim}")
+        return l2_normalize(query)
+
+    @staticmethod
+    def _merge(
+        ids_parts: List[np.ndarray],
+        score_parts: List[np.ndarray],
+        top_k: int,
+        min_score: float,
+    ) -> List[Tuple[int, float]]:
+        """Merges per-segment top-k candidates (given in row order of segments) into the overall top-k."""
+        if not ids_parts:
+            return []
+        ids = np.concatenate(ids_parts)
+        scores = np.concatenate(score_parts)
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if np.isfinite(scores[i]) and scores[i] >= min_score
+        ]
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        shortlist: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores every segment with a matrix-vector product and merges the per-segment top-k.
+
+        With `shortlist`, each segment first keeps its `top_k * shortlist` closest rows by
+        Hamming distance over packed sign bits and scores only those with full cosine.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are
+                excluded, as are rows added after the mask was built.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            shortlist (Optional[int], optional): Candidate multiplier for the binary first stage.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        mask = self._live_mask(mask)
+        segments = self._segments(None if mask is None else len(mask))
+        if top_k <= 0 or not segments:
+            return []
+        query = self._query_vector(query_embedding, segments)
+
+        ids_parts, score_parts = [], []
+        for segment, matrix, ids, positions in segments:
+            size = len(ids)
+            segment_mask = None if mask is None else self._segment_mask(mask, positions, size)
+
+            if shortlist and top_k * shortlist < size:
+                closeness = -hamming_distances(segment.packed_bits()[:size], pack_signs(query)).astype(np.float32)
+                if segment_mask is not None:
+                    closeness = np.where(segment_mask, closeness, -np.inf)
+                rows = np.sort(top_k_indices(closeness, top_k * shortlist))
+                rows = rows[np.isfinite(closeness[rows])]
+                matrix, ids, segment_mask = matrix[rows], ids[rows], None
+
+            scores = matrix @ query
+            if segment_mask is not None:
+                scores = np.where(segment_mask, scores, -np.inf)
+            best = top_k_indices(scores, top_k)
+            ids_parts.append(ids[best])
+            score_parts.append(scores[best])
+
+        return self._merge(ids_parts, score_parts, top_k, min_score)
+
+    def _gather(self, segments, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the vectors and chunk ids of global row positions, in row order."""
+        blocks, id_blocks = [], []
+        for _, matrix, ids, positions in segments:
+            size = len(ids)
+            if isinstance(positions, np.ndarray):
+                local = np.searchsorted(positions, rows)
+                found = local < size
+                local = local[found][positions[local[found]] == rows[found]]
+            else:
+                local = rows[(rows >= positions) & (rows < positions + size)] - positions
+            if len(local):
+                blocks.append(matrix[local])
+                id_blocks.append(ids[local])
+        if not blocks:
+            return np.empty((0, segments[0][1].shape[1]), dtype=np.float32), np.empty(0, dtype=np.int64)
+        return np.concatenate(blocks), np.concatenate(id_blocks)
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        rows: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores only the given rows, for filters selective enough to brute-force.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            rows (np.ndarray): Ascending row positions, counted across segments in order.
+            top_k (int): Maximum number of results.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        live = self._live_mask(None)
+        if live is not None:
+            rows = rows[live[rows]]
+        segments = self._segments()
+        if top_k <= 0 or len(rows) == 0 or not segments:
+            return []
+
+        matrix, ids = self._gather(segments, rows)
+        if not len(ids):
+            return []
+        scores = cosine_similarity_matrix(query_embedding, matrix)
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] >= min_score
+        ]
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[List[float]],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Scores a batch of queries with one matrix-matrix product per segment and merges per query.
+
+        Args:
+            query_embeddings (Sequence[List[float]]): Query vectors (normalized here).
+            top_k (int): Maximum number of results per query.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            rows (Optional[np.ndarray], optional): Score only these ascending row positions
+                (a selective filter); `mask` is ignored when given.
+
+        Returns:
+            List[List[Tuple[int, float]]]: (chunk_id, similarity) pairs per query, best first.
+        """
+        if not len(query_embeddings):
+            return []
+        if rows is not None:
+            live = self._live_mask(None)
+            if live is not None:
+                rows = rows[live[rows]]
+        else:
+            mask = self._live_mask(mask)
+        segments = self._segments(None if mask is None or rows is not None else len(mask))
+        if top_k <= 0 or not segments or (rows is not None and len(rows) == 0):
+            return [[] for _ in query_embeddings]
+
+        queries = self._query_vector(query_embeddings, segments)
+        if queries.ndim != 2:
+            raise ValueError(f"Expected a batch of query vectors, got shape {queries.shape}")
+
+        if rows is not None:
+            blocks = [self._gather(segments, rows) + (None,)]
+        else:
+            blocks = [
+                (matrix, ids, None if mask is None else self._segment_mask(mask, positions, len(ids)))
+                for _, matrix, ids, positions in segments
+            ]
+
+        ids_parts = [[] for _ in range(len(queries))]
+        score_parts = [[] for _ in range(len(queries))]
+        for matrix, ids, block_mask in blocks:
+            if not len(ids):
+                continue
+            step = max(1, BATCH_SCORE_ELEMENTS // len(ids))
+            for start in range(0, len(queries), step):
+                scores = queries[start:start + step] @ matrix.T
+                if block_mask is not None:
+                    scores[:, ~block_mask] = -np.inf
+                for position, row_scores in enumerate(scores, start):
+                    best = top_k_indices(row_scores, top_k)
+                    ids_parts[position].append(ids[best])
+                    score_parts[position].append(row_scores[best])
+
+        return [
+            self._merge(ids_parts[position], score_parts[position], top_k, min_score)
+            for position in range(len(queries))
+        ]
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_lsm_index(db_session: Session) -> LSMIndex:
+    """
+    Returns the process-wide LSMIndex for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        LSMIndex: The shared index (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = LSMIndex()
+            _indexes[engine] = index
+            logger.info("Created process-wide LSMIndex")
+        return index
@@ -0,0 +1,599 @@
+import json
+import logging
+import os
+import threading
+import weakref
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.corpus import ahead_of_database
+from app.db.models import Chunk
+from app.db.shard_slice import filter_shard_slice
+from app.utils.binary_quantization import hamming_distances, pack_signs
+from app.utils.embedding_codec import decode_embedding_rows
+from app.utils.similarity import cosine_similarity_matrix, l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+MATRIX_FORMAT_VERSION = 1
+# Upper bound on the (queries x rows) score block held at once by a batched search
+BATCH_SCORE_ELEMENTS = 2 ** 24
+
+
+class GrowableArray:
+    """Append-only NumPy array with amortized doubling along the first axis."""
+
+    def __init__(self, row_shape: Tuple[int, ...], dtype, capacity: int = 64):
+        self._data = np.empty((capacity,) + row_shape, dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def extend(self, values: np.ndarray) -> None:
+        end = self._size + len(values)
+        if end > len(self._data):
+            capacity = max(end, 2 * len(self._data))
+            data = np.empty((capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:end] = values
+        self._size = end
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated, including spare capacity."""
+        return self._data.nbytes
+
+
+def fit_mask(mask: np.ndarray, size: int) -> np.ndarray:
+    """
+    Fits a row mask to the rows of an index snapshot.
+
+    A mask is built from `row_ids()` before the search runs, and the index may sync
+    more rows in between. Rows the mask does not cover were added after it was built
+    and are excluded.
+
+    Args:
+        mask (np.ndarray): Boolean array over the first rows of the index.
+        size (int): Number of rows in the snapshot being searched.
+
+    Returns:
+        np.ndarray: Boolean array of length `size`.
+    """
+    if len(mask) >= size:
+        return mask[:size]
+    return np.concatenate([mask, np.zeros(size - len(mask), dtype=bool)])
+
+
+def index_file_is_current(db: Session, path: str) -> bool:
+    """
+    Returns whether a saved HNSW, IVF or quantized index file may be loaded.
+
+    Their headers record the corpus generation and watermark (`last_chunk_id`) the index
+    was saved at; files written before generations were recorded count as generation 0.
+    A file ahead of the database is rejected so the index is rebuilt from the `chunks`
+    table instead (the next save overwrites it).
+
+    Args:
+        db (Session): Session on the database the index serves.
+        path (str): Index file path.
+
+    Returns:
+        bool: False if the file is unreadable or ahead of the database.
+    """
+    try:
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable index file {path}: {e}")
+        return False
+    generation, last_chunk_id = header.get("generation", 0), header.get("last_chunk_id", 0)
+    if ahead_of_database(db, generation, last_chunk_id):
+        logger.warning(
+            f"Ignoring index file {path}: saved at generation={generation} "
+            f"last_chunk_id={last_chunk_id}, ahead of the database; rebuilding"
+        )
+        return False
+    return True
+
+
+class MatrixIndex:
+    """
+    Contiguous, pre-normalized float32 embedding matrix with parallel id arrays.
+
+    Rows are kept in ascending chunk id order (the order rows come back from the
+    `chunks` table), so a stable sort over the scores reproduces the ordering of a
+    row-by-row scan. The matrix grows with amortized doubling; readers take a
+    snapshot of the live rows under the lock and score without holding it.
+
+    Searches can optionally use a binary first stage: a packed sign-bit copy of the
+    matrix (built lazily on first use, then kept up to date) is scanned by Hamming
+    distance and only the resulting shortlist is scored with full cosine.
+
+    Attributes:
+        dim (Optional[int]): Embedding dimension, fixed by the first row added.
+        last_chunk_id (int): Highest chunk id loaded so far, used for incremental sync.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        Initializes an empty index.
+
+        Args:
+            initial_capacity (int, optional): Number of rows to preallocate. Defaults to 1024.
+        """
+        self.dim: Optional[int] = None
+        self.last_chunk_id = 0
+        self._capacity = max(1, initial_capacity)
+        self._size = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.empty(self._capacity, dtype=np.int64)
+        self._document_ids = np.empty(self._capacity, dtype=np.int64)
+        self._bits: Optional[GrowableArray] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def concatenate(cls, indexes: Sequence["MatrixIndex"], keep: Optional[np.ndarray] = None) -> "MatrixIndex":
+        """
+        Builds an index holding the live rows of several indexes, in order.
+
+        Rows are copied as stored (already normalized), so scores do not change.
+
+        Args:
+            indexes (Sequence[MatrixIndex]): Indexes of the same dimension, in row order.
+            keep (Optional[np.ndarray], optional): Boolean array over the concatenated rows;
+                False rows are dropped (e.g. deleted chunks).
+
+        Returns:
+            MatrixIndex: A new, tightly sized index.
+        """
+        parts = [index.snapshot() for index in indexes]
+        parts = [part for part in parts if len(part[1])]
+        if parts and keep is not None:
+            matrix = np.concatenate([matrix for matrix, _, _ in parts])[keep]
+            ids = np.concatenate([ids for _, ids, _ in parts])[keep]
+            document_ids = np.concatenate([document_ids for _, _, document_ids in parts])[keep]
+            parts = [(matrix, ids, document_ids)] if len(ids) else []
+        size = sum(len(ids) for _, ids, _ in parts)
+        merged = cls(initial_capacity=size)
+        merged.last_chunk_id = max((index.last_chunk_id for index in indexes), default=0)
+        merged.dim = next((index.dim for index in indexes if index.dim is not None), None)
+        if parts:
+            merged._matrix = np.concatenate([matrix for matrix, _, _ in parts])
+            merged._ids[:size] = np.concatenate([ids for _, ids, _ in parts])
+            merged._document_ids[:size] = np.concatenate([document_ids for _, _, document_ids in parts])
+            merged._size = size
+        return merged
+
+    def _grow(self, required: int) -> None:
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+        if capacity == self._capacity and self._matrix is not None:
+            return
+
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        ids = np.empty(capacity, dtype=np.int64)
+        document_ids = np.empty(capacity, dtype=np.int64)
+        if self._matrix is not None:
+            matrix[:self._size] = self._matrix[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        document_ids[:self._size] = self._document_ids[:self._size]
+
+        self._matrix, self._ids, self._document_ids = matrix, ids, document_ids
+        self._capacity = capacity
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Appends rows to the index, L2-normalizing each embedding.
+
+        Rows whose dimension differs from the index dimension are skipped with a warning.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending and greater than `last_chunk_id`.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors, or a 2-D array.
+
+        Returns:
+            int: Number of rows actually added.
+        """
+        if not chunk_ids:
+            return 0
+
+        with self._lock:
+            if self.dim is None:
+                first = next((emb for emb in embeddings if emb is not None), None)
+                if first is None:
+                    self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                    return 0
+                self.dim = len(first)
+
+            if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2 and embeddings.shape[1] == self.dim:
+                keep = list(range(len(embeddings)))
+                block = np.array(embeddings, dtype=np.float32)
+            else:
+                keep = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) == self.dim]
+                if len(keep) != len(embeddings):
+                    logger.warning(f"Skipping {len(embeddings) - len(keep)} embeddings with dimension != {self.dim}")
+                if not keep:
+                    self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                    return 0
+                block = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+
+            block = l2_normalize(block)
+
+            start, end = self._size, self._size + len(keep)
+            self._grow(end)
+            self._matrix[start:end] = block
+            self._ids[start:end] = [chunk_ids[i] for i in keep]
+            self._document_ids[start:end] = [document_ids[i] for i in keep]
+            self._size = end
+            self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+            return len(keep)
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns read-only views of the live rows.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (matrix, chunk_ids, document_ids).
+        """
+        with self._lock:
+            size = self._size
+            if self._matrix is None:
+                return np.empty((0, 0), dtype=np.float32), self._ids[:0], self._document_ids[:0]
+            return self._matrix[:size], self._ids[:size], self._document_ids[:size]
+
+    def packed_bits(self) -> np.ndarray:
+        """
+        Returns the packed sign bits of all rows, packing any rows added since the last call.
+
+        Returns:
+            np.ndarray: `(N, ceil(dim / 8))` uint8 array.
+        """
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, 0), dtype=np.uint8)
+            if self._bits is None:
+                self._bits = GrowableArray(((self.dim + 7) // 8,), np.uint8, capacity=max(64, self._size))
+            if len(self._bits) < self._size:
+                self._bits.extend(pack_signs(self._matrix[len(self._bits):self._size]))
+            return self._bits.view
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the chunk ids and document ids of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk_ids, document_ids).
+        """
+        _, chunk_ids, document_ids = self.snapshot()
+        return chunk_ids, document_ids
+
+    def sync(self, db: Session, batch_size: int = 10000, document_ids: Optional[Sequence[int]] = None) -> int:
+        """
+        Loads chunks with an id above `last_chunk_id` from the database.
+
+        The first call loads the whole table; later calls only read rows written since,
+        including rows written by other processes (e.g. the ingestion script).
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+            document_ids (Optional[Sequence[int]], optional): Only load chunks of these
+                documents (used by per-knowledge-base partitions).
+
+        Returns:
+            int: Number of rows added to the index.
+        """
+        added = 0
+        with self._lock:
+            batches = iter_chunk_embeddings(db, self.last_chunk_id, batch_size, document_ids=document_ids)
+            for chunk_ids, chunk_document_ids, embeddings in batches:
+                added += self.add(chunk_ids, chunk_document_ids, embeddings)
+        if added:
+            logger.info(f"MatrixIndex synced {added} new rows (total={len(self)})")
+        return added
+
+    def memory_bytes(self) -> int:
+        """Returns the bytes allocated for vectors, ids and packed bits (including spare capacity)."""
+        with self._lock:
+            allocated = self._ids.nbytes + self._document_ids.nbytes
+            if self._matrix is not None:
+                allocated += self._matrix.nbytes
+            if self._bits is not None:
+                allocated += self._bits.nbytes
+            return allocated
+
+    def save(self, path: str) -> None:
+        """
+        Persists the live rows to a `.npz` file (written atomically).
+
+        Args:
+            path (str): Destination file path.
+        """
+        with self._lock:
+            matrix, ids, document_ids = self.snapshot()
+            header = {"version": MATRIX_FORMAT_VERSION, "dim": self.dim, "last_chunk_id": self.last_chunk_id}
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(
+                tmp_path,
+                header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                vectors=matrix,
+                chunk_ids=ids,
+                document_ids=document_ids,
+            )
+            os.replace(tmp_path, path)
+        logger.info(f"Saved MatrixIndex ({len(ids)} rows) to {path}")
+
+    def load(self, path: str) -> None:
+        """
+        Restores an index written by `save`, replacing the current contents.
+
+        The saved rows are already normalized, so they are adopted without re-normalizing.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file format version is not supported.
+        """
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("version") != MATRIX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported MatrixIndex version: {header.get('version')}")
+
+            with self._lock:
+                size = len(data["chunk_ids"])
+                self.dim = header["dim"]
+                self.last_chunk_id = header["last_chunk_id"]
+                self._capacity = max(1, size)
+                self._size = size
+                self._ids = np.empty(self._capacity, dtype=np.int64)
+                self._ids[:size] = data["chunk_ids"]
+                self._document_ids = np.empty(self._capacity, dtype=np.int64)
+                self._document_ids[:size] = data["document_ids"]
+                self._matrix = None
+                if self.dim is not None:
+                    self._matrix = np.empty((self._capacity, self.dim), dtype=np.float32)
+                    self._matrix[:size] = data["vectors"]
+                self._bits = None
+        logger.info(f"Loaded MatrixIndex ({len(self)} rows) from {path}")
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        shortlist: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores every row with a single matrix-vector product and returns the best matches.
+
+        With `shortlist`, a Hamming-distance scan over the packed sign bits first selects
+        `top_k * shortlist` candidates and only those rows are scored with full cosine.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            shortlist (Optional[int], optional): Candidate multiplier for the binary first stage.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        matrix, ids, _ = self.snapshot()
+        if mask is not None:
+            # Rows synced after the mask was built are not covered by it
+            size = min(len(ids), len(mask))
+            matrix, ids, mask = matrix[:size], ids[:size], mask[:size]
+        if top_k <= 0 or len(ids) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {matrix.shape[1]}")
+        query = l2_normalize(query)
+
+        if shortlist and top_k * shortlist < len(ids):
+            bits = self.packed_bits()[:len(ids)]
+            closeness = -hamming_distances(bits, pack_signs(query)).astype(np.float32)
+            if mask is not None:
+                closeness = np.where(mask, closeness, -np.inf)
+            rows = np.sort(top_k_indices(closeness, top_k * shortlist))
+            rows = rows[np.isfinite(closeness[rows])]
+            matrix, ids = matrix[rows], ids[rows]
+            mask = None
+
+        scores = matrix @ query
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        order = top_k_indices(scores, top_k)
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in order
+            if np.isfinite(scores[i]) and scores[i] >= min_score
+        ]
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        rows: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores only the given rows, for filters selective enough to brute-force.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            rows (np.ndarray): Ascending row positions to score.
+            top_k (int): Maximum number of results.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        matrix, ids, _ = self.snapshot()
+        if top_k <= 0 or len(rows) == 0:
+            return []
+
+        scores = cosine_similarity_matrix(query_embedding, matrix[rows])
+        return [
+            (int(ids[rows[i]]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] >= min_score
+        ]
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[List[float]],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Scores a batch of queries with one matrix-matrix product and returns each query's best matches.
+
+        The queries are stacked into a `(Q, dim)` matrix so the whole batch costs a single
+        `(Q x dim) @ (dim x N)` product instead of Q matrix-vector scans; top-k is then
+        selected per query row. Large batches are split so at most `BATCH_SCORE_ELEMENTS`
+        scores are held at once.
+
+        Args:
+            query_embeddings (Sequence[List[float]]): Query vectors (normalized here).
+            top_k (int): Maximum number of results per query.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            rows (Optional[np.ndarray], optional): Score only these ascending row positions
+                (a selective filter); `mask` is ignored when given.
+
+        Returns:
+            List[List[Tuple[int, float]]]: (chunk_id, similarity) pairs per query, best first.
+        """
+        if not len(query_embeddings):
+            return []
+        matrix, ids, _ = self.snapshot()
+        if mask is not None and rows is None:
+            # Rows synced after the mask was built are not covered by it
+            size = min(len(ids), len(mask))
+            matrix, ids, mask = matrix[:size], ids[:size], mask[:size]
+        if top_k <= 0 or len(ids) == 0 or (rows is not None and len(rows) == 0):
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != matrix.shape[1]:
+            raise ValueError(f"Query dimension {queries.shape[-1]} does not match index dimension {matrix.shape[1]}")
+        queries = l2_normalize(queries)
+
+        if rows is not None:
+            matrix, ids, mask = matrix[rows], ids[rows], None
+
+        results = []
+        block = max(1, BATCH_SCORE_ELEMENTS // len(ids))
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ matrix.T
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            for row_scores in scores:
+                results.append([
+                    (int(ids[i]), float(row_scores[i]))
+                    for i in top_k_indices(row_scores, top_k)
+                    if np.isfinite(row_scores[i]) and row_scores[i] >= min_score
+                ])
+        return results
+
+
+def iter_chunk_embeddings(
+    db: Session,
+    after_id: int,
+    batch_size: int = 10000,
+    document_ids: Optional[Sequence[int]] = None,
+):
+    """
+    Yields decoded embeddings for chunks with an id above `after_id`, in id order.
+
+    Only the id, document id and embedding columns are read, never text or metadata. On
+    a shard server only chunks of the server's document slice are read.
+
+    Args:
+        db (Session): SQLAlchemy session to read from.
+        after_id (int): Exclusive lower bound on chunk id.
+        batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+        document_ids (Optional[Sequence[int]], optional): Only read chunks of these documents.
+
+    Yields:
+        Tuple[List[int], List[int], Union[np.ndarray, List[Optional[np.ndarray]]]]:
+            (chunk_ids, document_ids, embeddings) for each batch.
+    """
+    if document_ids is not None and not len(document_ids):
+        return
+    while True:
+        query = db.query(
+            Chunk.id,
+            Chunk.document_id,
+            Chunk.embedding_blob,
+            Chunk.embedding_dtype,
+            Chunk.embedding_dim,
+            Chunk.embedding_json,
+        ).filter(Chunk.id > after_id)
+        if document_ids is not None:
+            query = query.filter(Chunk.document_id.in_(list(document_ids)))
+        query = filter_shard_slice(query)
+        rows = query.order_by(Chunk.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield (
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            decode_embedding_rows([row[2:] for row in rows]),
+        )
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_matrix_index(db_session: Session) -> MatrixIndex:
+    """
+    Returns the process-wide MatrixIndex for the engine behind a session.
+
+    One index is kept per engine so per-request sessions share the same loaded matrix.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        MatrixIndex: The shared index (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = MatrixIndex()
+            _indexes[engine] = index
+            logger.info("Created process-wide MatrixIndex")
+        return index
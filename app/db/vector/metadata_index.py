@@ -0,0 +1,180 @@
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.models import Chunk
+from app.db.vector.matrix_index import GrowableArray
+
+logger = logging.getLogger(__name__)
+
+
+def posting_value(value: Any) -> Optional[str]:
+    """
+    Returns the key under which a metadata value is indexed.
+
+    Scalars compare by their string form, matching the SQL filters (`"3"` and `3` select
+    the same chunks). Nested values are not indexed.
+
+    Args:
+        value (Any): A metadata value or filter value.
+
+    Returns:
+        Optional[str]: The posting key, or None if the value cannot be filtered on.
+    """
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return str(value)
+
+
+class MetadataIndex:
+    """
+    Inverted index from `(metadata key, value)` to the ascending ids of matching chunks.
+
+    Like the vector indexes it is loaded once and then synced incrementally from the
+    `chunks` table, so metadata filters resolve to an id intersection in memory instead
+    of a per-row JSON extract in SQL. `mask` turns the result into a boolean array over
+    a vector index's rows that is applied directly to the score array.
+
+    Attributes:
+        last_chunk_id (int): Highest chunk id loaded so far, used for incremental sync.
+    """
+
+    def __init__(self):
+        """Initializes an empty index."""
+        self.last_chunk_id = 0
+        self._postings: Dict[Tuple[str, str], GrowableArray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Returns the number of distinct (key, value) postings."""
+        return len(self._postings)
+
+    def add(self, chunk_ids: List[int], metadatas: List[Optional[Dict[str, Any]]]) -> None:
+        """
+        Indexes the metadata of a batch of chunks.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending and greater than `last_chunk_id`.
+            metadatas (List[Optional[Dict[str, Any]]]): Metadata of each chunk.
+        """
+        if not len(chunk_ids):
+            return
+
+        pending: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for chunk_id, metadata in zip(chunk_ids, metadatas):
+            for key, value in (metadata or {}).items():
+                term = posting_value(value)
+                if term is not None:
+                    pending[(key, term)].append(chunk_id)
+
+        with self._lock:
+            for posting, ids in pending.items():
+                array = self._postings.get(posting)
+                if array is None:
+                    array = self._postings[posting] = GrowableArray((), np.int64, capacity=max(8, len(ids)))
+                array.extend(np.asarray(ids, dtype=np.int64))
+            self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Indexes chunks with an id above `last_chunk_id`.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of chunks indexed.
+        """
+        added = 0
+        with self._lock:
+            while True:
+                rows = (
+                    db.query(Chunk.id, Chunk.chunk_metadata)
+                    .filter(Chunk.id > self.last_chunk_id)
+                    .order_by(Chunk.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                self.add([row[0] for row in rows], [row[1] for row in rows])
+                added += len(rows)
+                if len(rows) < batch_size:
+                    break
+        if added:
+            logger.info(f"MetadataIndex synced {added} chunks ({len(self)} postings)")
+        return added
+
+    def matching_ids(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Returns the ascending ids of chunks matching every filter.
+
+        Args:
+            filters (Dict[str, Any]): Metadata key/value pairs, combined with AND.
+
+        Returns:
+            np.ndarray: Sorted int64 chunk ids.
+        """
+        with self._lock:
+            postings = []
+            for key, value in filters.items():
+                term = posting_value(value)
+                array = self._postings.get((key, term)) if term is not None else None
+                if array is None:
+                    return np.empty(0, dtype=np.int64)
+                postings.append(array.view)
+
+        # Intersect smallest first so the working set only shrinks
+        postings.sort(key=len)
+        ids = postings[0] if postings else np.empty(0, dtype=np.int64)
+        for other in postings[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def mask(self, chunk_ids: np.ndarray, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Builds a boolean mask over index rows selecting the chunks that match `filters`.
+
+        Args:
+            chunk_ids (np.ndarray): Ascending chunk ids of the index rows.
+            filters (Dict[str, Any]): Metadata key/value pairs, combined with AND.
+
+        Returns:
+            np.ndarray: Boolean array aligned with `chunk_ids`.
+        """
+        mask = np.zeros(len(chunk_ids), dtype=bool)
+        ids = self.matching_ids(filters)
+        if len(ids) and len(chunk_ids):
+            rows = np.searchsorted(chunk_ids, ids)
+            inside = rows < len(chunk_ids)
+            rows, ids = rows[inside], ids[inside]
+            mask[rows[chunk_ids[rows] == ids]] = True
+        return mask
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_metadata_index(db_session: Session) -> MetadataIndex:
+    """
+    Returns the process-wide MetadataIndex for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        MetadataIndex: The shared index (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = MetadataIndex()
+            _indexes[engine] = index
+            logger.info("Created process-wide MetadataIndex")
+        return index
@@ -0,0 +1,34 @@
+import logging
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.segment_index import DEFAULT_SEGMENT_DIR, get_segment_index
+
+logger = logging.getLogger(__name__)
+
+class MmapVectorStore(InMemoryVectorStore):
+    """
+    Vector store that searches memory-mapped embedding segment files.
+
+    Chunks are persisted in the relational database exactly like InMemoryVectorStore,
+    but embeddings are also appended to `.npy` segment files (see SegmentIndex) that
+    every worker process maps read-only. The operating system keeps one page-cache copy
+    per host instead of one heap copy per worker, and a cold start maps the files rather
+    than re-reading and re-parsing the `chunks` table.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(self, db_session: Session, segment_dir: str = DEFAULT_SEGMENT_DIR):
+        """
+        Initializes the memory-mapped vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+            segment_dir (str, optional): Directory holding the segment files and manifest.
+        """
+        super().__init__(db_session)
+        self.segment_dir = segment_dir
+        logger.info(f"MmapVectorStore initialized with segment_dir={segment_dir}")
+
+    def _index(self):
+        return get_segment_index(self.db, self.segment_dir)
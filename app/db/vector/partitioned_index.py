@@ -0,0 +1,265 @@
+import logging
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.knowledge_bases import resolve_document_ids
+from app.db.models import Chunk
+from app.db.vector.matrix_index import MatrixIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "rag_index")
+# Resident bytes allowed across all partitions of a worker; 0 keeps every partition loaded
+DEFAULT_MEMORY_BUDGET = int(float(os.getenv("VECTOR_PARTITION_BUDGET_MB", "0")) * 2 ** 20)
+DEFAULT_SNAPSHOT_DIR = os.getenv("VECTOR_PARTITION_DIR", os.path.join(DEFAULT_INDEX_DIR, "partitions"))
+
+
+class PartitionedIndex:
+    """
+    One MatrixIndex per knowledge base, each created and loaded on first use.
+
+    A knowledge-base-scoped query scores only its own partition, so its cost follows the
+    size of that knowledge base rather than of the whole corpus, and knowledge bases that
+    are never queried are never loaded. Each partition syncs incrementally like the
+    global index, restricted to the chunks of the knowledge base's documents. Each
+    partition remembers the documents it was synced for; when a knowledge base loses a
+    document, or gains one whose chunks predate the partition's sync position, the
+    partition is rebuilt instead of synced incrementally.
+
+    With a memory budget, partitions are kept in least-recently-queried order and the
+    oldest are evicted once the resident bytes exceed the budget (the partition being
+    queried is never evicted). A partition that gained rows since it was loaded is
+    snapshotted to `snapshot_dir` when it is evicted, and by `persist` at ingest end and
+    shutdown, never on the query path; an evicted partition reloads from disk and only
+    syncs the rows written since.
+
+    Attributes:
+        memory_budget (int): Resident byte budget; 0 disables eviction and snapshots.
+        snapshot_dir (str): Directory holding one `.npz` snapshot per partition.
+        hits (int): Queries served by a resident partition.
+        misses (int): Queries that had to load a partition.
+        evictions (int): Partitions evicted to respect the budget.
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR):
+        """
+        Initializes an index with no partitions loaded.
+
+        Args:
+            memory_budget (int, optional): Resident byte budget; 0 for unlimited.
+                Defaults to `VECTOR_PARTITION_BUDGET_MB`.
+            snapshot_dir (str, optional): Snapshot directory. Defaults to `VECTOR_PARTITION_DIR`.
+        """
+        self.memory_budget = memory_budget
+        self.snapshot_dir = snapshot_dir
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._partitions: "OrderedDict[str, MatrixIndex]" = OrderedDict()
+        self._members: Dict[str, List[int]] = {}
+        # Resident partitions with rows their snapshot does not hold
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Returns the number of resident partitions."""
+        return len(self._partitions)
+
+    def loaded(self) -> List[str]:
+        """Returns the knowledge base IDs of resident partitions, least recently queried first."""
+        with self._lock:
+            return list(self._partitions)
+
+    def resident_bytes(self) -> int:
+        """Returns the bytes held by resident partitions."""
+        with self._lock:
+            partitions = list(self._partitions.values())
+        return sum(index.memory_bytes() for index in partitions)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns residency counters for sizing workers.
+
+        Returns:
+            Dict[str, Any]: hits, misses, evictions, resident partitions and bytes, and the budget.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "resident_partitions": len(self),
+            "resident_bytes": self.resident_bytes(),
+            "memory_budget": self.memory_budget,
+        }
+
+    def snapshot_path(self, knowledge_base_id: Union[int, str]) -> str:
+        """Returns the snapshot file of a partition."""
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(knowledge_base_id))
+        return os.path.join(self.snapshot_dir, f"kb_{name}.npz")
+
+    def _load(self, key: str) -> MatrixIndex:
+        """Builds a partition, starting from its snapshot when one exists."""
+        index = MatrixIndex()
+        path = self.snapshot_path(key)
+        if self.memory_budget and os.path.exists(path):
+            try:
+                index.load(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable partition snapshot {path}: {e}")
+                index = MatrixIndex()
+        return index
+
+    def _evict(self, keep: str) -> None:
+        """Evicts least recently queried partitions until the budget is met, snapshotting unsaved ones first."""
+        while True:
+            with self._lock:
+                resident = sum(index.memory_bytes() for index in self._partitions.values())
+                victim = next((key for key in self._partitions if key != keep), None)
+                if resident <= self.memory_budget or victim is None:
+                    return
+                evicted = self._partitions[victim]
+                unsaved = victim in self._dirty
+                self._dirty.discard(victim)
+            if unsaved:
+                # Written without the partitions lock so other knowledge bases stay queryable
+                try:
+                    evicted.save(self.snapshot_path(victim))
+                except OSError as e:
+                    logger.warning(f"Could not snapshot partition knowledge_base_id={victim}: {e}")
+            with self._lock:
+                # A query that synced new rows into the victim meanwhile keeps it resident for now
+                if self._partitions.get(victim) is not evicted or victim in self._dirty:
+                    continue
+                del self._partitions[victim]
+                self._members.pop(victim, None)
+                self.evictions += 1
+            logger.info(
+                f"Evicted partition knowledge_base_id={victim} ({evicted.memory_bytes()} bytes); "
+                f"resident={resident - evicted.memory_bytes()} budget={self.memory_budget}"
+            )
+
+    def persist(self) -> int:
+        """
+        Snapshots every resident partition that gained rows since it was loaded or saved.
+
+        Does nothing without a memory budget, since partitions are then never evicted.
+
+        Returns:
+            int: Number of partition snapshots written.
+        """
+        if not self.memory_budget:
+            return 0
+        with self._lock:
+            unsaved = [(key, self._partitions[key]) for key in self._dirty if key in self._partitions]
+            self._dirty.clear()
+        for key, index in unsaved:
+            index.save(self.snapshot_path(key))
+        return len(unsaved)
+
+    def _is_stale(self, db: Session, key: str, index: MatrixIndex, document_ids: Sequence[int]) -> bool:
+        """Returns whether a partition's rows no longer match its knowledge base's documents."""
+        with self._lock:
+            members = self._members.get(key)
+        if members is None:
+            # Freshly loaded (possibly from a snapshot): the rows tell which documents it holds
+            members = np.unique(index.row_ids()[1]).tolist()
+        if set(members) - set(document_ids):
+            return True
+        gained = sorted(set(document_ids) - set(members))
+        if not gained or not index.last_chunk_id:
+            return False
+        earlier = (
+            db.query(Chunk.id)
+            .filter(Chunk.document_id.in_(gained), Chunk.id <= index.last_chunk_id)
+            .first()
+        )
+        return earlier is not None
+
+    def partition(self, db: Session, knowledge_base_id: Union[int, str], batch_size: int = 10000) -> MatrixIndex:
+        """
+        Returns the synced partition of a knowledge base, loading it if it is not resident.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            knowledge_base_id (Union[int, str]): Knowledge base (or legacy document) ID.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            MatrixIndex: The knowledge base's partition.
+        """
+        key = str(knowledge_base_id)
+        with self._lock:
+            index = self._partitions.get(key)
+            if index is not None:
+                self._partitions.move_to_end(key)
+                self.hits += 1
+        if index is None:
+            loaded = self._load(key)
+            with self._lock:
+                # Another thread may have loaded it meanwhile; keep the first copy
+                index = self._partitions.setdefault(key, loaded)
+                self._partitions.move_to_end(key)
+                self.misses += 1
+            logger.info(f"Loaded index partition for knowledge_base_id={key} ({len(index)} rows)")
+
+        document_ids = resolve_document_ids(db, key)
+        if self._is_stale(db, key, index, document_ids):
+            logger.info(f"Knowledge base membership changed; rebuilding partition knowledge_base_id={key}")
+            rebuilt = MatrixIndex()
+            with self._lock:
+                # Replace only the copy we checked; a concurrent rebuild may have won already
+                if self._partitions.get(key) is index:
+                    self._partitions[key] = rebuilt
+                    self._dirty.add(key)
+                index = self._partitions.get(key, rebuilt)
+        added = index.sync(db, batch_size, document_ids=document_ids)
+        with self._lock:
+            self._members[key] = document_ids
+            if added:
+                self._dirty.add(key)
+        if self.memory_budget:
+            self._evict(keep=key)
+        return index
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_partitioned_index(db_session: Session, **kwargs) -> PartitionedIndex:
+    """
+    Returns the process-wide PartitionedIndex for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+        **kwargs: PartitionedIndex parameters used on first creation.
+
+    Returns:
+        PartitionedIndex: The shared partitions.
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = PartitionedIndex(**kwargs)
+            _indexes[engine] = index
+        return index
+
+
+def save_partitioned_indexes() -> int:
+    """
+    Snapshots the unsaved partitions of every process-wide PartitionedIndex; see `PartitionedIndex.persist`.
+
+    Returns:
+        int: Number of partition snapshots written.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return sum(index.persist() for index in indexes)
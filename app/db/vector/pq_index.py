@@ -0,0 +1,121 @@
+"""
+Product-quantized vector index.
+
+Chunks are stored as `code_size`-byte PQ codes instead of float32 vectors (1.5 KB ->
+48 B for 384-dimensional embeddings) and scanned with asymmetric-distance lookup tables.
+Codebooks are trained automatically, on a background thread, once enough vectors exist,
+and can be retrained offline as the corpus grows:
+
+    python -m app.db.vector.pq_index --code-size 48
+
+Serving processes reload the retrained file on their next sync, and the retrain bumps
+the corpus generation so cached query results from the old index are dropped.
+"""
+
+import argparse
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from app.db.corpus import bump_generation, current_generation
+from app.db.vector.matrix_index import iter_chunk_embeddings
+from app.db.vector.quantized_index import QuantizedIndex
+from app.utils.product_quantization import ProductQuantizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "rag_index")
+
+
+class PQIndex(QuantizedIndex):
+    """
+    Index of PQ-encoded, pre-normalized embeddings scanned with ADC lookup tables.
+
+    Attributes:
+        code_size (int): Bytes per encoded vector.
+    """
+
+    kind = "pq"
+
+    def __init__(self, code_size: int = 48, **kwargs):
+        """
+        Initializes an empty, untrained index.
+
+        Args:
+            code_size (int, optional): Bytes per code, between 8 and 64. Defaults to 48.
+            **kwargs: QuantizedIndex parameters (`min_train_size`, `max_train_samples`, `path`, `seed`).
+        """
+        self.code_size = code_size
+        super().__init__(**kwargs)
+
+    def _new_quantizer(self) -> ProductQuantizer:
+        return ProductQuantizer(code_size=self.code_size, seed=self.seed)
+
+    def _quantizer_from_arrays(self, arrays) -> ProductQuantizer:
+        quantizer = ProductQuantizer.from_arrays(arrays)
+        self.code_size = quantizer.code_size
+        return quantizer
+
+
+_indexes: Dict[str, PQIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_pq_index(path: str, **params) -> PQIndex:
+    """
+    Returns the process-wide PQIndex persisted at `path`.
+
+    The file is loaded lazily by the first `sync`.
+
+    Args:
+        path (str): `.npz` file backing the index.
+        **params: PQIndex constructor parameters used on first creation.
+
+    Returns:
+        PQIndex: The shared index.
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = PQIndex(path=path, **params)
+        return _indexes[key]
+
+
+def save_pq_indexes() -> int:
+    """
+    Persists every process-wide PQIndex with unsaved rows; see `QuantizedIndex.persist`.
+
+    Returns:
+        int: Number of index files written.
+    """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return sum(index.persist() for index in indexes)
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Train (or retrain) PQ codebooks over all stored chunks.")
+    parser.add_argument("--code-size", type=int, default=48, help="Bytes per encoded vector (8-64).")
+    parser.add_argument("--path", default=os.path.join(DEFAULT_INDEX_DIR, "pq.npz"), help="Index file to write.")
+    args = parser.parse_args()
+
+    setup_logging()
+    index = PQIndex(code_size=args.code_size, min_train_size=2 ** 62)
+    db = SessionLocal()
+    try:
+        index.generation = current_generation(db)
+        for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, 0):
+            index.add(chunk_ids, document_ids, embeddings)
+    finally:
+        db.close()
+    index.train()
+    index.save(args.path)
+    # Serving processes reload the file on their next sync; results cached with the old
+    # codebooks must not be served after that
+    with SessionLocal() as db:
+        bump_generation(db)
+        db.commit()
@@ -0,0 +1,60 @@
+import logging
+import os
+from typing import Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.pq_index import DEFAULT_INDEX_DIR, get_pq_index
+
+logger = logging.getLogger(__name__)
+
+class PQVectorStore(InMemoryVectorStore):
+    """
+    Vector store backed by a product-quantized index.
+
+    Only `code_size` bytes per chunk are held in memory. Queries scan the codes with
+    asymmetric-distance lookup tables; when `rescore` is set, the best
+    `top_k * rescore` candidates are re-ranked with exact cosine similarity computed
+    from the embeddings stored in the database, so returned scores are exact.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(
+        self,
+        db_session: Session,
+        code_size: int = 48,
+        rescore: int = 4,
+        min_train_size: int = 4096,
+        index_path: Optional[str] = None,
+    ):
+        """
+        Initializes the PQ vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+            code_size (int, optional): Bytes per encoded vector (8-64). Defaults to 48.
+            rescore (int, optional): Candidate multiplier for exact rescoring; 0 disables it. Defaults to 4.
+            min_train_size (int, optional): Vectors needed before codebooks are trained. Defaults to 4096.
+            index_path (Optional[str], optional): Index file. Defaults to `<VECTOR_INDEX_DIR>/pq.npz`.
+        """
+        super().__init__(db_session)
+        self.code_size = code_size
+        self.rescore = rescore
+        self.min_train_size = min_train_size
+        self.index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, "pq.npz")
+        logger.info(f"PQVectorStore initialized | code_size={code_size} | rescore={rescore}")
+
+    def _index(self):
+        return get_pq_index(self.index_path, code_size=self.code_size, min_train_size=self.min_train_size)
+
+    def _exact_search(self, index, query_embedding, top_k, rows, min_score):
+        return self._rescore_rows(index, query_embedding, top_k, rows, min_score)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        rescore = search_params.get("rescore", self.rescore)
+        if not rescore or not index.trained:
+            return index.search(query_embedding, top_k, mask=mask, min_score=min_score)
+
+        candidates = index.search(query_embedding, top_k * rescore, mask=mask, min_score=-np.inf)
+        return self._rescore(query_embedding, candidates, top_k, min_score)
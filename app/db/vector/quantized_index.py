@@ -0,0 +1,439 @@
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.corpus import current_generation
+from app.db.vector.matrix_index import GrowableArray, index_file_is_current, iter_chunk_embeddings
+from app.utils.similarity import l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_FORMAT_VERSION = 1
+
+
+class QuantizedIndex(ABC):
+    """
+    Base class for indexes that keep compressed codes instead of float32 vectors.
+
+    Until `min_train_size` vectors have been added, rows are kept as float32 and searched
+    exactly; the first training pass fits the quantizer, encodes every row and drops the
+    float copy. Crossing `min_train_size` starts that pass on a background thread, so the
+    sync that crossed it (often on the query path) does not wait for it; searches stay
+    exact until the codes are swapped in. Scores returned by `search` are approximations
+    of cosine similarity; callers that need exact scores rescore the top candidates from
+    the stored embeddings.
+
+    The index is written to `path` only by `save`/`persist`, at ingest end and shutdown.
+
+    Subclasses provide the quantizer through `_new_quantizer` and `_quantizer_from_arrays`.
+    A quantizer implements `train(vectors)`, `encode(vectors)`, `scores(codes, query)`,
+    `to_arrays()` and a `trained` property.
+
+    Attributes:
+        kind (str): Quantizer name recorded in saved files.
+        min_train_size (int): Vectors required before the quantizer is trained automatically.
+        path (Optional[str]): File the index is persisted to, if any.
+        generation (int): Corpus generation read before the last sync, saved in the file header.
+    """
+
+    kind = "quantized"
+
+    def __init__(
+        self,
+        min_train_size: int = 4096,
+        max_train_samples: int = 65536,
+        path: Optional[str] = None,
+        seed: int = 42,
+    ):
+        """
+        Initializes an empty, untrained index.
+
+        Args:
+            min_train_size (int, optional): Auto-train threshold. Defaults to 4096.
+            max_train_samples (int, optional): Sample cap for quantizer training. Defaults to 65536.
+            path (Optional[str], optional): `.npz` file to persist to and load from.
+            seed (int, optional): Random seed for training and sampling. Defaults to 42.
+        """
+        self.min_train_size = min_train_size
+        self.max_train_samples = max_train_samples
+        self.path = path
+        self.seed = seed
+        self.quantizer = self._new_quantizer()
+        self.dim: Optional[int] = None
+        self.last_chunk_id = 0
+        self.generation = 0
+        self._raw: Optional[GrowableArray] = None
+        self._codes: Optional[GrowableArray] = None
+        self._chunk_ids = GrowableArray((), np.int64)
+        self._document_ids = GrowableArray((), np.int64)
+        self._loaded_mtime: Optional[int] = None
+        self._training: Optional[threading.Thread] = None
+        # Bumped whenever the contents are replaced, so a background training can tell
+        self._epoch = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+        # Serializes writers (sync, add, load) so the database can be read without `_lock`
+        self._write_lock = threading.RLock()
+
+    @abstractmethod
+    def _new_quantizer(self):
+        """Returns a fresh, untrained quantizer."""
+        pass
+
+    @abstractmethod
+    def _quantizer_from_arrays(self, arrays):
+        """Rebuilds a trained quantizer from a saved file."""
+        pass
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    @property
+    def trained(self) -> bool:
+        return self.quantizer.trained
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (chunk_ids, document_ids) for all rows, in row order."""
+        with self._lock:
+            return self._chunk_ids.view, self._document_ids.view
+
+    def memory_bytes(self) -> int:
+        """Returns the bytes held by the vector payload (codes, or float rows before training)."""
+        with self._lock:
+            if self.trained:
+                return self._codes.view.nbytes + sum(a.nbytes for a in self.quantizer.to_arrays().values())
+            return self._raw.view.nbytes if self._raw is not None else 0
+
+    # ---------- Building ----------
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Normalizes and appends vectors, encoding them if the quantizer is trained.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors.
+
+        Returns:
+            int: Number of vectors added.
+        """
+        if not len(chunk_ids):
+            return 0
+
+        with self._write_lock:
+            if self.dim is None:
+                first = next((emb for emb in embeddings if emb is not None), None)
+                if first is None:
+                    self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                    return 0
+                with self._lock:
+                    self.dim = len(first)
+                    self._raw = GrowableArray((self.dim,), np.float32)
+
+            keep = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) == self.dim]
+            if len(keep) != len(embeddings):
+                logger.warning(f"Skipping {len(embeddings) - len(keep)} embeddings with dimension != {self.dim}")
+            if not keep:
+                self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                return 0
+
+            vectors = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+            vectors = l2_normalize(vectors)
+            quantizer = self.quantizer
+            codes = quantizer.encode(vectors) if quantizer.trained else None
+
+            with self._lock:
+                if self.quantizer is not quantizer:
+                    # A background training swapped in a quantizer while this batch was encoded
+                    codes = self.quantizer.encode(vectors) if self.trained else None
+                self._chunk_ids.extend(np.asarray([chunk_ids[i] for i in keep], dtype=np.int64))
+                self._document_ids.extend(np.asarray([document_ids[i] for i in keep], dtype=np.int64))
+                self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+                if codes is not None:
+                    self._codes.extend(codes)
+                else:
+                    self._raw.extend(vectors)
+                    if len(self) >= self.min_train_size and self._training is None:
+                        self._training = threading.Thread(
+                            target=self._train_in_background, name=f"{self.kind}-train", daemon=True
+                        )
+                        self._training.start()
+                self._dirty = True
+            return len(keep)
+
+    def train(self, vectors: Optional[np.ndarray] = None) -> None:
+        """
+        (Re)trains the quantizer and re-encodes every row.
+
+        Args:
+            vectors (Optional[np.ndarray], optional): Full-precision vectors for every row, in
+                row order. Required when retraining an index that has already dropped its
+                float copy; defaults to the buffered rows of an untrained index.
+
+        Raises:
+            ValueError: If no full-precision vectors are available.
+        """
+        with self._lock:
+            if vectors is None:
+                if self.trained or self._raw is None:
+                    raise ValueError(f"Retraining a trained {self.kind} index requires the full-precision vectors")
+                vectors = self._raw.view
+            if len(vectors) == 0:
+                return
+
+            quantizer, codes = self._fit(vectors)
+            self._install(quantizer, codes)
+
+    def _fit(self, vectors: np.ndarray) -> Tuple[object, GrowableArray]:
+        """Trains a new quantizer on a sample of `vectors` and encodes them; touches no index state."""
+        sample = vectors
+        if len(vectors) > self.max_train_samples:
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[rng.choice(len(vectors), self.max_train_samples, replace=False)]
+
+        logger.info(f"Training {self.kind} quantizer on {len(sample)} samples")
+        quantizer = self._new_quantizer()
+        quantizer.train(sample)
+        encoded = quantizer.encode(vectors)
+        codes = GrowableArray(encoded.shape[1:], encoded.dtype, capacity=max(64, len(encoded)))
+        codes.extend(encoded)
+        return quantizer, codes
+
+    def _install(self, quantizer, codes: GrowableArray) -> None:
+        """Swaps in a trained quantizer and the codes of every row. Caller holds the lock."""
+        self.quantizer, self._codes, self._raw = quantizer, codes, None
+        self._epoch += 1
+        self._dirty = True
+        logger.info(f"{self.kind} index encoded {len(codes)} vectors at {codes.view[0].nbytes} bytes each")
+
+    def _train_in_background(self) -> None:
+        """
+        Runs the first automatic training off the request path.
+
+        The quantizer is fitted on the rows buffered when the thread started, without the
+        lock; rows added meanwhile are encoded under the lock when the codes are swapped in.
+        The result is dropped if the index was trained or reloaded in between.
+        """
+        try:
+            with self._lock:
+                epoch, vectors = self._epoch, self._raw.view
+            quantizer, codes = self._fit(vectors)
+            with self._lock:
+                if self._epoch != epoch or self.trained:
+                    logger.info(f"Discarding background {self.kind} training; the index changed meanwhile")
+                    return
+                if len(self._raw) > len(vectors):
+                    codes.extend(quantizer.encode(self._raw.view[len(vectors):]))
+                self._install(quantizer, codes)
+        except Exception as e:
+            logger.error(f"Background {self.kind} training failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._training = None
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for a background training started by `add` to finish.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait; None waits indefinitely.
+
+        Returns:
+            bool: True if no training is running any more.
+        """
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+            return not training.is_alive()
+        return True
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Reloads the index file if it was retrained elsewhere, then appends new chunks.
+
+        The database and the file are read without holding the search lock, which is only
+        taken to append each batch, so searches proceed during a large sync. A file saved
+        ahead of the database (see `index_file_is_current`) is not loaded; the index is
+        rebuilt from the `chunks` table instead. The index is not written here; call
+        `persist` at ingest end or shutdown.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of vectors added.
+        """
+        added = 0
+        with self._write_lock:
+            if self.path and os.path.exists(self.path):
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime != self._loaded_mtime:
+                    if index_file_is_current(db, self.path):
+                        self.load(self.path)
+                    else:
+                        self._loaded_mtime = mtime
+            # Read before syncing: the index then holds at least everything up to this generation
+            generation = current_generation(db)
+            for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, self.last_chunk_id, batch_size):
+                added += self.add(chunk_ids, document_ids, embeddings)
+            self.generation = max(self.generation, generation)
+        if added:
+            logger.info(f"{self.kind} index added {added} vectors (total={len(self)})")
+        return added
+
+    # ---------- Search ----------
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores every row from its code and returns the best approximate matches.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+            min_score (float, optional): Minimum approximate similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, approximate similarity) pairs, best first.
+        """
+        with self._lock:
+            trained = self.trained
+            quantizer = self.quantizer
+            payload = self._codes.view if trained else (self._raw.view if self._raw is not None else None)
+            chunk_ids = self._chunk_ids.view
+        if mask is not None and payload is not None:
+            # Rows synced after the mask was built are not covered by it
+            size = min(len(chunk_ids), len(mask))
+            payload, chunk_ids, mask = payload[:size], chunk_ids[:size], mask[:size]
+        if top_k <= 0 or payload is None or len(chunk_ids) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self.dim}")
+        query = l2_normalize(query)
+
+        scores = quantizer.scores(payload, query) if trained else payload @ query
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        return [
+            (int(chunk_ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if np.isfinite(scores[i]) and scores[i] >= min_score
+        ]
+
+    # ---------- Persistence ----------
+
+    def save(self, path: str) -> None:
+        """
+        Persists the quantizer, codes and ids to a `.npz` file (written atomically).
+
+        Args:
+            path (str): Destination file path.
+        """
+        with self._lock:
+            header = {
+                "version": QUANTIZED_FORMAT_VERSION,
+                "kind": self.kind,
+                "dim": self.dim,
+                "last_chunk_id": self.last_chunk_id,
+                "generation": self.generation,
+                "trained": self.trained,
+            }
+            arrays = {
+                "header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                "chunk_ids": self._chunk_ids.view,
+                "document_ids": self._document_ids.view,
+            }
+            if self.trained:
+                arrays["codes"] = self._codes.view
+                arrays.update(self.quantizer.to_arrays())
+            elif self._raw is not None:
+                arrays["raw"] = self._raw.view
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            if path == self.path:
+                self._loaded_mtime = os.stat(path).st_mtime_ns
+                self._dirty = False
+        logger.info(f"Saved {self.kind} index ({len(self)} vectors) to {path}")
+
+    def persist(self) -> bool:
+        """
+        Saves the index to `path` if rows were added or encoded since it was last saved or loaded.
+
+        Returns:
+            bool: True if the file was written.
+        """
+        with self._lock:
+            if not (self.path and self._dirty):
+                return False
+            self.save(self.path)
+            return True
+
+    def load(self, path: str) -> None:
+        """
+        Restores an index written by `save`, replacing the current contents.
+
+        Args:
+            path (str): Source file path.
+
+        Raises:
+            ValueError: If the file format version or quantizer kind does not match.
+        """
+        def restore(values):
+            array = GrowableArray(values.shape[1:], values.dtype, capacity=max(64, len(values)))
+            array.extend(values)
+            return array
+
+        with self._write_lock:
+            # Parse the file before taking the search lock, which is only held for the swap
+            with np.load(path) as data:
+                header = json.loads(data["header"].tobytes().decode("utf-8"))
+                if header.get("version") != QUANTIZED_FORMAT_VERSION:
+                    raise ValueError(f"Unsupported {self.kind} index version: {header.get('version')}")
+                if header.get("kind") != self.kind:
+                    raise ValueError(f"Index file {path} holds a {header.get('kind')} index, expected {self.kind}")
+
+                chunk_ids = restore(data["chunk_ids"])
+                document_ids = restore(data["document_ids"])
+                if header["trained"]:
+                    quantizer = self._quantizer_from_arrays(data)
+                    codes, raw = restore(data["codes"]), None
+                else:
+                    quantizer = self._new_quantizer()
+                    codes, raw = None, restore(data["raw"]) if "raw" in data else None
+            mtime = os.stat(path).st_mtime_ns
+
+            with self._lock:
+                self.dim = header["dim"]
+                self.last_chunk_id = header["last_chunk_id"]
+                self.generation = header.get("generation", 0)
+                self.quantizer, self._codes, self._raw = quantizer, codes, raw
+                self._chunk_ids, self._document_ids = chunk_ids, document_ids
+                self._loaded_mtime = mtime
+                self._epoch += 1
+                self._dirty = False
+        logger.info(f"Loaded {self.kind} index ({len(self)} vectors) from {path}")
@@ -0,0 +1,265 @@
+"""
+Versioned Query-Result Cache
+
+Repeated searches (the same question asked by many users, or a chat turn re-running the
+retrieval of the previous one) are answered from a per-engine LRU cache in front of the
+vector store. Entries are keyed by a SHA-256 of the query embedding and every parameter
+that shapes the result (top_k, filters, knowledge base, min_score, keyword text, search
+parameters and the store it came from).
+
+Each entry is stamped with the corpus generation (see app.db.corpus) it was computed at.
+Storing or deleting chunks bumps the generation in the same transaction, so an entry
+from an older generation is never served; the first lookup that sees a newer generation
+drops every older entry at once. Entries also expire after a TTL, and the cache is
+bounded by an entry count and a byte budget, evicting least recently used entries first.
+Results are stored pickled, which gives exact byte accounting and hands every hit its
+own copy of the result dicts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Entries kept per engine; 0 disables the cache
+DEFAULT_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("QUERY_CACHE_MAX_MB", "64")) * 2 ** 20)
+# Seconds an entry may be served; 0 keeps entries until evicted or stale
+DEFAULT_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+
+def query_cache_key(
+    namespace: str,
+    query_embedding: List[float],
+    top_k: int,
+    knowledge_base_id: Optional[str],
+    filters: Optional[Dict[str, Any]],
+    min_score: float,
+    query_text: Optional[str] = None,
+    search_params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Hashes a query and its parameters into a cache key.
+
+    The embedding is hashed as float32 bytes, so the same query embedded twice maps to
+    the same key; filters and search parameters are hashed as canonical JSON.
+
+    Args:
+        namespace (str): Identifies the store configuration the results come from.
+        query_embedding (List[float]): The query vector.
+        top_k (int): Maximum number of results.
+        knowledge_base_id (Optional[str]): Knowledge base scope.
+        filters (Optional[Dict[str, Any]]): Metadata filters.
+        min_score (float): Minimum similarity threshold.
+        query_text (Optional[str]): Keyword query of hybrid stores.
+        search_params (Optional[Dict[str, Any]]): Index-specific tuning knobs.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(np.asarray(query_embedding, dtype=np.float32).tobytes())
+    params = [
+        namespace,
+        top_k,
+        None if knowledge_base_id is None else str(knowledge_base_id),
+        filters,
+        float(min_score),
+        query_text,
+        search_params or {},
+    ]
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QueryCache:
+    """
+    Thread-safe LRU/TTL cache of query results stamped with a corpus generation.
+
+    Attributes:
+        max_entries (int): Entry limit; 0 disables the cache.
+        max_bytes (int): Byte budget of the pickled results; 0 for unlimited.
+        ttl (float): Seconds an entry may be served; 0 for no expiry.
+        hits (int): Lookups served from the cache.
+        misses (int): Lookups that found no servable entry.
+        evictions (int): Entries evicted to respect the entry limit or byte budget.
+        expirations (int): Entries dropped because their TTL passed.
+        invalidations (int): Entries dropped because the corpus generation moved on.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL,
+    ):
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_entries (int, optional): Entry limit. Defaults to `QUERY_CACHE_SIZE`.
+            max_bytes (int, optional): Byte budget. Defaults to `QUERY_CACHE_MAX_MB`.
+            ttl (float, optional): Entry lifetime in seconds. Defaults to `QUERY_CACHE_TTL`.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._bytes = 0
+        # key -> (generation, stored_at, pickled results)
+        self._entries: "OrderedDict[str, Tuple[int, float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything."""
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        """Returns the number of cached entries."""
+        return len(self._entries)
+
+    def get(self, key: str, generation: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the cached results of a query if they are still valid.
+
+        Args:
+            key (str): Cache key from `query_cache_key`.
+            generation (int): The current corpus generation.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: A fresh copy of the results, or None on a miss.
+        """
+        with self._lock:
+            self._advance(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != generation:
+                # The caller read an older generation than the entry's; it is not stale, just newer
+                entry = None
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            payload = entry[2]
+        return pickle.loads(payload)
+
+    def put(self, key: str, generation: int, results: List[Dict[str, Any]]) -> None:
+        """
+        Caches the results of a query computed at a corpus generation.
+
+        Results of an older generation than the newest one seen are not cached, and a
+        result larger than the whole byte budget is skipped.
+
+        Args:
+            key (str): Cache key from `query_cache_key`.
+            generation (int): The corpus generation read before the query ran.
+            results (List[Dict[str, Any]]): The results to cache.
+        """
+        if not self.enabled:
+            return
+        payload = pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes and len(payload) > self.max_bytes:
+            logger.debug(f"Not caching a {len(payload)}-byte result (budget {self.max_bytes} bytes)")
+            return
+
+        with self._lock:
+            self._advance(generation)
+            if generation < self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (generation, time.monotonic(), payload)
+            self._bytes += len(payload)
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        Returns:
+            Dict[str, Any]: hits, misses, hit ratio, evictions, expirations, invalidations,
+                entries, bytes and the configured limits.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "generation": self.generation,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _advance(self, generation: int) -> None:
+        """Drops every entry once a newer corpus generation is seen. Caller holds the lock."""
+        if generation <= self.generation:
+            return
+        if self._entries:
+            logger.debug(f"Corpus generation {self.generation} -> {generation}; dropping {len(self._entries)} cached queries")
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        self.generation = generation
+
+    def _drop(self, key: str) -> None:
+        """Removes one entry. Caller holds the lock."""
+        self._bytes -= len(self._entries.pop(key)[2])
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(db_session: Session) -> QueryCache:
+    """
+    Returns the process-wide QueryCache for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        QueryCache: The shared cache of that database's query results.
+    """
+    engine = db_session.get_bind()
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = QueryCache()
+            _caches[engine] = cache
+        return cache
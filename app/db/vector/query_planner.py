@@ -0,0 +1,83 @@
+import math
+from dataclasses import asdict, dataclass
+from typing import Any, Dict
+
+# Filters matching at most this many rows are brute-forced over the matching subset
+PREFILTER_MAX_ROWS = 4096
+# Extra candidates fetched by a post-filtered search beyond what selectivity predicts
+POSTFILTER_OVERFETCH = 2.0
+
+
+@dataclass
+class QueryPlan:
+    """
+    Strategy chosen for one vector query.
+
+    Strategies:
+        - "scan": no filters; the index is searched directly.
+        - "empty": the filters match no indexed rows.
+        - "prefilter": the filters are selective; only the matching rows are scored.
+        - "postfilter": the filters are broad; the index is searched unfiltered for
+          `fetch_k` candidates and non-matching hits are dropped.
+        - "masked_scan": over-fetching would cover the whole index, so the index is
+          searched once with the filter mask applied to its scores.
+
+    Attributes:
+        strategy (str): One of the strategies above.
+        total_rows (int): Rows in the index.
+        estimated_matches (int): Rows matching the filters, from the index statistics.
+        top_k (int): Results requested.
+        fetch_k (int): Candidates requested from the index by a post-filtered search.
+        fallback (bool): True if a post-filtered search came up short and was re-run masked.
+    """
+
+    strategy: str
+    total_rows: int
+    estimated_matches: int
+    top_k: int
+    fetch_k: int = 0
+    fallback: bool = False
+
+    @property
+    def selectivity(self) -> float:
+        """Fraction of rows matching the filters."""
+        return self.estimated_matches / self.total_rows if self.total_rows else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Returns the plan as a JSON-serializable dict for debug output."""
+        return {**asdict(self), "selectivity": round(self.selectivity, 6)}
+
+
+def plan_query(
+    total_rows: int,
+    estimated_matches: int,
+    top_k: int,
+    filtered: bool,
+    prefilter_max_rows: int = PREFILTER_MAX_ROWS,
+    overfetch: float = POSTFILTER_OVERFETCH,
+) -> QueryPlan:
+    """
+    Picks a search strategy from the estimated filter cardinality.
+
+    Args:
+        total_rows (int): Rows in the index.
+        estimated_matches (int): Rows estimated to match the filters.
+        top_k (int): Results requested.
+        filtered (bool): Whether any filter (knowledge base or metadata) applies.
+        prefilter_max_rows (int, optional): Largest match count brute-forced over the subset.
+        overfetch (float, optional): Post-filter over-fetch factor. Defaults to 2.0.
+
+    Returns:
+        QueryPlan: The chosen plan.
+    """
+    if not filtered:
+        return QueryPlan("scan", total_rows, total_rows, top_k)
+    if estimated_matches == 0:
+        return QueryPlan("empty", total_rows, 0, top_k)
+    if estimated_matches <= prefilter_max_rows:
+        return QueryPlan("prefilter", total_rows, estimated_matches, top_k)
+
+    fetch_k = math.ceil(top_k * total_rows / estimated_matches * overfetch)
+    if fetch_k >= total_rows:
+        return QueryPlan("masked_scan", total_rows, estimated_matches, top_k)
+    return QueryPlan("postfilter", total_rows, estimated_matches, top_k, fetch_k=fetch_k)
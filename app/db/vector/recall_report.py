@@ -0,0 +1,83 @@
+"""
+Recall@k of approximate vector store strategies against exact search.
+
+Query vectors are sampled from the stored chunk embeddings; each strategy's top-k is
+compared with brute-force cosine search over the same rows:
+
+    python -m app.db.vector.recall_report --strategies int8 pq ivf hnsw --k 10
+"""
+
+import argparse
+import logging
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.vector.matrix_index import MatrixIndex
+from app.db.vector.vector_store_factory import get_vector_store
+from app.utils.evaluation import mean_recall_at_k
+
+logger = logging.getLogger(__name__)
+
+
+def report_recall(
+    db: Session,
+    strategies: List[str],
+    k: int = 10,
+    n_queries: int = 100,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Measures mean recall@k of each strategy against exact search.
+
+    Args:
+        db (Session): SQLAlchemy session holding the chunks.
+        strategies (List[str]): Vector store factory strategies to evaluate.
+        k (int, optional): Cut-off. Defaults to 10.
+        n_queries (int, optional): Number of stored embeddings sampled as queries. Defaults to 100.
+        seed (int, optional): Random seed for sampling. Defaults to 0.
+
+    Returns:
+        Dict[str, float]: Mean recall@k per strategy.
+    """
+    exact = MatrixIndex()
+    exact.sync(db)
+    matrix, _, _ = exact.snapshot()
+    if len(matrix) == 0:
+        logger.warning("No embeddings stored; nothing to evaluate")
+        return {}
+
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.choice(len(matrix), min(n_queries, len(matrix)), replace=False)].tolist()
+
+    report = {}
+    for strategy in strategies:
+        store = get_vector_store(strategy, db)
+        report[strategy] = mean_recall_at_k(
+            lambda q, top_k: [(r["chunk_id"], r["similarity"]) for r in store.query(q, top_k=top_k, min_score=-1.0)],
+            lambda q, top_k: exact.search(q, top_k, min_score=-1.0),
+            queries,
+            k,
+        )
+        logger.info(f"recall@{k} | strategy={strategy} | {report[strategy]:.4f}")
+    return report
+
+
+if __name__ == "__main__":
+    from app.db.database import SessionLocal
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Report recall@k of vector store strategies against exact search.")
+    parser.add_argument("--strategies", nargs="+", default=["int8"], help="Factory strategies to evaluate.")
+    parser.add_argument("--k", type=int, default=10, help="Recall cut-off.")
+    parser.add_argument("--queries", type=int, default=100, help="Number of sampled query vectors.")
+    args = parser.parse_args()
+
+    setup_logging()
+    db = SessionLocal()
+    try:
+        for strategy, recall in report_recall(db, args.strategies, k=args.k, n_queries=args.queries).items():
+            print(f"{strategy}\trecall@{args.k}={recall:.4f}")
+    finally:
+        db.close()
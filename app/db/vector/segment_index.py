@@ -0,0 +1,382 @@
+import json
+import logging
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.models import Chunk
+from app.db.vector.matrix_index import iter_chunk_embeddings
+from app.utils.similarity import cosine_similarity_matrix, l2_normalize, top_k_indices
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms fall back to in-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_DIR = os.getenv("VECTOR_SEGMENT_DIR", "rag_segments")
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+class SegmentIndex:
+    """
+    Append-only embedding segments stored as `.npy` files and opened with `np.memmap`.
+
+    Each segment is a preallocated `(capacity, dim)` float32 `.npy` file of pre-normalized
+    vectors plus a `(capacity, 2)` int64 file of `(chunk_id, document_id)` pairs. A small
+    JSON manifest records how many rows of each segment are filled and the highest chunk
+    id written. Readers map the files read-only, so every worker process on a host shares
+    a single page-cache copy; cold start maps files instead of re-reading the `chunks` table.
+
+    Appends are serialized across processes with an advisory lock on the manifest. Vector
+    data is flushed before the manifest is atomically replaced, so readers never see rows
+    that are not fully written. Within a process, appends update the row count of the
+    last segment in place, so readers take a snapshot of `(maps, rows)` per segment under
+    the lock and scan that.
+
+    Attributes:
+        directory (str): Directory holding the manifest and segment files.
+        segment_capacity (int): Rows per segment file.
+    """
+
+    def __init__(self, directory: str = DEFAULT_SEGMENT_DIR, segment_capacity: int = 65536):
+        """
+        Initializes the index over a segment directory, creating it if needed.
+
+        Args:
+            directory (str, optional): Directory for segment files. Defaults to `VECTOR_SEGMENT_DIR`.
+            segment_capacity (int, optional): Rows per segment file. Defaults to 65536.
+        """
+        self.directory = directory
+        self.segment_capacity = segment_capacity
+        os.makedirs(directory, exist_ok=True)
+
+        self._manifest: Dict = {"version": MANIFEST_VERSION, "dim": None, "last_chunk_id": 0, "segments": []}
+        self._manifest_mtime: Optional[int] = None
+        self._maps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._row_ids: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._manifest["dim"]
+
+    @property
+    def last_chunk_id(self) -> int:
+        return self._manifest["last_chunk_id"]
+
+    def __len__(self) -> int:
+        return sum(segment["rows"] for segment in self._manifest["segments"])
+
+    # ---------- Manifest & mapping ----------
+
+    def refresh(self) -> bool:
+        """
+        Reloads the manifest if another process (or thread) has changed it.
+
+        Returns:
+            bool: True if a new manifest was loaded.
+        """
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return False
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported segment manifest version: {manifest.get('version')}")
+            self._manifest = manifest
+            self._manifest_mtime = mtime
+            self._row_ids = None
+            logger.debug(f"Loaded segment manifest with {len(manifest['segments'])} segments, {len(self)} rows")
+            return True
+
+    def _write_manifest(self) -> None:
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+        self._row_ids = None
+
+    def _segments(self) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+        """Returns (vectors, ids, rows) of every segment as of now, for scanning without the lock."""
+        with self._lock:
+            return [self._mapped(segment) + (segment["rows"],) for segment in self._manifest["segments"]]
+
+    def _mapped(self, segment: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        name = segment["file"]
+        if name not in self._maps:
+            vectors = np.load(os.path.join(self.directory, name), mmap_mode="r")
+            ids = np.load(os.path.join(self.directory, segment["ids_file"]), mmap_mode="r")
+            self._maps[name] = (vectors, ids)
+        return self._maps[name]
+
+    @contextmanager
+    def _writer_lock(self):
+        with self._lock:
+            lock_path = os.path.join(self.directory, ".lock")
+            with open(lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------- Writes ----------
+
+    def _new_segment(self) -> Dict:
+        number = len(self._manifest["segments"])
+        segment = {
+            "file": f"segment_{number:05d}.npy",
+            "ids_file": f"segment_{number:05d}.ids.npy",
+            "rows": 0,
+            "capacity": self.segment_capacity,
+        }
+        np.lib.format.open_memmap(
+            os.path.join(self.directory, segment["file"]), mode="w+",
+            dtype=np.float32, shape=(self.segment_capacity, self.dim),
+        ).flush()
+        np.lib.format.open_memmap(
+            os.path.join(self.directory, segment["ids_file"]), mode="w+",
+            dtype=np.int64, shape=(self.segment_capacity, 2),
+        ).flush()
+        self._manifest["segments"].append(segment)
+        logger.info(f"Created embedding segment {segment['file']} (capacity={self.segment_capacity})")
+        return segment
+
+    def _append_locked(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[Optional[np.ndarray]], np.ndarray],
+    ) -> int:
+        if self._manifest["dim"] is None:
+            first = next((emb for emb in embeddings if emb is not None), None)
+            if first is None:
+                return 0
+            self._manifest["dim"] = len(first)
+
+        keep = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) == self.dim]
+        if len(keep) != len(embeddings):
+            logger.warning(f"Skipping {len(embeddings) - len(keep)} embeddings with dimension != {self.dim}")
+        if not keep:
+            return 0
+
+        block = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+        block = l2_normalize(block)
+        pairs = np.asarray([(chunk_ids[i], document_ids[i]) for i in keep], dtype=np.int64)
+
+        written = 0
+        while written < len(block):
+            segments = self._manifest["segments"]
+            segment = segments[-1] if segments and segments[-1]["rows"] < segments[-1]["capacity"] else self._new_segment()
+            start = segment["rows"]
+            count = min(segment["capacity"] - start, len(block) - written)
+
+            vectors = np.load(os.path.join(self.directory, segment["file"]), mmap_mode="r+")
+            ids = np.load(os.path.join(self.directory, segment["ids_file"]), mmap_mode="r+")
+            vectors[start:start + count] = block[written:written + count]
+            ids[start:start + count] = pairs[written:written + count]
+            vectors.flush()
+            ids.flush()
+            del vectors, ids
+
+            segment["rows"] = start + count
+            written += count
+
+        self._manifest["last_chunk_id"] = max(self.last_chunk_id, int(pairs[-1, 0]))
+        self._write_manifest()
+        return written
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Appends chunks written to the database since the manifest's `last_chunk_id`.
+
+        Cheap when nothing changed: one manifest `stat` and one `MAX(id)` lookup.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of rows appended.
+        """
+        self.refresh()
+        max_id = db.query(func.max(Chunk.id)).scalar() or 0
+        if max_id <= self.last_chunk_id:
+            return 0
+
+        added = 0
+        with self._writer_lock():
+            self.refresh()
+            for chunk_ids, document_ids, embeddings in iter_chunk_embeddings(db, self.last_chunk_id, batch_size):
+                added += self._append_locked(chunk_ids, document_ids, embeddings)
+                # Advance past rows without a usable embedding too
+                if self.last_chunk_id < chunk_ids[-1]:
+                    self._manifest["last_chunk_id"] = chunk_ids[-1]
+                    self._write_manifest()
+        if added:
+            logger.info(f"Appended {added} rows to embedding segments (total={len(self)})")
+        return added
+
+    # ---------- Reads ----------
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the chunk ids and document ids of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk_ids, document_ids).
+        """
+        with self._lock:
+            if self._row_ids is None:
+                parts = [ids[:rows] for _, ids, rows in self._segments()]
+                pairs = np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int64)
+                self._row_ids = (pairs[:, 0], pairs[:, 1])
+            return self._row_ids
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scans every mapped segment with a vectorized dot product and merges per-segment top-k.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over all rows, in row order.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        segments = self._segments()
+        if top_k <= 0 or not segments:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {self.dim}")
+        query = l2_normalize(query)
+
+        candidate_ids, candidate_scores = [], []
+        offset = 0
+        for vectors, ids, rows in segments:
+            if mask is not None:
+                # Rows synced after the mask was built are not covered by it
+                rows = min(rows, len(mask) - offset)
+                if rows <= 0:
+                    break
+            scores = vectors[:rows] @ query
+            if mask is not None:
+                scores = np.where(mask[offset:offset + rows], scores, -np.inf)
+            best = np.sort(top_k_indices(scores, top_k))
+            candidate_ids.append(ids[best, 0])
+            candidate_scores.append(scores[best])
+            offset += rows
+        if not candidate_ids:
+            return []
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        order = top_k_indices(scores, top_k)
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in order
+            if np.isfinite(scores[i]) and scores[i] >= min_score
+        ]
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        rows: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores only the given rows, for filters selective enough to brute-force.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            rows (np.ndarray): Ascending row positions, counted across segments in order.
+            top_k (int): Maximum number of results.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        segments = self._segments()
+        if top_k <= 0 or len(rows) == 0 or not segments:
+            return []
+
+        candidate_ids, blocks = [], []
+        offset = 0
+        for vectors, ids, size in segments:
+            local = rows[(rows >= offset) & (rows < offset + size)] - offset
+            if len(local):
+                candidate_ids.append(ids[local, 0])
+                blocks.append(vectors[local])
+            offset += size
+        if not blocks:
+            return []
+
+        ids = np.concatenate(candidate_ids)
+        scores = cosine_similarity_matrix(query_embedding, np.concatenate(blocks))
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] >= min_score
+        ]
+
+
+# engine -> {absolute directory: index}
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_segment_index(db_session: Session, directory: str = DEFAULT_SEGMENT_DIR, **kwargs) -> SegmentIndex:
+    """
+    Returns the process-wide SegmentIndex for a directory and the engine behind a session.
+
+    Keying by engine too keeps two databases that point at the same directory from
+    sharing one in-memory view of it.
+
+    Args:
+        db_session (Session): Any session bound to the database the segments mirror.
+        directory (str, optional): Segment directory. Defaults to `VECTOR_SEGMENT_DIR`.
+        **kwargs: Passed to SegmentIndex on first creation.
+
+    Returns:
+        SegmentIndex: The shared index for that engine and directory.
+    """
+    engine = db_session.get_bind()
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        indexes = _indexes.setdefault(engine, {})
+        if key not in indexes:
+            indexes[key] = SegmentIndex(directory, **kwargs)
+        return indexes[key]
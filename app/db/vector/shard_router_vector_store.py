@@ -0,0 +1,311 @@
+"""
+Scatter-Gather Shard Router
+
+When one node cannot hold the whole corpus, the corpus is split across shard servers:
+each runs this app against the shared database with its own document slice
+(`SHARD_COUNT` / `SHARD_INDEX`, see app.db.shard_slice), so its in-memory indexes only
+load that slice. A router node sends the query embedding to every shard's
+`/api/shard/search` concurrently and merges the per-shard top-k into the global top-k
+with a bounded heap. The slices are disjoint, so the merged list is the exact top-k of
+the shards that answered.
+
+Each shard must answer within the per-shard timeout. Shards that time out, are
+unreachable or return an error are left out of the merge and reported in `last_plan`;
+with `allow_partial` off, or when no shard answers, the query fails instead.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.db.vector.base_vector_store import BaseVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated base URLs of the shard servers, e.g. "http://shard-0:8000,http://shard-1:8000"
+DEFAULT_SHARD_URLS = os.getenv("SHARD_URLS", "")
+SHARD_SEARCH_PATH = "/api/shard/search"
+# Seconds each shard may take to answer before the merge proceeds without it
+DEFAULT_SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "2.0"))
+DEFAULT_ALLOW_PARTIAL = os.getenv("SHARD_ALLOW_PARTIAL", "true").lower() in ("1", "true", "yes")
+ROUTER_WORKERS = int(os.getenv("SHARD_ROUTER_WORKERS", "16"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+
+def _router_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide thread pool that sends shard requests."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ROUTER_WORKERS, thread_name_prefix="shard-router")
+        return _executor
+
+
+def _http_client() -> httpx.Client:
+    """Returns the process-wide HTTP client, which keeps connections to the shards open."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client()
+        return _client
+
+
+def parse_shard_urls(value: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Normalizes shard base URLs given as a list or a comma-separated string.
+
+    Args:
+        value (Union[str, Sequence[str]]): The shard URLs.
+
+    Returns:
+        List[str]: Non-empty URLs without trailing slashes, in the given order.
+    """
+    urls = value.split(",") if isinstance(value, str) else value
+    return [url.strip().rstrip("/") for url in urls if url and url.strip()]
+
+
+def merge_top_k(hit_lists: Sequence[Sequence[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Merges per-shard results into the overall top-k with a heap of at most `top_k` hits.
+
+    Args:
+        hit_lists (Sequence[Sequence[Dict[str, Any]]]): Result dicts of each shard, each with
+            `chunk_id` and `similarity`.
+        top_k (int): Maximum number of hits returned.
+
+    Returns:
+        List[Dict[str, Any]]: The best hits, highest similarity first (ties by chunk id).
+            A chunk returned by several shards is kept once.
+    """
+    if top_k <= 0:
+        return []
+    heap = []
+    seen = set()
+    for hits in hit_lists:
+        for hit in hits:
+            if hit["chunk_id"] in seen:
+                continue
+            seen.add(hit["chunk_id"])
+            # Min-heap on (similarity, -chunk_id): the root is the worst hit kept so far
+            entry = (hit["similarity"], -hit["chunk_id"], hit)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+    return [hit for _, _, hit in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class ShardRouterVectorStore(BaseVectorStore):
+    """
+    Vector store that fans queries out to shard servers and merges their results.
+
+    The router holds no vectors. Writes go to the shared database through the storage
+    service, and each shard picks up its slice on its next query.
+
+    Attributes:
+        last_plan (Optional[Dict[str, Any]]): For the most recent query, the shards asked,
+            those that answered, those that failed (with the reason) and whether the
+            results are partial.
+    """
+
+    def __init__(
+        self,
+        db_session: Optional[Session] = None,
+        shard_urls: Optional[Union[str, Sequence[str]]] = None,
+        timeout: float = DEFAULT_SHARD_TIMEOUT,
+        allow_partial: bool = DEFAULT_ALLOW_PARTIAL,
+    ):
+        """
+        Initializes the router.
+
+        Args:
+            db_session (Optional[Session], optional): Unused; accepted so the factory can
+                build every strategy the same way. The shards read the database.
+            shard_urls (Optional[Union[str, Sequence[str]]], optional): Base URLs of the shard
+                servers. Defaults to `SHARD_URLS`.
+            timeout (float, optional): Seconds each shard may take. Defaults to `SHARD_TIMEOUT`.
+            allow_partial (bool, optional): Whether to answer from the shards that responded
+                when others fail. Defaults to `SHARD_ALLOW_PARTIAL`.
+
+        Raises:
+            ValueError: If no shard URL is configured.
+        """
+        self.shard_urls = parse_shard_urls(DEFAULT_SHARD_URLS if shard_urls is None else shard_urls)
+        if not self.shard_urls:
+            raise ValueError("ShardRouterVectorStore needs at least one shard URL (set SHARD_URLS)")
+        self.timeout = timeout
+        self.allow_partial = allow_partial
+        self.last_plan = None
+
+    def store_chunks(
+        self,
+        document_id: int,
+        chunks: List[Union[str, Dict[str, Any]]],
+        embeddings: List[List[float]],
+    ) -> None:
+        """
+        Not supported: chunks are written to the shared database, not through the router.
+
+        Raises:
+            NotImplementedError: Always.
+        """
+        raise NotImplementedError("ShardRouterVectorStore is read-only; store chunks through the storage service")
+
+    def query(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        knowledge_base_id: Optional[str] = None,
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        min_score: float = 0.0,
+        query_text: Optional[str] = None,
+        **search_params: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Queries every shard and returns the merged top-k.
+
+        Args:
+            query_embedding (List[float]): The embedding vector of the query.
+            top_k (int, optional): The maximum number of results. Defaults to 5.
+            knowledge_base_id (Optional[str], optional): Restricts the search to a knowledge base.
+            filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters.
+            min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
+            query_text (Optional[str], optional): Ignored; shards run vector search only.
+            **search_params: Index-specific tuning knobs forwarded to the shards.
+
+        Returns:
+            List[Dict[str, Any]]: Matched chunks with metadata and similarity scores.
+        """
+        return self.query_batch(
+            query_embeddings=[query_embedding],
+            top_k=top_k,
+            knowledge_base_id=knowledge_base_id,
+            filters=filters,
+            min_score=min_score,
+            **search_params,
+        )[0]
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        knowledge_base_id: Optional[str] = None,
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        min_score: float = 0.0,
+        query_texts: Optional[List[Optional[str]]] = None,
+        **search_params: Any,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Sends a batch of queries to every shard in one request each and merges per query.
+
+        Args:
+            query_embeddings (List[List[float]]): The embedding vectors of the queries.
+            top_k (int, optional): The maximum number of results per query. Defaults to 5.
+            knowledge_base_id (Optional[str], optional): Restricts the search to a knowledge base.
+            filters (Optional[Dict[str, Union[str, int]]], optional): Metadata filters.
+            min_score (float, optional): Minimum similarity score threshold. Defaults to 0.0.
+            query_texts (Optional[List[Optional[str]]], optional): Ignored; shards run vector search only.
+            **search_params: Index-specific tuning knobs forwarded to the shards.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The merged matches of each query, in input order.
+
+        Raises:
+            RuntimeError: If no shard answered, or one failed and partial results are not allowed.
+        """
+        if not query_embeddings:
+            return []
+
+        payload = {
+            "query_embeddings": [[float(value) for value in embedding] for embedding in query_embeddings],
+            "top_k": top_k,
+            "knowledge_base_id": knowledge_base_id,
+            "filters": filters,
+            "min_score": min_score,
+            "search_params": search_params,
+        }
+        responses, failures = self._scatter(payload, len(query_embeddings))
+
+        self.last_plan = {
+            "strategy": "shard_router",
+            "shards": len(self.shard_urls),
+            "answered": [url for url in self.shard_urls if url in responses],
+            "failed": failures,
+            "partial": bool(failures),
+        }
+        if failures:
+            logger.warning(f"{len(failures)}/{len(self.shard_urls)} shards failed: {failures}")
+            if not responses or not self.allow_partial:
+                raise RuntimeError(f"Shard search failed on {len(failures)}/{len(self.shard_urls)} shards: {failures}")
+
+        return [
+            merge_top_k([responses[url][position] for url in responses], top_k)
+            for position in range(len(query_embeddings))
+        ]
+
+    def _scatter(self, payload: Dict[str, Any], n_queries: int):
+        """
+        Sends the payload to all shards concurrently and waits at most `timeout` seconds.
+
+        A shard still running at the deadline is recorded as timed out; its request is
+        abandoned (the HTTP timeout bounds how long it lingers in the pool).
+
+        Args:
+            payload (Dict[str, Any]): JSON body of the shard search request.
+            n_queries (int): Number of queries in the payload; each shard must answer all of them.
+
+        Returns:
+            Tuple[Dict[str, List[List[Dict[str, Any]]]], Dict[str, str]]: Results of each shard
+                that answered, and the failure reason of each shard that did not.
+        """
+        executor = _router_executor()
+        started = time.perf_counter()
+        futures = {url: executor.submit(self._search_shard, url, payload, n_queries) for url in self.shard_urls}
+        done, _ = wait(futures.values(), timeout=self.timeout)
+
+        responses, failures = {}, {}
+        for url, future in futures.items():
+            if future not in done:
+                failures[url] = f"timed out after {self.timeout}s"
+                continue
+            try:
+                responses[url] = future.result()
+            except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+                failures[url] = f"{type(e).__name__}: {e}"
+        logger.debug(f"Shard fan-out to {len(futures)} shards finished in {time.perf_counter() - started:.4f}s")
+        return responses, failures
+
+    def _search_shard(self, url: str, payload: Dict[str, Any], n_queries: int) -> List[List[Dict[str, Any]]]:
+        """
+        Runs the shard search request against one shard server.
+
+        Args:
+            url (str): Base URL of the shard server.
+            payload (Dict[str, Any]): JSON body of the request.
+            n_queries (int): Number of result lists expected.
+
+        Returns:
+            List[List[Dict[str, Any]]]: The shard's hits for each query.
+
+        Raises:
+            httpx.HTTPError: If the request fails or the shard answers with an error status.
+            ValueError: If the response is not a result list per query.
+        """
+        response = _http_client().post(url + SHARD_SEARCH_PATH, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        results = body["results"]
+        if len(results) != n_queries:
+            raise ValueError(f"expected results for {n_queries} queries, got {len(results)}")
+        logger.debug(f"Shard {url} ({body.get('shard')}) returned {sum(len(hits) for hits in results)} hits")
+        return results
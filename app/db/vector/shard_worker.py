@@ -0,0 +1,93 @@
+"""
+Shard Scoring Workers
+
+Functions run by the ShardedIndex process pool. Pool processes are spawned, so this
+module only depends on NumPy and the similarity helpers: a worker imports it once and
+then attaches to the index's shared-memory matrix by name, without copying vectors.
+"""
+
+from collections import OrderedDict
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.similarity import top_k_indices
+
+# Shared-memory blocks this worker is attached to, least recently used first. Blocks a
+# grown index has retired stay mapped here until they are evicted.
+_attached: "OrderedDict[str, SharedMemory]" = OrderedDict()
+MAX_ATTACHED = 4
+
+
+def _matrix(name: str, capacity: int, dim: int) -> np.ndarray:
+    """Returns a float32 view of a shared matrix, attaching on first use."""
+    shm = _attached.get(name)
+    if shm is None:
+        while len(_attached) >= MAX_ATTACHED:
+            _attached.popitem(last=False)[1].close()
+        # Spawned workers share the owner's resource tracker, which already tracks the block
+        shm = _attached[name] = SharedMemory(name=name)
+    _attached.move_to_end(name)
+    return np.ndarray((capacity, dim), dtype=np.float32, buffer=shm.buf)
+
+
+def score_rows(
+    matrix: np.ndarray,
+    start: int,
+    queries: np.ndarray,
+    top_k: int,
+    mask: Optional[np.ndarray] = None,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Scores a block of rows against normalized queries and keeps each query's top-k.
+
+    Args:
+        matrix (np.ndarray): Normalized rows of the shard.
+        start (int): Global position of the shard's first row.
+        queries (np.ndarray): Normalized query matrix of shape (n_queries, dim).
+        top_k (int): Candidates kept per query.
+        mask (Optional[np.ndarray]): Boolean array over the shard's rows; False rows are excluded.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: Per query, the global row positions and scores
+            of its candidates, best first (ties by position).
+    """
+    scores = queries @ matrix.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    results = []
+    for row_scores in scores:
+        best = top_k_indices(row_scores, top_k)
+        best = best[np.isfinite(row_scores[best])]
+        results.append((best + start, row_scores[best]))
+    return results
+
+
+def score_shard(
+    name: str,
+    capacity: int,
+    dim: int,
+    start: int,
+    end: int,
+    queries: np.ndarray,
+    top_k: int,
+    mask: Optional[np.ndarray] = None,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Scores rows `start:end` of a shared matrix; runs in a pool process.
+
+    Args:
+        name (str): Name of the shared-memory block holding the matrix.
+        capacity (int): Rows allocated in the block.
+        dim (int): Embedding dimension.
+        start (int): First row of the shard.
+        end (int): Row after the last row of the shard.
+        queries (np.ndarray): Normalized query matrix of shape (n_queries, dim).
+        top_k (int): Candidates kept per query.
+        mask (Optional[np.ndarray]): Boolean array over the shard's rows.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: As for `score_rows`.
+    """
+    return score_rows(_matrix(name, capacity, dim)[start:end], start, queries, top_k, mask)
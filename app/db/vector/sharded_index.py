@@ -0,0 +1,467 @@
+import atexit
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.vector.matrix_index import GrowableArray, iter_chunk_embeddings
+from app.db.vector.shard_worker import score_rows, score_shard
+from app.utils.similarity import l2_normalize, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Worker processes scoring shards; 0 scores every shard in the calling process
+DEFAULT_SHARD_WORKERS = int(os.getenv("VECTOR_SHARD_WORKERS", str(os.cpu_count() or 1)))
+# Row shards per search (defaults to one per worker)
+DEFAULT_SHARDS = int(os.getenv("VECTOR_SHARDS", "0")) or max(1, DEFAULT_SHARD_WORKERS)
+# Smallest index searched in the pool; below it, IPC costs more than the scoring
+DEFAULT_PARALLEL_MIN_ROWS = int(os.getenv("VECTOR_SHARD_MIN_ROWS", "50000"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _shard_executor(workers: int) -> ProcessPoolExecutor:
+    """Returns the process-wide pool that scores shards, (re)starting it with `workers` processes if needed."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers < workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # Spawned (not forked) so workers never inherit locks held by the server's threads
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+            logger.info(f"Started shard scoring pool with {workers} processes")
+        return _executor
+
+
+def _reset_executor() -> None:
+    """Drops a broken pool so the next parallel search starts a fresh one."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor, _executor_workers = None, 0
+
+
+@atexit.register
+def shutdown_shard_executor() -> None:
+    """Stops the shard scoring pool (registered to run at interpreter exit)."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+        _executor, _executor_workers = None, 0
+
+
+def _free_shared_memory(shm: SharedMemory) -> None:
+    try:
+        shm.close()
+    except BufferError:  # pragma: no cover - a view outlived its search
+        logger.debug(f"Shared memory {shm.name} still has views; unlinking without closing")
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class _SharedBlock:
+    """A float32 `(capacity, dim)` matrix in a shared-memory block, unlinked once freed or collected."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.capacity = capacity
+        self.dim = dim
+        self.shm = SharedMemory(create=True, size=max(1, capacity * dim * 4))
+        self.matrix = np.ndarray((capacity, dim), dtype=np.float32, buffer=self.shm.buf)
+        self.readers = 0
+        self.retired = False
+        self._finalizer = weakref.finalize(self, _free_shared_memory, self.shm)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def free(self) -> None:
+        self.matrix = None
+        self._finalizer()
+
+
+class ShardedIndex:
+    """
+    Brute-force index whose matrix lives in shared memory and is scored by a process pool.
+
+    Rows are pre-normalized float32 vectors in a `multiprocessing.shared_memory` block
+    (grown by doubling into a new block). A search splits the rows into `shards`
+    contiguous ranges and submits one task per shard to a persistent, process-wide pool;
+    each worker attaches to the block by name (no vectors are copied or pickled), scores
+    its range with one matrix product and returns its per-query top-k. The per-shard
+    lists are already sorted, so they are combined with a heap merge. NumPy releases the
+    GIL only inside BLAS, so separate processes are what makes scoring scale with cores.
+
+    Indexes smaller than `parallel_min_rows`, and `search_rows` (a selective filter's few
+    rows), are scored in the calling process, where inter-process overhead would dominate.
+
+    Rows are kept in ascending chunk id order, and the merge breaks ties by row position,
+    so results match a single-matrix scan.
+
+    Attributes:
+        shards (int): Row ranges per search.
+        workers (int): Pool processes; 0 scores every shard in the calling process.
+        parallel_min_rows (int): Smallest index searched in the pool.
+        dim (Optional[int]): Embedding dimension, fixed by the first row added.
+        last_chunk_id (int): Highest chunk id loaded so far, used for incremental sync.
+    """
+
+    def __init__(
+        self,
+        shards: int = DEFAULT_SHARDS,
+        workers: int = DEFAULT_SHARD_WORKERS,
+        parallel_min_rows: int = DEFAULT_PARALLEL_MIN_ROWS,
+        initial_capacity: int = 1024,
+    ):
+        """
+        Initializes an empty index.
+
+        Args:
+            shards (int, optional): Row ranges per search. Defaults to `VECTOR_SHARDS` (one per worker).
+            workers (int, optional): Pool processes. Defaults to `VECTOR_SHARD_WORKERS` (the CPU count).
+            parallel_min_rows (int, optional): Smallest index searched in the pool. Defaults to `VECTOR_SHARD_MIN_ROWS`.
+            initial_capacity (int, optional): Rows allocated by the first block. Defaults to 1024.
+        """
+        self.shards = max(1, shards)
+        self.workers = max(0, workers)
+        self.parallel_min_rows = parallel_min_rows
+        self.dim: Optional[int] = None
+        self.last_chunk_id = 0
+        self._initial_capacity = max(1, initial_capacity)
+        self._block: Optional[_SharedBlock] = None
+        self._size = 0
+        self._chunk_ids = GrowableArray((), np.int64)
+        self._document_ids = GrowableArray((), np.int64)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ---------- Writes ----------
+
+    def _grow(self, required: int) -> None:
+        """Moves the rows into a larger block, retiring the old one. Caller holds `_lock`."""
+        old = self._block
+        capacity = old.capacity if old is not None else self._initial_capacity
+        while capacity < required:
+            capacity *= 2
+        if old is not None and capacity == old.capacity:
+            return
+
+        block = _SharedBlock(capacity, self.dim)
+        if old is not None:
+            block.matrix[:self._size] = old.matrix[:self._size]
+            self._retire(old)
+        self._block = block
+        logger.debug(f"ShardedIndex moved to shared block {block.name} ({capacity} rows)")
+
+    def _retire(self, block: _SharedBlock) -> None:
+        """Frees a block once no search is still reading it. Caller holds `_lock`."""
+        block.retired = True
+        if block.readers == 0:
+            block.free()
+
+    def add(
+        self,
+        chunk_ids: List[int],
+        document_ids: List[int],
+        embeddings: Union[List[List[float]], np.ndarray],
+    ) -> int:
+        """
+        Appends rows to the shared matrix, L2-normalizing each embedding.
+
+        Rows are written past the size searches read up to, so concurrent searches never
+        see partial rows. Rows whose dimension differs from the index dimension are skipped.
+
+        Args:
+            chunk_ids (List[int]): Chunk ids, ascending and greater than `last_chunk_id`.
+            document_ids (List[int]): Parent document id of each chunk.
+            embeddings (Union[List[List[float]], np.ndarray]): Raw embedding vectors, or a 2-D array.
+
+        Returns:
+            int: Number of rows actually added.
+        """
+        if not len(chunk_ids):
+            return 0
+
+        with self._lock:
+            self.last_chunk_id = max(self.last_chunk_id, int(chunk_ids[-1]))
+            if self.dim is None:
+                first = next((emb for emb in embeddings if emb is not None), None)
+                if first is None:
+                    return 0
+                self.dim = len(first)
+
+            keep = [i for i, emb in enumerate(embeddings) if emb is not None and len(emb) == self.dim]
+            if len(keep) != len(embeddings):
+                logger.warning(f"Skipping {len(embeddings) - len(keep)} embeddings with dimension != {self.dim}")
+            if not keep:
+                return 0
+            block = l2_normalize(np.asarray([embeddings[i] for i in keep], dtype=np.float32))
+
+            start, end = self._size, self._size + len(keep)
+            self._grow(end)
+            self._block.matrix[start:end] = block
+            self._chunk_ids.extend(np.asarray(chunk_ids, dtype=np.int64)[keep])
+            self._document_ids.extend(np.asarray(document_ids, dtype=np.int64)[keep])
+            self._size = end
+        return len(keep)
+
+    def sync(self, db: Session, batch_size: int = 10000) -> int:
+        """
+        Loads chunks with an id above `last_chunk_id` from the database.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+            batch_size (int, optional): Rows fetched per round trip. Defaults to 10000.
+
+        Returns:
+            int: Number of rows added to the index.
+        """
+        added = 0
+        with self._lock:
+            for chunk_ids, chunk_document_ids, embeddings in iter_chunk_embeddings(db, self.last_chunk_id, batch_size):
+                added += self.add(chunk_ids, chunk_document_ids, embeddings)
+        if added:
+            logger.info(f"ShardedIndex synced {added} new rows (total={len(self)})")
+        return added
+
+    def close(self) -> None:
+        """Frees the shared-memory block; the index is empty afterwards."""
+        with self._lock:
+            if self._block is not None:
+                self._retire(self._block)
+            self._block = None
+            self._size = 0
+            self._chunk_ids = GrowableArray((), np.int64)
+            self._document_ids = GrowableArray((), np.int64)
+            self.last_chunk_id = 0
+
+    def memory_bytes(self) -> int:
+        """Returns the bytes of the shared block and the row id arrays."""
+        with self._lock:
+            block = self._block.matrix.nbytes if self._block is not None else 0
+            return block + self._chunk_ids.nbytes + self._document_ids.nbytes
+
+    # ---------- Reads ----------
+
+    def row_ids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the chunk ids and document ids of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (chunk_ids, document_ids).
+        """
+        with self._lock:
+            return self._chunk_ids.view, self._document_ids.view
+
+    def _acquire(self) -> Tuple[Optional[_SharedBlock], int, np.ndarray]:
+        """Pins the current block for a search and returns it with the row count and chunk ids."""
+        with self._lock:
+            block = self._block
+            if block is not None:
+                block.readers += 1
+            return block, self._size, self._chunk_ids.view
+
+    def _release(self, block: Optional[_SharedBlock]) -> None:
+        if block is None:
+            return
+        with self._lock:
+            block.readers -= 1
+            if block.retired and block.readers == 0:
+                block.free()
+
+    def _queries(self, query_embeddings) -> np.ndarray:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.shape[-1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[-1]} does not match index dimension {self.dim}")
+        return l2_normalize(queries)
+
+    def _score(
+        self,
+        block: _SharedBlock,
+        size: int,
+        queries: np.ndarray,
+        top_k: int,
+        mask: Optional[np.ndarray],
+    ) -> List[List[Tuple[np.ndarray, np.ndarray]]]:
+        """Scores rows `0:size` shard by shard, in the pool when the index is large enough."""
+        bounds = np.unique(np.linspace(0, size, min(self.shards, size) + 1).astype(np.int64))
+        ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        if self.workers and size >= self.parallel_min_rows:
+            try:
+                executor = _shard_executor(self.workers)
+                futures = [
+                    executor.submit(
+                        score_shard, block.name, block.capacity, block.dim, start, end, queries, top_k,
+                        None if mask is None else mask[start:end],
+                    )
+                    for start, end in ranges
+                ]
+                return [future.result() for future in futures]
+            except BrokenProcessPool as e:
+                logger.error(f"Shard scoring pool failed ({e}); scoring in process")
+                _reset_executor()
+
+        return [
+            score_rows(block.matrix[start:end], start, queries, top_k, None if mask is None else mask[start:end])
+            for start, end in ranges
+        ]
+
+    @staticmethod
+    def _merge(
+        parts: List[Tuple[np.ndarray, np.ndarray]],
+        chunk_ids: np.ndarray,
+        top_k: int,
+        min_score: float,
+    ) -> List[Tuple[int, float]]:
+        """Heap-merges per-shard candidate lists (each best first) into the overall top-k."""
+        streams = [zip(positions.tolist(), scores.tolist()) for positions, scores in parts]
+        hits = []
+        for position, score in heapq.merge(*streams, key=lambda item: (-item[1], item[0])):
+            if len(hits) >= top_k or score < min_score:
+                break
+            hits.append((int(chunk_ids[position]), score))
+        return hits
+
+    def search_batch(
+        self,
+        query_embeddings: Sequence[List[float]],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Scores a batch of queries across all shards and merges the shard results per query.
+
+        Args:
+            query_embeddings (Sequence[List[float]]): Query vectors (normalized here).
+            top_k (int): Maximum number of results per query.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are
+                excluded, as are rows added after the mask was built.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+            rows (Optional[np.ndarray], optional): Score only these ascending row positions
+                (in process); `mask` is ignored when given.
+
+        Returns:
+            List[List[Tuple[int, float]]]: (chunk_id, similarity) pairs per query, best first.
+        """
+        if not len(query_embeddings):
+            return []
+        if rows is not None:
+            return [self.search_rows(query, rows, top_k, min_score) for query in query_embeddings]
+
+        block, size, chunk_ids = self._acquire()
+        try:
+            if mask is not None:
+                size = min(size, len(mask))
+            if block is None or size == 0 or top_k <= 0:
+                return [[] for _ in query_embeddings]
+            queries = self._queries(query_embeddings)
+            if queries.ndim != 2:
+                raise ValueError(f"Expected a batch of query vectors, got shape {queries.shape}")
+            shard_results = self._score(block, size, queries, top_k, mask)
+        finally:
+            self._release(block)
+
+        return [
+            self._merge([shard[position] for shard in shard_results], chunk_ids, top_k, min_score)
+            for position in range(len(queries))
+        ]
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the `top_k` rows most similar to the query.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            top_k (int): Maximum number of results.
+            mask (Optional[np.ndarray], optional): Boolean array over rows; False rows are excluded.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        return self.search_batch([query_embedding], top_k, mask=mask, min_score=min_score)[0]
+
+    def search_rows(
+        self,
+        query_embedding: List[float],
+        rows: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Scores only the given rows in the calling process, for selective filters.
+
+        Args:
+            query_embedding (List[float]): Query vector (normalized here).
+            rows (np.ndarray): Ascending row positions.
+            top_k (int): Maximum number of results.
+            min_score (float, optional): Minimum cosine similarity. Defaults to 0.0.
+
+        Returns:
+            List[Tuple[int, float]]: (chunk_id, similarity) pairs, best first.
+        """
+        block, size, chunk_ids = self._acquire()
+        try:
+            rows = np.asarray(rows, dtype=np.int64)
+            rows = rows[rows < size]
+            if block is None or top_k <= 0 or not len(rows):
+                return []
+            scores = block.matrix[rows] @ self._queries(query_embedding)
+        finally:
+            self._release(block)
+        return [
+            (int(chunk_ids[rows[i]]), float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] >= min_score
+        ]
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_sharded_index(db_session: Session) -> ShardedIndex:
+    """
+    Returns the process-wide ShardedIndex for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        ShardedIndex: The shared index (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = ShardedIndex()
+            _indexes[engine] = index
+            logger.info(f"Created process-wide ShardedIndex ({index.shards} shards, {index.workers} workers)")
+        return index
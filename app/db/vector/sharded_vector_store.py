@@ -0,0 +1,35 @@
+import logging
+from sqlalchemy.orm import Session
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.sharded_index import get_sharded_index
+
+logger = logging.getLogger(__name__)
+
+class ShardedVectorStore(InMemoryVectorStore):
+    """
+    Vector store that brute-forces searches across CPU cores.
+
+    Chunks are persisted in the relational database exactly like InMemoryVectorStore,
+    but the embedding matrix is held in shared memory (see ShardedIndex) and split into
+    row shards that a persistent process pool scores in parallel; the per-shard top-k
+    lists are heap-merged. Results are exact, and throughput scales with the number of
+    worker processes (`VECTOR_SHARD_WORKERS`) instead of being bound by the GIL.
+    """
+
+    partition_by_knowledge_base = False
+
+    def __init__(self, db_session: Session):
+        """
+        Initializes the sharded vector store.
+
+        Args:
+            db_session (Session): SQLAlchemy database session used for persistence.
+        """
+        super().__init__(db_session)
+        logger.info("ShardedVectorStore initialized")
+
+    def _index(self):
+        return get_sharded_index(self.db)
+
+    def _search(self, index, query_embedding, top_k, mask, min_score, **search_params):
+        return index.search(query_embedding, top_k, mask=mask, min_score=min_score)
@@ -0,0 +1,234 @@
+"""
+Vector Index Snapshots and Warm Start
+
+A snapshot is an index file written by the index's own `save` (e.g. the `.npz` of
+vectors and id maps that LSMIndex writes after compacting into its base segment) plus
+a JSON manifest next to it recording the manifest version, the index type, the replay
+watermark (`last_chunk_id`), the corpus generation the index was built from and the
+document shard slice it holds (`shard`, see app.db.shard_slice).
+Deleted chunks are left out of the file; tombstones are replayed from the start after
+a restore, which is a no-op for chunks the snapshot no longer holds.
+
+At startup `warm_start` loads the snapshot of the process-wide LSMIndex, which costs
+one sequential read of the file, and then replays only chunks written after the
+snapshot's watermark. A snapshot whose generation or watermark is ahead of the database
+(e.g. the database was replaced or restored from an older backup) is ignored and the
+index is rebuilt from the `chunks` table.
+
+The file-backed approximate indexes (HNSW, IVF, PQ, int8) and the knowledge base
+partitions are not written on the query path either; `save_vector_indexes` writes the
+snapshot and every one of them with unsaved rows, at shutdown and at the end of an
+ingest run. The HNSW, IVF, PQ and int8 files record the corpus generation and watermark
+in their own header and are checked the same way before they are loaded (see
+`app.db.vector.matrix_index.index_file_is_current`).
+
+Usage:
+    python -m app.db.vector.snapshot [--snapshot-dir rag_index]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.corpus import ahead_of_database, current_generation
+from app.db.shard_slice import shard_label
+from app.db.vector.hnsw_index import save_hnsw_indexes
+from app.db.vector.int8_index import save_int8_indexes
+from app.db.vector.ivf_index import save_ivf_indexes
+from app.db.vector.lsm_index import get_lsm_index
+from app.db.vector.partitioned_index import save_partitioned_indexes
+from app.db.vector.pq_index import save_pq_indexes
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MANIFEST_VERSION = 1
+# Directory of the matrix snapshot; an empty value disables snapshots
+DEFAULT_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", os.getenv("VECTOR_INDEX_DIR", "rag_index"))
+MATRIX_SNAPSHOT_FILE = "matrix.npz"
+
+
+def manifest_path(path: str) -> str:
+    """Returns the manifest file that accompanies the snapshot at `path`."""
+    return path + ".json"
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads the manifest of a snapshot.
+
+    Args:
+        path (str): Snapshot file path.
+
+    Returns:
+        Optional[Dict[str, Any]]: The manifest, or None if it is missing or unreadable.
+    """
+    try:
+        with open(manifest_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.debug(f"No usable snapshot manifest for {path}: {e}")
+        return None
+
+
+def save_snapshot(index, path: str, generation: int) -> Dict[str, Any]:
+    """
+    Writes an index snapshot and its manifest.
+
+    The index file is written first and the manifest last (both atomically), so a crash
+    in between leaves either the previous manifest, whose watermark the new file still
+    covers, or no manifest at all.
+
+    Args:
+        index: Index with `save`, `last_chunk_id` and `__len__` (e.g. LSMIndex).
+        path (str): Snapshot file path.
+        generation (int): Corpus generation read before the index was last synced.
+
+    Returns:
+        Dict[str, Any]: The manifest written.
+    """
+    index.save(path)
+    manifest = {
+        "version": SNAPSHOT_MANIFEST_VERSION,
+        "index": type(index).__name__,
+        "generation": generation,
+        "last_chunk_id": int(index.last_chunk_id),
+        "rows": len(index),
+        "shard": shard_label(),
+        "created_at": time.time(),
+    }
+    tmp_path = manifest_path(path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path(path))
+    logger.info(f"Saved {manifest['index']} snapshot to {path} (generation={generation}, rows={manifest['rows']})")
+    return manifest
+
+
+def restore_snapshot(index, path: str, db: Session) -> bool:
+    """
+    Loads a snapshot into an empty index if it is consistent with the database.
+
+    Args:
+        index: Index with `load` (e.g. LSMIndex).
+        path (str): Snapshot file path.
+        db (Session): Session on the database the index serves.
+
+    Returns:
+        bool: True if the snapshot was loaded; False if it was missing, of another
+            version, index type or shard slice, ahead of the database, or unreadable.
+    """
+    manifest = read_manifest(path)
+    if manifest is None or not os.path.exists(path):
+        return False
+    if manifest.get("version") != SNAPSHOT_MANIFEST_VERSION or manifest.get("index") != type(index).__name__:
+        logger.warning(f"Ignoring snapshot {path}: unsupported manifest {manifest.get('version')}/{manifest.get('index')}")
+        return False
+    # Manifests written before shard slices existed always hold the whole corpus
+    if manifest.get("shard", "0/1") != shard_label():
+        logger.warning(f"Ignoring snapshot {path}: it holds shard {manifest.get('shard', '0/1')}, not {shard_label()}")
+        return False
+
+    if ahead_of_database(db, manifest["generation"], manifest["last_chunk_id"]):
+        logger.warning(
+            f"Ignoring snapshot {path}: built at generation={manifest['generation']} "
+            f"last_chunk_id={manifest['last_chunk_id']}, ahead of the database"
+        )
+        return False
+
+    try:
+        index.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return False
+    return True
+
+
+def warm_start(db: Session, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> Dict[str, Any]:
+    """
+    Loads the process-wide LSMIndex from its snapshot and replays newer chunks.
+
+    Does nothing to the snapshot step if the index already holds rows or snapshots are
+    disabled; the replay (an incremental sync) always runs.
+
+    Args:
+        db (Session): Session on the database the index serves.
+        snapshot_dir (str, optional): Snapshot directory. Defaults to `VECTOR_SNAPSHOT_DIR`.
+
+    Returns:
+        Dict[str, Any]: Whether a snapshot was restored, the rows it held, the rows
+            replayed, the corpus generation and the elapsed seconds.
+    """
+    started = time.perf_counter()
+    index = get_lsm_index(db)
+    restored = False
+    if snapshot_dir and len(index) == 0:
+        restored = restore_snapshot(index, os.path.join(snapshot_dir, MATRIX_SNAPSHOT_FILE), db)
+    snapshot_rows = len(index)
+
+    generation = current_generation(db)
+    replayed = index.sync(db)
+    stats = {
+        "restored": restored,
+        "snapshot_rows": snapshot_rows,
+        "replayed": replayed,
+        "generation": generation,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    logger.info(f"Vector index warm start: {stats}")
+    return stats
+
+
+def save_matrix_snapshot(db: Session, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Syncs the process-wide LSMIndex and writes its snapshot.
+
+    Args:
+        db (Session): Session on the database the index serves.
+        snapshot_dir (str, optional): Snapshot directory. Defaults to `VECTOR_SNAPSHOT_DIR`.
+
+    Returns:
+        Optional[Dict[str, Any]]: The manifest written, or None if snapshots are disabled.
+    """
+    if not snapshot_dir:
+        return None
+    index = get_lsm_index(db)
+    # Read before syncing: the index then holds at least everything up to this generation
+    generation = current_generation(db)
+    index.sync(db)
+    return save_snapshot(index, os.path.join(snapshot_dir, MATRIX_SNAPSHOT_FILE), generation)
+
+
+def save_vector_indexes(db: Session, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> int:
+    """
+    Writes the matrix snapshot and every file-backed index with unsaved rows.
+
+    Args:
+        db (Session): Session on the database the indexes serve.
+        snapshot_dir (str, optional): Snapshot directory. Defaults to `VECTOR_SNAPSHOT_DIR`.
+
+    Returns:
+        int: Number of HNSW, IVF, PQ, int8 and partition index files written.
+    """
+    save_matrix_snapshot(db, snapshot_dir)
+    written = save_hnsw_indexes() + save_ivf_indexes() + save_pq_indexes() + save_int8_indexes()
+    return written + save_partitioned_indexes()
+
+
+if __name__ == "__main__":
+    from app.db.database import Base, SessionLocal, engine
+    from app.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Write a snapshot of the in-memory vector index.")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR, help="Directory to write the snapshot to.")
+    args = parser.parse_args()
+
+    setup_logging()
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        warm_start(session, args.snapshot_dir)
+        save_matrix_snapshot(session, args.snapshot_dir)
@@ -0,0 +1,101 @@
+import logging
+import threading
+import weakref
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.corpus import tombstones_since
+
+logger = logging.getLogger(__name__)
+
+
+class TombstoneIndex:
+    """
+    Sorted array of deleted chunk ids, replayed incrementally from `chunk_tombstones`.
+
+    Indexes only ever append rows, so rows of deleted chunks stay in them until they are
+    rebuilt or compacted. Searches turn the tombstones into a boolean mask over the
+    index's (ascending) row chunk ids with one `np.searchsorted`, so a deletion by any
+    process is excluded from the next query without touching the index.
+
+    Attributes:
+        last_tombstone_id (int): Highest tombstone id replayed so far.
+    """
+
+    def __init__(self):
+        """Initializes an empty tombstone set."""
+        self.last_tombstone_id = 0
+        self._chunk_ids = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._chunk_ids)
+
+    def sync(self, db: Session) -> int:
+        """
+        Replays tombstones recorded since `last_tombstone_id`.
+
+        Args:
+            db (Session): SQLAlchemy session to read from.
+
+        Returns:
+            int: Number of tombstones added.
+        """
+        with self._lock:
+            rows = tombstones_since(db, self.last_tombstone_id)
+            if not rows:
+                return 0
+            added = np.asarray([chunk_id for _, chunk_id in rows], dtype=np.int64)
+            self._chunk_ids = np.union1d(self._chunk_ids, added)
+            self.last_tombstone_id = rows[-1][0]
+        logger.info(f"TombstoneIndex synced {len(rows)} tombstones (total={len(self)})")
+        return len(rows)
+
+    def live_mask(self, chunk_ids: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Builds a mask excluding tombstoned rows.
+
+        Args:
+            chunk_ids (np.ndarray): Ascending chunk ids of an index's rows.
+
+        Returns:
+            Optional[np.ndarray]: Boolean array over the rows (False for deleted chunks),
+                or None if none of the rows is deleted.
+        """
+        deleted = self._chunk_ids
+        if not len(deleted) or not len(chunk_ids):
+            return None
+        positions = np.searchsorted(chunk_ids, deleted)
+        found = positions < len(chunk_ids)
+        positions = positions[found]
+        positions = positions[chunk_ids[positions] == deleted[found]]
+        if not len(positions):
+            return None
+        mask = np.ones(len(chunk_ids), dtype=bool)
+        mask[positions] = False
+        return mask
+
+
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_tombstone_index(db_session: Session) -> TombstoneIndex:
+    """
+    Returns the process-wide TombstoneIndex for the engine behind a session.
+
+    Args:
+        db_session (Session): Any session bound to the target database.
+
+    Returns:
+        TombstoneIndex: The shared tombstones (possibly not yet synced).
+    """
+    engine = db_session.get_bind()
+    with _indexes_lock:
+        index = _indexes.get(engine)
+        if index is None:
+            index = TombstoneIndex()
+            _indexes[engine] = index
+        return index
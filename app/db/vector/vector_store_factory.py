@@ -1,19 +1,36 @@
 import logging
 from app.db.vector.in_memory_vector_store import InMemoryVectorStore
 from app.db.vector.db_vector_store import DBVectorStore
-from app.db.vector.hybrid_vector_store import HybridVectorStore
+from app.db.vector.hybrid_vector_store import DEFAULT_KEYWORD_BACKEND, HybridVectorStore
+from app.db.vector.mmap_vector_store import MmapVectorStore
+from app.db.vector.hnsw_vector_store import HNSWVectorStore
+from app.db.vector.ivf_vector_store import IVFVectorStore
+from app.db.vector.pq_vector_store import PQVectorStore
+from app.db.vector.int8_vector_store import Int8VectorStore
+from app.db.vector.sharded_vector_store import ShardedVectorStore
+from app.db.vector.shard_router_vector_store import ShardRouterVectorStore
 from app.db.vector.base_vector_store import BaseVectorStore
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BINARY_SHORTLIST = 16
+
 def get_vector_store(strategy: str, db_session, **kwargs) -> BaseVectorStore:
     """
     Factory function to initialize the appropriate vector store strategy.
 
     Args:
-        strategy (str): The vector store strategy to use ("inmemory", "db", "hybrid").
+        strategy (str): The vector store strategy to use ("inmemory", "binary", "mmap", "hnsw", "ivf", "pq", "int8", "sharded", "router", "db", "hybrid").
         db_session: SQLAlchemy session.
-        **kwargs: Additional parameters. For hybrid, requires `memory_strategy`.
+        **kwargs: Additional parameters. For hybrid, requires `memory_strategy` and accepts
+            `keyword_backend` ("bm25" or "fts5").
+            For inmemory, accepts `binary_shortlist`; binary is inmemory with a sign-bit
+            first stage enabled (`binary_shortlist` defaults to DEFAULT_BINARY_SHORTLIST).
+            For hnsw, accepts `M`, `ef_construction`, `ef_search` and `index_path`.
+            For ivf, accepts `n_lists`, `nprobe`, `min_train_size` and `index_path`.
+            For pq, accepts `code_size`, `rescore`, `min_train_size` and `index_path`.
+            For int8, accepts `oversample`, `min_train_size` and `index_path`.
+            For router, accepts `shard_urls`, `timeout` and `allow_partial`.
 
     Returns:
         BaseVectorStore
@@ -25,12 +42,46 @@ def get_vector_store(strategy: str, db_session, **kwargs) -> BaseVectorStore:
         logger.info("Initializing InMemoryVectorStore")
         return InMemoryVectorStore(db_session, **kwargs)
 
+    elif strategy == "binary":
+        logger.info("Initializing InMemoryVectorStore with a binary first stage")
+        kwargs.setdefault("binary_shortlist", DEFAULT_BINARY_SHORTLIST)
+        return InMemoryVectorStore(db_session, **kwargs)
+
+    elif strategy == "mmap":
+        logger.info("Initializing MmapVectorStore")
+        return MmapVectorStore(db_session, **kwargs)
+
+    elif strategy == "hnsw":
+        logger.info("Initializing HNSWVectorStore")
+        return HNSWVectorStore(db_session, **kwargs)
+
+    elif strategy == "ivf":
+        logger.info("Initializing IVFVectorStore")
+        return IVFVectorStore(db_session, **kwargs)
+
+    elif strategy == "pq":
+        logger.info("Initializing PQVectorStore")
+        return PQVectorStore(db_session, **kwargs)
+
+    elif strategy == "int8":
+        logger.info("Initializing Int8VectorStore")
+        return Int8VectorStore(db_session, **kwargs)
+
+    elif strategy == "sharded":
+        logger.info("Initializing ShardedVectorStore")
+        return ShardedVectorStore(db_session, **kwargs)
+
+    elif strategy == "router":
+        logger.info("Initializing ShardRouterVectorStore")
+        return ShardRouterVectorStore(db_session, **kwargs)
+
     elif strategy == "db":
         logger.info("Initializing DBVectorStore")
         return DBVectorStore(db_session, **kwargs)
 
     elif strategy == "hybrid":
         memory_strategy = kwargs.pop("memory_strategy", None)
+        keyword_backend = kwargs.pop("keyword_backend", DEFAULT_KEYWORD_BACKEND)
         if not memory_strategy:
             logger.error("Missing `memory_strategy` for hybrid vector store strategy")
             raise ValueError("memory_strategy is required when using hybrid strategy")
@@ -41,6 +92,27 @@ def get_vector_store(strategy: str, db_session, **kwargs) -> BaseVectorStore:
         if memory_strategy == "inmemory":
             memory_store = InMemoryVectorStore(db_session)
             logger.info("Inner store: InMemoryVectorStore initialized")
+        elif memory_strategy == "binary":
+            memory_store = InMemoryVectorStore(db_session, binary_shortlist=DEFAULT_BINARY_SHORTLIST)
+            logger.info("Inner store: InMemoryVectorStore with binary first stage initialized")
+        elif memory_strategy == "mmap":
+            memory_store = MmapVectorStore(db_session)
+            logger.info("Inner store: MmapVectorStore initialized")
+        elif memory_strategy == "hnsw":
+            memory_store = HNSWVectorStore(db_session)
+            logger.info("Inner store: HNSWVectorStore initialized")
+        elif memory_strategy == "ivf":
+            memory_store = IVFVectorStore(db_session)
+            logger.info("Inner store: IVFVectorStore initialized")
+        elif memory_strategy == "pq":
+            memory_store = PQVectorStore(db_session)
+            logger.info("Inner store: PQVectorStore initialized")
+        elif memory_strategy == "int8":
+            memory_store = Int8VectorStore(db_session)
+            logger.info("Inner store: Int8VectorStore initialized")
+        elif memory_strategy == "sharded":
+            memory_store = ShardedVectorStore(db_session)
+            logger.info("Inner store: ShardedVectorStore initialized")
         elif memory_strategy == "db":
             memory_store = DBVectorStore(db_session)
             logger.info("Inner store: DBVectorStore initialized")
@@ -49,7 +121,7 @@ def get_vector_store(strategy: str, db_session, **kwargs) -> BaseVectorStore:
             raise ValueError(f"Unsupported memory strategy: {memory_strategy}")
 
         logger.info("Initializing HybridVectorStore")
-        return HybridVectorStore(db_session=db_session, vector_store=memory_store)
+        return HybridVectorStore(db_session=db_session, vector_store=memory_store, keyword_backend=keyword_backend)
 
     else:
         logger.error(f"Unsupported vector store strategy: '{strategy}'")
@@ -1,5 +1,8 @@
 from typing import List, Dict, Union, Optional, Any
+from sqlalchemy.orm import Session
+from app.db.corpus import current_generation
 from app.db.vector.base_vector_store import BaseVectorStore
+from app.db.vector.query_cache import QueryCache, get_query_cache, query_cache_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,18 +13,52 @@ class VectorStoreService:
 
     This class serves as an abstraction over the underlying vector store,
     handling validation and forwarding requests for storing and querying vector data.
+
+    Given a database session, `query` is answered from the engine's QueryCache when the
+    same query was run at the current corpus generation.
     """
 
-    def __init__(self, vector_store: BaseVectorStore):
+    def __init__(
+        self,
+        vector_store: BaseVectorStore,
+        db_session: Optional[Session] = None,
+        query_cache: Optional[QueryCache] = None,
+        cache_namespace: Optional[str] = None
+    ):
         """
         Initializes the VectorStoreService with a specific vector store backend.
 
         Args:
             vector_store (BaseVectorStore): An instance of a class implementing the BaseVectorStore interface.
+            db_session (Optional[Session], optional): Session used to read the corpus generation;
+                without one, queries are not cached.
+            query_cache (Optional[QueryCache], optional): Cache of query results. Defaults to the
+                process-wide cache of the session's engine.
+            cache_namespace (Optional[str], optional): Identifies the store configuration in cache
+                keys. Defaults to the store's class name.
         """
         self.vector_store = vector_store
+        self.db_session = db_session
+        self.query_cache = query_cache
+        self.cache_namespace = cache_namespace or type(vector_store).__name__
+        self._cached_plan: Optional[Dict[str, Any]] = None
         logger.info(f"Initialized VectorStoreService with vector store backend: {type(vector_store).__name__}")
 
+    @property
+    def last_plan(self) -> Optional[Dict[str, Any]]:
+        """The search plan chosen by the vector store for the most recent query, if it plans queries."""
+        if self._cached_plan is not None:
+            return self._cached_plan
+        return self.vector_store.last_plan
+
+    def _cache(self) -> Optional[QueryCache]:
+        """Returns the query cache to use, or None if queries are not cached."""
+        if self.db_session is None:
+            return None
+        if self.query_cache is None:
+            self.query_cache = get_query_cache(self.db_session)
+        return self.query_cache if self.query_cache.enabled else None
+
     def store_chunks(
         self,
         document_id: int,
@@ -50,6 +87,47 @@ class VectorStoreService:
         self.vector_store.store_chunks(document_id, chunks, embeddings)
         logger.info(f"Successfully stored chunks for document_id={document_id}")
 
+    def delete_chunks(self, document_id: int) -> int:
+        """
+        Deletes all chunks of a document from the vector store.
+
+        Args:
+            document_id (int): Identifier of the document whose chunks are deleted.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        deleted = self.vector_store.delete_chunks(document_id)
+        logger.info(f"Deleted {deleted} chunks for document_id={document_id}")
+        return deleted
+
+    def replace_chunks(
+        self,
+        document_id: int,
+        chunks: List[Union[str, Dict[str, Union[str, Dict[str, Union[str, int]]]]]],
+        embeddings: List[List[float]]
+    ) -> None:
+        """
+        Replaces all chunks of a document with new chunks and embeddings.
+
+        Args:
+            document_id (int): Identifier of the document whose chunks are replaced.
+            chunks (List[Union[str, Dict]]): The new text chunks or dictionaries containing 'text' and optional metadata.
+            embeddings (List[List[float]]): A list of embedding vectors corresponding to the chunks.
+
+        Raises:
+            ValueError: If the number of chunks does not match the number of embeddings.
+
+        Returns:
+            None
+        """
+        if len(chunks) != len(embeddings):
+            logger.error(f"replace_chunks error | document_id={document_id} | chunks={len(chunks)} | embeddings={len(embeddings)}")
+            raise ValueError("Number of chunks and embeddings must be the same.")
+
+        logger.info(f"Replacing chunks of document_id={document_id} with {len(chunks)} chunks")
+        self.vector_store.replace_chunks(document_id, chunks, embeddings)
+
     def query(
         self,
         query_embedding: List[float],
@@ -57,7 +135,8 @@ class VectorStoreService:
         knowledge_base_id: Optional[str] = None,
         filters: Optional[Dict[str, Union[str, int]]] = None,
         min_score: float = 0.0,
-        query_text: Optional[str] = None
+        query_text: Optional[str] = None,
+        **search_params: Any
     ) -> List[Dict[str, Union[str, float, Dict[str, Any], int]]]:
         """
         Queries the vector store for the most relevant chunks based on the provided query embedding.
@@ -69,23 +148,93 @@ class VectorStoreService:
             filters (Optional[Dict[str, Union[str, int]]], optional): Optional metadata filters.
             min_score (float, optional): Minimum similarity score required to include results. Defaults to 0.0.
             query_text (Optional[str], optional): Optional keyword query to support hybrid search strategies.
+            **search_params: Index-specific tuning knobs (e.g. `nprobe`) passed through to the store.
 
         Returns:
             List[Dict[str, Union[str, float, Dict[str, Any], int]]]: A list of matched chunks with metadata and scores.
         """
         logger.info(
             f"Performing vector search | top_k={top_k} | knowledge_base_id={knowledge_base_id} | min_score={min_score} "
-            f"| filters={filters} | query_text={query_text}"
+            f"| filters={filters} | query_text={query_text} | search_params={search_params}"
         )
 
+        self._cached_plan = None
+        cache = self._cache()
+        if cache is not None:
+            # Read before searching, so a write racing the search only makes the entry stale
+            generation = current_generation(self.db_session)
+            key = query_cache_key(
+                self.cache_namespace, query_embedding, top_k, knowledge_base_id, filters, min_score, query_text, search_params
+            )
+            cached = cache.get(key, generation)
+            if cached is not None:
+                self._cached_plan = {"strategy": "cache", "generation": generation}
+                logger.info(f"Vector search served from cache | Results found: {len(cached)}")
+                return cached
+
         results = self.vector_store.query(
             query_embedding=query_embedding,
             top_k=top_k,
             knowledge_base_id=knowledge_base_id,
             filters=filters,
             min_score=min_score,
-            query_text=query_text
+            query_text=query_text,
+            **search_params
         )
+        # Partial results (e.g. a shard router missing a shard) are not worth repeating
+        if cache is not None and not (self.vector_store.last_plan or {}).get("partial"):
+            cache.put(key, generation, results)
 
         logger.info(f"Vector search complete | Results found: {len(results)}")
         return results
+
+    def query_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        knowledge_base_id: Optional[str] = None,
+        filters: Optional[Dict[str, Union[str, int]]] = None,
+        min_score: float = 0.0,
+        query_texts: Optional[List[Optional[str]]] = None,
+        **search_params: Any
+    ) -> List[List[Dict[str, Union[str, float, Dict[str, Any], int]]]]:
+        """
+        Queries the vector store with a batch of embeddings that share scope and parameters.
+
+        Args:
+            query_embeddings (List[List[float]]): The embedding vectors of the queries.
+            top_k (int, optional): Maximum number of results per query. Defaults to 5.
+            knowledge_base_id (Optional[str], optional): Optional knowledge base ID to scope the search.
+            filters (Optional[Dict[str, Union[str, int]]], optional): Optional metadata filters.
+            min_score (float, optional): Minimum similarity score required to include results. Defaults to 0.0.
+            query_texts (Optional[List[Optional[str]]], optional): Optional keyword query per embedding.
+            **search_params: Index-specific tuning knobs (e.g. `nprobe`) passed through to the store.
+
+        Raises:
+            ValueError: If `query_texts` is given with a different length than `query_embeddings`.
+
+        Returns:
+            List[List[Dict[str, Union[str, float, Dict[str, Any], int]]]]: Matched chunks of each query, in input order.
+        """
+        if query_texts is not None and len(query_texts) != len(query_embeddings):
+            logger.error(f"query_batch error | embeddings={len(query_embeddings)} | query_texts={len(query_texts)}")
+            raise ValueError("Number of query texts and query embeddings must be the same.")
+
+        self._cached_plan = None
+        logger.info(
+            f"Performing batch vector search | queries={len(query_embeddings)} | top_k={top_k} "
+            f"| knowledge_base_id={knowledge_base_id} | min_score={min_score} | filters={filters} | search_params={search_params}"
+        )
+
+        results = self.vector_store.query_batch(
+            query_embeddings=query_embeddings,
+            top_k=top_k,
+            knowledge_base_id=knowledge_base_id,
+            filters=filters,
+            min_score=min_score,
+            query_texts=query_texts,
+            **search_params
+        )
+
+        logger.info(f"Batch vector search complete | Results found: {sum(len(hits) for hits in results)}")
+        return results
@@ -11,7 +11,7 @@ from the `sample_data` folder. It performs the following tasks:
 5. Stores documents, chunks, and embeddings into the database
 
 Usage:
-    python ingest.py
+    python -m app.ingest [--folder sample_data] [--knowledge-base KB_ID]
 
 Note:
     - Make sure your document files are placed in the `sample_data/` folder.
@@ -20,30 +20,43 @@ Note:
         pip install -r requirements.txt
 """
 
+import argparse
 import logging
 from app.logging_config import setup_logging
 from app.services.ingestion.ingestion_pipeline import IngestionPipeline
-from app.db.database import Base, engine
+from app.db.database import Base, SessionLocal, engine
+from app.db.migrate_embeddings import upgrade_schema
+from app.db.vector.snapshot import save_vector_indexes
 from app.api.dependencies import get_chunking_service, get_embedding_service, get_storage_service
 
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documents into the RAG database.")
+    parser.add_argument("--folder", default="sample_data", help="Folder of documents to ingest.")
+    parser.add_argument("--knowledge-base", default=None, help="Knowledge base ID to add the documents to.")
+    args = parser.parse_args()
+
     setup_logging()
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     logger.info("Starting ingestion script...")
 
     try:
         pipeline = IngestionPipeline(
-            folder_path="sample_data",
+            folder_path=args.folder,
             chunking_service=get_chunking_service(),
             embedding_service=get_embedding_service(),
-            storage_service=get_storage_service()
+            storage_service=get_storage_service(),
+            knowledge_base_id=args.knowledge_base
         )
         logger.info("IngestionPipeline initialized successfully.")
 
         pipeline.run()
         logger.info("Ingestion pipeline completed successfully.")
 
+        with SessionLocal() as db:
+            save_vector_indexes(db)
+
     except Exception as e:
         logger.error(f"Error running ingestion pipeline: {e}", exc_info=True)
@@ -1,7 +1,9 @@
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.database import Base, engine
+from app.db.database import Base, SessionLocal, engine
+from app.db.migrate_embeddings import upgrade_schema
+from app.db.vector.snapshot import save_vector_indexes, warm_start
 from app.api.routes import router as rag_router
 from app.logging_config import setup_logging
 import logging
@@ -18,6 +20,7 @@ app = FastAPI(
 )
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,8 +32,15 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
+    with SessionLocal() as db:
+        warm_start(db)
     logging.getLogger("main").info("FastAPI app started")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    with SessionLocal() as db:
+        save_vector_indexes(db)
+
 app.include_router(rag_router, prefix="/api", tags=["RAG"])
 
 @app.get("/health")
@@ -5,11 +5,14 @@ This module defines the core ingestion pipeline that:
 - Detects supported file types in a folder
 - Uses the appropriate ingestor to load document contents
 - Chunks text, generates embeddings, and stores both
+- Re-ingests documents whose content changed since they were stored
 """
 
+import hashlib
 import os
 import traceback
 import logging
+from typing import Optional
 
 from app.services.chunking.chunking_service import ChunkingService
 from app.services.embedding.embedding_service import EmbeddingService
@@ -30,6 +33,10 @@ class IngestionPipeline:
     - Chunks the text using a strategy (e.g., word, sentence)
     - Generates embeddings for each chunk
     - Stores documents, chunks, and embeddings via the storage service
+
+    Each stored document records a SHA-256 `content_hash` in its metadata. A document
+    that is already stored with the same hash is skipped; one whose content changed (or
+    that predates the hash) is re-chunked and re-embedded, and its chunks are replaced.
     """
 
     def __init__(
@@ -37,7 +44,8 @@ class IngestionPipeline:
         folder_path: str,
         chunking_service: ChunkingService,
         embedding_service: EmbeddingService,
-        storage_service: StorageService
+        storage_service: StorageService,
+        knowledge_base_id: Optional[str] = None
     ):
         """
         Initializes the pipeline with all required services.
@@ -52,11 +60,14 @@ class IngestionPipeline:
             The service used to generate vector embeddings for text chunks.
         storage_service : StorageService
             The service used to store documents and chunks with embeddings.
+        knowledge_base_id : Optional[str]
+            Knowledge base the ingested documents are added to, if any.
         """
         self.folder_path = folder_path
         self.chunker = chunking_service
         self.embedder = embedding_service
         self.storage = storage_service
+        self.knowledge_base_id = knowledge_base_id
 
         logger.info(f"IngestionPipeline initialized for folder: {self.folder_path}")
 
@@ -80,8 +91,10 @@ class IngestionPipeline:
                 logger.debug(f"Loaded {len(documents)} document(s) from {file_name}")
 
                 for doc_name, content, metadata in documents:
-                    if self.storage.document_exists(doc_name):
-                        logger.info(f"⚠️ Document '{doc_name}' already exists. Skipping.")
+                    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                    existing = self.storage.get_document_by_name(doc_name)
+                    if existing is not None and (existing.document_metadata or {}).get("content_hash") == content_hash:
+                        logger.info(f"⚠️ Document '{doc_name}' already exists and is unchanged. Skipping.")
                         continue
 
                     logger.debug(f"Chunking document: {doc_name}")
@@ -91,10 +104,17 @@ class IngestionPipeline:
                     logger.debug("Generating embeddings...")
                     embeddings = [self.embedder.get_embedding(c['text']) for c in chunks]
 
+                    document_metadata = {**metadata, "content_hash": content_hash}
+                    if existing is not None:
+                        self.storage.replace_chunks(existing.id, chunks, embeddings, document_metadata=document_metadata)
+                        logger.info(f"🔄 Re-ingested changed {doc_name} ({len(chunks)} chunks)")
+                        continue
+
                     doc = self.storage.store_document(
                         name=doc_name,
-                        document_metadata=metadata,
-                        path=file_path
+                        document_metadata=document_metadata,
+                        path=file_path,
+                        knowledge_base_id=self.knowledge_base_id
                     )
                     self.storage.store_chunks(doc.id, chunks, embeddings)
 
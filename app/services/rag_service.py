@@ -1,15 +1,22 @@
 import logging
-from typing import Optional, List, Dict, Union
+import os
+from typing import Any, Optional, List, Dict, Union
 from app.services.embedding.embedding_service import EmbeddingService
 from app.services.storage.storage_service import StorageService
 from app.db.vector.vector_store_service import VectorStoreService
 from app.services.generator.generator_service import GeneratorService
 from app.services.reranking.reranking_service import RerankingService
 from app.db.models import Conversation, Message
+from app.utils.mmr import DEFAULT_MMR_LAMBDA, maximal_marginal_relevance
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Relevance/diversity trade-off of the context selection (1.0 = plain top-k)
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", str(DEFAULT_MMR_LAMBDA)))
+# Candidates retrieved for the diversity stage to choose the context chunks from
+MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+
 class RagService:
     """
     Core service that handles Retrieval-Augmented Generation workflow.
@@ -17,6 +24,7 @@ class RagService:
     Responsibilities:
     - Generate embeddings for the query
     - Run vector search using embeddings
+    - Pick a diverse subset of the candidates with maximal marginal relevance
     - Retrieve or create conversation
     - Store user and assistant messages
     - Generate answer using generator with context and chat history
@@ -43,7 +51,10 @@ class RagService:
         conversation_id: Optional[str] = None,
         knowledge_base_id: Optional[str] = None,
         top_k: int = 5,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+        **search_params
     ) -> Dict[str, Union[str, List[Dict[str, Union[str, float]]]]]:
         """
         Handles a chat query and returns an AI-generated response along with context chunks.
@@ -54,6 +65,11 @@ class RagService:
             knowledge_base_id (Optional[str]): Used if creating a new conversation.
             top_k (int): Number of context chunks to retrieve.
             min_score (float): Minimum similarity threshold for retrieved chunks.
+            mmr_lambda (Optional[float]): Relevance/diversity trade-off of the context selection,
+                from 0.0 (most diverse) to 1.0 (plain top-k). Defaults to `RAG_MMR_LAMBDA`.
+            fetch_k (Optional[int]): Candidates retrieved to select the `top_k` context chunks from.
+                Defaults to `RAG_MMR_FETCH_K`.
+            **search_params: Index-specific retrieval knobs (e.g. `nprobe`) passed to the vector store.
 
         Returns:
             Dict[str, Union[str, List[Dict[str, Union[str, float]]]]]: Generated answer and context.
@@ -65,15 +81,22 @@ class RagService:
         query_embedding = self.embedding_service.get_embedding(query)
         logger.debug(f"Generated query embedding of length {len(query_embedding)}")
 
-        # 2. Run vector search
+        # 2. Run vector search, over-fetching candidates for the diversity stage
+        mmr_lambda = MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+        fetch_k = max(top_k, MMR_FETCH_K if fetch_k is None else fetch_k)
+        diversify = mmr_lambda < 1.0 and fetch_k > top_k
         context_chunks = self.vector_store_service.query(
             query_embedding=query_embedding,
-            top_k=top_k,
+            top_k=fetch_k if diversify else top_k,
             knowledge_base_id=knowledge_base_id if knowledge_base_id else None,
             min_score=min_score,
+            **search_params,
         )
         logger.info(f"Retrieved {len(context_chunks)} context chunks from vector search")
 
+        if diversify:
+            context_chunks = self._diversify(query_embedding, context_chunks, top_k, mmr_lambda)
+
         # Optional reranking (not implemented here, but logged for awareness)
         # context_chunks = self.reranking_service.rerank(query, context_chunks)
         # logger.info("Reranked context chunks")
@@ -133,3 +156,45 @@ class RagService:
             "answer": answer,
             "context_chunks": context_chunks
         }
+
+    def _diversify(
+        self,
+        query_embedding: List[float],
+        candidates: List[Dict[str, Any]],
+        top_k: int,
+        mmr_lambda: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Selects `top_k` candidates with maximal marginal relevance.
+
+        Overlapping neighbouring chunks tend to be retrieved together; MMR trades some
+        relevance for context that does not repeat itself. Candidates are scored with the
+        embeddings stored for them, and those without a stored embedding only fill the
+        slots left after the selection, in retrieval order.
+
+        Args:
+            query_embedding (List[float]): The query vector.
+            candidates (List[Dict[str, Any]]): Retrieved chunks, best first.
+            top_k (int): Number of chunks to keep.
+            mmr_lambda (float): Relevance/diversity trade-off.
+
+        Returns:
+            List[Dict[str, Any]]: The selected chunks, in selection order.
+        """
+        if len(candidates) <= top_k:
+            return candidates
+
+        embeddings = self.storage_service.get_chunk_embeddings([chunk["chunk_id"] for chunk in candidates])
+        scored = [chunk for chunk in candidates if chunk["chunk_id"] in embeddings]
+        selected = [
+            scored[i]
+            for i in maximal_marginal_relevance(
+                query_embedding,
+                [embeddings[chunk["chunk_id"]] for chunk in scored],
+                k=top_k,
+                lambda_mult=mmr_lambda,
+            )
+        ]
+        selected += [chunk for chunk in candidates if chunk["chunk_id"] not in embeddings][:top_k - len(selected)]
+        logger.info(f"Selected {len(selected)} of {len(candidates)} candidates with MMR (lambda={mmr_lambda})")
+        return selected
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List, Any, Union, Dict, Optional
-from app.db.models import Conversation, Message
+import numpy as np
+from app.db.models import Conversation, Document, Message
 
 
 class BaseStorage(ABC):
@@ -13,7 +14,7 @@ class BaseStorage(ABC):
     """
 
     @abstractmethod
-    def store_document(self, name: str, document_metadata: dict, path: str) -> Any:
+    def store_document(self, name: str, document_metadata: dict, path: str, knowledge_base_id: Optional[str] = None) -> Any:
         """
         Store metadata about the original document in the storage backend.
 
@@ -21,6 +22,7 @@ class BaseStorage(ABC):
             name (str): The name of the document.
             document_metadata (dict): Additional metadata for the document.
             path (str): The path to the document on the local filesystem or cloud.
+            knowledge_base_id (Optional[str]): Knowledge base the document belongs to, if any.
 
         Returns:
             Any: A storage-specific object representing the stored document.
@@ -42,6 +44,67 @@ class BaseStorage(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_document_by_name(self, name: str) -> Optional[Document]:
+        """
+        Retrieve a stored document by its name.
+
+        Args:
+            name (str): The name of the document.
+
+        Returns:
+            Optional[Document]: The document if found, else None.
+        """
+        pass
+
+    @abstractmethod
+    def delete_document(self, document_id: int) -> int:
+        """
+        Delete a document together with its chunks.
+
+        Args:
+            document_id (int): The unique identifier of the stored document.
+
+        Returns:
+            int: The number of chunks deleted.
+        """
+        pass
+
+    @abstractmethod
+    def replace_chunks(
+        self,
+        document_id: int,
+        chunks: List[Dict[str, Union[str, dict]]],
+        embeddings: List[List[float]],
+        document_metadata: Optional[dict] = None,
+    ) -> None:
+        """
+        Replace all chunks of a document, e.g. after its source file changed.
+
+        Args:
+            document_id (int): The unique identifier of the stored document.
+            chunks (List[Dict]): The new text chunks and optional metadata.
+            embeddings (List[List[float]]): Vector embeddings corresponding to each chunk.
+            document_metadata (Optional[dict]): New metadata for the document, if it changed.
+
+        Returns:
+            None
+        """
+        pass
+
+    @abstractmethod
+    def get_chunk_embeddings(self, chunk_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Retrieve the stored embeddings of chunks, e.g. to diversify retrieved context.
+
+        Args:
+            chunk_ids (List[int]): IDs of the chunks.
+
+        Returns:
+            Dict[int, np.ndarray]: Embedding of each chunk found; chunks without one are left out.
+        """
+        pass
+
     @abstractmethod
     def get_conversation_by_id(self, conversation_id: str) -> Optional[Conversation]:
         """
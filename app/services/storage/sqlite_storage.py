@@ -1,10 +1,13 @@
 import logging
 from typing import List, Dict, Union, Optional
 from datetime import datetime
+import numpy as np
 from sqlalchemy.orm import Session
+from app.db.corpus import bump_generation, delete_document_chunks
 from app.db.database import SessionLocal
-from app.db.models import Document, Chunk, Conversation, Message
+from app.db.models import Document, Chunk, Conversation, KnowledgeBase, Message
 from app.services.storage.base_storage import BaseStorage
+from app.utils.embedding_codec import decode_embedding_rows
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +30,13 @@ class SQLiteStorage(BaseStorage):
         self.db: Session = SessionLocal()
         logger.info("Initialized SQLiteStorage with new DB session")
 
-    def store_document(self, name: str, document_metadata: dict, path: str) -> Document:
+    def store_document(
+        self,
+        name: str,
+        document_metadata: dict,
+        path: str,
+        knowledge_base_id: Optional[str] = None
+    ) -> Document:
         """
         Store a document entry in the database.
 
@@ -39,14 +48,21 @@ class SQLiteStorage(BaseStorage):
             A dictionary containing metadata about the document.
         path : str
             The file path or URI where the document is stored.
+        knowledge_base_id : Optional[str]
+            Knowledge base to add the document to; created if it does not exist yet.
 
         Returns
         -------
         Document
             The SQLAlchemy Document model instance representing the stored document.
         """
-        logger.info(f"Storing document: {name}, path: {path}")
-        document = Document(name=name, document_metadata=document_metadata, path=path)
+        logger.info(f"Storing document: {name}, path: {path}, knowledge_base_id: {knowledge_base_id}")
+        if knowledge_base_id and self.db.get(KnowledgeBase, knowledge_base_id) is None:
+            self.db.add(KnowledgeBase(id=knowledge_base_id, name=knowledge_base_id))
+            logger.info(f"Created knowledge base: {knowledge_base_id}")
+        document = Document(
+            name=name, document_metadata=document_metadata, path=path, knowledge_base_id=knowledge_base_id
+        )
         self.db.add(document)
         self.db.commit()
         self.db.refresh(document)
@@ -93,9 +109,112 @@ class SQLiteStorage(BaseStorage):
             )
             self.db.add(new_chunk)
             logger.debug(f"Added chunk index {i} for document ID {document_id}")
+        bump_generation(self.db)
         self.db.commit()
         logger.info(f"Committed all chunks for document ID: {document_id}")
 
+    def get_document_by_name(self, name: str) -> Optional[Document]:
+        """
+        Retrieve the document stored under a name.
+
+        Parameters
+        ----------
+        name : str
+            Name of the document.
+
+        Returns
+        -------
+        Optional[Document]
+            The first document stored under that name, or None.
+        """
+        return self.db.query(Document).filter(Document.name == name).order_by(Document.id).first()
+
+    def delete_document(self, document_id: int) -> int:
+        """
+        Delete a document and its chunks.
+
+        The chunks are tombstoned, so in-memory vector indexes stop returning them on
+        their next sync.
+
+        Parameters
+        ----------
+        document_id : int
+            The ID of the document to delete.
+
+        Returns
+        -------
+        int
+            Number of chunks deleted.
+        """
+        deleted = delete_document_chunks(self.db, document_id, delete_document=True)
+        self.db.commit()
+        logger.info(f"Deleted document ID {document_id} and {len(deleted)} chunks")
+        return len(deleted)
+
+    def replace_chunks(
+        self,
+        document_id: int,
+        chunks: List[Dict[str, Union[str, dict]]],
+        embeddings: List[List[float]],
+        document_metadata: Optional[dict] = None
+    ) -> None:
+        """
+        Replace all chunks of a document in a single transaction.
+
+        Parameters
+        ----------
+        document_id : int
+            The ID of the document whose chunks are replaced.
+        chunks : List[Dict[str, Union[str, dict]]]
+            The new chunk dictionaries, as for `store_chunks`.
+        embeddings : List[List[float]]
+            A list of embedding vectors corresponding to each chunk.
+        document_metadata : Optional[dict]
+            New metadata for the document (e.g. a new content hash), if given.
+
+        Returns
+        -------
+        None
+            Commits the deletion, the new chunks and the metadata together.
+        """
+        deleted = delete_document_chunks(self.db, document_id)
+        logger.info(f"Replacing {len(deleted)} chunks of document ID {document_id} with {len(chunks)} chunks")
+        if document_metadata is not None:
+            self.db.query(Document).filter(Document.id == document_id).update(
+                {Document.document_metadata: document_metadata}, synchronize_session=False
+            )
+        self.store_chunks(document_id, chunks, embeddings)
+
+    def get_chunk_embeddings(self, chunk_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Retrieve the stored embeddings of chunks in one query.
+
+        Parameters
+        ----------
+        chunk_ids : List[int]
+            IDs of the chunks.
+
+        Returns
+        -------
+        Dict[int, np.ndarray]
+            Decoded float32 embedding of each chunk found; chunks without one are left out.
+        """
+        if not chunk_ids:
+            return {}
+        rows = (
+            self.db.query(
+                Chunk.id,
+                Chunk.embedding_blob,
+                Chunk.embedding_dtype,
+                Chunk.embedding_dim,
+                Chunk.embedding_json,
+            )
+            .filter(Chunk.id.in_(list(chunk_ids)))
+            .all()
+        )
+        vectors = decode_embedding_rows([row[1:] for row in rows])
+        return {row[0]: vector for row, vector in zip(rows, vectors) if vector is not None}
+
     def get_conversation_by_id(self, conversation_id: str) -> Optional[Conversation]:
         """
         Retrieve a conversation by its unique identifier.
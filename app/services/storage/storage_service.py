@@ -1,5 +1,6 @@
 import logging
 from typing import List, Dict, Union, Optional
+import numpy as np
 from app.services.storage.base_storage import BaseStorage
 from app.db.models import Conversation, Message, Document
 
@@ -24,7 +25,7 @@ class StorageService:
         logger.info(f"StorageService initialized with backend: {backend.__class__.__name__}")
 
     # ========== Document Storage ==========
-    def store_document(self, name: str, document_metadata: dict, path: str):
+    def store_document(self, name: str, document_metadata: dict, path: str, knowledge_base_id: Optional[str] = None):
         """
         Store a document record via the backend storage.
 
@@ -36,6 +37,8 @@ class StorageService:
             Metadata dictionary associated with the document.
         path : str
             File path or URI where the document is stored.
+        knowledge_base_id : Optional[str]
+            Knowledge base the document belongs to, if any.
 
         Returns
         -------
@@ -43,7 +46,7 @@ class StorageService:
             Return value from the backend's store_document method.
         """
         logger.debug(f"Storing document '{name}' with metadata {document_metadata} at path '{path}'")
-        result = self.backend.store_document(name, document_metadata, path)
+        result = self.backend.store_document(name, document_metadata, path, knowledge_base_id=knowledge_base_id)
         logger.info(f"Document '{name}' stored successfully")
         return result
 
@@ -69,6 +72,84 @@ class StorageService:
         self.backend.store_chunks(document_id, chunks, embeddings)
         logger.info(f"Chunks stored successfully for document ID {document_id}")
 
+    def get_document_by_name(self, name: str) -> Optional[Document]:
+        """
+        Retrieve a document record by its name.
+
+        Parameters
+        ----------
+        name : str
+            The name of the document.
+
+        Returns
+        -------
+        Optional[Document]
+            The document if found, otherwise None.
+        """
+        logger.debug(f"Fetching document '{name}'")
+        return self.backend.get_document_by_name(name)
+
+    def delete_document(self, document_id: int) -> int:
+        """
+        Delete a document and its chunks.
+
+        Parameters
+        ----------
+        document_id : int
+            The ID of the document to delete.
+
+        Returns
+        -------
+        int
+            Number of chunks deleted.
+        """
+        logger.debug(f"Deleting document ID {document_id}")
+        deleted = self.backend.delete_document(document_id)
+        logger.info(f"Document ID {document_id} deleted with {deleted} chunks")
+        return deleted
+
+    def replace_chunks(
+        self,
+        document_id: int,
+        chunks: List[Dict[str, Union[str, dict]]],
+        embeddings: List[List[float]],
+        document_metadata: Optional[dict] = None
+    ):
+        """
+        Replace all chunks of a document and, optionally, its metadata.
+
+        Parameters
+        ----------
+        document_id : int
+            The ID of the parent document.
+        chunks : List[Dict[str, Union[str, dict]]]
+            List of chunk dictionaries containing text and metadata.
+        embeddings : List[List[float]]
+            List of embedding vectors corresponding to each chunk.
+        document_metadata : Optional[dict]
+            New metadata for the document, if it changed.
+        """
+        logger.debug(f"Replacing chunks of document ID {document_id} with {len(chunks)} chunks")
+        self.backend.replace_chunks(document_id, chunks, embeddings, document_metadata=document_metadata)
+        logger.info(f"Chunks replaced successfully for document ID {document_id}")
+
+    def get_chunk_embeddings(self, chunk_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Retrieve the stored embeddings of chunks.
+
+        Parameters
+        ----------
+        chunk_ids : List[int]
+            IDs of the chunks.
+
+        Returns
+        -------
+        Dict[int, np.ndarray]
+            Embedding of each chunk found; chunks without one are left out.
+        """
+        logger.debug(f"Fetching embeddings of {len(chunk_ids)} chunks")
+        return self.backend.get_chunk_embeddings(chunk_ids)
+
     # ========== Conversation & Messages ==========
     def get_conversation_by_id(self, conversation_id: str) -> Optional[Conversation]:
         """
@@ -0,0 +1,42 @@
+"""
+Binary (sign-bit) quantization for first-stage candidate generation.
+
+Each embedding is reduced to one bit per dimension (the sign of each component) and
+packed with `np.packbits`, 32x smaller than float32. Hamming distance between packed
+codes approximates angular distance and is computed with XOR plus popcount.
+"""
+
+import numpy as np
+
+
+def pack_signs(vectors: np.ndarray) -> np.ndarray:
+    """
+    Packs the sign bits of each vector into bytes.
+
+    Args:
+        vectors (np.ndarray): `(N, dim)` or `(dim,)` vectors.
+
+    Returns:
+        np.ndarray: `(N, ceil(dim / 8))` (or `(ceil(dim / 8),)`) uint8 array.
+    """
+    vectors = np.asarray(vectors)
+    return np.packbits(vectors > 0, axis=-1)
+
+
+def hamming_distances(packed: np.ndarray, query_bits: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """
+    Computes the Hamming distance from a packed query to every packed row.
+
+    Args:
+        packed (np.ndarray): `(N, B)` uint8 packed codes.
+        query_bits (np.ndarray): `(B,)` uint8 packed query.
+        block_size (int, optional): Rows processed at a time, bounding temporary memory. Defaults to 65536.
+
+    Returns:
+        np.ndarray: `(N,)` int32 distances.
+    """
+    distances = np.empty(len(packed), dtype=np.int32)
+    for start in range(0, len(packed), block_size):
+        block = np.bitwise_xor(packed[start:start + block_size], query_bits)
+        distances[start:start + len(block)] = np.bitwise_count(block).sum(axis=1, dtype=np.int32)
+    return distances
@@ -0,0 +1,113 @@
+"""
+Binary encoding for chunk embeddings.
+
+Embeddings are stored as raw little-endian float32 (or float16) bytes together with
+their dtype name and dimension, so they can be read back with `np.frombuffer`
+without any per-float text parsing.
+"""
+
+import os
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+# Storage dtype name -> little-endian NumPy dtype
+EMBEDDING_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+DEFAULT_EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+
+
+def _resolve_dtype(dtype: str) -> np.dtype:
+    try:
+        return EMBEDDING_DTYPES[dtype]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+def encode_embedding(embedding: Union[Sequence[float], np.ndarray], dtype: str = DEFAULT_EMBEDDING_DTYPE) -> bytes:
+    """
+    Encode an embedding vector as little-endian bytes.
+
+    Args:
+        embedding (Sequence[float] or np.ndarray): The vector to encode.
+        dtype (str): Storage dtype name ("float32" or "float16").
+
+    Returns:
+        bytes: Raw vector bytes (`dim * itemsize` long).
+    """
+    return np.asarray(embedding, dtype=_resolve_dtype(dtype)).tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: str = "float32", dim: Optional[int] = None) -> np.ndarray:
+    """
+    Decode bytes produced by `encode_embedding` into a float32 vector.
+
+    Args:
+        blob (bytes): Raw vector bytes.
+        dtype (str): Storage dtype name the bytes were written with.
+        dim (Optional[int]): Expected dimension; validated when given.
+
+    Returns:
+        np.ndarray: 1-D float32 array.
+
+    Raises:
+        ValueError: If the decoded length does not match `dim`.
+    """
+    vector = np.frombuffer(blob, dtype=_resolve_dtype(dtype))
+    if dim is not None and vector.shape[0] != dim:
+        raise ValueError(f"Embedding blob has {vector.shape[0]} values, expected {dim}")
+    return vector.astype(np.float32, copy=False)
+
+
+def decode_embeddings(blobs: List[bytes], dtype: str, dim: int) -> np.ndarray:
+    """
+    Decode many same-dtype, same-dimension blobs into a single (N, dim) float32 matrix.
+
+    The blobs are concatenated and decoded with one `np.frombuffer` call.
+
+    Args:
+        blobs (List[bytes]): Raw vector bytes, one per row.
+        dtype (str): Storage dtype name shared by all rows.
+        dim (int): Dimension shared by all rows.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(blobs), dim).
+    """
+    if not blobs:
+        return np.empty((0, dim), dtype=np.float32)
+    matrix = np.frombuffer(b"".join(blobs), dtype=_resolve_dtype(dtype)).reshape(len(blobs), dim)
+    return matrix.astype(np.float32, copy=False)
+
+
+def decode_embedding_rows(rows: Sequence[tuple]) -> Union[np.ndarray, List[Optional[np.ndarray]]]:
+    """
+    Decode `(blob, dtype, dim, legacy_json)` rows as selected from the `chunks` table.
+
+    When every row holds a blob of the same dtype and dimension (the common case once
+    migrated) the whole batch is decoded with a single `np.frombuffer` call and a 2-D
+    matrix is returned. Otherwise each row is decoded on its own, falling back to the
+    legacy JSON value, and rows without any embedding decode to None.
+
+    Args:
+        rows (Sequence[tuple]): `(embedding_blob, embedding_dtype, embedding_dim, embedding_json)` tuples.
+
+    Returns:
+        np.ndarray or List[Optional[np.ndarray]]: Decoded float32 vectors.
+    """
+    layouts = {(row[1], row[2]) for row in rows if row[0] is not None}
+    if len(layouts) == 1 and all(row[0] is not None for row in rows):
+        dtype, dim = layouts.pop()
+        return decode_embeddings([row[0] for row in rows], dtype or "float32", dim)
+
+    decoded = []
+    for blob, dtype, dim, legacy in rows:
+        if blob is not None:
+            decoded.append(decode_embedding(blob, dtype or "float32", dim))
+        elif legacy is not None:
+            decoded.append(np.asarray(legacy, dtype=np.float32))
+        else:
+            decoded.append(None)
+    return decoded
@@ -0,0 +1,51 @@
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+
+def recall_at_k(retrieved: Sequence[int], relevant: Sequence[int], k: int) -> float:
+    """
+    Fraction of the top-k relevant ids that appear in the top-k retrieved ids.
+
+    Args:
+        retrieved (Sequence[int]): Ids returned by the system under test, best first.
+        relevant (Sequence[int]): Ground-truth ids (e.g. exact search results), best first.
+        k (int): Cut-off.
+
+    Returns:
+        float: Recall in [0, 1]. Returns 1.0 when there is nothing relevant to find.
+    """
+    truth = set(relevant[:k])
+    if not truth:
+        return 1.0
+    return len(truth.intersection(retrieved[:k])) / len(truth)
+
+
+def mean_recall_at_k(
+    approximate: Callable[[List[float], int], List[Tuple[int, float]]],
+    exact: Callable[[List[float], int], List[Tuple[int, float]]],
+    queries: Iterable[List[float]],
+    k: int,
+) -> float:
+    """
+    Average recall@k of an approximate search function against an exact one.
+
+    Both callables take `(query_embedding, k)` and return `(chunk_id, score)` pairs,
+    which matches the `search` method of the vector indexes.
+
+    Args:
+        approximate (Callable): Search function under test.
+        exact (Callable): Reference (brute-force) search function.
+        queries (Iterable[List[float]]): Query vectors.
+        k (int): Cut-off.
+
+    Returns:
+        float: Mean recall@k over all queries.
+    """
+    recalls = [
+        recall_at_k(
+            [chunk_id for chunk_id, _ in approximate(query, k)],
+            [chunk_id for chunk_id, _ in exact(query, k)],
+            k,
+        )
+        for query in queries
+    ]
+    return sum(recalls) / len(recalls) if recalls else 1.0
@@ -0,0 +1,57 @@
+from typing import List
+
+import numpy as np
+
+from app.utils.similarity import l2_normalize
+
+DEFAULT_MMR_LAMBDA = 0.5
+
+
+def maximal_marginal_relevance(
+    query_embedding,
+    candidate_embeddings,
+    k: int,
+    lambda_mult: float = DEFAULT_MMR_LAMBDA,
+) -> List[int]:
+    """
+    Select a relevant but diverse subset of candidates with maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, s) for s in selected)`.
+    All similarities come from one query-candidate product and one candidate-candidate
+    matrix; each step only updates the running max-similarity vector with the row of the
+    candidate just picked, so selecting k of n costs O(n^2 * dim + k * n).
+
+    Args:
+        query_embedding (List[float] or np.ndarray): `(dim,)` query vector.
+        candidate_embeddings (List[List[float]] or np.ndarray): `(n, dim)` candidate vectors.
+        k (int): Number of candidates to select.
+        lambda_mult (float): Trade-off between relevance (1.0) and diversity (0.0). Defaults to 0.5.
+
+    Returns:
+        List[int]: Indices of the selected candidates, in selection order. The first one
+            is always the most relevant candidate (ties by position).
+    """
+    candidates = l2_normalize(candidate_embeddings)
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    relevance = candidates @ l2_normalize(query_embedding)
+    similarity = candidates @ candidates.T
+
+    selected: List[int] = []
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    for _ in range(k):
+        if selected:
+            scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
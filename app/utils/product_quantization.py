@@ -0,0 +1,182 @@
+"""
+Product quantization (PQ) for embedding compression.
+
+A vector is split into `code_size` sub-vectors; each sub-vector is replaced by the id of
+its nearest centroid in a 256-entry codebook trained for that subspace, so every vector
+becomes `code_size` bytes. Inner products against a query are then approximated with
+asymmetric distance computation (ADC): the query is compared once with every codebook
+centroid, and a code's score is the sum of `code_size` table lookups.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+MIN_CODE_SIZE = 8
+MAX_CODE_SIZE = 64
+CODEBOOK_SIZE = 256
+
+
+class ProductQuantizer:
+    """
+    Trains per-subspace codebooks and encodes vectors to `uint8` codes.
+
+    Vectors whose dimension is not a multiple of `code_size` are zero-padded, which does
+    not change inner products.
+
+    Attributes:
+        code_size (int): Bytes per encoded vector (number of subspaces).
+        dim (Optional[int]): Input dimension, set by `train`.
+        codebooks (Optional[np.ndarray]): `(code_size, 256, sub_dim)` float32 centroids.
+    """
+
+    def __init__(self, code_size: int = 48, seed: int = 42):
+        """
+        Initializes an untrained quantizer.
+
+        Args:
+            code_size (int, optional): Bytes per code, between 8 and 64. Defaults to 48.
+            seed (int, optional): Random seed for k-means. Defaults to 42.
+
+        Raises:
+            ValueError: If `code_size` is out of range.
+        """
+        if not MIN_CODE_SIZE <= code_size <= MAX_CODE_SIZE:
+            raise ValueError(f"code_size must be between {MIN_CODE_SIZE} and {MAX_CODE_SIZE}, got {code_size}")
+        self.code_size = code_size
+        self.seed = seed
+        self.dim: Optional[int] = None
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def sub_dim(self) -> int:
+        return -(-self.dim // self.code_size)
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """Pads vectors to `code_size * sub_dim` and reshapes to (N, code_size, sub_dim)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match quantizer dimension {self.dim}")
+        padded = np.zeros((len(vectors), self.code_size * self.sub_dim), dtype=np.float32)
+        padded[:, :self.dim] = vectors
+        return padded.reshape(len(vectors), self.code_size, self.sub_dim)
+
+    def train(self, vectors: np.ndarray, max_iter: int = 25) -> None:
+        """
+        Learns one k-means codebook per subspace.
+
+        Args:
+            vectors (np.ndarray): `(N, dim)` training vectors.
+            max_iter (int, optional): k-means iterations per subspace. Defaults to 25.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dim = vectors.shape[1]
+        parts = self._split(vectors)
+        n_centroids = min(CODEBOOK_SIZE, len(vectors))
+
+        codebooks = np.zeros((self.code_size, CODEBOOK_SIZE, self.sub_dim), dtype=np.float32)
+        for j in range(self.code_size):
+            kmeans = KMeans(n_clusters=n_centroids, n_init=1, max_iter=max_iter, random_state=self.seed)
+            kmeans.fit(parts[:, j, :])
+            codebooks[j, :n_centroids] = kmeans.cluster_centers_
+            # Unused slots repeat the first centroid so they are never a strictly better match
+            codebooks[j, n_centroids:] = kmeans.cluster_centers_[0]
+        self.codebooks = codebooks
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Encodes vectors to their nearest codebook entries.
+
+        Args:
+            vectors (np.ndarray): `(N, dim)` vectors.
+
+        Returns:
+            np.ndarray: `(N, code_size)` uint8 codes.
+        """
+        parts = self._split(vectors)
+        codes = np.empty((len(parts), self.code_size), dtype=np.uint8)
+        for j in range(self.code_size):
+            sub = parts[:, j, :]
+            centroids = self.codebooks[j]
+            # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+            distances = (centroids * centroids).sum(axis=1) - 2.0 * (sub @ centroids.T)
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Reconstructs approximate vectors from codes.
+
+        Args:
+            codes (np.ndarray): `(N, code_size)` uint8 codes.
+
+        Returns:
+            np.ndarray: `(N, dim)` float32 vectors.
+        """
+        parts = self.codebooks[np.arange(self.code_size), codes.astype(np.intp)]
+        return parts.reshape(len(codes), -1)[:, :self.dim]
+
+    def lookup_table(self, query: np.ndarray) -> np.ndarray:
+        """
+        Precomputes the inner product of each query sub-vector with every centroid.
+
+        Args:
+            query (np.ndarray): `(dim,)` query vector.
+
+        Returns:
+            np.ndarray: `(code_size, 256)` float32 table.
+        """
+        parts = self._split(query)[0]
+        return np.einsum("jcd,jd->jc", self.codebooks, parts)
+
+    def adc_scores(self, codes: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """
+        Approximates inner products between a query and encoded vectors.
+
+        Args:
+            codes (np.ndarray): `(N, code_size)` uint8 codes.
+            table (np.ndarray): Lookup table from `lookup_table`.
+
+        Returns:
+            np.ndarray: `(N,)` float32 approximate scores.
+        """
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.code_size):
+            scores += table[j, codes[:, j]]
+        return scores
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Approximates inner products between a query and encoded vectors via ADC.
+
+        Args:
+            codes (np.ndarray): `(N, code_size)` uint8 codes.
+            query (np.ndarray): `(dim,)` query vector.
+
+        Returns:
+            np.ndarray: `(N,)` float32 approximate scores.
+        """
+        return self.adc_scores(codes, self.lookup_table(query))
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Returns the trained state as arrays for `np.savez`."""
+        return {
+            "pq_params": np.asarray([self.code_size, self.dim, self.seed], dtype=np.int64),
+            "pq_codebooks": self.codebooks,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ProductQuantizer":
+        """Rebuilds a quantizer from arrays written by `to_arrays`."""
+        code_size, dim, seed = (int(v) for v in arrays["pq_params"])
+        quantizer = cls(code_size=code_size, seed=seed)
+        quantizer.dim = dim
+        quantizer.codebooks = np.asarray(arrays["pq_codebooks"], dtype=np.float32)
+        return quantizer
@@ -0,0 +1,32 @@
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = RRF_K,
+) -> List[Tuple[Hashable, float]]:
+    """
+    Merge several rankings with (weighted) reciprocal-rank fusion.
+
+    An item scores `sum(weight_i / (k + rank_i))` over the rankings it appears in, with
+    1-based ranks. Only ranks are used, so rankings whose scores live on different
+    scales (cosine similarity, BM25) combine without calibration.
+
+    Args:
+        rankings (Sequence[Sequence[Hashable]]): Item ids of each ranking, best first.
+        weights (Optional[Sequence[float]]): Weight of each ranking. Defaults to 1.0 each.
+        k (int): Rank offset damping the influence of top ranks. Defaults to 60.
+
+    Returns:
+        List[Tuple[Hashable, float]]: (item, fused score) pairs, best first; ties keep
+            the order in which items were first seen.
+    """
+    weights = weights if weights is not None else [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
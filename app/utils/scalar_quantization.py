@@ -0,0 +1,120 @@
+"""
+Int8 scalar quantization for embedding compression.
+
+Each dimension is calibrated to its observed [min, max] range and mapped linearly onto
+the 256 int8 levels, so a vector costs one byte per dimension (4x smaller than
+float32). Query scoring quantizes the per-dimension query weights as well and runs an
+integer matrix-vector product with int32 accumulation.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+INT8_LEVELS = 255
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension min/max int8 quantizer.
+
+    A component `x` in dimension `d` is stored as `c = round((x - min_d) / scale_d) - 128`
+    with `scale_d = (max_d - min_d) / 255`; values outside the calibrated range are clipped.
+
+    Attributes:
+        minimum (Optional[np.ndarray]): Per-dimension calibrated minimum.
+        scale (Optional[np.ndarray]): Per-dimension step size.
+        block_size (int): Rows converted to int32 at a time while scoring.
+    """
+
+    def __init__(self, block_size: int = 16384):
+        """
+        Initializes an uncalibrated quantizer.
+
+        Args:
+            block_size (int, optional): Rows scored per block, bounding temporary memory. Defaults to 16384.
+        """
+        self.block_size = block_size
+        self.minimum: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        """
+        Calibrates the per-dimension range from sample vectors.
+
+        Args:
+            vectors (np.ndarray): `(N, dim)` calibration vectors.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        minimum = vectors.min(axis=0)
+        scale = (vectors.max(axis=0) - minimum) / INT8_LEVELS
+        scale[scale == 0] = 1.0
+        self.minimum, self.scale = minimum, scale.astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Quantizes vectors to int8.
+
+        Args:
+            vectors (np.ndarray): `(N, dim)` vectors.
+
+        Returns:
+            np.ndarray: `(N, dim)` int8 codes.
+        """
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimum) / self.scale)
+        return (np.clip(levels, 0, INT8_LEVELS) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Reconstructs approximate vectors from int8 codes.
+
+        Args:
+            codes (np.ndarray): `(N, dim)` int8 codes.
+
+        Returns:
+            np.ndarray: `(N, dim)` float32 vectors.
+        """
+        return (codes.astype(np.float32) + 128) * self.scale + self.minimum
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Approximates inner products between a query and encoded vectors.
+
+        Since `x_d ~= scale_d * c_d + (min_d + 128 * scale_d)`, the inner product is
+        `sum_d (scale_d * q_d) * c_d` plus a query-only constant. The weights
+        `scale_d * q_d` are quantized to int8 so the scan is an integer product.
+
+        Args:
+            codes (np.ndarray): `(N, dim)` int8 codes.
+            query (np.ndarray): `(dim,)` query vector.
+
+        Returns:
+            np.ndarray: `(N,)` float32 approximate scores.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        weights = query * self.scale
+        offset = float(query @ (self.minimum + 128 * self.scale))
+        weight_scale = float(np.abs(weights).max()) / 127 or 1.0
+        int_weights = np.rint(weights / weight_scale).astype(np.int32)
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            block = codes[start:start + self.block_size].astype(np.int32)
+            scores[start:start + len(block)] = block @ int_weights
+        return scores * weight_scale + offset
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Returns the calibration as arrays for `np.savez`."""
+        return {"sq_minimum": self.minimum, "sq_scale": self.scale}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "ScalarQuantizer":
+        """Rebuilds a quantizer from arrays written by `to_arrays`."""
+        quantizer = cls()
+        quantizer.minimum = np.asarray(arrays["sq_minimum"], dtype=np.float32)
+        quantizer.scale = np.asarray(arrays["sq_scale"], dtype=np.float32)
+        return quantizer
@@ -25,4 +25,76 @@ def cosine_similarity(vec1, vec2) -> float:
     dot_product = np.dot(vec1, vec2)
     similarity = dot_product / (norm_vec1 * norm_vec2)
 
-    return similarity
\ No newline at end of file
+    return similarity
+
+def l2_normalize(vectors) -> np.ndarray:
+    """
+    Scale vectors to unit L2 norm.
+
+    Zero vectors are returned unchanged, so they score 0.0 against everything.
+
+    Args:
+        vectors (List[float] or np.ndarray): A `(dim,)` vector or `(N, dim)` matrix.
+
+    Returns:
+        np.ndarray: float32 array of the same shape with unit-norm rows.
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+def cosine_similarity_matrix(query, matrix, normalized=True) -> np.ndarray:
+    """
+    Compute the cosine similarity between a query and every row of a matrix.
+
+    Rows stored at unit norm are scored with a raw dot product; only rows flagged as
+    not normalized (e.g. legacy rows awaiting the normalization backfill) pay for a
+    norm computation.
+
+    Args:
+        query (List[float] or np.ndarray): `(dim,)` query vector; normalized here.
+        matrix (np.ndarray): `(N, dim)` candidate vectors.
+        normalized (bool or np.ndarray): True if every row is unit-norm, False if none
+            are, or a boolean array flagging the unit-norm rows.
+
+    Returns:
+        np.ndarray: `(N,)` float32 similarities. Zero rows score 0.0.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scores = matrix @ l2_normalize(query)
+    if normalized is True:
+        return scores
+
+    stale = np.ones(len(matrix), dtype=bool) if normalized is False else ~np.asarray(normalized, dtype=bool)
+    if stale.any():
+        norms = np.linalg.norm(matrix[stale], axis=1)
+        scores[stale] = np.divide(scores[stale], norms, out=np.zeros_like(norms), where=norms > 0)
+    return scores
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the indices of the k highest scores, best first.
+
+    Uses `np.argpartition` so only the k candidates are fully sorted. Ties are broken
+    by position, matching a stable descending sort of the whole array.
+
+    Args:
+        scores (np.ndarray): 1-D array of scores.
+        k (int): Number of indices to return.
+
+    Returns:
+        np.ndarray: Up to k indices into `scores`.
+    """
+    n = scores.shape[0]
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(above)]
+    candidates = np.concatenate([above, ties])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
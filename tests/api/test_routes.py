@@ -13,7 +13,10 @@ from app.api.dependencies import (
 # ----- Step 1: Dummy service implementations for testing -----
 
 class DummyRagService:
-    def chat(self, query, conversation_id=None, knowledge_base_id=None, top_k=5, min_score=0.0):
+    calls = []
+
+    def chat(self, query, conversation_id=None, knowledge_base_id=None, top_k=5, min_score=0.0, mmr_lambda=None, fetch_k=None):
+        self.calls.append({"mmr_lambda": mmr_lambda, "fetch_k": fetch_k})
         return {
             "answer": f"Mocked response for: {query}",
             "conversation_id": conversation_id or "dummy-convo-id",
@@ -32,16 +35,26 @@ class DummyEmbeddingService:
         return [0.1] * 768  # Simulated embedding vector
 
 class DummyVectorStoreService:
-    def query(self, query_embedding, top_k, filters, min_score):
+    last_plan = {"strategy": "prefilter", "estimated_matches": 3}
+    batches = []
+
+    def query(self, query_embedding, top_k, filters, min_score, knowledge_base_id=None, **search_params):
         return [
             {
                 "chunk_id": 123,
                 "text": "Relevant chunk text",
-                "chunk_metadata": {"source": "test"},
+                "chunk_metadata": {"source": "test", **search_params},
                 "similarity": 0.95
             }
         ]
 
+    def query_batch(self, query_embeddings, top_k, filters, min_score, knowledge_base_id=None, **search_params):
+        self.batches.append((len(query_embeddings), top_k, knowledge_base_id))
+        return [
+            [{"chunk_id": i, "text": f"chunk for query {i}", "chunk_metadata": filters, "similarity": 0.5}]
+            for i in range(len(query_embeddings))
+        ]
+
 # ----- Step 2: Create FastAPI app and override dependencies -----
 
 app = FastAPI()
@@ -73,6 +86,15 @@ def test_chat_missing_query():
     response = client.post("/chat", json={})
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
+def test_chat_forwards_diversity_settings():
+    DummyRagService.calls.clear()
+    response = client.post("/chat", json={"query": "renewal terms", "mmr_lambda": 0.3, "fetch_k": 12})
+    assert response.status_code == status.HTTP_200_OK
+    assert DummyRagService.calls == [{"mmr_lambda": 0.3, "fetch_k": 12}]
+
+    response = client.post("/chat", json={"query": "renewal terms", "mmr_lambda": 1.5})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
 def test_search_success():
     payload = {
         "query": "find something relevant",
@@ -100,3 +122,88 @@ def test_search_invalid_body():
     response = client.post("/search", json={"limit": 3})
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
+
+def test_search_forwards_nprobe():
+    response = client.post("/search", json={"query": "example query", "nprobe": 16})
+    assert response.status_code == 200
+    assert response.json()["results"][0]["metadata"]["nprobe"] == 16
+
+
+def test_search_returns_plan_only_in_debug_mode():
+    response = client.post("/search", json={"query": "example query", "knowledge_base_id": "7"})
+    assert response.json()["debug"] is None
+
+    response = client.post("/search", json={"query": "example query", "knowledge_base_id": "7", "debug": True})
+    assert response.status_code == 200
+    assert response.json()["debug"]["plan"]["strategy"] == "prefilter"
+
+
+def test_index_stats_reports_partition_counters():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.api.dependencies import get_db
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    app.dependency_overrides[get_db] = lambda: sessionmaker(bind=engine)()
+    try:
+        response = client.get("/index/stats")
+    finally:
+        del app.dependency_overrides[get_db]
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["hits"] == body["misses"] == body["evictions"] == 0
+    assert body["resident_partitions"] == 0 and body["resident_bytes"] == 0
+
+
+def test_cache_stats_reports_query_cache_counters():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.api.dependencies import get_db
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    app.dependency_overrides[get_db] = lambda: sessionmaker(bind=engine)()
+    try:
+        response = client.get("/cache/stats")
+    finally:
+        del app.dependency_overrides[get_db]
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["hits"] == body["misses"] == body["evictions"] == body["entries"] == body["bytes"] == 0
+    assert body["hit_ratio"] == 0.0 and body["max_entries"] > 0
+
+
+def test_search_batch_groups_searches_with_shared_parameters():
+    DummyVectorStoreService.batches.clear()
+    searches = [
+        {"query": "first", "limit": 3},
+        {"query": "scoped", "limit": 3, "knowledge_base_id": "kb"},
+        {"query": "second", "limit": 3},
+    ]
+    response = client.post("/search/batch", json={"searches": searches})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["query"] for r in results] == ["first", "scoped", "second"]
+    assert [r["results"][0]["chunk_id"] for r in results] == [0, 0, 1]
+    assert sorted(DummyVectorStoreService.batches) == [(1, 3, "kb"), (2, 3, None)]
+
+
+def test_search_batch_requires_searches():
+    response = client.post("/search/batch", json={"searches": []})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_shard_search_scores_embeddings_of_this_slice():
+    DummyVectorStoreService.batches.clear()
+    payload = {"query_embeddings": [[0.1, 0.2], [0.3, 0.4]], "top_k": 4, "knowledge_base_id": "kb"}
+    response = client.post("/shard/search", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["shard"] == "0/1"
+    assert [hits[0]["chunk_id"] for hits in data["results"]] == [0, 1]
+    assert DummyVectorStoreService.batches == [(2, 4, "kb")]
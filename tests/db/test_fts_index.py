@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app.db.fts_index import FTS_TABLE, backfill_fts_index, ensure_fts_index, fts_search, match_expression
+from app.db.models import Base, Chunk, Document, KnowledgeBase
+from app.db.vector.hybrid_vector_store import HybridVectorStore
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+
+
+@pytest.fixture
+def db_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rag.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _hits(db_session, query, **kwargs):
+    return [chunk_id for chunk_id, _ in fts_search(db_session, query, 10, **kwargs)]
+
+
+def test_match_expression_quotes_words():
+    assert match_expression('notice AND "NEAR(" -x') == '"and" OR "near" OR "notice" OR "x"'
+    assert match_expression("?!") is None
+
+
+def test_backfills_existing_chunks_and_tracks_changes_with_triggers(db_session):
+    db_session.add_all([
+        Chunk(id=1, document_id=1, chunk_index=0, text="termination notice period"),
+        Chunk(id=2, document_id=1, chunk_index=1, text="renewal terms"),
+    ])
+    db_session.commit()
+
+    engine = db_session.get_bind()
+    ensure_fts_index(engine)
+    assert inspect(engine).has_table(FTS_TABLE)
+    assert _hits(db_session, "termination") == [1]
+
+    db_session.add(Chunk(id=3, document_id=2, chunk_index=0, text="notice of termination"))
+    db_session.get(Chunk, 2).text = "renewal notice"
+    db_session.delete(db_session.get(Chunk, 1))
+    db_session.commit()
+
+    assert _hits(db_session, "termination") == [3]
+    assert sorted(_hits(db_session, "notice")) == [2, 3]
+    assert _hits(db_session, "period") == []
+    assert backfill_fts_index(engine) == 2
+    assert sorted(_hits(db_session, "notice")) == [2, 3]
+
+
+def test_ranks_by_bm25_and_applies_filters(db_session):
+    ensure_fts_index(db_session.get_bind())
+    db_session.add_all([
+        Chunk(id=1, document_id=1, chunk_index=0, text="notice", chunk_metadata={"section": "a"}),
+        Chunk(id=2, document_id=1, chunk_index=1, text="termination notice: termination", chunk_metadata={"section": "b"}),
+        Chunk(id=3, document_id=2, chunk_index=0, text="termination", chunk_metadata={"section": "b", "page": 3}),
+        Chunk(id=4, document_id=2, chunk_index=1, text="unrelated text", chunk_metadata={"section": "b"}),
+    ])
+    db_session.commit()
+
+    hits = fts_search(db_session, "termination notice", 10)
+    assert [chunk_id for chunk_id, _ in hits][0] == 2
+    assert sorted(chunk_id for chunk_id, _ in hits) == [1, 2, 3]
+    assert all(score > 0 for _, score in hits)
+
+    assert _hits(db_session, "termination notice", document_ids=[2]) == [3]
+    assert _hits(db_session, "termination notice", document_ids=[]) == []
+    assert sorted(_hits(db_session, "termination notice", filters={"section": "b"})) == [2, 3]
+    assert _hits(db_session, "termination notice", filters={"page": "3"}) == [3]
+
+
+def test_hybrid_store_keyword_search_with_fts5_backend(db_session):
+    kb = KnowledgeBase(id="contracts", name="Contracts")
+    db_session.add_all([kb, Document(id=1, name="c", path="/c", knowledge_base=kb), Document(id=2, name="o", path="/o")])
+    db_session.commit()
+    store = HybridVectorStore(db_session, InMemoryVectorStore(db_session), keyword_backend="fts5")
+    store.store_chunks(1, ["termination notice: termination", "notice period"], [[1.0, 0.0], [0.0, 1.0]])
+    store.store_chunks(2, ["termination elsewhere"], [[1.0, 1.0]])
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    results = store.keyword_search("termination notice", top_k=5, knowledge_base_id="contracts")
+
+    assert [r["text"] for r in results] == ["termination notice: termination", "notice period"]
+    assert results[0]["similarity"] == 1.0 and 0 < results[1]["similarity"] < 1.0
+    assert any("MATCH" in sql for sql in statements)
+    assert not any("LIKE" in sql.upper() for sql in statements)
+
+
+def test_hybrid_store_rejects_unknown_keyword_backend(db_session):
+    with pytest.raises(ValueError):
+        HybridVectorStore(db_session, InMemoryVectorStore(db_session), keyword_backend="lucene")
+
+
+def test_hybrid_store_falls_back_to_bm25_without_fts5():
+    from unittest.mock import MagicMock
+
+    session = MagicMock()
+    session.get_bind.return_value.dialect.name = "postgresql"
+    store = HybridVectorStore(session, MagicMock(), keyword_backend="fts5")
+    assert store.keyword_backend == "bm25"
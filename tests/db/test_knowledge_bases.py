@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.corpus import current_generation
+from app.db.knowledge_bases import assign_documents, resolve_document_ids
+from app.db.models import Base, Document, KnowledgeBase
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_resolves_documents_of_a_knowledge_base(db_session):
+    kb = KnowledgeBase(id="kb-a", name="A")
+    db_session.add_all([
+        kb,
+        Document(id=1, name="one", path="/1", knowledge_base=kb),
+        Document(id=2, name="two", path="/2"),
+        Document(id=3, name="three", path="/3", knowledge_base=kb),
+    ])
+    db_session.commit()
+
+    assert resolve_document_ids(db_session, "kb-a") == [1, 3]
+    assert [d.id for d in kb.documents] == [1, 3]
+    assert resolve_document_ids(db_session, "missing") == []
+
+
+def test_numeric_id_of_an_unassigned_document_selects_that_document(db_session):
+    kb = KnowledgeBase(id="kb-a", name="A")
+    db_session.add_all([
+        kb,
+        Document(id=1, name="one", path="/1", knowledge_base=kb),
+        Document(id=2, name="two", path="/2"),
+    ])
+    db_session.commit()
+
+    assert resolve_document_ids(db_session, "2") == [2]
+    assert resolve_document_ids(db_session, 2) == [2]
+    # Chunks can reference document ids without a Document row
+    assert resolve_document_ids(db_session, 9) == [9]
+    # A document that belongs to a knowledge base is only reachable through it
+    assert resolve_document_ids(db_session, 1) == []
+
+
+def test_assigning_documents_bumps_the_generation(db_session):
+    db_session.add_all([
+        KnowledgeBase(id="kb-a", name="A"),
+        Document(id=1, name="one", path="/1", knowledge_base_id="kb-a"),
+        Document(id=2, name="two", path="/2"),
+    ])
+    db_session.commit()
+
+    assert assign_documents(db_session, [1, 2], "kb-a") == 1
+    db_session.commit()
+    assert resolve_document_ids(db_session, "kb-a") == [1, 2]
+    assert current_generation(db_session) == 1
+
+    # Re-assigning to the same knowledge base changes nothing
+    assert assign_documents(db_session, [1, 2], "kb-a") == 0
+    assert current_generation(db_session) == 1
+
+    assert assign_documents(db_session, [1], None) == 1
+    db_session.commit()
+    assert resolve_document_ids(db_session, "kb-a") == [2]
+    assert current_generation(db_session) == 2
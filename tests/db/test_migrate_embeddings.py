@@ -0,0 +1,144 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Chunk
+from app.db.migrate_embeddings import (
+    migrate_embeddings,
+    normalize_embeddings,
+    rebuild_chunks_with_autoincrement,
+    upgrade_schema,
+)
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database whose `chunks` table predates the binary embedding columns."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE chunks (id INTEGER PRIMARY KEY, document_id INTEGER, chunk_index INTEGER, "
+            "text TEXT NOT NULL, embedding JSON, created_at DATETIME, chunk_metadata JSON)"
+        ))
+        for i in range(1, 8):
+            conn.execute(
+                text("INSERT INTO chunks (id, document_id, chunk_index, text, embedding) VALUES (:id, 1, :id, 't', :emb)"),
+                {"id": i, "emb": json.dumps([float(i), 0.5, -1.0])},
+            )
+        conn.execute(text("INSERT INTO chunks (id, document_id, chunk_index, text, embedding) VALUES (8, 1, 8, 't', NULL)"))
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_schema_adds_missing_columns(legacy_engine):
+    upgrade_schema(legacy_engine)
+    columns = {c["name"] for c in inspect(legacy_engine).get_columns("chunks")}
+    assert {"embedding_blob", "embedding_dtype", "embedding_dim", "embedding_normalized"} <= columns
+
+    # Idempotent
+    upgrade_schema(legacy_engine)
+
+
+def test_upgrade_schema_adds_knowledge_base_column_to_documents(legacy_engine):
+    with legacy_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE documents (id INTEGER PRIMARY KEY, name TEXT, path TEXT)"))
+    upgrade_schema(legacy_engine)
+    columns = {c["name"] for c in inspect(legacy_engine).get_columns("documents")}
+    assert "knowledge_base_id" in columns
+
+
+def test_migrate_converts_rows_in_batches(legacy_engine):
+    converted = migrate_embeddings(legacy_engine, batch_size=3)
+    assert converted == 7
+
+    session = sessionmaker(bind=legacy_engine)()
+    chunks = session.query(Chunk).order_by(Chunk.id).all()
+    assert chunks[0].embedding_json is None
+    assert chunks[0].embedding_dtype == "float32"
+    assert chunks[0].embedding_dim == 3
+    assert chunks[2].embedding == [3.0, 0.5, -1.0]
+    assert chunks[7].embedding is None
+    session.close()
+
+    # Re-running finds nothing left to convert
+    assert migrate_embeddings(legacy_engine, batch_size=3) == 0
+
+
+def test_migrate_float16(legacy_engine):
+    migrate_embeddings(legacy_engine, dtype="float16")
+    with legacy_engine.connect() as conn:
+        blob, dtype = conn.execute(text("SELECT embedding_blob, embedding_dtype FROM chunks WHERE id = 1")).one()
+    assert dtype == "float16"
+    assert len(blob) == 3 * 2
+
+
+def test_migrate_rejects_unknown_dtype(legacy_engine):
+    with pytest.raises(ValueError):
+        migrate_embeddings(legacy_engine, dtype="int8")
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_normalize_backfills_unit_norm_embeddings(legacy_engine, dtype):
+    migrate_embeddings(legacy_engine, dtype=dtype)
+    assert normalize_embeddings(legacy_engine, batch_size=3) == 7
+
+    session = sessionmaker(bind=legacy_engine)()
+    chunks = session.query(Chunk).order_by(Chunk.id).all()
+    expected = np.array([3.0, 0.5, -1.0]) / np.linalg.norm([3.0, 0.5, -1.0])
+    assert chunks[2].embedding_normalized
+    assert chunks[2].embedding == pytest.approx(expected.tolist(), abs=1e-3)
+    assert all(np.linalg.norm(c.embedding) == pytest.approx(1.0, abs=1e-3) for c in chunks[:7])
+    assert not chunks[7].embedding_normalized
+    session.close()
+
+    # Re-running finds nothing left to normalize
+    assert normalize_embeddings(legacy_engine) == 0
+
+
+def test_upgrade_schema_stops_reusing_ids_of_replaced_chunks(tmp_path):
+    # A database created before chunk ids were AUTOINCREMENT
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE chunks (id INTEGER PRIMARY KEY, document_id INTEGER, chunk_index INTEGER, "
+            "text TEXT NOT NULL, embedding JSON, created_at DATETIME, chunk_metadata JSON)"
+        ))
+        conn.execute(text("CREATE TABLE chunk_log (chunk_id INTEGER)"))
+        conn.execute(text(
+            "CREATE TRIGGER chunk_log_ai AFTER INSERT ON chunks BEGIN INSERT INTO chunk_log VALUES (new.id); END"
+        ))
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        assert "AUTOINCREMENT" in conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'chunks'")).scalar()
+
+    session = sessionmaker(bind=engine)()
+    store = InMemoryVectorStore(session)
+    store.store_chunks(1, ["old one", "old two"], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    store.replace_chunks(1, ["new one", "new two"], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    assert [chunk.id for chunk in session.query(Chunk).order_by(Chunk.id)] == [3, 4]
+    assert [hit["text"] for hit in store.query([1.0, 0.0, 0.0], top_k=1)] == ["new one"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM chunk_log")).scalar() == 4
+    session.close()
+    engine.dispose()
+
+
+def test_rebuild_keeps_rows_and_seeds_past_tombstoned_ids(legacy_engine):
+    Base.metadata.create_all(bind=legacy_engine)
+    with legacy_engine.begin() as conn:
+        conn.execute(text("INSERT INTO chunk_tombstones (chunk_id) VALUES (20)"))
+    upgrade_schema(legacy_engine)
+
+    assert rebuild_chunks_with_autoincrement(legacy_engine) is False
+    with legacy_engine.begin() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM chunks")).scalar() == 8
+        assert conn.execute(text("SELECT embedding FROM chunks WHERE id = 3")).scalar() == json.dumps([3.0, 0.5, -1.0])
+        conn.execute(text("INSERT INTO chunks (document_id, chunk_index, text) VALUES (1, 9, 't')"))
+        assert conn.execute(text("SELECT MAX(id) FROM chunks")).scalar() == 21
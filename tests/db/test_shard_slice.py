@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import shard_slice
+from app.db.models import Base
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.matrix_index import iter_chunk_embeddings
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _document_ids(db_session):
+    return sorted({document_id for _, document_ids, _ in iter_chunk_embeddings(db_session, 0) for document_id in document_ids})
+
+
+def test_default_slice_is_the_whole_corpus(db_session):
+    store = InMemoryVectorStore(db_session)
+    for document_id in range(1, 5):
+        store.store_chunks(document_id, ["a", "b"], np.eye(2).tolist())
+
+    assert shard_slice.shard_label() == "0/1"
+    assert _document_ids(db_session) == [1, 2, 3, 4]
+
+
+def test_shard_reads_only_its_documents(db_session, monkeypatch):
+    store = InMemoryVectorStore(db_session)
+    for document_id in range(1, 8):
+        store.store_chunks(document_id, ["a"], [[1.0, 0.0]])
+
+    monkeypatch.setattr(shard_slice, "SHARD_COUNT", 3)
+    monkeypatch.setattr(shard_slice, "SHARD_INDEX", 1)
+    assert shard_slice.shard_label() == "1/3"
+    assert _document_ids(db_session) == [1, 4, 7]
+
+
+def test_invalid_slice_is_rejected(monkeypatch):
+    monkeypatch.setattr(shard_slice, "SHARD_COUNT", 2)
+    monkeypatch.setattr(shard_slice, "SHARD_INDEX", 2)
+    with pytest.raises(ValueError):
+        shard_slice.shard_slice()
@@ -88,3 +88,13 @@ def test_query_min_score_threshold():
     results = store.query(query_embedding=[0.5]*10, min_score=0.8)
     assert len(results) == 1
     assert results[0]["text"] == "chunk high"
+
+
+def test_query_batch_defaults_to_one_query_per_embedding():
+    store = DummyVectorStore()
+    store.store_chunks(1, [{"text": "a", "metadata": {"section": 1}}, {"text": "b", "metadata": {"section": 2}}],
+                       [[0.1] * 10, [0.2] * 10])
+
+    batch = store.query_batch([[0.1] * 10, [0.2] * 10], top_k=5, filters={"section": 2})
+
+    assert [[chunk["text"] for chunk in results] for results in batch] == [["b"], ["b"]]
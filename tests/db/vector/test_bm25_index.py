@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Chunk
+from app.db.vector.bm25_index import BM25Index, get_bm25_index, tokenize
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Clause 7, Termination-notice!") == ["clause", "7", "termination", "notice"]
+    assert tokenize(None) == []
+
+
+def test_scores_match_reference_bm25():
+    texts = ["the cat sat", "the cat and the other cat", "a dog barked", "the dog and the cat"]
+    index = BM25Index(k1=1.5, b=0.75)
+    index.add([1, 2, 3, 4], [1, 1, 1, 1], texts)
+
+    docs = [tokenize(text) for text in texts]
+    avg_length = sum(len(doc) for doc in docs) / len(docs)
+
+    def reference(query, doc):
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in other for other in docs)
+            tf = doc.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * 2.5 / (tf + 1.5 * (0.25 + 0.75 * len(doc) / avg_length))
+        return score
+
+    hits = index.search("cat dog", top_k=10)
+    expected = sorted(((i + 1, reference("cat dog", doc)) for i, doc in enumerate(docs)), key=lambda hit: -hit[1])
+    assert [chunk_id for chunk_id, _ in hits] == [chunk_id for chunk_id, _ in expected]
+    assert [score for _, score in hits] == pytest.approx([score for _, score in expected], rel=1e-5)
+
+
+def test_search_respects_mask_and_top_k():
+    index = BM25Index()
+    index.add([10, 11, 12], [1, 2, 2], ["alpha beta", "alpha", "beta gamma"])
+
+    assert [chunk_id for chunk_id, _ in index.search("alpha", top_k=1)] == [11]
+    mask = np.array([False, True, True])
+    assert [chunk_id for chunk_id, _ in index.search("alpha beta", top_k=5, mask=mask)] == [11, 12]
+    assert index.search("delta", top_k=5) == []
+    assert index.search("alpha", top_k=0) == []
+
+
+def test_rows_synced_after_the_mask_are_excluded():
+    index = BM25Index()
+    index.add([10, 11], [1, 1], ["alpha beta", "beta"])
+    mask = np.array([True, True])
+    index.add([12], [1], ["alpha alpha"])
+
+    assert [chunk_id for chunk_id, _ in index.search("alpha", top_k=5, mask=mask)] == [10]
+
+
+def test_sync_indexes_only_new_chunks(db_session):
+    db_session.add_all([Chunk(id=1, document_id=1, chunk_index=0, text="first apple"),
+                        Chunk(id=2, document_id=1, chunk_index=1, text="second pear")])
+    db_session.commit()
+    index = get_bm25_index(db_session)
+    assert index is get_bm25_index(db_session)
+
+    assert index.sync(db_session, batch_size=1) == 2
+    db_session.add(Chunk(id=3, document_id=2, chunk_index=0, text="third apple"))
+    db_session.commit()
+    assert index.sync(db_session) == 1
+    assert index.sync(db_session) == 0
+
+    chunk_ids, document_ids = index.row_ids()
+    assert chunk_ids.tolist() == [1, 2, 3]
+    assert document_ids.tolist() == [1, 1, 2]
+    assert [chunk_id for chunk_id, _ in index.search("apple", top_k=5)] == [1, 3]
@@ -1,7 +1,8 @@
+import numpy as np
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.db.models import Base, Chunk
+from app.db.models import Base, Chunk, Document, KnowledgeBase
 from app.db.vector.db_vector_store import DBVectorStore
 
 
@@ -30,7 +31,9 @@ def test_store_chunks(db_session):
     assert len(results) == 2
     assert results[0].text == "First chunk"
     assert results[0].chunk_metadata["section"] == "intro"
-    assert results[0].embedding == embeddings[0]
+    # Embeddings are stored at unit norm
+    assert results[0].embedding == pytest.approx((np.asarray(embeddings[0]) / np.linalg.norm(embeddings[0])).tolist(), rel=1e-6)
+    assert results[0].embedding_normalized is True
     assert results[0].chunk_index == 0
 
 
@@ -90,3 +93,51 @@ def test_query_filters_by_metadata(monkeypatch, db_session):
 
     results = store.query(query_embedding=[0.1] * 10, filters={"section": "summary"})
     assert results[0]["chunk_metadata"]["section"] == "summary"
+
+
+def test_query_scores_binary_embeddings_on_sqlite(db_session):
+    store = DBVectorStore(db_session)
+    store.store_chunks(
+        document_id=1,
+        chunks=[{"text": "x axis", "metadata": {"kind": "a"}}, {"text": "y axis", "metadata": {"kind": "b"}}],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+    )
+    store.store_chunks(document_id=2, chunks=["diagonal"], embeddings=[[1.0, 1.0]])
+
+    results = store.query(query_embedding=[1.0, 0.1], top_k=2)
+    assert [r["text"] for r in results] == ["x axis", "diagonal"]
+
+    results = store.query(query_embedding=[1.0, 0.1], knowledge_base_id=2)
+    assert [r["text"] for r in results] == ["diagonal"]
+
+    results = store.query(query_embedding=[1.0, 0.1], filters={"kind": "b"})
+    assert [r["text"] for r in results] == ["y axis"]
+
+
+def test_query_scores_legacy_unnormalized_rows(db_session):
+    store = DBVectorStore(db_session)
+    store.store_chunks(document_id=1, chunks=["normalized"], embeddings=[[1.0, 1.0]])
+    legacy = Chunk(document_id=1, chunk_index=1, text="legacy")
+    legacy.set_embedding([0.0, 4.0], normalize=False)
+    db_session.add(legacy)
+    db_session.commit()
+
+    results = store.query(query_embedding=[0.0, 2.0], top_k=2)
+    assert [r["text"] for r in results] == ["legacy", "normalized"]
+    assert [r["similarity"] for r in results] == pytest.approx([1.0, 2 ** -0.5], abs=1e-6)
+
+
+def test_query_scopes_to_knowledge_base_documents_on_sqlite(db_session):
+    db_session.add_all([
+        KnowledgeBase(id="kb", name="KB"),
+        Document(id=1, name="a", path="/a", knowledge_base_id="kb"),
+        Document(id=2, name="b", path="/b"),
+        Document(id=3, name="c", path="/c", knowledge_base_id="kb"),
+    ])
+    db_session.commit()
+    store = DBVectorStore(db_session)
+    for document_id in (1, 2, 3):
+        store.store_chunks(document_id=document_id, chunks=[f"doc {document_id}"], embeddings=[[1.0, 0.0]])
+
+    results = store.query(query_embedding=[1.0, 0.0], top_k=5, knowledge_base_id="kb")
+    assert sorted(r["document_id"] for r in results) == [1, 3]
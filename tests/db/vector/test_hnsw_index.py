@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.hnsw_index import HNSWIndex, save_hnsw_indexes
+from app.db.vector.hnsw_vector_store import HNSWVectorStore
+from app.db.vector.matrix_index import MatrixIndex
+from app.utils.evaluation import mean_recall_at_k
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(20, 24))
+    data = centers[rng.integers(0, 20, size=1500)] + 0.3 * rng.normal(size=(1500, 24))
+    queries = centers[rng.integers(0, 20, size=30)] + 0.3 * rng.normal(size=(30, 24))
+    ids = list(range(1, 1501))
+    return ids, data, queries
+
+
+@pytest.fixture(scope="module")
+def built(corpus):
+    ids, data, _ = corpus
+    hnsw = HNSWIndex(M=8, ef_construction=64, ef_search=32)
+    # Insert in several batches to exercise incremental inserts
+    for start in range(0, len(ids), 500):
+        hnsw.add(ids[start:start + 500], [1] * 500, data[start:start + 500])
+    exact = MatrixIndex()
+    exact.add(ids, [1] * len(ids), data)
+    return hnsw, exact
+
+
+def test_recall_against_exact_search(built, corpus):
+    hnsw, exact = built
+    _, _, queries = corpus
+    recall = mean_recall_at_k(
+        lambda q, k: hnsw.search(q, k, min_score=-1.0),
+        lambda q, k: exact.search(q, k, min_score=-1.0),
+        queries.tolist(),
+        k=10,
+    )
+    assert recall >= 0.9
+
+
+def test_higher_ef_search_does_not_reduce_recall(built, corpus):
+    hnsw, exact = built
+    _, _, queries = corpus
+
+    def recall(ef):
+        return mean_recall_at_k(
+            lambda q, k: hnsw.search(q, k, min_score=-1.0, ef_search=ef),
+            lambda q, k: exact.search(q, k, min_score=-1.0),
+            queries.tolist(),
+            k=10,
+        )
+
+    assert recall(200) >= recall(10)
+    assert recall(200) >= 0.97
+
+
+def test_node_degree_is_bounded(built):
+    hnsw, _ = built
+    assert max(len(links) for links in hnsw._layers[0].values()) <= 2 * hnsw.M
+    for layer in hnsw._layers[1:]:
+        assert all(len(links) <= hnsw.M for links in layer.values())
+
+
+def test_masked_search_only_returns_allowed_rows(built, corpus):
+    hnsw, _ = built
+    _, _, queries = corpus
+    mask = np.zeros(len(hnsw), dtype=bool)
+    mask[::7] = True
+    allowed = set(hnsw.row_ids()[0][mask].tolist())
+
+    hits = hnsw.search(queries[0].tolist(), 5, mask=mask, min_score=-1.0)
+    assert len(hits) == 5
+    assert all(chunk_id in allowed for chunk_id, _ in hits)
+
+
+def test_rows_synced_after_the_mask_are_excluded(corpus):
+    ids, data, queries = corpus
+    hnsw = HNSWIndex(M=8, ef_construction=32, ef_search=16)
+    hnsw.add(ids[:300], [1] * 300, data[:300])
+    mask = np.ones(300, dtype=bool)
+    hnsw.add(ids[300:600], [1] * 300, data[300:600])
+
+    hits = hnsw.search(queries[0].tolist(), 20, mask=mask, min_score=-1.0)
+    assert len(hits) == 20
+    assert all(chunk_id <= 300 for chunk_id, _ in hits)
+
+
+def test_search_skips_nodes_not_linked_yet(corpus):
+    ids, data, queries = corpus
+    hnsw = HNSWIndex(M=8, ef_construction=32, ef_search=16)
+    hnsw.add(ids[:100], [1] * 100, data[:100])
+    # An insert in progress has appended its vectors but not linked or published them
+    hnsw.vectors.add(ids[100:200], [1] * 100, data[100:200])
+
+    mask = np.ones(200, dtype=bool)
+    hits = hnsw.search(queries[0].tolist(), 150, mask=mask, min_score=-1.0, ef_search=200)
+    assert len(hits) == 100
+    assert all(chunk_id <= 100 for chunk_id, _ in hits)
+
+
+def test_save_and_load_round_trip(built, corpus, tmp_path):
+    hnsw, _ = built
+    _, _, queries = corpus
+    path = str(tmp_path / "hnsw.npz")
+    hnsw.save(path)
+
+    restored = HNSWIndex(ef_search=32)
+    restored.load(path)
+    assert len(restored) == len(hnsw)
+    assert restored.last_chunk_id == hnsw.last_chunk_id
+    for query in queries[:5].tolist():
+        before = hnsw.search(query, 10, min_score=-1.0)
+        after = restored.search(query, 10, min_score=-1.0)
+        assert [h[0] for h in after] == [h[0] for h in before]
+        assert [h[1] for h in after] == pytest.approx([h[1] for h in before], abs=1e-6)
+
+
+def test_hnsw_vector_store_inserts_and_persists(tmp_path, db_session):
+    path = str(tmp_path / "graph.npz")
+    store = HNSWVectorStore(db_session, M=4, ef_construction=16, ef_search=8, index_path=path)
+    store.store_chunks(1, ["north", "east"], [[0, 1], [1, 0]])
+    store.store_chunks(2, ["north-east"], [[1, 1]])
+
+    results = store.query([0.9, 1.0], top_k=1)
+    assert results[0]["text"] == "north-east"
+    # Inserts are written explicitly (ingest end, shutdown), not on every sync
+    assert not os.path.exists(path)
+
+    assert save_hnsw_indexes() >= 1
+    restored = HNSWIndex()
+    restored.load(path)
+    assert len(restored) == 3
+    assert save_hnsw_indexes() == 0
+
+
+def test_graph_file_ahead_of_the_database_is_rebuilt(tmp_path, db_session, corpus):
+    ids, data, _ = corpus
+    path = str(tmp_path / "graph.npz")
+    # Left over from a database that has since been recreated
+    stale = HNSWIndex(M=4, ef_construction=16)
+    stale.add(ids[:50], [1] * 50, data[:50, :2])
+    stale.save(path)
+
+    store = HNSWVectorStore(db_session, M=4, ef_construction=16, ef_search=8, index_path=path)
+    store.store_chunks(1, ["north", "east"], [[0, 1], [1, 0]])
+    assert len(store._index()) == 2
+    assert store.query([0.1, 1.0], top_k=1)[0]["text"] == "north"
+
+
+def test_graph_file_is_loaded_when_consistent_with_the_database(tmp_path, db_session):
+    path = str(tmp_path / "graph.npz")
+    HNSWVectorStore(db_session, M=4, ef_construction=16, index_path=path).store_chunks(1, ["north"], [[0, 1]])
+    save_hnsw_indexes()
+
+    restored = HNSWIndex(path=path)
+    restored.sync(db_session)
+    assert len(restored) == 1 and restored.generation == 1
@@ -1,8 +1,10 @@
 import pytest
 from unittest.mock import patch, MagicMock, PropertyMock
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.elements import ColumnElement
 
-from app.db.models import Chunk
+from app.db.models import Base, Chunk
 from app.db.vector.hybrid_vector_store import HybridVectorStore
 from app.db.vector.base_vector_store import BaseVectorStore
 
@@ -46,22 +48,24 @@ def test_store_chunks_delegates_to_vector_store(hybrid_vector_store):
     hybrid_vector_store.vector_store.store_chunks.assert_called_once_with(doc_id, chunks, embeddings)
 
 
-def test_keyword_search_basic(mock_db_session, hybrid_vector_store):
-    # Setup fake chunks returned from DB query
-    fake_chunks = [
-        MagicMock(id=1, text="hello world", chunk_metadata={"section": "intro"}, document_id=42),
-        MagicMock(id=2, text="another chunk", chunk_metadata={"section": "body"}, document_id=42),
-    ]
-
-    query_mock = mock_db_session.query.return_value
-    query_mock.filter.return_value.filter.return_value.filter.return_value.limit.return_value.all.return_value = fake_chunks
-
-    results = hybrid_vector_store.keyword_search("hello", top_k=2, knowledge_base_id="42")
+@pytest.fixture
+def sqlite_hybrid_store(mock_vector_store):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Chunk(id=1, document_id=42, chunk_index=0, text="hello world", chunk_metadata={"section": "intro"}),
+        Chunk(id=2, document_id=42, chunk_index=1, text="hello again", chunk_metadata={"section": "body", "author": "alice"}),
+        Chunk(id=3, document_id=7, chunk_index=0, text="hello from elsewhere", chunk_metadata={"author": "alice"}),
+    ])
+    session.commit()
+    yield HybridVectorStore(db_session=session, vector_store=mock_vector_store)
+    session.close()
+
+
+def test_keyword_search_basic(sqlite_hybrid_store):
+    results = sqlite_hybrid_store.keyword_search("hello", top_k=2, knowledge_base_id="42")
 
-    # Verify query/filter calls
-    mock_db_session.query.assert_called_once_with(Chunk)
-    # It should filter on document_id and ilike
-    # Also chunk.metadata[key].astext should be called in filters (none here)
     assert len(results) == 2
     assert results[0]["chunk_id"] == 1
     assert results[0]["text"] == "hello world"
@@ -69,38 +73,14 @@ def test_keyword_search_basic(mock_db_session, hybrid_vector_store):
     assert results[0]["chunk_metadata"] == {"section": "intro"}
     assert results[0]["document_id"] == 42
 
-def test_keyword_search_with_filters(mock_db_session, hybrid_vector_store):
-    fake_chunk = MagicMock(
-        id=1,
-        text="some text",
-        chunk_metadata={"author": "alice"},
-        document_id=10
-    )
-
-    query_mock = MagicMock()
-    mock_db_session.query.return_value = query_mock
-    query_mock.filter.return_value = query_mock
-    query_mock.limit.return_value.all.return_value = [fake_chunk]
-
-    filters = {"author": "alice"}
 
-    # Create a mock bind object with dialect.name property
-    mock_dialect = MagicMock()
-    type(mock_dialect).name = PropertyMock(return_value="sqlite")
-    mock_bind = MagicMock()
-    mock_bind.dialect = mock_dialect
+def test_keyword_search_with_filters(sqlite_hybrid_store):
+    results = sqlite_hybrid_store.keyword_search("hello", filters={"author": "alice"})
 
-    # Patch get_bind to return this mock_bind
-    with patch.object(hybrid_vector_store.db, "get_bind", return_value=mock_bind):
+    assert [r["chunk_id"] for r in results] == [2, 3]
+    assert results[0]["chunk_metadata"] == {"section": "body", "author": "alice"}
+    assert results[0]["text"] == "hello again"
 
-        with patch("app.db.models.Chunk.chunk_metadata", create=True) as mock_chunk_metadata:
-            mock_chunk_metadata.__getitem__.side_effect = lambda key: f"chunk_metadata['{key}']"
-
-            results = hybrid_vector_store.keyword_search("some", filters=filters)
-
-    assert len(results) == 1
-    assert results[0]["chunk_metadata"] == {"author": "alice"}
-    assert results[0]["text"] == "some text"
 
 def test_keyword_search_without_knowledge_base(mock_db_session, hybrid_vector_store):
     # Should not filter by document_id
@@ -111,6 +91,56 @@ def test_keyword_search_without_knowledge_base(mock_db_session, hybrid_vector_st
     assert results == []
 
 
+def test_keyword_search_scores_in_memory_and_hydrates_winners_once(sqlite_hybrid_store):
+    sqlite_hybrid_store.keyword_search("warm up")
+
+    statements = []
+    event.listen(sqlite_hybrid_store.db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    sqlite_hybrid_store.keyword_search("hello", top_k=2)
+
+    # Incremental sync probes for chunks and tombstones, then one hydration; matching never scans chunk text in SQL
+    sync_sql, tombstone_sql, hydrate_sql = statements
+    assert "chunks.id >" in sync_sql
+    assert "chunk_tombstones.id >" in tombstone_sql
+    assert "LIKE" not in " ".join(statements).upper()
+    assert " IN (" in hydrate_sql
+    assert "embedding" not in hydrate_sql
+
+
+def test_keyword_search_ranks_by_bm25(sqlite_hybrid_store):
+    session = sqlite_hybrid_store.db
+    session.add_all([
+        Chunk(id=4, document_id=9, chunk_index=0, text="Termination: either party may terminate. Termination notice is 30 days."),
+        Chunk(id=5, document_id=9, chunk_index=1, text="Notice periods and renewal terms are described in the annex of this agreement."),
+    ])
+    session.commit()
+
+    results = sqlite_hybrid_store.keyword_search("termination notice", top_k=5)
+
+    # Repeated rare terms outrank a single common one; "hello" chunks match neither term
+    assert [r["chunk_id"] for r in results] == [4, 5]
+    assert results[0]["similarity"] == 1.0
+    assert 0 < results[1]["similarity"] < 1.0
+    assert results[0]["keyword_score"] > results[1]["keyword_score"] > 0
+    assert sqlite_hybrid_store.keyword_search("", top_k=5) == []
+    assert sqlite_hybrid_store.keyword_search("absent words", top_k=5) == []
+
+
+def test_store_chunks_updates_keyword_index(sqlite_hybrid_store):
+    from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+
+    session = sqlite_hybrid_store.db
+    store = HybridVectorStore(db_session=session, vector_store=InMemoryVectorStore(session))
+    assert store.keyword_search("zebra") == []
+
+    store.store_chunks(42, [{"text": "a zebra crossing", "metadata": {"section": "roads"}}], [[1.0, 0.0]])
+
+    results = store.keyword_search("Zebra", knowledge_base_id="42", filters={"section": "roads"})
+    assert [r["text"] for r in results] == ["a zebra crossing"]
+
+
 def test_query_merges_vector_and_keyword_results(hybrid_vector_store):
     # Setup vector_store.query return value
     vector_results = [
@@ -130,21 +160,21 @@ def test_query_merges_vector_and_keyword_results(hybrid_vector_store):
         query_embedding=[0.1, 0.2, 0.3], top_k=3, query_text="some query"
     )
 
-    # chunk_id 2 is in both; similarity should be weighted: 0.7*0.8 + 0.3*1.0 = 0.86
-    # chunk_id 1 only in vector results with 0.9 similarity
-    # chunk_id 3 only in keyword results with 1.0 similarity
-    # So sorted by similarity: chunk 1 (0.9), chunk 3 (1.0), chunk 2 (0.86) => actually chunk 3 highest similarity 1.0, then 1 (0.9), then 2 (0.86)
-    # But keyword-only chunks get similarity=1.0 by default, so order: 3, 1, 2
-
-    # Let's check combined results are sorted by similarity descending and only top_k returned
-    similarities = [res["similarity"] for res in combined_results]
+    # Weighted reciprocal-rank fusion with k=60:
+    # chunk 2 = 0.7/(60+2) + 0.3/(60+1), chunk 1 = 0.7/(60+1), chunk 3 = 0.3/(60+2)
     chunk_ids = [res["chunk_id"] for res in combined_results]
+    assert chunk_ids == [2, 1, 3]
+    assert combined_results[0]["rrf_score"] == pytest.approx(0.7 / 62 + 0.3 / 61)
+    assert combined_results[1]["rrf_score"] == pytest.approx(0.7 / 61)
+    assert combined_results[2]["rrf_score"] == pytest.approx(0.3 / 62)
+    # Similarity stays the leg score: the cosine where the vector leg matched
+    assert [r["similarity"] for r in combined_results] == [0.8, 0.9, 1.0]
 
-    assert chunk_ids == [3, 1, 2]
-    assert similarities[0] == 1.0  # chunk 3 keyword only
-    # Confirm weighted similarity for chunk 2
-    expected_weighted_similarity = 0.7 * 0.8 + 0.3 * 1.0
-    assert abs(combined_results[2]["similarity"] - expected_weighted_similarity) < 1e-6
+    # Leg scores are kept alongside; the legs' own result dicts are not modified
+    assert combined_results[0]["vector_similarity"] == 0.8
+    assert combined_results[0]["keyword_similarity"] == 1.0
+    assert combined_results[2]["vector_similarity"] is None
+    assert vector_results[1]["similarity"] == 0.8
 
 
 def test_query_when_vector_results_empty(hybrid_vector_store):
@@ -160,7 +190,9 @@ def test_query_when_vector_results_empty(hybrid_vector_store):
 
     assert len(results) == 1
     assert results[0]["chunk_id"] == 5
+    assert results[0]["rrf_score"] == pytest.approx(0.3 / 61)
     assert results[0]["similarity"] == 1.0
+    assert results[0]["keyword_similarity"] == 1.0
 
 
 def test_query_when_keyword_results_empty(hybrid_vector_store):
@@ -174,7 +206,9 @@ def test_query_when_keyword_results_empty(hybrid_vector_store):
 
     assert len(results) == 1
     assert results[0]["chunk_id"] == 10
+    assert results[0]["rrf_score"] == pytest.approx(0.7 / 61)
     assert results[0]["similarity"] == 0.5
+    assert results[0]["vector_similarity"] == 0.5
 
 
 def test_query_top_k_limit(hybrid_vector_store):
@@ -189,4 +223,108 @@ def test_query_top_k_limit(hybrid_vector_store):
     results = hybrid_vector_store.query([0, 0, 0], top_k=2)
 
     assert len(results) == 2
-    assert results[0]["similarity"] >= results[1]["similarity"]
+    assert results[0]["rrf_score"] >= results[1]["rrf_score"]
+
+
+@pytest.fixture
+def file_hybrid_store(tmp_path):
+    from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'rag.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    store = HybridVectorStore(db_session=session, vector_store=InMemoryVectorStore(session))
+    store.store_chunks(1, ["termination notice", "renewal terms", "payment schedule"],
+                       [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]])
+    yield store
+    session.close()
+    engine.dispose()
+
+
+def test_query_runs_legs_concurrently_on_separate_sessions(file_hybrid_store):
+    import threading
+
+    sessions, threads = {}, {}
+    barrier = threading.Barrier(2, timeout=2)
+    vector_query, keyword_search = file_hybrid_store.vector_store.query, file_hybrid_store.keyword_search
+
+    def slow_vector(**kwargs):
+        threads["vector"] = threading.current_thread().name
+        barrier.wait()
+        return vector_query(**kwargs)
+
+    def slow_keyword(*args, **kwargs):
+        sessions["keyword"] = kwargs["db"]
+        barrier.wait()
+        return keyword_search(*args, **kwargs)
+
+    file_hybrid_store.vector_store.query = slow_vector
+    file_hybrid_store.keyword_search = slow_keyword
+
+    # Both legs must be in flight at once to get past the barrier
+    results = file_hybrid_store.query([1.0, 0.0], top_k=3, query_text="renewal")
+
+    # The store's session stays on the request thread; the keyword leg gets its own
+    assert threads["vector"] == threading.current_thread().name
+    assert sessions["keyword"] is not file_hybrid_store.db
+    # Last for the vector leg but first for the keyword leg, so it wins the fusion
+    assert [r["text"] for r in results] == ["renewal terms", "termination notice", "payment schedule"]
+
+
+def test_query_merges_without_a_leg_that_times_out(file_hybrid_store):
+    import time
+
+    keyword_search = file_hybrid_store.keyword_search
+
+    def stalled_keyword(*args, **kwargs):
+        time.sleep(0.5)
+        return keyword_search(*args, **kwargs)
+
+    file_hybrid_store.keyword_search = stalled_keyword
+    file_hybrid_store.leg_timeout = 0.05
+
+    started = time.perf_counter()
+    results = file_hybrid_store.query([1.0, 0.0], top_k=2, query_text="renewal")
+
+    assert time.perf_counter() - started < 0.4
+    assert [r["text"] for r in results] == ["termination notice", "payment schedule"]
+    assert all(r["keyword_similarity"] is None for r in results)
+    assert file_hybrid_store.last_plan["partial"] is True
+    assert file_hybrid_store.last_plan["timed_out"] == ["keyword"]
+
+    file_hybrid_store.leg_timeout = 5.0
+    file_hybrid_store.query([1.0, 0.0], top_k=2, query_text="renewal")
+    assert "partial" not in (file_hybrid_store.last_plan or {})
+
+
+def test_results_missing_a_timed_out_leg_are_not_cached(file_hybrid_store):
+    import time
+
+    from app.db.vector.query_cache import QueryCache
+    from app.db.vector.vector_store_service import VectorStoreService
+
+    keyword_search = file_hybrid_store.keyword_search
+
+    def stalled_keyword(*args, **kwargs):
+        time.sleep(0.3)
+        return keyword_search(*args, **kwargs)
+
+    file_hybrid_store.keyword_search = stalled_keyword
+    file_hybrid_store.leg_timeout = 0.05
+    cache = QueryCache()
+    service = VectorStoreService(file_hybrid_store, db_session=file_hybrid_store.db, query_cache=cache)
+
+    service.query([1.0, 0.0], top_k=2, query_text="renewal")
+    assert len(cache) == 0
+
+
+def test_delete_chunks_drops_them_from_keyword_search(sqlite_hybrid_store):
+    from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+
+    session = sqlite_hybrid_store.db
+    store = HybridVectorStore(db_session=session, vector_store=InMemoryVectorStore(session))
+    assert [r["chunk_id"] for r in store.keyword_search("hello", top_k=5)] == [1, 2, 3]
+
+    assert store.delete_chunks(42) == 2
+
+    assert [r["chunk_id"] for r in store.keyword_search("hello", top_k=5)] == [3]
@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.db.models import Base, Chunk
 from app.db.vector.in_memory_vector_store import InMemoryVectorStore
@@ -159,3 +159,157 @@ def test_query_filters_metadata_missing_key(db_session):
     # Filter by metadata key that some chunks don't have should not raise error and filter properly
     results = store.query([1, 0, 0], filters={"type": "A"})
     assert all("type" in r["chunk_metadata"] and r["chunk_metadata"]["type"] == "A" for r in results)
+
+
+def test_query_hydrates_only_winners_without_embedding_columns(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.store_chunks(1, [f"chunk {i}" for i in range(20)], [[1.0, float(i)] for i in range(20)])
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    results = store.query([1.0, 0.0], top_k=3)
+
+    assert len(results) == 3
+    hydrations = [sql for sql in statements if "chunks.text" in sql]
+    assert len(hydrations) == 1
+    assert "embedding" not in hydrations[0]
+
+
+def test_query_filters_from_inverted_metadata_index(db_session):
+    store = InMemoryVectorStore(db_session)
+    chunks = [{"text": f"chunk {i}", "metadata": {"type": "AB"[i % 2], "page": i % 3}} for i in range(12)]
+    store.store_chunks(1, chunks, [[1.0, float(i)] for i in range(12)])
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    results = store.query([1.0, 0.0], top_k=10, filters={"type": "A", "page": 0})
+
+    assert [r["text"] for r in results] == ["chunk 0", "chunk 6"]
+    assert not any("json" in sql.lower() for sql in statements)
+
+    # Filter values match by their string form, and chunks stored later are indexed
+    store.store_chunks(2, [{"text": "late", "metadata": {"type": "A", "page": 0}}], [[1.0, 0.5]])
+    results = store.query([1.0, 0.0], top_k=10, filters={"type": "A", "page": "0"})
+    assert [r["text"] for r in results] == ["chunk 0", "late", "chunk 6"]
+
+
+def test_query_planner_picks_strategy_by_selectivity(db_session):
+    store = InMemoryVectorStore(db_session)
+    rng = np.random.default_rng(0)
+    chunks = [{"text": f"chunk {i}", "metadata": {"rare": i % 50 == 0, "half": i % 2}} for i in range(400)]
+    embeddings = rng.normal(size=(400, 8)).tolist()
+    store.store_chunks(1, chunks, embeddings)
+    query = rng.normal(size=8).tolist()
+
+    store.prefilter_max_rows = 20
+    selective = store.query(query, top_k=3, filters={"rare": True})
+    assert store.last_plan["strategy"] == "prefilter"
+    assert store.last_plan["estimated_matches"] == 8
+
+    broad = store.query(query, top_k=3, filters={"half": 0}, min_score=-1.0)
+    assert store.last_plan["strategy"] == "postfilter"
+    assert store.last_plan["fetch_k"] == 12
+
+    store.query(query, top_k=3)
+    assert store.last_plan["strategy"] == "scan"
+
+    # Every plan returns what a masked exact scan would
+    store.prefilter_max_rows = 0
+    assert store.query(query, top_k=3, filters={"rare": True}) == selective
+    assert store.last_plan["strategy"] in ("postfilter", "masked_scan")
+    store.prefilter_max_rows = 10_000
+    assert store.query(query, top_k=3, filters={"half": 0}, min_score=-1.0) == broad
+    assert store.last_plan["strategy"] == "prefilter"
+
+
+def test_postfilter_falls_back_to_masked_search_when_short(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.prefilter_max_rows = 0
+    # The 50 matching chunks point away from the query, so an unmasked top-4 misses them all
+    chunks = [{"text": f"chunk {i}", "metadata": {"side": "far" if i < 50 else "near"}} for i in range(100)]
+    embeddings = [[-1.0, float(i)] if i < 50 else [1.0, float(i)] for i in range(100)]
+    store.store_chunks(1, chunks, embeddings)
+
+    results = store.query([1.0, 0.0], top_k=2, filters={"side": "far"}, min_score=-1.0)
+    assert store.last_plan["strategy"] == "postfilter"
+    assert store.last_plan["fallback"] is True
+    assert [r["chunk_metadata"]["side"] for r in results] == ["far", "far"]
+
+
+def _ranked(results):
+    return [(r["chunk_id"], round(r["similarity"], 5)) for r in results]
+
+
+def test_query_batch_matches_individual_queries(db_session):
+    store = InMemoryVectorStore(db_session)
+    rng = np.random.default_rng(1)
+    chunks = [{"text": f"chunk {i}", "metadata": {"rare": i % 50 == 0, "half": i % 2}} for i in range(300)]
+    store.store_chunks(1, chunks, rng.normal(size=(300, 8)).tolist())
+    queries = rng.normal(size=(6, 8)).tolist()
+
+    store.prefilter_max_rows = 20
+    for filters in (None, {"rare": True}, {"half": 1}, {"rare": "missing"}):
+        batch = store.query_batch(queries, top_k=4, filters=filters, min_score=-1.0)
+        assert len(batch) == len(queries)
+        for query, results in zip(queries, batch):
+            assert _ranked(results) == _ranked(store.query(query, top_k=4, filters=filters, min_score=-1.0))
+
+    store.query_batch(queries, top_k=4, filters={"half": 1})
+    assert store.last_plan["strategy"] == "masked_scan"
+    assert store.query_batch([], top_k=4) == []
+
+
+def test_query_batch_scores_and_hydrates_once(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.store_chunks(1, [f"chunk {i}" for i in range(20)], [[1.0, float(i)] for i in range(20)])
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    batch = store.query_batch([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]], top_k=2)
+
+    assert [[r["text"] for r in results] for results in batch] == [
+        ["chunk 0", "chunk 1"], ["chunk 19", "chunk 18"], ["chunk 1", "chunk 2"]
+    ]
+    assert len([sql for sql in statements if "chunks.text" in sql]) == 1
+
+
+def test_delete_chunks_excludes_them_immediately(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.store_chunks(1, ["doc one"], [[1, 0, 0]])
+    store.store_chunks(2, ["doc two a", "doc two b"], [[0.9, 0.1, 0], [0, 1, 0]])
+
+    assert store.delete_chunks(2) == 2
+    assert [r["text"] for r in store.query([1, 0, 0], top_k=5)] == ["doc one"]
+    # Knowledge-base partitions mask the tombstoned rows too
+    assert store.query([0, 1, 0], top_k=5, knowledge_base_id=2) == []
+    assert store.delete_chunks(2) == 0
+
+
+def test_replace_chunks_swaps_old_chunks_for_new(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.store_chunks(1, ["old text"], [[1, 0, 0]])
+
+    store.replace_chunks(1, ["new text"], [[0, 1, 0]])
+
+    results = store.query([1, 1, 0], top_k=5)
+    assert [r["text"] for r in results] == ["new text"]
+    assert db_session.query(Chunk).count() == 1
+
+
+def test_postfilter_ignores_rows_synced_after_the_mask(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.prefilter_max_rows = 0
+    chunks = [{"text": f"chunk {i}", "metadata": {"half": i % 2}} for i in range(40)]
+    store.store_chunks(1, chunks, [[1.0, float(i) / 100] for i in range(40)])
+    index, chunk_ids, mask = store._scope(None, {"half": 0})
+
+    # Another request stores closer chunks; the index grows past the mask before the search runs
+    store.store_chunks(2, [{"text": "late", "metadata": {"half": 0}}] * 5, [[1.0, 0.0]] * 5)
+    hits = store._planned_search(index, [1.0, 0.0], 3, chunk_ids, mask, -1.0)
+
+    assert store.last_plan["strategy"] == "postfilter"
+    assert all(chunk_id in set(chunk_ids[mask].tolist()) for chunk_id, _ in hits)
+    assert len(hits) == 3
@@ -0,0 +1,207 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.int8_index import Int8Index
+from app.db.vector.int8_vector_store import Int8VectorStore
+from app.db.vector.matrix_index import MatrixIndex
+from app.db.vector.pq_index import PQIndex
+from app.db.vector.quantized_index import QuantizedIndex
+from app.db.vector.recall_report import report_recall
+from app.utils.evaluation import mean_recall_at_k
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(21)
+    centers = rng.normal(size=(20, 48))
+    data = centers[rng.integers(0, 20, size=1500)] + 0.3 * rng.normal(size=(1500, 48))
+    queries = centers[rng.integers(0, 20, size=20)] + 0.3 * rng.normal(size=(20, 48))
+    return list(range(1, 1501)), data, queries
+
+
+def test_int8_index_uses_a_quarter_of_the_memory_and_keeps_ranking(corpus):
+    ids, data, queries = corpus
+    int8 = Int8Index(min_train_size=1000)
+    int8.add(ids, [1] * len(ids), data)
+    int8.wait_for_training()
+    exact = MatrixIndex()
+    exact.add(ids, [1] * len(ids), data)
+
+    assert int8.trained
+    assert int8._codes.view.nbytes * 4 == len(ids) * 48 * 4
+    recall = mean_recall_at_k(
+        lambda q, k: int8.search(q, k, min_score=-1.0),
+        lambda q, k: exact.search(q, k, min_score=-1.0),
+        queries.tolist(),
+        k=10,
+    )
+    assert recall >= 0.95
+
+
+def test_first_training_runs_off_the_add_path(corpus):
+    import threading
+
+    ids, data, queries = corpus
+    int8 = Int8Index(min_train_size=200)
+    release = threading.Event()
+    fit = int8._fit
+
+    def slow_fit(vectors):
+        release.wait(5)
+        return fit(vectors)
+
+    int8._fit = slow_fit
+    int8.add(ids[:200], [1] * 200, data[:200])
+    # The add that crossed min_train_size returned before training finished; search stays exact
+    assert not int8.trained
+    assert len(int8.search(queries[0].tolist(), 5, min_score=-1.0)) == 5
+    int8.add(ids[200:300], [1] * 100, data[200:300])
+
+    release.set()
+    assert int8.wait_for_training(timeout=30)
+    assert int8.trained and len(int8._codes.view) == len(int8) == 300
+
+
+def test_search_is_not_blocked_by_a_sync_reading_the_database(corpus, db_session, monkeypatch):
+    import threading
+
+    ids, data, queries = corpus
+    int8 = Int8Index(min_train_size=50)
+    int8.add(ids[:100], [1] * 100, data[:100])
+    int8.wait_for_training()
+    reading, release = threading.Event(), threading.Event()
+
+    def slow_batches(db, after_id, batch_size):
+        reading.set()
+        release.wait(5)
+        yield ids[100:200], [1] * 100, data[100:200]
+
+    monkeypatch.setattr("app.db.vector.quantized_index.iter_chunk_embeddings", slow_batches)
+    # Check out the connection here; another thread would open its own empty in-memory database
+    db_session.connection()
+    syncing = threading.Thread(target=int8.sync, args=(db_session,))
+    syncing.start()
+    assert reading.wait(5)
+    try:
+        searched = []
+        searcher = threading.Thread(target=lambda: searched.append(int8.search(queries[0].tolist(), 5, min_score=-1.0)))
+        searcher.start()
+        searcher.join(2)
+        assert not searcher.is_alive() and len(searched[0]) == 5
+    finally:
+        release.set()
+        syncing.join(5)
+    assert len(int8) == len(int8._codes.view) == 200
+
+
+def test_quantized_index_is_abstract():
+    with pytest.raises(TypeError):
+        QuantizedIndex()  # Subclasses provide the quantizer hooks
+
+
+def test_load_rejects_a_different_quantizer_kind(corpus, tmp_path):
+    ids, data, _ = corpus
+    int8 = Int8Index(min_train_size=100)
+    int8.add(ids[:200], [1] * 200, data[:200])
+    int8.wait_for_training()
+    path = str(tmp_path / "int8.npz")
+    int8.save(path)
+
+    restored = Int8Index()
+    restored.load(path)
+    assert restored.trained and len(restored) == 200
+    with pytest.raises(ValueError):
+        PQIndex(code_size=8).load(path)
+
+
+@pytest.mark.parametrize("min_train_size", [100, 10_000])
+def test_rows_synced_after_the_mask_are_excluded(corpus, min_train_size):
+    ids, data, queries = corpus
+    int8 = Int8Index(min_train_size=min_train_size)
+    int8.add(ids[:200], [1] * 200, data[:200])
+    mask = np.ones(200, dtype=bool)
+    int8.add(ids[200:400], [1] * 200, data[200:400])
+
+    hits = int8.search(queries[0].tolist(), 20, mask=mask, min_score=-1.0)
+    assert len(hits) == 20
+    assert all(chunk_id <= 200 for chunk_id, _ in hits)
+
+
+def test_index_file_ahead_of_the_database_is_rebuilt(tmp_path, db_session, corpus):
+    ids, data, queries = corpus
+    path = str(tmp_path / "int8.npz")
+    # Left over from a database that has since been recreated, at a later generation
+    stale = Int8Index(min_train_size=100)
+    stale.add(ids[:200], [1] * 200, data[:200])
+    stale.wait_for_training()
+    stale.generation = 5
+    stale.save(path)
+
+    store = Int8VectorStore(db_session, min_train_size=10 ** 9, index_path=path)
+    store.store_chunks(1, [f"chunk {i}" for i in range(300)], data[:300].tolist())
+    index = store._index()
+    assert len(index) == 300 and not index.trained
+    assert index.row_ids()[0].tolist() == list(range(1, 301))
+
+
+def test_int8_vector_store_rescores_in_float32(tmp_path, db_session, corpus):
+    ids, data, queries = corpus
+    store = Int8VectorStore(db_session, oversample=4, min_train_size=300, index_path=str(tmp_path / "int8.npz"))
+    store.store_chunks(1, [f"chunk {i}" for i in range(400)], data[:400].tolist())
+
+    exact = MatrixIndex()
+    exact.add(ids[:400], [1] * 400, data[:400])
+    query = queries[0].tolist()
+    expected = exact.search(query, 5, min_score=-1.0)
+
+    results = store.query(query, top_k=5, min_score=-1.0)
+    assert [r["chunk_id"] for r in results] == [chunk_id for chunk_id, _ in expected]
+    assert [r["similarity"] for r in results] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+
+def test_offline_recalibration_bumps_the_corpus_generation(tmp_path, corpus):
+    import os
+    import subprocess
+    import sys
+
+    from app.db.corpus import current_generation
+
+    _, data, _ = corpus
+    # The CLI opens ./rag.db, so run it from a scratch directory
+    engine = create_engine(f"sqlite:///{tmp_path / 'rag.db'}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        InMemoryVectorStore(session).store_chunks(1, [f"chunk {i}" for i in range(50)], data[:50].tolist())
+        before = current_generation(session)
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    env = dict(os.environ, PYTHONPATH=root)
+    subprocess.run([sys.executable, "-m", "app.db.vector.int8_index", "--path", "int8.npz"],
+                   cwd=tmp_path, env=env, check=True, capture_output=True)
+
+    restored = Int8Index()
+    restored.load(str(tmp_path / "int8.npz"))
+    assert restored.trained and len(restored) == 50 and restored.generation == before
+    with sessionmaker(bind=engine)() as session:
+        assert current_generation(session) == before + 1
+    engine.dispose()
+
+
+def test_report_recall_against_exact_search(db_session, corpus):
+    _, data, _ = corpus
+    InMemoryVectorStore(db_session).store_chunks(1, [f"chunk {i}" for i in range(50)], data[:50].tolist())
+    assert report_recall(db_session, ["inmemory"], k=5, n_queries=10) == {"inmemory": 1.0}
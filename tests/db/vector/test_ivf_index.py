@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.ivf_index import IVFIndex, save_ivf_indexes
+from app.db.vector.ivf_vector_store import IVFVectorStore
+from app.db.vector.matrix_index import MatrixIndex
+from app.utils.evaluation import mean_recall_at_k
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(11)
+    centers = rng.normal(size=(20, 24))
+    data = centers[rng.integers(0, 20, size=2000)] + 0.3 * rng.normal(size=(2000, 24))
+    queries = centers[rng.integers(0, 20, size=30)] + 0.3 * rng.normal(size=(30, 24))
+    ids = list(range(1, 2001))
+    return ids, data, queries
+
+
+@pytest.fixture(scope="module")
+def built(corpus):
+    ids, data, _ = corpus
+    ivf = IVFIndex(n_lists=32, nprobe=4, min_train_size=1000)
+    for start in range(0, len(ids), 500):
+        ivf.add(ids[start:start + 500], [start // 500] * 500, data[start:start + 500])
+    ivf.wait_for_training()
+    exact = MatrixIndex()
+    exact.add(ids, [i // 500 for i in range(len(ids))], data)
+    return ivf, exact
+
+
+def test_trains_once_min_train_size_is_reached(built):
+    ivf, _ = built
+    assert ivf.trained
+    assert ivf.centroids.shape == (32, 24)
+    assert sum(len(rows) for _, rows in ivf._lists) == len(ivf) == 2000
+
+
+def test_recall_increases_with_nprobe(built, corpus):
+    ivf, exact = built
+    _, _, queries = corpus
+
+    def recall(nprobe):
+        return mean_recall_at_k(
+            lambda q, k: ivf.search(q, k, min_score=-1.0, nprobe=nprobe),
+            lambda q, k: exact.search(q, k, min_score=-1.0),
+            queries.tolist(),
+            k=10,
+        )
+
+    assert recall(32) == 1.0
+    assert recall(8) >= recall(1)
+    assert recall(8) >= 0.9
+
+
+def test_masked_search_only_returns_allowed_rows(built, corpus):
+    ivf, _ = built
+    _, _, queries = corpus
+    chunk_ids, document_ids = ivf.row_ids()
+    mask = document_ids == 2
+    allowed = set(chunk_ids[mask].tolist())
+
+    hits = ivf.search(queries[0].tolist(), 5, mask=mask, min_score=-1.0, nprobe=1)
+    assert len(hits) == 5
+    assert all(chunk_id in allowed for chunk_id, _ in hits)
+
+
+def test_rows_synced_after_the_mask_are_excluded(corpus):
+    ids, data, queries = corpus
+    ivf = IVFIndex(n_lists=8, nprobe=8, min_train_size=200)
+    ivf.add(ids[:300], [1] * 300, data[:300])
+    mask = np.ones(300, dtype=bool)
+    ivf.add(ids[300:600], [1] * 300, data[300:600])
+
+    hits = ivf.search(queries[0].tolist(), 20, mask=mask, min_score=-1.0)
+    assert len(hits) == 20
+    assert all(chunk_id <= 300 for chunk_id, _ in hits)
+
+
+def test_first_training_runs_off_the_add_path(corpus):
+    import threading
+
+    ids, data, queries = corpus
+    ivf = IVFIndex(n_lists=8, min_train_size=200)
+    release = threading.Event()
+    fit = ivf._fit
+
+    def slow_fit(vectors, n_lists=None):
+        release.wait(5)
+        return fit(vectors, n_lists)
+
+    ivf._fit = slow_fit
+    ivf.add(ids[:200], [1] * 200, data[:200])
+    assert not ivf.trained
+    ivf.add(ids[200:300], [1] * 100, data[200:300])
+
+    release.set()
+    assert ivf.wait_for_training(timeout=30)
+    assert ivf.trained
+    assert sum(len(rows) for _, rows in ivf._lists) == len(ivf) == 300
+    assert len(ivf.search(queries[0].tolist(), 5, min_score=-1.0, nprobe=8)) == 5
+
+
+def test_search_is_not_blocked_by_a_sync_reading_the_database(corpus, db_session, monkeypatch):
+    import threading
+
+    ids, data, queries = corpus
+    ivf = IVFIndex(n_lists=8, min_train_size=10 ** 9)
+    ivf.add(ids[:100], [1] * 100, data[:100])
+    reading, release = threading.Event(), threading.Event()
+
+    def slow_batches(db, after_id, batch_size):
+        reading.set()
+        release.wait(5)
+        yield ids[100:200], [1] * 100, data[100:200]
+
+    monkeypatch.setattr("app.db.vector.ivf_index.iter_chunk_embeddings", slow_batches)
+    # Check out the connection here; another thread would open its own empty in-memory database
+    db_session.connection()
+    syncing = threading.Thread(target=ivf.sync, args=(db_session,))
+    syncing.start()
+    assert reading.wait(5)
+    try:
+        searched = []
+        searcher = threading.Thread(target=lambda: searched.append(ivf.search(queries[0].tolist(), 5, min_score=-1.0)))
+        searcher.start()
+        searcher.join(2)
+        assert not searcher.is_alive() and len(searched[0]) == 5
+    finally:
+        release.set()
+        syncing.join(5)
+    assert len(ivf) == 200
+
+
+def test_retrain_keeps_all_rows(corpus):
+    ids, data, queries = corpus
+    ivf = IVFIndex(n_lists=8, min_train_size=10 ** 9)
+    ivf.add(ids[:300], [1] * 300, data[:300])
+    assert not ivf.trained
+    ivf.train(16)
+    assert ivf.trained and len(ivf.centroids) == 16
+    hits = ivf.search(queries[0].tolist(), 3, min_score=-1.0, nprobe=16)
+    assert len(hits) == 3
+
+
+def test_save_and_load_round_trip(built, corpus, tmp_path):
+    ivf, _ = built
+    _, _, queries = corpus
+    path = str(tmp_path / "ivf.npz")
+    ivf.save(path)
+
+    restored = IVFIndex(nprobe=4)
+    restored.load(path)
+    assert len(restored) == len(ivf)
+    assert restored.last_chunk_id == ivf.last_chunk_id
+    for query in queries[:5].tolist():
+        assert restored.search(query, 10, min_score=-1.0) == ivf.search(query, 10, min_score=-1.0)
+
+
+def test_ivf_vector_store_uses_per_query_nprobe(tmp_path, db_session):
+    path = str(tmp_path / "ivf.npz")
+    store = IVFVectorStore(db_session, n_lists=2, nprobe=1, min_train_size=4, index_path=path)
+    store.store_chunks(1, ["north", "north-ish", "east", "east-ish"], [[0, 1], [0.1, 1], [1, 0], [1, 0.1]])
+
+    assert store._index().wait_for_training(timeout=30)
+
+    results = store.query([0, 1], top_k=4, nprobe=2)
+    assert len(results) == 4
+    assert results[0]["text"] == "north"
+
+    # Written explicitly at ingest end and shutdown, not by the sync on the query path
+    assert not os.path.exists(path)
+    assert save_ivf_indexes() >= 1
+    restored = IVFIndex()
+    restored.load(path)
+    assert len(restored) == 4 and restored.trained
+
+
+def test_index_file_ahead_of_the_database_is_rebuilt(tmp_path, db_session, corpus):
+    ids, data, _ = corpus
+    path = str(tmp_path / "ivf.npz")
+    # Left over from a database that has since been recreated
+    stale = IVFIndex(min_train_size=10 ** 9)
+    stale.add(ids[:50], [1] * 50, data[:50])
+    stale.save(path)
+
+    store = IVFVectorStore(db_session, min_train_size=10 ** 9, index_path=path)
+    store.store_chunks(1, ["north", "east"], [[0, 1], [1, 0]])
+    assert store._index().last_chunk_id == 2
+    assert [r["text"] for r in store.query([0, 1], top_k=2, min_score=-1.0)] == ["north", "east"]
+
+    assert save_ivf_indexes() >= 1
+    restored = IVFIndex()
+    restored.load(path)
+    assert len(restored) == 2
+
+
+def test_ivf_vector_store_prefilters_selective_filters_exactly(tmp_path, db_session):
+    store = IVFVectorStore(db_session, n_lists=2, nprobe=1, min_train_size=4, index_path=str(tmp_path / "ivf.npz"))
+    chunks = [{"text": text, "metadata": {"tag": tag}} for text, tag in
+              [("north", "x"), ("north-ish", "y"), ("east", "y"), ("east-ish", "x")]]
+    store.store_chunks(1, chunks, [[0, 1], [0.1, 1], [1, 0], [1, 0.1]])
+
+    # nprobe=1 alone would only see one list; the prefilter scores both tagged rows exactly
+    results = store.query([0, 1], top_k=2, filters={"tag": "x"})
+    assert store.last_plan["strategy"] == "prefilter"
+    assert [r["text"] for r in results] == ["north", "east-ish"]
+    assert results[1]["similarity"] == pytest.approx(0.1 / np.linalg.norm([1, 0.1]), abs=1e-6)
@@ -0,0 +1,234 @@
+import threading
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Chunk
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.lsm_index import LSMIndex, get_lsm_index
+from app.db.vector.matrix_index import MatrixIndex
+
+
+@pytest.fixture(scope="function")
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    yield Session
+    Base.metadata.drop_all(bind=engine)
+
+
+def _data(rows=300, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(rows, dim)), rng.normal(size=(5, dim))
+
+
+def _reference(embeddings):
+    index = MatrixIndex()
+    index.add(list(range(1, len(embeddings) + 1)), [i % 3 for i in range(len(embeddings))], embeddings)
+    return index
+
+
+def _fill(index, embeddings, batch=37):
+    for start in range(0, len(embeddings), batch):
+        ids = list(range(start + 1, min(start + batch, len(embeddings)) + 1))
+        index.add(ids, [(i - 1) % 3 for i in ids], embeddings[start:start + batch])
+
+
+def test_appends_go_to_delta_segments():
+    embeddings, _ = _data()
+    index = LSMIndex(delta_rows=50, max_deltas=100)
+    _fill(index, embeddings)
+
+    stats = index.stats()
+    assert len(index) == 300
+    assert stats["base_rows"] == 0
+    assert stats["delta_segments"] == 6
+    assert stats["active_rows"] == 0
+    assert index.row_ids()[0].tolist() == list(range(1, 301))
+    assert index.last_chunk_id == 300
+
+
+def test_search_merges_segments_like_a_single_matrix():
+    embeddings, queries = _data()
+    reference = _reference(embeddings)
+    index = LSMIndex(delta_rows=64, max_deltas=100)
+    _fill(index, embeddings)
+    mask = np.arange(300) % 2 == 0
+
+    for query in queries:
+        assert index.search(query, 10, min_score=-1.0) == reference.search(query, 10, min_score=-1.0)
+        assert index.search(query, 10, mask=mask, min_score=-1.0) == reference.search(query, 10, mask=mask, min_score=-1.0)
+        rows = np.array([3, 70, 71, 150, 299])
+        assert index.search_rows(query, rows, 3, min_score=-1.0) == reference.search_rows(query, rows, 3, min_score=-1.0)
+
+    assert index.search_batch(queries, 7, mask=mask, min_score=-1.0) == reference.search_batch(
+        queries, 7, mask=mask, min_score=-1.0
+    )
+
+
+def test_compaction_folds_deltas_without_changing_results():
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=40, max_deltas=3, background=False)
+    _fill(index, embeddings)
+
+    stats = index.stats()
+    assert stats["compactions"] >= 1
+    assert stats["base_rows"] > 0
+    assert stats["delta_segments"] < 3
+
+    reference = _reference(embeddings)
+    for query in queries:
+        assert index.search(query, 10, min_score=-1.0) == reference.search(query, 10, min_score=-1.0)
+
+    assert index.compact() is True
+    assert index.stats()["base_rows"] == 300
+    assert index.row_ids()[0].tolist() == list(range(1, 301))
+
+
+def test_mask_excludes_rows_added_after_it_was_built():
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=64)
+    index.add(list(range(1, 101)), [1] * 100, embeddings[:100])
+    mask = np.ones(100, dtype=bool)
+    index.add(list(range(101, 301)), [1] * 200, embeddings[100:])
+
+    hits = index.search(queries[0], 300, mask=mask, min_score=-1.0)
+    assert len(hits) == 100
+    assert max(chunk_id for chunk_id, _ in hits) <= 100
+
+
+def test_searches_run_during_background_compaction():
+    embeddings, queries = _data(rows=2000)
+    reference = _reference(embeddings)
+    expected = reference.search(queries[0], 10, min_score=-1.0)
+    index = LSMIndex(delta_rows=100, max_deltas=2)
+    errors = []
+    done = threading.Event()
+
+    def search_loop():
+        while not done.is_set():
+            complete = len(index) == 2000
+            hits = index.search(queries[0], 10, min_score=-1.0)
+            # Every row is either in the base or a delta: a search never sees a partial view
+            if complete and hits != expected:
+                errors.append(hits)
+
+    reader = threading.Thread(target=search_loop)
+    reader.start()
+    _fill(index, embeddings, batch=50)
+    index.wait_for_compaction(timeout=10)
+    index.compact()
+    done.set()
+    reader.join()
+
+    assert not errors
+    assert index.stats()["compactions"] >= 1
+    assert index.search(queries[0], 10, min_score=-1.0) == expected
+
+
+def test_save_and_load_round_trip(tmp_path):
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=64)
+    _fill(index, embeddings)
+    path = str(tmp_path / "lsm.npz")
+
+    index.save(path)
+    restored = LSMIndex(delta_rows=64)
+    restored.load(path)
+
+    assert len(restored) == 300
+    assert restored.last_chunk_id == 300
+    assert restored.stats()["base_rows"] == 300
+    assert restored.search(queries[0], 5, min_score=-1.0) == index.search(queries[0], 5, min_score=-1.0)
+
+
+def test_store_chunks_writes_delta_and_sync_picks_up_other_writers(session_factory):
+    first, second = session_factory(), session_factory()
+    assert get_lsm_index(first) is get_lsm_index(second)
+
+    InMemoryVectorStore(first).store_chunks(1, ["a", "b"], [[1, 0], [0, 1]])
+    index = get_lsm_index(first)
+    assert len(index) == 2
+    assert index.stats()["active_rows"] == 2
+
+    # Rows written outside the store (e.g. by the ingestion script) are picked up on query.
+    second.add(Chunk(document_id=2, chunk_index=0, text="c", embedding=[1, 1], chunk_metadata={}))
+    second.commit()
+
+    results = InMemoryVectorStore(first).query([1, 1], top_k=1)
+    assert results[0]["text"] == "c"
+    assert len(index) == 3
+
+
+def test_delete_masks_rows_and_compaction_purges_them():
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=64, max_deltas=100, background=False)
+    _fill(index, embeddings)
+    deleted = list(range(1, 301, 4))
+
+    assert index.delete(deleted) == 75
+    assert index.delete(deleted + [999]) == 0
+    hits = index.search(queries[0], 300, min_score=-1.0)
+    assert len(hits) == 225
+    assert not set(deleted) & {chunk_id for chunk_id, _ in hits}
+
+    keep = np.ones(300, dtype=bool)
+    keep[np.asarray(deleted) - 1] = False
+    mask = np.arange(300) % 3 != 0
+    expected_full = index.search(queries[1], 10, min_score=-1.0)
+    expected_masked = index.search(queries[1], 10, mask=mask, min_score=-1.0)
+    expected_rows = index.search_rows(queries[1], np.array([0, 1, 5, 150, 299]), 3, min_score=-1.0)
+
+    assert index.compact() is True
+    stats = index.stats()
+    assert stats["base_rows"] == 225
+    assert stats["dead_rows"] == 0
+    assert stats["purged_rows"] == 75
+    # Positions are stable: row ids and masks over them keep working after the purge
+    assert len(index.row_ids()[0]) == 300
+    assert index.search(queries[1], 10, min_score=-1.0) == expected_full
+    assert index.search(queries[1], 10, mask=mask, min_score=-1.0) == expected_masked
+    assert index.search_rows(queries[1], np.array([0, 1, 5, 150, 299]), 3, min_score=-1.0) == expected_rows
+    batch = index.search_batch(queries, 5, mask=mask, min_score=-1.0)[1]
+    assert [chunk_id for chunk_id, _ in batch] == [chunk_id for chunk_id, _ in expected_masked[:5]]
+
+    reference = MatrixIndex()
+    chunk_ids = np.arange(1, 301)[keep]
+    reference.add(chunk_ids.tolist(), [0] * len(chunk_ids), embeddings[keep])
+    assert index.search(queries[2], 10, min_score=-1.0) == reference.search(queries[2], 10, min_score=-1.0)
+
+
+def test_rows_added_after_a_purge_keep_their_positions():
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=50, max_deltas=100, background=False)
+    _fill(index, embeddings[:200])
+    index.delete(list(range(1, 101)))
+    index.compact()
+    index.add(list(range(201, 301)), [0] * 100, embeddings[200:])
+    index.delete([250])
+
+    mask = np.zeros(300, dtype=bool)
+    mask[240:260] = True
+    hits = index.search(queries[0], 50, mask=mask, min_score=-1.0)
+    assert sorted(chunk_id for chunk_id, _ in hits) == [i for i in range(241, 261) if i != 250]
+    rows = index.search_rows(queries[0], np.array([0, 150, 249, 260]), 10, min_score=-1.0)
+    assert sorted(chunk_id for chunk_id, _ in rows) == [151, 261]
+
+
+def test_save_writes_only_live_rows(tmp_path):
+    embeddings, queries = _data()
+    index = LSMIndex(delta_rows=64)
+    _fill(index, embeddings)
+    index.delete(list(range(1, 51)))
+    path = str(tmp_path / "lsm.npz")
+
+    index.save(path)
+    restored = LSMIndex(delta_rows=64)
+    restored.load(path)
+
+    assert len(restored) == 250
+    assert restored.row_ids()[0].tolist() == list(range(51, 301))
+    assert restored.search(queries[0], 5, min_score=-1.0) == index.search(queries[0], 5, min_score=-1.0)
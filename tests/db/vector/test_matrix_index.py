@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.matrix_index import MatrixIndex, get_matrix_index
+from app.utils.evaluation import mean_recall_at_k
+from app.utils.similarity import cosine_similarity
+
+
+@pytest.fixture(scope="function")
+def session_factory():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    yield Session
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_search_matches_bruteforce_ordering():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 16)).tolist()
+    index = MatrixIndex(initial_capacity=8)
+    index.add(list(range(1, 201)), [1] * 200, embeddings)
+
+    query = rng.normal(size=16).tolist()
+    expected = sorted(
+        ((i + 1, cosine_similarity(query, emb)) for i, emb in enumerate(embeddings)),
+        key=lambda x: x[1],
+        reverse=True,
+    )[:10]
+
+    hits = index.search(query, top_k=10)
+    assert [h[0] for h in hits] == [e[0] for e in expected]
+    assert [h[1] for h in hits] == pytest.approx([e[1] for e in expected], abs=1e-5)
+
+
+def test_ties_are_broken_by_insertion_order():
+    index = MatrixIndex()
+    index.add([1, 2, 3, 4], [1, 1, 1, 1], [[1, 0], [0, 1], [1, 0], [1, 0]])
+
+    hits = index.search([1, 0], top_k=2)
+    assert [h[0] for h in hits] == [1, 3]
+
+
+def test_mask_and_min_score():
+    index = MatrixIndex()
+    index.add([1, 2, 3], [1, 2, 2], [[1, 0], [0.9, 0.1], [0, 1]])
+
+    mask = np.array([False, True, True])
+    hits = index.search([1, 0], top_k=5, mask=mask, min_score=0.5)
+    assert [h[0] for h in hits] == [2]
+
+
+def test_rows_synced_after_the_mask_are_excluded():
+    index = MatrixIndex()
+    index.add([1, 2], [1, 1], [[0.9, 0.1], [0, 1]])
+    mask = np.array([True, True])
+    # Another request syncs a better match between building the mask and searching
+    index.add([3], [1], [[1, 0]])
+
+    assert [h[0] for h in index.search([1, 0], top_k=5, mask=mask, min_score=-1.0)] == [1, 2]
+    assert [h[0] for h in index.search([1, 0], top_k=1, mask=mask, shortlist=1)] == [1]
+    assert [h[0] for h in index.search_batch([[1, 0]], top_k=5, mask=mask, min_score=-1.0)[0]] == [1, 2]
+
+
+def test_mismatched_dimensions_are_skipped():
+    index = MatrixIndex()
+    added = index.add([1, 2], [1, 1], [[1, 0, 0], [1, 0]])
+    assert added == 1
+    assert len(index) == 1
+    assert index.last_chunk_id == 2
+
+
+def test_index_is_shared_per_engine(session_factory):
+    assert get_matrix_index(session_factory()) is get_matrix_index(session_factory())
+
+
+def test_concatenate_keeps_rows_and_scores():
+    rng = np.random.default_rng(2)
+    embeddings = rng.normal(size=(30, 8))
+    whole = MatrixIndex()
+    whole.add(list(range(1, 31)), [1] * 30, embeddings)
+    parts = [MatrixIndex(), MatrixIndex(), MatrixIndex()]
+    parts[0].add(list(range(1, 11)), [1] * 10, embeddings[:10])
+    parts[2].add(list(range(11, 31)), [1] * 20, embeddings[10:])
+
+    merged = MatrixIndex.concatenate(parts)
+
+    assert len(merged) == 30
+    assert merged.last_chunk_id == 30
+    assert merged.row_ids()[0].tolist() == list(range(1, 31))
+    query = rng.normal(size=8)
+    assert merged.search(query, 5, min_score=-1.0) == whole.search(query, 5, min_score=-1.0)
+
+
+def test_binary_shortlist_reranks_with_full_cosine():
+    rng = np.random.default_rng(4)
+    centers = rng.normal(size=(10, 64))
+    data = centers[rng.integers(0, 10, size=800)] + 0.2 * rng.normal(size=(800, 64))
+    index = MatrixIndex()
+    index.add(list(range(1, 801)), [1] * 800, data)
+    assert index.packed_bits().shape == (800, 8)
+
+    queries = (centers[rng.integers(0, 10, size=20)] + 0.2 * rng.normal(size=(20, 64))).tolist()
+    recall = mean_recall_at_k(
+        lambda q, k: index.search(q, k, min_score=-1.0, shortlist=20),
+        lambda q, k: index.search(q, k, min_score=-1.0),
+        queries,
+        k=5,
+    )
+    assert recall >= 0.9
+    # Shortlisted rows are rescored with full cosine
+    for chunk_id, score in index.search(queries[0], 5, min_score=-1.0, shortlist=20):
+        assert score == pytest.approx(cosine_similarity(queries[0], data[chunk_id - 1]), abs=1e-5)
+
+    query = queries[0]
+    # Rows added later are packed on the next binary search
+    index.add([801], [2], [centers[3]])
+    mask = index.row_ids()[1] == 2
+    assert index.search(query, 5, mask=mask, min_score=-1.0, shortlist=2)[0][0] == 801
+
+
+def test_save_and_load_round_trip(tmp_path):
+    rng = np.random.default_rng(3)
+    index = MatrixIndex(initial_capacity=2)
+    index.add(list(range(1, 11)), [1] * 10, rng.normal(size=(10, 6)))
+    path = str(tmp_path / "matrix.npz")
+    index.save(path)
+
+    restored = MatrixIndex()
+    restored.load(path)
+    query = rng.normal(size=6).tolist()
+    assert restored.last_chunk_id == 10
+    assert restored.search(query, 5, min_score=-1.0) == index.search(query, 5, min_score=-1.0)
+    assert restored.memory_bytes() > 0
+
+    restored.add([11], [2], rng.normal(size=(1, 6)))
+    assert len(restored) == 11
+
+
+def test_search_batch_matches_single_searches():
+    rng = np.random.default_rng(4)
+    index = MatrixIndex()
+    index.add(list(range(1, 201)), [i % 3 for i in range(200)], rng.normal(size=(200, 16)))
+    queries = rng.normal(size=(5, 16))
+    mask = np.arange(200) % 3 == 0
+
+    def ranked(hits):
+        return [(chunk_id, round(score, 5)) for chunk_id, score in hits]
+
+    batch = index.search_batch(queries, 7, min_score=-1.0)
+    masked = index.search_batch(queries, 7, mask=mask, min_score=-1.0)
+    rows = index.search_batch(queries, 7, min_score=-1.0, rows=np.flatnonzero(mask))
+    for query, hits, masked_hits, row_hits in zip(queries, batch, masked, rows):
+        assert ranked(hits) == ranked(index.search(query, 7, min_score=-1.0))
+        assert ranked(masked_hits) == ranked(index.search(query, 7, mask=mask, min_score=-1.0))
+        assert ranked(row_hits) == ranked(masked_hits)
+
+    assert index.search_batch([], 3) == []
+    assert index.search_batch(queries, 0) == [[]] * 5
+    with pytest.raises(ValueError):
+        index.search_batch([[1.0, 2.0]], 3)
+
+
+def test_search_batch_splits_large_batches(monkeypatch):
+    rng = np.random.default_rng(5)
+    index = MatrixIndex()
+    index.add(list(range(1, 51)), [1] * 50, rng.normal(size=(50, 4)))
+    queries = rng.normal(size=(9, 4))
+    expected = [[(chunk_id, round(score, 5)) for chunk_id, score in hits] for hits in index.search_batch(queries, 3)]
+
+    monkeypatch.setattr("app.db.vector.matrix_index.BATCH_SCORE_ELEMENTS", 100)
+    split = [[(chunk_id, round(score, 5)) for chunk_id, score in hits] for hits in index.search_batch(queries, 3)]
+    assert split == expected
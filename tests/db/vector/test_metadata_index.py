@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Chunk
+from app.db.vector.metadata_index import MetadataIndex, get_metadata_index, posting_value
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_posting_value_uses_string_form_of_scalars():
+    assert posting_value(3) == posting_value("3") == "3"
+    assert posting_value(None) is None
+    assert posting_value({"nested": 1}) is None
+    assert posting_value([1, 2]) is None
+
+
+def test_matching_ids_intersects_postings():
+    index = MetadataIndex()
+    index.add([1, 2, 3, 4], [{"type": "A", "page": 1}, {"type": "B", "page": 1}, {"type": "A", "page": 2}, None])
+    index.add([7], [{"type": "A", "page": 1, "tags": ["x"]}])
+
+    assert index.matching_ids({"type": "A"}).tolist() == [1, 3, 7]
+    assert index.matching_ids({"type": "A", "page": 1}).tolist() == [1, 7]
+    assert index.matching_ids({"type": "C"}).tolist() == []
+    assert index.matching_ids({"tags": ["x"]}).tolist() == []
+    assert index.last_chunk_id == 7
+
+
+def test_mask_aligns_with_index_rows():
+    index = MetadataIndex()
+    index.add([1, 2, 3, 9], [{"k": "v"}, {"k": "w"}, {"k": "v"}, {"k": "v"}])
+
+    # Row 9 is not in the vector index yet; row 5 has no postings
+    mask = index.mask(np.array([1, 2, 3, 5], dtype=np.int64), {"k": "v"})
+    assert mask.tolist() == [True, False, True, False]
+    assert index.mask(np.empty(0, dtype=np.int64), {"k": "v"}).tolist() == []
+
+
+def test_sync_is_incremental_and_shared_per_engine(db_session):
+    db_session.add_all([Chunk(document_id=1, chunk_index=i, text="t", chunk_metadata={"n": i % 2}) for i in range(5)])
+    db_session.commit()
+
+    index = get_metadata_index(db_session)
+    assert index.sync(db_session, batch_size=2) == 5
+    assert index.matching_ids({"n": 0}).tolist() == [1, 3, 5]
+
+    db_session.add(Chunk(document_id=1, chunk_index=5, text="t", chunk_metadata={"n": 0}))
+    db_session.commit()
+    assert index.sync(db_session) == 1
+    assert index.matching_ids({"n": "0"}).tolist() == [1, 3, 5, 6]
+
+    other_session = sessionmaker(bind=db_session.get_bind())()
+    assert get_metadata_index(other_session) is index
+    other_session.close()
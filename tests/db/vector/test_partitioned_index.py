@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.knowledge_bases import assign_documents
+from app.db.models import Base, Document, KnowledgeBase
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.partitioned_index import PartitionedIndex, get_partitioned_index
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _seed(db_session):
+    db_session.add_all([
+        KnowledgeBase(id="small", name="Small"),
+        KnowledgeBase(id="large", name="Large"),
+        Document(id=1, name="a", path="/a", knowledge_base_id="small"),
+        Document(id=2, name="b", path="/b", knowledge_base_id="large"),
+        Document(id=3, name="c", path="/c", knowledge_base_id="large"),
+        Document(id=4, name="legacy", path="/legacy"),
+    ])
+    db_session.commit()
+    store = InMemoryVectorStore(db_session)
+    rng = np.random.default_rng(0)
+    for document_id, count in [(1, 3), (2, 40), (3, 40), (4, 5)]:
+        store.store_chunks(document_id, [f"doc {document_id} chunk {i}" for i in range(count)],
+                           rng.normal(size=(count, 8)).tolist())
+    return store
+
+
+def test_scoped_query_searches_only_its_partition(db_session):
+    store = _seed(db_session)
+    partitions = get_partitioned_index(db_session)
+    assert len(partitions) == 0
+
+    results = store.query(np.ones(8).tolist(), top_k=10, knowledge_base_id="small", min_score=-1.0)
+    assert len(results) == 3
+    assert {r["document_id"] for r in results} == {1}
+    assert partitions.loaded() == ["small"]
+    assert len(partitions.partition(db_session, "small")) == 3
+
+    results = store.query(np.ones(8).tolist(), top_k=100, knowledge_base_id="large", min_score=-1.0)
+    assert len(results) == 80
+    assert {r["document_id"] for r in results} == {2, 3}
+
+
+def test_partition_matches_masked_global_search(db_session):
+    store = _seed(db_session)
+    query = np.linspace(-1, 1, 8).tolist()
+
+    scoped = store.query(query, top_k=5, knowledge_base_id="large", min_score=-1.0)
+    unscoped = store.query(query, top_k=200, min_score=-1.0)
+    expected = [r["chunk_id"] for r in unscoped if r["document_id"] in (2, 3)][:5]
+    assert [r["chunk_id"] for r in scoped] == expected
+
+
+def test_partition_syncs_new_chunks_and_legacy_document_ids(db_session):
+    store = _seed(db_session)
+    assert len(store.query([1.0] * 8, top_k=10, knowledge_base_id=4, min_score=-1.0)) == 5
+
+    store.store_chunks(1, ["late"], [[1.0] * 8])
+    results = store.query([1.0] * 8, top_k=1, knowledge_base_id="small")
+    assert results[0]["text"] == "late"
+
+
+def test_partition_follows_knowledge_base_membership_changes(db_session):
+    store = _seed(db_session)
+    partitions = get_partitioned_index(db_session)
+    assert {r["document_id"] for r in store.query([1.0] * 8, top_k=100, knowledge_base_id="small", min_score=-1.0)} == {1}
+
+    # Document 4's chunks were stored (and synced past) before it joined the knowledge base
+    assign_documents(db_session, [4], "small")
+    db_session.commit()
+    results = store.query([1.0] * 8, top_k=100, knowledge_base_id="small", min_score=-1.0)
+    assert {r["document_id"] for r in results} == {1, 4}
+    assert len(results) == 8
+
+    assign_documents(db_session, [1], "large")
+    db_session.commit()
+    assert {r["document_id"] for r in store.query([1.0] * 8, top_k=100, knowledge_base_id="small", min_score=-1.0)} == {4}
+    assert len(partitions.partition(db_session, "small")) == 5
+
+
+def test_snapshot_of_a_changed_knowledge_base_is_rebuilt(db_session, tmp_path):
+    _seed(db_session)
+    partitions = PartitionedIndex(memory_budget=10 ** 9, snapshot_dir=str(tmp_path))
+    partitions.partition(db_session, "large")
+    assert partitions.persist() == 1
+
+    assign_documents(db_session, [3], None)
+    db_session.commit()
+    reloaded = PartitionedIndex(memory_budget=10 ** 9, snapshot_dir=str(tmp_path)).partition(db_session, "large")
+    assert set(reloaded.row_ids()[1].tolist()) == {2}
+
+
+def test_lru_eviction_under_budget_reloads_from_snapshot(db_session, tmp_path):
+    _seed(db_session)
+    partitions = PartitionedIndex(memory_budget=1, snapshot_dir=str(tmp_path))
+
+    small = partitions.partition(db_session, "small")
+    assert partitions.stats()["misses"] == 1
+    # Queries never write snapshots; eviction does
+    assert not os.path.exists(partitions.snapshot_path("small"))
+
+    partitions.partition(db_session, "large")
+    # The budget only fits one partition; the least recently queried one goes
+    assert partitions.loaded() == ["large"]
+    assert partitions.evictions == 1
+    assert os.path.exists(partitions.snapshot_path("small"))
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    reloaded = partitions.partition(db_session, "small")
+    assert reloaded is not small
+    assert reloaded.row_ids()[0].tolist() == small.row_ids()[0].tolist()
+    # Only rows newer than the snapshot are read back from the database
+    embedding_reads = [sql for sql in statements if "embedding_blob" in sql]
+    assert len(embedding_reads) == 1
+
+    partitions.partition(db_session, "small")
+    stats = partitions.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 2)
+    assert stats["resident_partitions"] == 1
+    assert stats["resident_bytes"] == reloaded.memory_bytes() > 0
+
+
+def test_persist_writes_only_partitions_with_new_rows(db_session, tmp_path):
+    store = _seed(db_session)
+    partitions = PartitionedIndex(memory_budget=10 ** 9, snapshot_dir=str(tmp_path))
+    partitions.partition(db_session, "small")
+    partitions.partition(db_session, "large")
+    assert os.listdir(tmp_path) == []
+
+    assert partitions.persist() == 2
+    assert partitions.persist() == 0
+    store.store_chunks(1, ["late"], [[1.0] * 8])
+    partitions.partition(db_session, "small")
+    assert partitions.persist() == 1
+
+
+def test_unlimited_budget_keeps_partitions_and_writes_no_snapshots(db_session, tmp_path):
+    _seed(db_session)
+    partitions = PartitionedIndex(memory_budget=0, snapshot_dir=str(tmp_path))
+    for kb in ("small", "large", "small"):
+        partitions.partition(db_session, kb)
+
+    assert partitions.loaded() == ["large", "small"]
+    assert (partitions.hits, partitions.misses, partitions.evictions) == (1, 2, 0)
+    assert os.listdir(tmp_path) == []
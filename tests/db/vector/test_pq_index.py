@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.matrix_index import MatrixIndex
+from app.db.vector.pq_index import PQIndex
+from app.db.vector.pq_vector_store import PQVectorStore
+from app.utils.evaluation import mean_recall_at_k
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(5)
+    centers = rng.normal(size=(20, 32))
+    data = centers[rng.integers(0, 20, size=1200)] + 0.3 * rng.normal(size=(1200, 32))
+    queries = centers[rng.integers(0, 20, size=20)] + 0.3 * rng.normal(size=(20, 32))
+    ids = list(range(1, 1201))
+    return ids, data, queries
+
+
+@pytest.fixture(scope="module")
+def built(corpus):
+    ids, data, _ = corpus
+    pq = PQIndex(code_size=16, min_train_size=1000)
+    for start in range(0, len(ids), 400):
+        pq.add(ids[start:start + 400], [1] * 400, data[start:start + 400])
+    pq.wait_for_training()
+    exact = MatrixIndex()
+    exact.add(ids, [1] * len(ids), data)
+    return pq, exact
+
+
+def test_trains_and_compresses(built):
+    pq, _ = built
+    assert pq.trained
+    assert pq._codes.view.shape == (1200, 16)
+    # 16 bytes per vector instead of 32 * 4 (plus the shared codebooks)
+    assert pq._codes.view.nbytes * 8 == 1200 * 32 * 4
+
+
+def test_adc_search_recall(built, corpus):
+    pq, exact = built
+    _, _, queries = corpus
+    recall = mean_recall_at_k(
+        lambda q, k: pq.search(q, k, min_score=-1.0),
+        lambda q, k: exact.search(q, k, min_score=-1.0),
+        queries.tolist(),
+        k=10,
+    )
+    assert recall >= 0.7
+
+
+def test_untrained_index_searches_exactly(corpus):
+    ids, data, queries = corpus
+    pq = PQIndex(code_size=8, min_train_size=10 ** 9)
+    exact = MatrixIndex()
+    pq.add(ids[:200], [1] * 200, data[:200])
+    exact.add(ids[:200], [1] * 200, data[:200])
+    query = queries[0].tolist()
+    assert pq.search(query, 5, min_score=-1.0) == exact.search(query, 5, min_score=-1.0)
+
+
+def test_save_and_load_round_trip(built, corpus, tmp_path):
+    pq, _ = built
+    _, _, queries = corpus
+    path = str(tmp_path / "pq.npz")
+    pq.save(path)
+
+    restored = PQIndex(code_size=16)
+    restored.load(path)
+    assert len(restored) == len(pq) and restored.trained
+    query = queries[0].tolist()
+    assert restored.search(query, 10, min_score=-1.0) == pq.search(query, 10, min_score=-1.0)
+
+
+def test_pq_vector_store_rescores_with_exact_similarity(tmp_path, db_session, corpus):
+    ids, data, queries = corpus
+    store = PQVectorStore(db_session, code_size=8, rescore=4, min_train_size=300, index_path=str(tmp_path / "pq.npz"))
+    store.store_chunks(1, [f"chunk {i}" for i in range(300)], data[:300].tolist())
+
+    exact = MatrixIndex()
+    exact.add(ids[:300], [1] * 300, data[:300])
+    query = queries[0].tolist()
+    expected = exact.search(query, 3, min_score=-1.0)
+
+    results = store.query(query, top_k=3, min_score=-1.0)
+    assert [r["chunk_id"] for r in results] == [chunk_id for chunk_id, _ in expected]
+    assert [r["similarity"] for r in results] == pytest.approx([score for _, score in expected], abs=1e-5)
@@ -0,0 +1,100 @@
+import pytest
+
+from app.db.vector import query_cache as query_cache_module
+from app.db.vector.query_cache import QueryCache, query_cache_key
+
+
+def _key(embedding=(0.1, 0.2), **overrides):
+    params = {"top_k": 5, "knowledge_base_id": None, "filters": None, "min_score": 0.0}
+    params.update(overrides)
+    return query_cache_key("inmemory", list(embedding), **params)
+
+
+def _results(n=2, text="chunk"):
+    return [{"chunk_id": i, "text": f"{text} {i}", "similarity": 1.0 - i / 10} for i in range(n)]
+
+
+def test_key_covers_embedding_and_every_parameter():
+    base = _key()
+    assert _key() == base
+    assert _key(filters={"b": 1, "a": 2}) == _key(filters={"a": 2, "b": 1})
+    variants = [
+        _key(embedding=(0.1, 0.3)),
+        _key(top_k=6),
+        _key(knowledge_base_id="kb"),
+        _key(filters={"a": 1}),
+        _key(min_score=0.2),
+        _key(query_text="renewal"),
+        _key(search_params={"nprobe": 4}),
+        query_cache_key("hnsw", [0.1, 0.2], 5, None, None, 0.0),
+    ]
+    assert len({base, *variants}) == len(variants) + 1
+
+
+def test_hits_return_copies_and_count_in_the_hit_ratio():
+    cache = QueryCache(max_entries=4, max_bytes=0, ttl=0)
+    assert cache.get("q", generation=1) is None
+    cache.put("q", 1, _results())
+
+    first = cache.get("q", generation=1)
+    first[0]["text"] = "mutated"
+    assert cache.get("q", generation=1) == _results()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+    assert stats["bytes"] > 0
+
+
+def test_newer_generation_drops_stale_entries():
+    cache = QueryCache(max_entries=4, max_bytes=0, ttl=0)
+    cache.put("a", 1, _results())
+    cache.put("b", 1, _results())
+
+    assert cache.get("a", generation=2) is None
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+    assert cache.stats()["invalidations"] == 2
+
+    # Results computed at an older generation than the newest seen are not cached
+    cache.put("a", 1, _results())
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used_by_count_and_bytes():
+    cache = QueryCache(max_entries=2, max_bytes=0, ttl=0)
+    cache.put("a", 1, _results())
+    cache.put("b", 1, _results())
+    cache.get("a", 1)
+    cache.put("c", 1, _results())
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None and cache.get("c", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+    entry_bytes = cache.stats()["bytes"] // 2
+    cache = QueryCache(max_entries=10, max_bytes=int(entry_bytes * 2.5), ttl=0)
+    for key in "abc":
+        cache.put(key, 1, _results())
+    assert len(cache) == 2 and cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.get("a", 1) is None
+
+    cache.put("huge", 1, _results(n=200))
+    assert cache.get("huge", 1) is None
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(query_cache_module.time, "monotonic", lambda: now[0])
+    cache = QueryCache(max_entries=4, max_bytes=0, ttl=30)
+    cache.put("q", 1, _results())
+
+    now[0] += 29
+    assert cache.get("q", 1) is not None
+    now[0] += 2
+    assert cache.get("q", 1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = QueryCache(max_entries=0)
+    cache.put("q", 1, _results())
+    assert not cache.enabled and len(cache) == 0
@@ -0,0 +1,31 @@
+import pytest
+
+from app.db.vector.query_planner import plan_query
+
+
+def test_unfiltered_query_scans():
+    plan = plan_query(total_rows=1000, estimated_matches=1000, top_k=5, filtered=False)
+    assert plan.strategy == "scan"
+    assert plan.selectivity == 1.0
+
+
+def test_no_matches_plans_empty():
+    assert plan_query(1000, 0, 5, filtered=True).strategy == "empty"
+
+
+def test_selective_filter_prefilters():
+    plan = plan_query(1_000_000, 300, 5, filtered=True, prefilter_max_rows=4096)
+    assert plan.strategy == "prefilter"
+    assert plan.as_dict()["selectivity"] == pytest.approx(0.0003)
+
+
+def test_broad_filter_postfilters_with_overfetch():
+    plan = plan_query(1_000_000, 500_000, 10, filtered=True, prefilter_max_rows=4096, overfetch=2.0)
+    assert plan.strategy == "postfilter"
+    assert plan.fetch_k == 40
+
+
+def test_overfetch_covering_the_index_uses_a_masked_scan():
+    plan = plan_query(10_000, 5_000, 10, filtered=True, prefilter_max_rows=100, overfetch=1000.0)
+    assert plan.strategy == "masked_scan"
+    assert plan.fetch_k == 0
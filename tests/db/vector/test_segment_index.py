@@ -0,0 +1,151 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, Chunk
+from app.db.vector.segment_index import SegmentIndex, get_segment_index
+from app.db.vector.mmap_vector_store import MmapVectorStore
+from app.utils.similarity import cosine_similarity
+
+
+@pytest.fixture(scope="function")
+def db_session():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+def _store_random(db_session, n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.normal(size=(n, dim)).tolist()
+    for i, emb in enumerate(embeddings):
+        db_session.add(Chunk(document_id=1 + i % 3, chunk_index=i, text=f"chunk {i}", embedding=emb, chunk_metadata={}))
+    db_session.commit()
+    return embeddings
+
+
+def test_sync_spans_multiple_segments_and_matches_bruteforce(tmp_path, db_session):
+    embeddings = _store_random(db_session, 25)
+    index = SegmentIndex(str(tmp_path), segment_capacity=10)
+
+    assert index.sync(db_session) == 25
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert [s["rows"] for s in manifest["segments"]] == [10, 10, 5]
+    assert manifest["last_chunk_id"] == 25
+
+    query = np.random.default_rng(1).normal(size=8).tolist()
+    expected = sorted(range(25), key=lambda i: -cosine_similarity(query, embeddings[i]))[:5]
+    hits = index.search(query, top_k=5, min_score=-1.0)
+    assert [h[0] for h in hits] == [i + 1 for i in expected]
+
+
+def test_new_reader_maps_existing_segments_without_db(tmp_path, db_session):
+    _store_random(db_session, 12)
+    SegmentIndex(str(tmp_path), segment_capacity=5).sync(db_session)
+
+    reader = SegmentIndex(str(tmp_path))
+    assert len(reader) == 12
+    assert isinstance(reader._mapped(reader._manifest["segments"][0])[0], np.memmap)
+    chunk_ids, document_ids = reader.row_ids()
+    assert chunk_ids.tolist() == list(range(1, 13))
+    assert document_ids.tolist()[:4] == [1, 2, 3, 1]
+
+
+def test_reader_sees_rows_appended_by_another_writer(tmp_path, db_session):
+    _store_random(db_session, 3)
+    writer = SegmentIndex(str(tmp_path), segment_capacity=8)
+    reader = SegmentIndex(str(tmp_path))
+    writer.sync(db_session)
+    reader.refresh()
+    assert len(reader) == 3
+
+    db_session.add(Chunk(document_id=9, chunk_index=0, text="late", embedding=[1.0] * 8, chunk_metadata={}))
+    db_session.commit()
+    writer.sync(db_session)
+
+    assert reader.refresh()
+    hits = reader.search([1.0] * 8, top_k=1)
+    assert hits[0][0] == 4
+
+
+def test_mask_is_applied_across_segments(tmp_path, db_session):
+    _store_random(db_session, 9)
+    index = SegmentIndex(str(tmp_path), segment_capacity=4)
+    index.sync(db_session)
+    _, document_ids = index.row_ids()
+
+    hits = index.search([1.0] * 8, top_k=10, mask=document_ids == 2, min_score=-1.0)
+    assert sorted(h[0] for h in hits) == [2, 5, 8]
+
+
+def test_rows_synced_after_the_mask_are_excluded(tmp_path, db_session):
+    _store_random(db_session, 6)
+    index = SegmentIndex(str(tmp_path), segment_capacity=4)
+    index.sync(db_session)
+    mask = np.ones(6, dtype=bool)
+    db_session.add_all([Chunk(document_id=1, chunk_index=10 + i, text="late", embedding=[1.0] * 8, chunk_metadata={}) for i in range(4)])
+    db_session.commit()
+    index.sync(db_session)
+
+    hits = index.search([1.0] * 8, top_k=10, mask=mask, min_score=-1.0)
+    assert sorted(h[0] for h in hits) == [1, 2, 3, 4, 5, 6]
+
+
+def test_scans_use_the_row_counts_taken_under_the_lock(tmp_path, db_session):
+    _store_random(db_session, 6)
+    index = SegmentIndex(str(tmp_path), segment_capacity=10)
+    index.sync(db_session)
+    segments = index._segments()
+
+    # A later append grows the last segment in place; the snapshot keeps its count
+    _store_random(db_session, 3, seed=1)
+    index.sync(db_session)
+    assert [rows for _, _, rows in segments] == [6]
+    assert [rows for _, _, rows in index._segments()] == [9]
+
+
+def test_segment_index_is_shared_per_engine_and_directory(tmp_path, db_session):
+    other_engine = create_engine("sqlite:///:memory:")
+    other_session = sessionmaker(bind=other_engine)()
+    directory = str(tmp_path / "segments")
+
+    index = get_segment_index(db_session, directory)
+    assert get_segment_index(db_session, directory) is index
+    assert get_segment_index(db_session, str(tmp_path / "other")) is not index
+    assert get_segment_index(other_session, directory) is not index
+    other_session.close()
+
+
+def test_mmap_vector_store_round_trip(tmp_path, db_session):
+    store = MmapVectorStore(db_session, segment_dir=str(tmp_path))
+    store.store_chunks(1, [{"text": "alpha", "metadata": {"k": "v"}}, "beta"], [[1, 0, 0], [0, 1, 0]])
+    store.store_chunks(2, ["gamma"], [[0, 0, 1]])
+
+    assert os.path.exists(tmp_path / "segment_00000.npy")
+    results = store.query([0.9, 0.1, 0.0], top_k=2)
+    assert [r["text"] for r in results] == ["alpha", "beta"]
+    assert results[0]["chunk_metadata"] == {"k": "v"}
+
+    results = store.query([0.9, 0.1, 0.0], knowledge_base_id=2)
+    assert [r["text"] for r in results] == ["gamma"]
+
+
+def test_search_rows_scores_subset_across_segments(tmp_path, db_session):
+    embeddings = _store_random(db_session, 25)
+    index = SegmentIndex(str(tmp_path), segment_capacity=10)
+    index.sync(db_session)
+
+    rows = np.array([3, 12, 21, 24])
+    query = embeddings[12]
+    hits = index.search_rows(query, rows, top_k=3, min_score=-1.0)
+
+    expected = sorted(((int(r) + 1, cosine_similarity(embeddings[r], query)) for r in rows), key=lambda h: -h[1])[:3]
+    assert [h[0] for h in hits] == [e[0] for e in expected]
+    assert [h[1] for h in hits] == pytest.approx([e[1] for e in expected], abs=1e-5)
@@ -0,0 +1,184 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.shard_router_vector_store import ShardRouterVectorStore, merge_top_k
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def _hit(chunk_id, similarity):
+    return {"chunk_id": chunk_id, "document_id": 1, "text": f"chunk {chunk_id}", "chunk_metadata": None, "similarity": similarity}
+
+
+def test_merge_top_k_keeps_the_best_hits_once():
+    merged = merge_top_k(
+        [[_hit(1, 0.9), _hit(2, 0.5)], [_hit(3, 0.7), _hit(4, 0.5), _hit(1, 0.9)], []],
+        top_k=3,
+    )
+    assert [(hit["chunk_id"], hit["similarity"]) for hit in merged] == [(1, 0.9), (3, 0.7), (2, 0.5)]
+    assert merge_top_k([[_hit(1, 0.9)]], top_k=0) == []
+
+
+@pytest.fixture
+def fake_shard():
+    """Starts local HTTP servers answering shard searches with canned hits, a delay or an error."""
+    servers = []
+
+    def start(hits=(), delay=0.0, status=200):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(delay)
+                if status != 200:
+                    self.send_response(status)
+                    self.end_headers()
+                    return
+                payload = json.dumps({
+                    "shard": "fake",
+                    "results": [list(hits)[:body["top_k"]] for _ in body["query_embeddings"]],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_router_merges_shards_and_reports_failed_ones(fake_shard):
+    good = [fake_shard([_hit(1, 0.9), _hit(3, 0.4)]), fake_shard([_hit(2, 0.8), _hit(4, 0.6)])]
+    slow = fake_shard([_hit(5, 1.0)], delay=1.0)
+    broken = fake_shard(status=500)
+    router = ShardRouterVectorStore(shard_urls=good + [slow, broken], timeout=0.3)
+
+    started = time.perf_counter()
+    results = router.query_batch([[1.0, 0.0], [0.0, 1.0]], top_k=3)
+
+    assert time.perf_counter() - started < 1.0
+    assert [[hit["chunk_id"] for hit in hits] for hits in results] == [[1, 2, 4], [1, 2, 4]]
+    assert router.last_plan["answered"] == good
+    assert set(router.last_plan["failed"]) == {slow, broken}
+    assert "timed out" in router.last_plan["failed"][slow]
+    assert router.last_plan["partial"] is True
+
+
+def test_router_can_refuse_partial_results(fake_shard):
+    router = ShardRouterVectorStore(shard_urls=[fake_shard([_hit(1, 0.9)]), fake_shard(status=500)], allow_partial=False)
+    with pytest.raises(RuntimeError, match="1/2 shards"):
+        router.query([1.0, 0.0])
+
+    router = ShardRouterVectorStore(shard_urls=[fake_shard(status=503)])
+    with pytest.raises(RuntimeError):
+        router.query([1.0, 0.0])
+
+
+def test_router_requires_shard_urls():
+    with pytest.raises(ValueError):
+        ShardRouterVectorStore(shard_urls=" , ")
+    with pytest.raises(NotImplementedError):
+        ShardRouterVectorStore(shard_urls="http://shard:8000").store_chunks(1, ["text"], [[1.0]])
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_shard(workdir, index, count):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "SHARD_INDEX": str(index),
+        "SHARD_COUNT": str(count),
+        "VECTOR_SNAPSHOT_DIR": "",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "dummy"),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def _wait_until_healthy(process, url, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"shard server {url} exited with {process.returncode}")
+        try:
+            if httpx.get(url + "/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"shard server {url} did not start")
+
+
+def test_router_over_local_shard_processes_matches_a_single_node(tmp_path):
+    # Shard servers share the database; each serves the documents of its slice
+    engine = create_engine(f"sqlite:///{tmp_path / 'rag.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    rng = np.random.default_rng(7)
+    single_node = InMemoryVectorStore(session)
+    for document_id in range(1, 7):
+        single_node.store_chunks(
+            document_id,
+            [f"document {document_id} chunk {i}" for i in range(5)],
+            rng.normal(size=(5, 8)).tolist(),
+        )
+    queries = rng.normal(size=(3, 8)).tolist()
+    expected = single_node.query_batch(queries, top_k=4)
+
+    shards = [_start_shard(tmp_path, index, 2) for index in range(2)]
+    try:
+        for process, url in shards:
+            _wait_until_healthy(process, url)
+
+        slices = [httpx.post(url + "/api/shard/search", json={"query_embeddings": queries, "top_k": 30}).json() for _, url in shards]
+        assert [response["shard"] for response in slices] == ["0/2", "1/2"]
+        assert {hit["document_id"] % 2 for hit in slices[0]["results"][0]} == {0}
+        assert {hit["document_id"] % 2 for hit in slices[1]["results"][0]} == {1}
+
+        router = ShardRouterVectorStore(shard_urls=[url for _, url in shards], timeout=10.0)
+        results = router.query_batch(queries, top_k=4)
+
+        assert [[hit["chunk_id"] for hit in hits] for hits in results] == [[hit["chunk_id"] for hit in hits] for hits in expected]
+        assert results[0][0]["similarity"] == pytest.approx(expected[0][0]["similarity"], abs=1e-5)
+        assert router.last_plan["partial"] is False
+    finally:
+        for process, _ in shards:
+            process.terminate()
+            process.wait(timeout=30)
+        session.close()
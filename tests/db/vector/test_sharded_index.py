@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base
+from app.db.vector.matrix_index import MatrixIndex
+from app.db.vector.sharded_index import ShardedIndex
+from app.db.vector.sharded_vector_store import ShardedVectorStore
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _data(rows=500, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(rows, dim)), rng.normal(size=(4, dim))
+
+
+def _fill(index, embeddings):
+    ids = list(range(1, len(embeddings) + 1))
+    index.add(ids, [i % 3 for i in ids], embeddings)
+    return index
+
+
+def _ids(hits):
+    return [chunk_id for chunk_id, _ in hits]
+
+
+@pytest.fixture
+def reference():
+    embeddings, _ = _data()
+    return _fill(MatrixIndex(), embeddings)
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_sharded_search_matches_a_single_matrix(reference, workers):
+    embeddings, queries = _data()
+    index = _fill(ShardedIndex(shards=3, workers=workers, parallel_min_rows=0, initial_capacity=64), embeddings)
+    mask = np.arange(500) % 4 != 0
+    try:
+        for query in queries:
+            expected = reference.search(query, 10, min_score=-1.0)
+            hits = index.search(query, 10, min_score=-1.0)
+            assert _ids(hits) == _ids(expected)
+            assert [score for _, score in hits] == pytest.approx([score for _, score in expected], abs=1e-5)
+            assert _ids(index.search(query, 10, mask=mask, min_score=-1.0)) == _ids(
+                reference.search(query, 10, mask=mask, min_score=-1.0)
+            )
+            rows = np.array([2, 40, 41, 300, 499])
+            assert _ids(index.search_rows(query, rows, 3, min_score=-1.0)) == _ids(
+                reference.search_rows(query, rows, 3, min_score=-1.0)
+            )
+
+        batch = index.search_batch(queries, 7, mask=mask, min_score=0.2)
+        expected = reference.search_batch(queries, 7, mask=mask, min_score=0.2)
+        assert [_ids(hits) for hits in batch] == [_ids(hits) for hits in expected]
+    finally:
+        index.close()
+
+
+def test_growth_moves_rows_to_a_new_block_and_masks_cover_old_rows():
+    embeddings, queries = _data()
+    index = ShardedIndex(shards=2, workers=0, initial_capacity=16)
+    index.add(list(range(1, 101)), [1] * 100, embeddings[:100])
+    first_block = index._block.name
+    mask = np.ones(100, dtype=bool)
+    index.add(list(range(101, 501)), [1] * 400, embeddings[100:])
+
+    assert index._block.name != first_block
+    assert len(index) == 500
+    assert index.row_ids()[0].tolist() == list(range(1, 501))
+    hits = index.search(queries[0], 500, mask=mask, min_score=-1.0)
+    assert sorted(_ids(hits)) == list(range(1, 101))
+    index.close()
+    assert len(index) == 0
+    assert index.search(queries[0], 5) == []
+
+
+def test_sharded_store_syncs_and_masks_tombstones(db_session):
+    store = ShardedVectorStore(db_session)
+    store.store_chunks(1, ["one"], [[1, 0, 0]])
+    store.store_chunks(2, ["two", "three"], [[0.9, 0.1, 0], [0, 1, 0]])
+
+    assert [r["text"] for r in store.query([1, 0, 0], top_k=2)] == ["one", "two"]
+    assert [r["text"] for r in store.query([1, 0, 0], top_k=5, knowledge_base_id=2)] == ["two", "three"]
+
+    store.delete_chunks(2)
+    assert [r["text"] for r in store.query([1, 0, 0], top_k=5)] == ["one"]
+    assert [[r["text"] for r in hits] for hits in store.query_batch([[1, 0, 0], [0, 1, 0]], top_k=5)] == [["one"], ["one"]]
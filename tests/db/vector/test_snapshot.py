@@ -0,0 +1,158 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.corpus import current_generation
+from app.db import shard_slice
+from app.db.models import Base, Document
+from app.db.vector import lsm_index
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.lsm_index import LSMIndex, get_lsm_index
+from app.db.vector.snapshot import (
+    MATRIX_SNAPSHOT_FILE,
+    SNAPSHOT_MANIFEST_VERSION,
+    manifest_path,
+    read_manifest,
+    restore_snapshot,
+    save_matrix_snapshot,
+    warm_start,
+)
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _store(db_session, count, document_id=1, seed=0):
+    if db_session.get(Document, document_id) is None:
+        db_session.add(Document(id=document_id, name=f"doc {document_id}", path=f"/{document_id}"))
+        db_session.commit()
+    rng = np.random.default_rng(seed)
+    InMemoryVectorStore(db_session).store_chunks(
+        document_id, [f"chunk {seed}-{i}" for i in range(count)], rng.normal(size=(count, 8)).tolist()
+    )
+
+
+def _count_embedding_reads(db_session):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "chunks.embedding" in statement:
+            statements.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", record)
+    return statements
+
+
+def test_store_chunks_bumps_generation(db_session):
+    assert current_generation(db_session) == 0
+    _store(db_session, 3)
+    _store(db_session, 2, seed=1)
+    assert current_generation(db_session) == 2
+
+
+def test_save_writes_index_and_manifest(db_session, tmp_path):
+    _store(db_session, 5)
+
+    manifest = save_matrix_snapshot(db_session, str(tmp_path))
+
+    path = str(tmp_path / MATRIX_SNAPSHOT_FILE)
+    assert read_manifest(path) == manifest
+    assert manifest["version"] == SNAPSHOT_MANIFEST_VERSION
+    assert manifest["index"] == "LSMIndex"
+    assert manifest["generation"] == 1
+    assert manifest["rows"] == 5
+    assert manifest["last_chunk_id"] == get_lsm_index(db_session).last_chunk_id
+
+
+def test_save_is_disabled_without_directory(db_session):
+    assert save_matrix_snapshot(db_session, "") is None
+
+
+def test_warm_start_restores_snapshot_and_replays_new_chunks(db_session, tmp_path):
+    _store(db_session, 6)
+    save_matrix_snapshot(db_session, str(tmp_path))
+    _store(db_session, 3, seed=1)
+    expected = get_lsm_index(db_session).search(np.ones(8), 4)
+
+    # Simulate a restart: a fresh process-wide index on the same database
+    restarted = LSMIndex()
+    lsm_index._indexes[db_session.get_bind()] = restarted
+    reads = _count_embedding_reads(db_session)
+
+    stats = warm_start(db_session, str(tmp_path))
+
+    assert stats["restored"] is True
+    assert stats["snapshot_rows"] == 6
+    assert stats["replayed"] == 3
+    assert len(restarted) == 9
+    assert len(reads) == 1
+    assert restarted.search(np.ones(8), 4) == expected
+
+
+def test_warm_start_without_snapshot_rebuilds(db_session, tmp_path):
+    _store(db_session, 4)
+    lsm_index._indexes[db_session.get_bind()] = LSMIndex()
+
+    stats = warm_start(db_session, str(tmp_path))
+
+    assert stats["restored"] is False
+    assert stats["replayed"] == 4
+
+
+def test_restore_rejects_snapshot_ahead_of_database(db_session, tmp_path):
+    _store(db_session, 4)
+    save_matrix_snapshot(db_session, str(tmp_path))
+    path = str(tmp_path / MATRIX_SNAPSHOT_FILE)
+
+    manifest = read_manifest(path)
+    manifest["generation"] += 1
+    with open(manifest_path(path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    index = LSMIndex()
+    assert restore_snapshot(index, path, db_session) is False
+    assert len(index) == 0
+
+
+def test_restore_rejects_snapshot_of_another_database(db_session, tmp_path):
+    _store(db_session, 4)
+    save_matrix_snapshot(db_session, str(tmp_path))
+
+    other = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=other)
+    with sessionmaker(bind=other)() as fresh:
+        assert restore_snapshot(LSMIndex(), str(tmp_path / MATRIX_SNAPSHOT_FILE), fresh) is False
+    other.dispose()
+
+
+def test_restore_rejects_unsupported_manifest(db_session, tmp_path):
+    _store(db_session, 2)
+    save_matrix_snapshot(db_session, str(tmp_path))
+    path = str(tmp_path / MATRIX_SNAPSHOT_FILE)
+
+    manifest = read_manifest(path)
+    manifest["version"] = SNAPSHOT_MANIFEST_VERSION + 1
+    with open(manifest_path(path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    assert restore_snapshot(LSMIndex(), path, db_session) is False
+
+
+def test_restore_rejects_snapshot_of_another_shard_slice(db_session, tmp_path, monkeypatch):
+    _store(db_session, 4)
+    save_matrix_snapshot(db_session, str(tmp_path))
+    path = str(tmp_path / MATRIX_SNAPSHOT_FILE)
+    assert read_manifest(path)["shard"] == "0/1"
+
+    monkeypatch.setattr(shard_slice, "SHARD_COUNT", 2)
+    assert restore_snapshot(LSMIndex(), path, db_session) is False
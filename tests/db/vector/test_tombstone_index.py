@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.corpus import current_generation, delete_document_chunks
+from app.db.models import Base, Chunk, Document
+from app.db.vector.tombstone_index import TombstoneIndex, get_tombstone_index
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _add_chunks(session, document_id, count):
+    for i in range(count):
+        session.add(Chunk(document_id=document_id, chunk_index=i, text=f"{document_id}-{i}", embedding=[1.0, 0.0]))
+    session.commit()
+
+
+def test_delete_document_chunks_records_tombstones(db_session):
+    db_session.add(Document(id=1, name="a.txt", path="/a.txt", document_metadata={}))
+    _add_chunks(db_session, 1, 3)
+    _add_chunks(db_session, 2, 2)
+
+    deleted = delete_document_chunks(db_session, 1, delete_document=True)
+    db_session.commit()
+
+    assert deleted == [1, 2, 3]
+    assert [chunk.document_id for chunk in db_session.query(Chunk)] == [2, 2]
+    assert db_session.get(Document, 1) is None
+    assert current_generation(db_session) == 1
+    assert delete_document_chunks(db_session, 1) == []
+
+
+def test_sync_is_incremental_and_masks_deleted_rows(db_session):
+    _add_chunks(db_session, 1, 2)
+    _add_chunks(db_session, 2, 3)
+    index = TombstoneIndex()
+    chunk_ids = np.arange(1, 6)
+
+    assert index.sync(db_session) == 0
+    assert index.live_mask(chunk_ids) is None
+
+    delete_document_chunks(db_session, 1)
+    db_session.commit()
+    assert index.sync(db_session) == 2
+    assert index.sync(db_session) == 0
+    assert index.live_mask(chunk_ids).tolist() == [False, False, True, True, True]
+    # Ids past the end of the rows, or rows without deleted chunks, are not masked
+    assert index.live_mask(np.arange(3, 6)) is None
+
+    delete_document_chunks(db_session, 2)
+    db_session.commit()
+    assert index.sync(db_session) == 3
+    assert len(index) == 5
+    assert not index.live_mask(chunk_ids).any()
+
+
+def test_index_is_shared_per_engine(db_session):
+    assert get_tombstone_index(db_session) is get_tombstone_index(db_session)
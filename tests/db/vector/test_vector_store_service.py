@@ -1,5 +1,10 @@
 import pytest
 from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.models import Base
+from app.db.vector.in_memory_vector_store import InMemoryVectorStore
+from app.db.vector.query_cache import QueryCache
 from app.db.vector.vector_store_service import VectorStoreService
 
 @pytest.fixture
@@ -53,3 +58,83 @@ def test_query_delegates_to_vector_store(vector_store_service, mock_vector_store
     )
 
     assert results == mock_result
+
+
+def test_query_batch_delegates_to_vector_store(vector_store_service, mock_vector_store):
+    mock_vector_store.query_batch.return_value = [[{"text": "A"}], []]
+
+    results = vector_store_service.query_batch([[0.1, 0.2], [0.3, 0.4]], top_k=3, knowledge_base_id="kb1", nprobe=4)
+
+    mock_vector_store.query_batch.assert_called_once_with(
+        query_embeddings=[[0.1, 0.2], [0.3, 0.4]],
+        top_k=3,
+        knowledge_base_id="kb1",
+        filters=None,
+        min_score=0.0,
+        query_texts=None,
+        nprobe=4
+    )
+    assert results == [[{"text": "A"}], []]
+
+
+def test_query_batch_rejects_mismatched_query_texts(vector_store_service):
+    with pytest.raises(ValueError, match="Number of query texts and query embeddings must be the same."):
+        vector_store_service.query_batch([[0.1, 0.2]], query_texts=["a", "b"])
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _cached_service(db_session, store):
+    return VectorStoreService(vector_store=store, db_session=db_session, query_cache=QueryCache(max_entries=8, max_bytes=0, ttl=0))
+
+
+def test_repeated_query_is_served_from_cache_until_the_corpus_changes(db_session):
+    store = InMemoryVectorStore(db_session)
+    store.store_chunks(1, ["alpha", "beta"], [[1.0, 0.0], [0.0, 1.0]])
+    spy = MagicMock(wraps=store.query)
+    store.query = spy
+    service = _cached_service(db_session, store)
+
+    first = service.query([1.0, 0.1], top_k=2)
+    assert service.query([1.0, 0.1], top_k=2) == first
+    assert spy.call_count == 1
+    assert service.last_plan["strategy"] == "cache"
+
+    service.query([1.0, 0.1], top_k=1)
+    assert spy.call_count == 2
+
+    store.store_chunks(2, ["gamma"], [[1.0, 0.05]])
+    assert [hit["text"] for hit in service.query([1.0, 0.1], top_k=2)][0] == "gamma"
+    assert spy.call_count == 3
+    assert service.last_plan["strategy"] != "cache"
+
+    service.delete_chunks(2)
+    assert "gamma" not in [hit["text"] for hit in service.query([1.0, 0.1], top_k=2)]
+    assert spy.call_count == 4
+    assert service.query_cache.stats()["hits"] == 1
+
+
+def test_partial_results_are_not_cached(db_session):
+    store = MagicMock()
+    store.query.return_value = [{"chunk_id": 1, "text": "A", "similarity": 0.9}]
+    store.last_plan = {"strategy": "shard_router", "partial": True}
+    service = _cached_service(db_session, store)
+
+    service.query([0.1, 0.2])
+    service.query([0.1, 0.2])
+    assert store.query.call_count == 2
+    assert len(service.query_cache) == 0
+
+
+def test_service_without_session_does_not_cache(vector_store_service, mock_vector_store):
+    mock_vector_store.query.return_value = []
+    vector_store_service.query([0.1, 0.2])
+    vector_store_service.query([0.1, 0.2])
+    assert mock_vector_store.query.call_count == 2
@@ -4,6 +4,13 @@ from unittest.mock import MagicMock
 from app.db.vector.in_memory_vector_store import InMemoryVectorStore
 from app.db.vector.db_vector_store import DBVectorStore
 from app.db.vector.hybrid_vector_store import HybridVectorStore
+from app.db.vector.mmap_vector_store import MmapVectorStore
+from app.db.vector.hnsw_vector_store import HNSWVectorStore
+from app.db.vector.ivf_vector_store import IVFVectorStore
+from app.db.vector.pq_vector_store import PQVectorStore
+from app.db.vector.int8_vector_store import Int8VectorStore
+from app.db.vector.sharded_vector_store import ShardedVectorStore
+from app.db.vector.shard_router_vector_store import ShardRouterVectorStore
 from app.db.vector.base_vector_store import BaseVectorStore
 from app.db.vector.vector_store_factory import get_vector_store
 
@@ -55,3 +62,55 @@ def test_get_vector_store_with_unsupported_strategy_raises_value_error(mock_db_s
     with pytest.raises(ValueError) as exc_info:
         get_vector_store("unsupported_strategy", mock_db_session)
     assert "Unsupported vector store strategy" in str(exc_info.value)
+
+
+def test_get_vector_store_mmap_returns_correct_instance(mock_db_session):
+    store = get_vector_store("mmap", mock_db_session, segment_dir="unused")
+    assert isinstance(store, MmapVectorStore)
+    assert isinstance(store, BaseVectorStore)
+
+
+def test_get_vector_store_hnsw_passes_tuning_parameters(mock_db_session):
+    store = get_vector_store("hnsw", mock_db_session, M=8, ef_construction=50, ef_search=20)
+    assert isinstance(store, HNSWVectorStore)
+    assert (store.M, store.ef_construction, store.ef_search) == (8, 50, 20)
+
+
+def test_get_vector_store_ivf_passes_tuning_parameters(mock_db_session):
+    store = get_vector_store("ivf", mock_db_session, n_lists=64, nprobe=4)
+    assert isinstance(store, IVFVectorStore)
+    assert (store.n_lists, store.nprobe) == (64, 4)
+
+
+def test_get_vector_store_pq_passes_tuning_parameters(mock_db_session):
+    store = get_vector_store("pq", mock_db_session, code_size=16, rescore=0)
+    assert isinstance(store, PQVectorStore)
+    assert (store.code_size, store.rescore) == (16, 0)
+
+
+def test_get_vector_store_int8_passes_tuning_parameters(mock_db_session):
+    store = get_vector_store("int8", mock_db_session, oversample=8)
+    assert isinstance(store, Int8VectorStore)
+    assert store.oversample == 8
+
+
+def test_get_vector_store_sharded(mock_db_session):
+    assert isinstance(get_vector_store("sharded", mock_db_session), ShardedVectorStore)
+    hybrid = get_vector_store("hybrid", mock_db_session, memory_strategy="sharded")
+    assert isinstance(hybrid.vector_store, ShardedVectorStore)
+
+
+def test_get_vector_store_router_passes_shard_settings(mock_db_session):
+    store = get_vector_store("router", mock_db_session, shard_urls="http://a:8000/, http://b:8000", timeout=0.5)
+    assert isinstance(store, ShardRouterVectorStore)
+    assert store.shard_urls == ["http://a:8000", "http://b:8000"]
+    assert store.timeout == 0.5
+
+
+def test_get_vector_store_binary_enables_first_stage(mock_db_session):
+    store = get_vector_store("binary", mock_db_session)
+    assert type(store) is InMemoryVectorStore
+    assert store.binary_shortlist == 16
+
+    hybrid = get_vector_store("hybrid", mock_db_session, memory_strategy="binary")
+    assert hybrid.vector_store.binary_shortlist == 16
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import pytest
 from unittest.mock import patch, MagicMock
@@ -49,6 +50,7 @@ def test_ingestion_success(mock_get_ingestor, tmp_path, mock_services):
     mock_doc = MagicMock()
     mock_doc.id = "doc-1"
     mock_services["storage_service"].store_document.return_value = mock_doc
+    mock_services["storage_service"].get_document_by_name.return_value = None
 
     # 🔁 Run the pipeline
     pipeline = IngestionPipeline(
@@ -63,6 +65,14 @@ def test_ingestion_success(mock_get_ingestor, tmp_path, mock_services):
     mock_get_ingestor.assert_called_once_with(".txt")
     mock_ingestor_class.assert_called_once_with(file_path=str(test_file))
     mock_ingestor_instance.load_documents.assert_called_once()
+    mock_services["storage_service"].store_document.assert_called_once_with(
+        name="example.txt",
+        document_metadata={"source": "unit", "content_hash": hashlib.sha256(b"Some content").hexdigest()},
+        path=str(test_file),
+        knowledge_base_id=None,
+    )
+    mock_services["storage_service"].store_chunks.assert_called_once_with("doc-1", [{"text": "chunk1"}], [[0.1, 0.2, 0.3]])
+    mock_services["storage_service"].replace_chunks.assert_not_called()
 
 
 
@@ -106,7 +116,9 @@ def test_ingestion_skips_existing_document(mock_get_ingestor, tmp_path, mock_ser
     mock_doc.id = "doc-1"
     mock_services["storage_service"].store_document.return_value = mock_doc
 
-    mock_services["storage_service"].document_exists.return_value = True
+    existing = MagicMock()
+    existing.document_metadata = {"source": "unit", "content_hash": hashlib.sha256(b"Some content").hexdigest()}
+    mock_services["storage_service"].get_document_by_name.return_value = existing
 
     pipeline = IngestionPipeline(
         folder_path=str(tmp_path),
@@ -120,11 +132,48 @@ def test_ingestion_skips_existing_document(mock_get_ingestor, tmp_path, mock_ser
     mock_ingestor_class.assert_called_once_with(file_path=str(test_file))
     mock_ingestor_instance.load_documents.assert_called_once()
 
-    mock_services["storage_service"].document_exists.assert_called_once_with("example.txt")
+    mock_services["storage_service"].get_document_by_name.assert_called_once_with("example.txt")
     mock_services["chunking_service"].chunk_text.assert_not_called()
     mock_services["embedding_service"].get_embedding.assert_not_called()
     mock_services["storage_service"].store_document.assert_not_called()
     mock_services["storage_service"].store_chunks.assert_not_called()
+    mock_services["storage_service"].replace_chunks.assert_not_called()
+
+
+@pytest.mark.parametrize("stored_metadata", [{"content_hash": "stale"}, {"source": "unit"}, None])
+@patch("app.services.ingestion.ingestion_pipeline.get_ingestor_for_extension")
+def test_ingestion_replaces_chunks_of_changed_document(mock_get_ingestor, tmp_path, mock_services, stored_metadata):
+    (tmp_path / "example.txt").write_text("Hello world")
+
+    mock_ingestor_class = MagicMock()
+    mock_ingestor_class.return_value.load_documents.return_value = [
+        ("example.txt", "New content", {"source": "unit"})
+    ]
+    mock_get_ingestor.return_value = mock_ingestor_class
+
+    mock_services["chunking_service"].chunk_text.return_value = [{"text": "chunk1"}, {"text": "chunk2"}]
+    mock_services["embedding_service"].get_embedding.return_value = [0.1, 0.2, 0.3]
+    existing = MagicMock()
+    existing.id = 7
+    existing.document_metadata = stored_metadata
+    mock_services["storage_service"].get_document_by_name.return_value = existing
+
+    pipeline = IngestionPipeline(
+        folder_path=str(tmp_path),
+        chunking_service=mock_services["chunking_service"],
+        embedding_service=mock_services["embedding_service"],
+        storage_service=mock_services["storage_service"],
+    )
+    pipeline.run()
+
+    mock_services["storage_service"].replace_chunks.assert_called_once_with(
+        7,
+        [{"text": "chunk1"}, {"text": "chunk2"}],
+        [[0.1, 0.2, 0.3], [0.1, 0.2, 0.3]],
+        document_metadata={"source": "unit", "content_hash": hashlib.sha256(b"New content").hexdigest()},
+    )
+    mock_services["storage_service"].store_document.assert_not_called()
+    mock_services["storage_service"].store_chunks.assert_not_called()
 
 
 @patch("app.services.ingestion.ingestor_factory.get_ingestor_for_extension")
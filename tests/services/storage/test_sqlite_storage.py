@@ -3,12 +3,14 @@
 import uuid
 from datetime import datetime
 
+import numpy as np
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.db.models import Base, Chunk, Conversation, Message
+from app.db.corpus import current_generation, tombstones_since
+from app.db.models import Base, Chunk, Conversation, Document, KnowledgeBase, Message
 from app.services.storage.sqlite_storage import SQLiteStorage
 
 
@@ -52,6 +54,16 @@ def test_store_document(storage):
     assert doc.path == "/path/to/test.txt"
 
 
+def test_store_document_in_knowledge_base(storage):
+    first = storage.store_document("a.txt", {}, "/a.txt", knowledge_base_id="kb-1")
+    second = storage.store_document("b.txt", {}, "/b.txt", knowledge_base_id="kb-1")
+
+    kb = storage.db.get(KnowledgeBase, "kb-1")
+    assert kb is not None
+    assert [d.id for d in kb.documents] == [first.id, second.id]
+    assert storage.store_document("c.txt", {}, "/c.txt").knowledge_base_id is None
+
+
 def test_store_chunks(storage):
     doc = storage.store_document("doc.txt", {}, "/path/to/doc.txt")
 
@@ -71,8 +83,50 @@ def test_store_chunks(storage):
 
     assert len(stored) == 2
     assert stored[0].text == "chunk one"
-    assert stored[1].embedding == [0.4, 0.5, 0.6]
+    assert stored[1].embedding == pytest.approx((np.array([0.4, 0.5, 0.6]) / np.linalg.norm([0.4, 0.5, 0.6])).tolist(), rel=1e-6)
+    assert stored[1].embedding_normalized is True
+    assert stored[1].embedding_dtype == "float32"
+    assert len(stored[1].embedding_blob) == 3 * 4
+
+
+def test_replace_chunks_tombstones_old_chunks_and_updates_metadata(storage):
+    doc = storage.store_document("doc.txt", {"content_hash": "old"}, "/path/to/doc.txt")
+    storage.store_chunks(doc.id, [{"text": "old one"}, {"text": "old two"}], [[1.0, 0.0], [0.0, 1.0]])
+    old_ids = [chunk.id for chunk in storage.db.query(Chunk).filter_by(document_id=doc.id)]
+    generation = current_generation(storage.db)
+
+    storage.replace_chunks(doc.id, [{"text": "new one"}], [[1.0, 1.0]], document_metadata={"content_hash": "new"})
+
+    stored = storage.db.query(Chunk).filter_by(document_id=doc.id).all()
+    assert [chunk.text for chunk in stored] == ["new one"]
+    assert [chunk_id for _, chunk_id in tombstones_since(storage.db, 0)] == old_ids
+    assert current_generation(storage.db) > generation
+    storage.db.expire_all()
+    assert storage.get_document_by_name("doc.txt").document_metadata == {"content_hash": "new"}
+
+
+def test_delete_document_removes_document_and_chunks(storage):
+    doc = storage.store_document("doc.txt", {}, "/path/to/doc.txt")
+    storage.store_chunks(doc.id, [{"text": "one"}, {"text": "two"}], [[1.0, 0.0], [0.0, 1.0]])
+
+    assert storage.delete_document(doc.id) == 2
+    assert storage.db.query(Chunk).count() == 0
+    assert storage.db.query(Document).count() == 0
+    assert storage.get_document_by_name("doc.txt") is None
+    assert len(tombstones_since(storage.db, 0)) == 2
+
+
+def test_get_chunk_embeddings_decodes_stored_vectors(storage):
+    doc = storage.store_document("doc.txt", {}, "/path/to/doc.txt")
+    storage.store_chunks(doc.id, [{"text": "one"}, {"text": "two"}], [[3.0, 4.0], [0.0, 2.0]])
+    ids = [chunk.id for chunk in storage.db.query(Chunk).order_by(Chunk.id)]
+
+    embeddings = storage.get_chunk_embeddings(ids + [999])
 
+    assert sorted(embeddings) == ids
+    assert embeddings[ids[0]] == pytest.approx([0.6, 0.8])
+    assert embeddings[ids[1]] == pytest.approx([0.0, 1.0])
+    assert storage.get_chunk_embeddings([]) == {}
 
 
 def test_create_and_get_conversation(storage):
@@ -15,7 +15,9 @@ def storage_service(mock_backend):
 
 def test_store_document_calls_backend(storage_service, mock_backend):
     storage_service.store_document("doc.txt", {"source": "user"}, "/path/doc.txt")
-    mock_backend.store_document.assert_called_once_with("doc.txt", {"source": "user"}, "/path/doc.txt")
+    mock_backend.store_document.assert_called_once_with(
+        "doc.txt", {"source": "user"}, "/path/doc.txt", knowledge_base_id=None
+    )
 
 
 def test_store_chunks_calls_backend(storage_service, mock_backend):
@@ -44,6 +46,30 @@ def test_get_messages_by_conversation_calls_backend(storage_service, mock_backen
     storage_service.get_messages_by_conversation("conv-123")
     mock_backend.get_messages_by_conversation.assert_called_once_with("conv-123")
 
+def test_get_document_by_name_calls_backend(storage_service, mock_backend):
+    document = Document(id=1, name="doc.txt")
+    mock_backend.get_document_by_name.return_value = document
+    assert storage_service.get_document_by_name("doc.txt") is document
+    mock_backend.get_document_by_name.assert_called_once_with("doc.txt")
+
+
+def test_delete_document_calls_backend(storage_service, mock_backend):
+    mock_backend.delete_document.return_value = 3
+    assert storage_service.delete_document(1) == 3
+    mock_backend.delete_document.assert_called_once_with(1)
+
+
+def test_replace_chunks_calls_backend(storage_service, mock_backend):
+    storage_service.replace_chunks(1, [{"text": "chunk1"}], [[0.1, 0.2]], document_metadata={"content_hash": "abc"})
+    mock_backend.replace_chunks.assert_called_once_with(
+        1, [{"text": "chunk1"}], [[0.1, 0.2]], document_metadata={"content_hash": "abc"}
+    )
+
+def test_get_chunk_embeddings_calls_backend(storage_service, mock_backend):
+    mock_backend.get_chunk_embeddings.return_value = {1: [0.1, 0.2]}
+    assert storage_service.get_chunk_embeddings([1, 2]) == {1: [0.1, 0.2]}
+    mock_backend.get_chunk_embeddings.assert_called_once_with([1, 2])
+
 def test_document_exists_calls_backend():
     mock_backend = MagicMock()
     mock_backend.document_exists.return_value = True
@@ -80,3 +80,41 @@ def test_chat_existing_conversation(rag_service, mock_services):
     mock_services["vector_store_service"].query.assert_called_once()
     mock_services["generator_service"].generate_answer.assert_called_once()
     mock_services["storage_service"].add_message.assert_called()
+
+def _prepare_chat(mock_services, candidates):
+    mock_services["embedding_service"].get_embedding.return_value = [1.0, 0.2, 0.0]
+    mock_services["vector_store_service"].query.return_value = candidates
+    mock_services["generator_service"].generate_answer.return_value = "answer"
+    mock_services["storage_service"].create_conversation.side_effect = lambda c: setattr(c, "id", "conv-mmr")
+
+def test_chat_over_fetches_and_drops_near_duplicate_context(rag_service, mock_services):
+    candidates = [
+        {"chunk_id": 1, "text": "renewal clause", "similarity": 0.99},
+        {"chunk_id": 2, "text": "renewal clause (overlap)", "similarity": 0.98},
+        {"chunk_id": 3, "text": "termination clause", "similarity": 0.60},
+        {"chunk_id": 4, "text": "no stored embedding", "similarity": 0.50},
+    ]
+    _prepare_chat(mock_services, candidates)
+    mock_services["storage_service"].get_chunk_embeddings.return_value = {
+        1: [1.0, 0.11, 0.0],
+        2: [1.0, 0.1, 0.0],
+        3: [0.6, 0.0, 0.8],
+    }
+
+    result = rag_service.chat(query="renewal?", top_k=3, mmr_lambda=0.3, fetch_k=8)
+
+    assert mock_services["vector_store_service"].query.call_args.kwargs["top_k"] == 8
+    mock_services["storage_service"].get_chunk_embeddings.assert_called_once_with([1, 2, 3, 4])
+    assert [chunk["chunk_id"] for chunk in result["context_chunks"]] == [1, 3, 2]
+    context = mock_services["generator_service"].generate_answer.call_args.kwargs["context"]
+    assert context.split("\n") == ["renewal clause", "termination clause", "renewal clause (overlap)"]
+
+def test_chat_with_lambda_one_keeps_plain_top_k(rag_service, mock_services):
+    candidates = [{"chunk_id": i, "text": f"chunk {i}", "similarity": 1.0 - i / 10} for i in range(3)]
+    _prepare_chat(mock_services, candidates)
+
+    result = rag_service.chat(query="renewal?", top_k=3, mmr_lambda=1.0, fetch_k=20)
+
+    assert mock_services["vector_store_service"].query.call_args.kwargs["top_k"] == 3
+    mock_services["storage_service"].get_chunk_embeddings.assert_not_called()
+    assert result["context_chunks"] == candidates
@@ -0,0 +1,20 @@
+import numpy as np
+
+from app.utils.binary_quantization import hamming_distances, pack_signs
+
+
+def test_pack_signs_uses_one_bit_per_dimension():
+    vectors = np.array([[0.5, -1.0, 2.0, -0.1, 0.0, 3.0, 1.0, -2.0, 4.0]])
+    packed = pack_signs(vectors)
+    assert packed.dtype == np.uint8
+    assert packed.shape == (1, 2)
+    assert packed[0, 0] == 0b10100110
+    assert packed[0, 1] == 0b10000000
+
+
+def test_hamming_distances_count_differing_bits():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 40))
+    query = rng.normal(size=40)
+    expected = ((vectors > 0) != (query > 0)).sum(axis=1)
+    assert np.array_equal(hamming_distances(pack_signs(vectors), pack_signs(query), block_size=7), expected)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from app.utils.embedding_codec import (
+    encode_embedding,
+    decode_embedding,
+    decode_embeddings,
+    decode_embedding_rows,
+)
+
+
+def test_float32_round_trip():
+    vec = [0.25, -1.5, 3.0]
+    blob = encode_embedding(vec, "float32")
+    assert len(blob) == 12
+    assert decode_embedding(blob, "float32", 3).tolist() == vec
+
+
+def test_float16_halves_size():
+    vec = [0.5, 0.25, -2.0, 1.0]
+    blob = encode_embedding(vec, "float16")
+    assert len(blob) == 8
+    decoded = decode_embedding(blob, "float16")
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == vec
+
+
+def test_encoding_is_little_endian():
+    assert encode_embedding([1.0], "float32") == np.array([1.0], dtype="<f4").tobytes()
+
+
+def test_decode_validates_dimension():
+    with pytest.raises(ValueError):
+        decode_embedding(encode_embedding([1.0, 2.0]), "float32", 3)
+
+
+def test_unsupported_dtype_raises():
+    with pytest.raises(ValueError):
+        encode_embedding([1.0], "int8")
+
+
+def test_decode_embeddings_builds_matrix():
+    blobs = [encode_embedding([1, 2]), encode_embedding([3, 4])]
+    matrix = decode_embeddings(blobs, "float32", 2)
+    assert matrix.shape == (2, 2)
+    assert matrix.tolist() == [[1, 2], [3, 4]]
+
+
+def test_decode_embedding_rows_mixes_blob_and_legacy_json():
+    rows = [
+        (encode_embedding([1, 0]), "float32", 2, None),
+        (None, None, None, [0, 1]),
+        (None, None, None, None),
+    ]
+    decoded = decode_embedding_rows(rows)
+    assert decoded[0].tolist() == [1, 0]
+    assert decoded[1].tolist() == [0, 1]
+    assert decoded[2] is None
@@ -0,0 +1,14 @@
+import pytest
+from app.utils.evaluation import recall_at_k, mean_recall_at_k
+
+
+def test_recall_at_k():
+    assert recall_at_k([1, 2, 3], [1, 2, 3], 3) == 1.0
+    assert recall_at_k([1, 9, 8], [1, 2, 3], 3) == pytest.approx(1 / 3)
+    assert recall_at_k([1, 2], [], 2) == 1.0
+
+
+def test_mean_recall_at_k():
+    exact = lambda q, k: [(1, 1.0), (2, 0.9)]
+    approx = lambda q, k: [(1, 1.0), (5, 0.8)]
+    assert mean_recall_at_k(approx, exact, [[0.0], [1.0]], 2) == pytest.approx(0.5)
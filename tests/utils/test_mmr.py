@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.utils.mmr import maximal_marginal_relevance
+
+
+def _naive_mmr(query, candidates, k, lambda_mult):
+    candidates = [np.asarray(c) / np.linalg.norm(c) for c in candidates]
+    query = np.asarray(query) / np.linalg.norm(query)
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            relevance = float(candidate @ query)
+            redundancy = max((float(candidate @ candidates[j]) for j in selected), default=0.0)
+            score = relevance if not selected else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def test_skips_near_duplicates_of_selected_candidates():
+    query = [1.0, 0.2, 0.0]
+    candidates = [
+        [1.0, 0.1, 0.0],
+        [1.0, 0.11, 0.0],  # near-duplicate of the first, e.g. an overlapping neighbour chunk
+        [0.6, 0.0, 0.8],
+    ]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.3) == [1, 2]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [1, 0]
+
+
+def test_matches_a_pairwise_implementation():
+    rng = np.random.default_rng(3)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(40, 16))
+    for lambda_mult in (0.0, 0.3, 0.7, 1.0):
+        assert maximal_marginal_relevance(query, candidates, k=10, lambda_mult=lambda_mult) == _naive_mmr(
+            query, candidates, 10, lambda_mult
+        )
+
+
+def test_k_is_capped_by_the_candidates():
+    assert maximal_marginal_relevance([1.0, 0.0], [[1.0, 0.0]], k=5) == [0]
+    assert maximal_marginal_relevance([1.0, 0.0], [], k=5) == []
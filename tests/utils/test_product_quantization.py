@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.utils.product_quantization import ProductQuantizer
+
+
+@pytest.fixture(scope="module")
+def trained():
+    rng = np.random.default_rng(3)
+    data = rng.normal(size=(600, 20)).astype(np.float32)
+    pq = ProductQuantizer(code_size=8)
+    pq.train(data)
+    return pq, data
+
+
+def test_rejects_code_size_out_of_range():
+    with pytest.raises(ValueError):
+        ProductQuantizer(code_size=4)
+    with pytest.raises(ValueError):
+        ProductQuantizer(code_size=128)
+
+
+def test_encode_produces_uint8_codes_of_code_size(trained):
+    pq, data = trained
+    codes = pq.encode(data[:10])
+    assert codes.dtype == np.uint8
+    assert codes.shape == (10, 8)
+
+
+def test_decode_reconstructs_close_to_original(trained):
+    pq, data = trained
+    reconstructed = pq.decode(pq.encode(data))
+    assert reconstructed.shape == data.shape
+    error = np.linalg.norm(reconstructed - data) / np.linalg.norm(data)
+    assert error < 0.5
+
+
+def test_adc_scores_match_inner_product_with_reconstruction(trained):
+    pq, data = trained
+    codes = pq.encode(data[:50])
+    query = data[100]
+    scores = pq.adc_scores(codes, pq.lookup_table(query))
+    assert scores == pytest.approx(pq.decode(codes) @ query, abs=1e-4)
+
+
+def test_round_trips_through_arrays(trained):
+    pq, data = trained
+    restored = ProductQuantizer.from_arrays(pq.to_arrays())
+    assert np.array_equal(restored.encode(data[:20]), pq.encode(data[:20]))
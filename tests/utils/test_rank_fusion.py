@@ -0,0 +1,17 @@
+import pytest
+
+from app.utils.rank_fusion import reciprocal_rank_fusion
+
+
+def test_fuses_by_weighted_reciprocal_rank():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], weights=[1.0, 2.0], k=10)
+
+    scores = dict(fused)
+    assert [item for item, _ in fused] == ["c", "a", "b"]
+    assert scores["a"] == pytest.approx(1 / 11 + 2 / 12)
+    assert scores["c"] == pytest.approx(1 / 13 + 2 / 11)
+
+
+def test_ties_keep_first_seen_order_and_empty_rankings_are_ignored():
+    assert reciprocal_rank_fusion([["x"], [], ["y"]]) == [("x", 1 / 61), ("y", 1 / 61)]
+    assert reciprocal_rank_fusion([]) == []
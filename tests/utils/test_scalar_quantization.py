@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from app.utils.scalar_quantization import ScalarQuantizer
+
+
+@pytest.fixture(scope="module")
+def calibrated():
+    rng = np.random.default_rng(9)
+    data = rng.normal(size=(500, 32)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    sq = ScalarQuantizer(block_size=64)
+    sq.train(data)
+    return sq, data
+
+
+def test_encode_produces_int8_codes(calibrated):
+    sq, data = calibrated
+    codes = sq.encode(data)
+    assert codes.dtype == np.int8
+    assert codes.shape == data.shape
+    assert codes.min() == -128 and codes.max() == 127
+
+
+def test_decode_error_is_bounded_by_half_a_step(calibrated):
+    sq, data = calibrated
+    error = np.abs(sq.decode(sq.encode(data)) - data)
+    assert np.all(error <= sq.scale / 2 + 1e-6)
+
+
+def test_out_of_range_values_are_clipped(calibrated):
+    sq, data = calibrated
+    codes = sq.encode(np.full((1, 32), 10.0, dtype=np.float32))
+    assert np.all(codes == 127)
+
+
+def test_integer_scores_approximate_inner_products(calibrated):
+    sq, data = calibrated
+    codes = sq.encode(data)
+    query = data[0]
+    assert sq.scores(codes, query) == pytest.approx(data @ query, abs=0.02)
+
+
+def test_round_trips_through_arrays(calibrated):
+    sq, data = calibrated
+    restored = ScalarQuantizer.from_arrays(sq.to_arrays())
+    assert np.array_equal(restored.encode(data), sq.encode(data))
@@ -1,6 +1,6 @@
 import numpy as np
 import pytest
-from app.utils.similarity import cosine_similarity 
+from app.utils.similarity import cosine_similarity, cosine_similarity_matrix, l2_normalize, top_k_indices
 
 def test_identical_vectors():
     vec = [1, 2, 3]
@@ -34,3 +34,30 @@ def test_different_lengths_should_fail():
     vec2 = [1, 2, 3]
     with pytest.raises(ValueError):
         cosine_similarity(vec1, vec2)
+
+def test_top_k_indices_matches_stable_sort():
+    scores = np.array([0.1, 0.9, 0.5, 0.9, 0.3, 0.5])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 5, 4, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+
+def test_l2_normalize_rows_and_zero_vectors():
+    normalized = l2_normalize([[3.0, 4.0], [0.0, 0.0]])
+    assert normalized.dtype == np.float32
+    assert normalized[0].tolist() == pytest.approx([0.6, 0.8])
+    assert normalized[1].tolist() == [0.0, 0.0]
+    assert l2_normalize([0.0, 2.0]).tolist() == pytest.approx([0.0, 1.0])
+
+def test_cosine_similarity_matrix_matches_cosine_similarity():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(20, 8)).astype(np.float32)
+    query = rng.normal(size=8)
+    expected = [cosine_similarity(row, query) for row in matrix]
+
+    assert cosine_similarity_matrix(query, matrix, normalized=False) == pytest.approx(expected, abs=1e-5)
+    assert cosine_similarity_matrix(query, l2_normalize(matrix)) == pytest.approx(expected, abs=1e-5)
+
+def test_cosine_similarity_matrix_mixes_normalized_and_legacy_rows():
+    matrix = np.array([[0.6, 0.8], [3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    scores = cosine_similarity_matrix([0.0, 5.0], matrix, normalized=np.array([True, False, False]))
+    assert scores.tolist() == pytest.approx([0.8, 0.8, 0.0])